@@ -42,6 +42,25 @@ class AlphaHunterRepository(BaseRepository):
                 PRIMARY KEY (ticker, trade_date)
             )
             """)
+            
+            # Incremental pullback state (last processed bar per ticker)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS alpha_hunter_tracking_state (
+                ticker TEXT PRIMARY KEY,
+                spike_date TEXT NOT NULL,
+                post_spike_days INTEGER NOT NULL,
+                track_until TEXT,
+                last_bar_date TEXT NOT NULL,
+                last_close REAL,
+                last_volume INTEGER,
+                days_tracked INTEGER DEFAULT 0,
+                healthy_days INTEGER DEFAULT 0,
+                distribution_days INTEGER DEFAULT 0,
+                health_score INTEGER DEFAULT 100,
+                stage2_score INTEGER,
+                updated_at TIMESTAMP
+            )
+            """)
             conn.commit()
         finally:
             conn.close()
@@ -69,6 +88,7 @@ class AlphaHunterRepository(BaseRepository):
         try:
             conn.execute("DELETE FROM alpha_hunter_watchlist WHERE ticker = ?", (ticker.upper(),))
             conn.execute("DELETE FROM alpha_hunter_tracking WHERE ticker = ?", (ticker.upper(),))
+            conn.execute("DELETE FROM alpha_hunter_tracking_state WHERE ticker = ?", (ticker.upper(),))
             conn.commit()
             return True
         except Exception as e:
@@ -147,25 +167,36 @@ class AlphaHunterRepository(BaseRepository):
         finally:
             conn.close()
 
+    _SNAPSHOT_SQL = """
+    INSERT OR REPLACE INTO alpha_hunter_tracking
+    (ticker, trade_date, price, price_change_pct, volume, volume_change_pct, health_status, health_score, meta_data)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    _STATE_COLUMNS = (
+        "spike_date", "post_spike_days", "track_until", "last_bar_date", "last_close", "last_volume",
+        "days_tracked", "healthy_days", "distribution_days", "health_score", "stage2_score"
+    )
+
+    @staticmethod
+    def _snapshot_row(ticker: str, date: str, metrics: Dict) -> tuple:
+        return (
+            ticker.upper(),
+            date,
+            metrics.get('price'),
+            metrics.get('price_change_pct'),
+            metrics.get('volume'),
+            metrics.get('volume_change_pct'),
+            metrics.get('health_status'),
+            metrics.get('health_score'),
+            json.dumps(metrics.get('meta_data', {}))
+        )
+
     def save_tracking_snapshot(self, ticker: str, date: str, metrics: Dict) -> bool:
         """Save daily tracking snapshot."""
         conn = self._get_conn()
         try:
-            conn.execute("""
-            INSERT OR REPLACE INTO alpha_hunter_tracking
-            (ticker, trade_date, price, price_change_pct, volume, volume_change_pct, health_status, health_score, meta_data)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ticker.upper(),
-                date,
-                metrics.get('price'),
-                metrics.get('price_change_pct'),
-                metrics.get('volume'),
-                metrics.get('volume_change_pct'),
-                metrics.get('health_status'),
-                metrics.get('health_score'),
-                json.dumps(metrics.get('meta_data', {}))
-            ))
+            conn.execute(self._SNAPSHOT_SQL, self._snapshot_row(ticker, date, metrics))
             conn.commit()
             return True
         except Exception as e:
@@ -174,6 +205,77 @@ class AlphaHunterRepository(BaseRepository):
         finally:
             conn.close()
             
+    def get_tracking_states(self, tickers: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Incremental pullback state per ticker.
+        
+        Args:
+            tickers: Tickers to read (default: all tracked tickers)
+            
+        Returns:
+            {TICKER: {spike_date, post_spike_days, track_until, last_bar_date, last_close,
+                      last_volume, days_tracked, healthy_days, distribution_days,
+                      health_score, stage2_score}}
+        """
+        columns = ", ".join(self._STATE_COLUMNS)
+        conn = self._get_conn()
+        try:
+            if tickers is None:
+                rows = conn.execute(f"SELECT ticker, {columns} FROM alpha_hunter_tracking_state").fetchall()
+            else:
+                wanted = sorted({t.upper() for t in tickers if t})
+                rows = []
+                for i in range(0, len(wanted), 500):
+                    chunk = wanted[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(conn.execute(
+                        f"SELECT ticker, {columns} FROM alpha_hunter_tracking_state WHERE ticker IN ({placeholders})",
+                        chunk
+                    ).fetchall())
+            return {row[0]: dict(zip(self._STATE_COLUMNS, row[1:])) for row in rows}
+        except Exception as e:
+            print(f"[!] Error getting tracking states: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def save_tracking_progress(self, updates: List[Dict]) -> bool:
+        """
+        Apply incremental tracking updates in one transaction.
+        
+        Args:
+            updates: [{"ticker", "state", "snapshots": [(date, metrics)], "reset": bool}]
+                     reset drops the ticker's previous snapshots (new spike)
+        """
+        if not updates:
+            return True
+        columns = ", ".join(self._STATE_COLUMNS)
+        placeholders = ", ".join("?" * len(self._STATE_COLUMNS))
+        assignments = ", ".join(f"{c} = excluded.{c}" for c in self._STATE_COLUMNS)
+        conn = self._get_conn()
+        try:
+            for update in updates:
+                ticker = update["ticker"].upper()
+                if update.get("reset"):
+                    conn.execute("DELETE FROM alpha_hunter_tracking WHERE ticker = ?", (ticker,))
+                conn.executemany(self._SNAPSHOT_SQL, [
+                    self._snapshot_row(ticker, date, metrics) for date, metrics in update.get("snapshots", [])
+                ])
+                state = update["state"]
+                conn.execute(f"""
+                INSERT INTO alpha_hunter_tracking_state (ticker, {columns}, updated_at)
+                VALUES (?, {placeholders}, datetime('now'))
+                ON CONFLICT(ticker) DO UPDATE SET {assignments}, updated_at = excluded.updated_at
+                """, (ticker, *(state.get(c) for c in self._STATE_COLUMNS)))
+            conn.commit()
+            return True
+        except Exception as e:
+            print(f"[!] Error saving tracking progress: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
     def get_tracking_history(self, ticker: str) -> List[Dict]:
         """Get tracking history for a ticker."""
         conn = self._get_conn()
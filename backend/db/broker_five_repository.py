@@ -35,6 +35,34 @@ class BrokerFiveRepository(BaseRepository):
         finally:
             conn.close()
 
+    def get_codes_by_ticker(self) -> Dict[str, List[str]]:
+        """Return {TICKER: [broker codes]} for every ticker in one query."""
+        conn = self._get_conn()
+        try:
+            cursor = conn.execute(
+                """
+                SELECT UPPER(ticker), UPPER(broker_code)
+                FROM broker_five_percent
+                ORDER BY ticker, broker_code
+                """
+            )
+            codes: Dict[str, List[str]] = {}
+            for ticker, broker_code in cursor.fetchall():
+                codes.setdefault(ticker, []).append(broker_code)
+            return codes
+        finally:
+            conn.close()
+
+    def get_version(self) -> tuple:
+        """Row count, highest id and latest update; changes with every create/update/delete."""
+        conn = self._get_conn()
+        try:
+            return tuple(conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(MAX(updated_at), '') FROM broker_five_percent"
+            ).fetchone())
+        finally:
+            conn.close()
+
     def get_broker(self, broker_id: int) -> Optional[Dict]:
         """Get broker by id."""
         conn = self._get_conn()
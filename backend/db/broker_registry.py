@@ -0,0 +1,188 @@
+"""
+Broker classification registry backed by brokers_idx.json.
+
+The file is parsed once per modification time into a BrokerRegistry
+snapshot holding dict lookups (name, categories), precomputed category
+sets and integer broker ids. Ids index the boolean masks returned by
+mask() / category_mask(), so a column of broker codes can be classified
+with one encode() and a fancy index instead of per-row set lookups.
+"""
+import json
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+
+# Stage 3 overrides (Alpha Hunter Smart Money Flow)
+STAGE3_SMART_MONEY_OVERRIDES = frozenset({
+    "MG", "BB", "RX", "AK", "BK", "CC", "SS"
+})
+STAGE3_RETAIL_OVERRIDES = frozenset({
+    "YP", "XL", "PD", "XC"
+})
+
+
+class BrokerRegistry:
+    """
+    Immutable snapshot of the broker list.
+
+    Derived sets follow the broker_utils classification:
+      - retail: retail and neither institutional nor foreign
+      - institutional: institutional and not foreign
+      - foreign: foreign
+      - mixed: both retail and institutional
+    stage3_smart_money / stage3_retail are the Alpha Hunter Stage 3 groups
+    with the overrides applied (overrides win on overlaps).
+    """
+
+    def __init__(self, brokers: Iterable[Dict]):
+        self.by_code: Dict[str, Dict] = {}
+        for broker in brokers:
+            if isinstance(broker, dict) and broker.get('code'):
+                self.by_code[broker['code']] = broker
+
+        self.codes = tuple(sorted(self.by_code))
+        self.ids: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self._index = pd.Index(self.codes, dtype=object)
+        self.names: Dict[str, str] = {
+            code: b.get('name') or code for code, b in self.by_code.items()
+        }
+        self.categories: Dict[str, List[str]] = {
+            code: b.get('category', ['unknown']) for code, b in self.by_code.items()
+        }
+
+        by_category: Dict[str, set] = {}
+        for code, categories in self.categories.items():
+            for category in categories:
+                by_category.setdefault(category, set()).add(code)
+        self._by_category = {k: frozenset(v) for k, v in by_category.items()}
+        self.unclassified = frozenset(
+            code for code, categories in self.categories.items() if not categories or 'unknown' in categories
+        )
+
+        retail = self.with_category('retail')
+        institutional = self.with_category('institutional')
+        foreign = self.with_category('foreign')
+        self.retail = retail - institutional - foreign
+        self.institutional = institutional - foreign
+        self.foreign = foreign
+        self.mixed = retail & institutional
+
+        self.stage3_smart_money = (
+            STAGE3_SMART_MONEY_OVERRIDES or (self.institutional | self.foreign)
+        ) - STAGE3_RETAIL_OVERRIDES
+        self.stage3_retail = (
+            STAGE3_RETAIL_OVERRIDES or self.retail
+        ) - STAGE3_SMART_MONEY_OVERRIDES
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.by_code
+
+    # ==================== LOOKUPS ====================
+
+    def name(self, code: str, default: Optional[str] = None) -> str:
+        """Broker name, `default` (or the code itself) when unknown."""
+        return self.names.get(code, code if default is None else default)
+
+    def categories_of(self, code: str) -> List[str]:
+        return self.categories.get(code, ['unknown'])
+
+    def with_category(self, category: str) -> FrozenSet[str]:
+        """Codes tagged with `category` in the file (no exclusions)."""
+        return self._by_category.get(category, frozenset())
+
+    def classify(self, code: str) -> str:
+        """Primary category. Priority: foreign > institutional > retail > mixed > unknown"""
+        if code in self.foreign:
+            return "foreign"
+        if code in self.institutional:
+            return "institutional"
+        if code in self.retail:
+            return "retail"
+        if code in self.mixed:
+            return "mixed"
+        return "unknown"
+
+    # ==================== INTEGER IDS ====================
+
+    def encode(self, codes) -> np.ndarray:
+        """Broker ids of a sequence of codes; -1 for codes not in the file."""
+        return self._index.get_indexer(pd.Index(codes, dtype=object)).astype(np.int32)
+
+    def mask(self, codes: Iterable[str], unregistered: bool = False) -> np.ndarray:
+        """
+        Boolean membership array indexed by broker id.
+
+        The array has one extra trailing slot, so the -1 id of unregistered
+        codes reads `unregistered`: mask(codes)[registry.encode(column)].
+        """
+        result = np.zeros(len(self.codes) + 1, dtype=bool)
+        ids = [self.ids[c] for c in codes if c in self.ids]
+        result[ids] = True
+        result[-1] = unregistered
+        return result
+
+    def category_mask(self, category: str, unregistered: bool = False) -> np.ndarray:
+        return self.mask(self.with_category(category), unregistered=unregistered)
+
+
+# ==================== SHARED REGISTRY ====================
+
+# path -> (mtime, BrokerRegistry); mtime is None when the file is missing
+_registries: Dict[str, tuple] = {}
+_registries_lock = threading.Lock()
+
+
+def _read_brokers(path: str) -> List[Dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # Handle both formats: {"brokers": [...]} and just [...]
+    return data.get('brokers', []) if isinstance(data, dict) else data
+
+
+def _registry_path(path: Optional[str] = None) -> str:
+    return path or os.path.join(config.DATA_DIR, "brokers_idx.json")
+
+
+def get_broker_registry_mtime(path: Optional[str] = None) -> Optional[float]:
+    """mtime of the brokers_idx.json behind get_broker_registry (None when missing)."""
+    try:
+        return os.path.getmtime(_registry_path(path))
+    except OSError:
+        return None
+
+
+def get_broker_registry(path: Optional[str] = None) -> BrokerRegistry:
+    """
+    Registry of a brokers_idx.json (config.DATA_DIR's when path is None).
+
+    Re-parsed only when the file's mtime changes; a missing or unreadable
+    file yields an empty registry.
+    """
+    path = _registry_path(path)
+    mtime = get_broker_registry_mtime(path)
+
+    cached = _registries.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _registries_lock:
+        cached = _registries.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        brokers = []
+        if mtime is not None:
+            try:
+                brokers = _read_brokers(path)
+            except (OSError, ValueError) as e:
+                print(f"[!] Error loading broker data: {e}")
+        registry = BrokerRegistry(brokers)
+        _registries[path] = (mtime, registry)
+        return registry
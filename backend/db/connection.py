@@ -4,6 +4,23 @@ import os
 import config
 from typing import Optional
 
+# Rebuilds done_detail_broker_daily rows from the done_detail_records matching {where}
+DONE_DETAIL_BROKER_DAILY_SQL = """
+INSERT OR REPLACE INTO done_detail_broker_daily
+(ticker, trade_date, broker, buy_lot, sell_lot, buy_value, sell_value)
+SELECT ticker, trade_date, broker, SUM(buy_lot), SUM(sell_lot), SUM(buy_value), SUM(sell_value)
+FROM (
+    SELECT ticker, trade_date, buyer_code AS broker, qty AS buy_lot, 0 AS sell_lot,
+           qty * price * 100 AS buy_value, 0 AS sell_value
+    FROM done_detail_records WHERE {where}
+    UNION ALL
+    SELECT ticker, trade_date, seller_code, 0, qty, 0, qty * price * 100
+    FROM done_detail_records WHERE {where}
+)
+WHERE broker IS NOT NULL AND broker != ''
+GROUP BY ticker, trade_date, broker
+"""
+
 
 class BaseRepository:
     """Base repository class with shared connection management."""
@@ -195,19 +212,22 @@ class DatabaseConnection:
         except sqlite3.OperationalError:
             pass
 
-        # Market Analytics Cache (OHLCV Data)
+        # Daily OHLCV bars (canonical store for every price/volume consumer)
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS market_analytics_cache (
-                ticker TEXT,
-                date DATE,
-                open REAL,
-                high REAL,
-                low REAL,
-                close REAL,
-                volume REAL,
-                PRIMARY KEY (ticker, date)
+            CREATE TABLE IF NOT EXISTS price_volume (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ticker TEXT NOT NULL,
+                trade_date DATE NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(ticker, trade_date)
             );
         """)
+        self._migrate_legacy_ohlcv(conn)
         
         # Market Metadata Cache (Market Cap with TTL)
         conn.execute("""
@@ -237,22 +257,6 @@ class DatabaseConnection:
             );
         """)
         
-        # Volume Daily Records (Incremental Volume Data)
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS volume_daily_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ticker TEXT NOT NULL,
-                trade_date TEXT NOT NULL,
-                volume INTEGER NOT NULL,
-                open_price REAL,
-                high_price REAL,
-                low_price REAL,
-                close_price REAL,
-                fetched_at TEXT DEFAULT (datetime('now')),
-                UNIQUE(ticker, trade_date)
-            );
-        """)
-        
         # Safe migration for existing tables
         try:
             conn.execute("ALTER TABLE news ADD COLUMN summary TEXT")
@@ -268,15 +272,100 @@ class DatabaseConnection:
             conn.execute("ALTER TABLE market_metadata ADD COLUMN last_price REAL")
         except sqlite3.OperationalError:
             pass  # Column already exists
+        try:
+            conn.execute("ALTER TABLE market_metadata ADD COLUMN sector TEXT")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
         
         # Optimization: Create indexes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_news_ticker ON news(ticker);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_news_timestamp ON news(timestamp);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_dis_ticker ON idx_disclosures(ticker);")
         
+        # Migration: trade_date + row_hash on neobdm_records for incremental upserts
+        trade_date_added = False
+        try:
+            conn.execute("ALTER TABLE neobdm_records ADD COLUMN trade_date TEXT")
+            trade_date_added = True
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+        try:
+            conn.execute("ALTER TABLE neobdm_records ADD COLUMN row_hash TEXT")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+        # One row per (symbol, method, period, trade_date). Existing duplicates are
+        # collapsed to the most recent row once, before the unique index exists.
+        has_unique = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_neobdm_rec_unique'"
+        ).fetchone()
+        if trade_date_added or not has_unique:
+            # Rows written before the column existed take their scrape date
+            conn.execute("UPDATE neobdm_records SET trade_date = substr(scraped_at, 1, 10) WHERE trade_date IS NULL")
+            conn.commit()
+        if not has_unique:
+            conn.execute("""
+                DELETE FROM neobdm_records WHERE id NOT IN (
+                    SELECT MAX(id) FROM neobdm_records GROUP BY symbol, method, period, trade_date
+                )
+            """)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_neobdm_rec_unique ON neobdm_records(symbol, method, period, trade_date);")
+            conn.commit()
+
+        # NeoBDM ingest log (one row per saved method/period batch)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS neobdm_ingest_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_at DATETIME DEFAULT (datetime('now')),
+                method TEXT,
+                period TEXT,
+                trade_date TEXT,
+                total_rows INTEGER,
+                inserted INTEGER,
+                updated INTEGER,
+                unchanged INTEGER,
+                deleted INTEGER,
+                scraped_at DATETIME
+            );
+        """)
+        try:
+            conn.execute("ALTER TABLE neobdm_ingest_runs ADD COLUMN scraped_at DATETIME")
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+        # Migration: run_id marks the ingest run that last inserted or changed a record
+        try:
+            conn.execute("ALTER TABLE neobdm_records ADD COLUMN run_id INTEGER")
+            # Existing rows are attributed to one synthetic run so exports still pick them up
+            legacy_rows = conn.execute("SELECT COUNT(*) FROM neobdm_records").fetchone()[0]
+            if legacy_rows:
+                cursor = conn.execute(
+                    "INSERT INTO neobdm_ingest_runs (total_rows, inserted, updated, unchanged, deleted) VALUES (?, ?, 0, 0, 0)",
+                    (legacy_rows, legacy_rows)
+                )
+                conn.execute("UPDATE neobdm_records SET run_id = ? WHERE run_id IS NULL", (cursor.lastrowid,))
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+        # Tombstones of records pruned by an ingest run (consumed by the Parquet export)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS neobdm_record_deletes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER,
+                symbol TEXT,
+                method TEXT,
+                period TEXT,
+                trade_date TEXT
+            );
+        """)
+
         # NeoBDM Optimization Indexes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_rec_lookup ON neobdm_records(method, period, scraped_at);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_rec_trade ON neobdm_records(method, period, trade_date);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_rec_symbol ON neobdm_records(symbol);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_rec_run ON neobdm_records(run_id);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_del_run ON neobdm_record_deletes(run_id);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_sum_lookup ON neobdm_summaries(method, period, scraped_at);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_neobdm_broker_lookup ON neobdm_broker_summaries(ticker, trade_date);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_broker_five_ticker ON broker_five_percent(ticker);")
@@ -285,12 +374,15 @@ class DatabaseConnection:
         # Market Metadata Indexes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_market_meta_symbol ON market_metadata(symbol);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_market_meta_cached ON market_metadata(cached_at);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_market_meta_sector_cap ON market_metadata(sector COLLATE NOCASE, market_cap);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_market_meta_cap ON market_metadata(market_cap);")
         
         # Market Cap History Indexes
         conn.execute("CREATE INDEX IF NOT EXISTS idx_mcap_hist_ticker_date ON market_cap_history(ticker, trade_date DESC);")
         
-        # Volume Daily Indexes
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_volume_ticker_date ON volume_daily_records(ticker, trade_date DESC);")
+        # Price Volume Indexes
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_price_volume_ticker_date ON price_volume(ticker, trade_date);")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_price_volume_date ON price_volume(trade_date);")
         
         # Done Detail Records (Paste-based trade data)
         conn.execute("""
@@ -348,5 +440,60 @@ class DatabaseConnection:
         """)
         conn.execute("CREATE INDEX IF NOT EXISTS idx_synthesis_lookup ON done_detail_synthesis(ticker, trade_date);")
         
+        # Done Detail per-day broker totals (kept after raw records are cleaned up)
+        has_broker_daily = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='done_detail_broker_daily'"
+        ).fetchone()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS done_detail_broker_daily (
+                ticker TEXT NOT NULL,
+                trade_date TEXT NOT NULL,
+                broker TEXT NOT NULL,
+                buy_lot INTEGER DEFAULT 0,
+                sell_lot INTEGER DEFAULT 0,
+                buy_value REAL DEFAULT 0,
+                sell_value REAL DEFAULT 0,
+                PRIMARY KEY (ticker, trade_date, broker)
+            );
+        """)
+        if not has_broker_daily:
+            # Backfill once from the raw records still on disk
+            conn.execute(DONE_DETAIL_BROKER_DAILY_SQL.format(where="1 = 1"))
+        
         conn.commit()
 
+
+    def _migrate_legacy_ohlcv(self, conn: sqlite3.Connection):
+        """
+        Retire the old duplicate OHLCV caches in favour of price_volume.
+
+        volume_daily_records (volume fetcher, adjusted prices like price_volume)
+        is copied over; existing price_volume rows win on conflict and rows
+        without full OHLC are left behind. market_analytics_cache (MarketData)
+        held unadjusted prices (auto_adjust=False), so it is not copied: those
+        tickers are re-downloaded, adjusted, on first use.
+
+        Both tables are renamed to *_legacy rather than dropped, so nothing is
+        lost and the migration runs once.
+        """
+        legacy = {
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN "
+                "('market_analytics_cache', 'volume_daily_records', "
+                "'market_analytics_cache_legacy', 'volume_daily_records_legacy')"
+            )
+        }
+        if 'volume_daily_records' in legacy:
+            conn.execute("""
+                INSERT OR IGNORE INTO price_volume (ticker, trade_date, open, high, low, close, volume)
+                SELECT UPPER(ticker), trade_date, open_price, high_price, low_price, close_price, volume
+                FROM volume_daily_records
+                WHERE open_price IS NOT NULL AND high_price IS NOT NULL
+                  AND low_price IS NOT NULL AND close_price IS NOT NULL
+            """)
+        for table in ('market_analytics_cache', 'volume_daily_records'):
+            if table in legacy and f"{table}_legacy" not in legacy:
+                conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+                print(f"[*] Retired legacy OHLCV table {table} (kept as {table}_legacy)")
+        if legacy:
+            conn.commit()
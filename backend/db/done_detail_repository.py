@@ -1,7 +1,8 @@
 """Done Detail repository for paste-based trade data analysis."""
 import pandas as pd
 from typing import Optional, List, Dict
-from .connection import BaseRepository
+from .broker_registry import get_broker_registry
+from .connection import BaseRepository, DONE_DETAIL_BROKER_DAILY_SQL
 
 
 class DoneDetailRepository(BaseRepository):
@@ -75,6 +76,7 @@ class DoneDetailRepository(BaseRepository):
                 rows.append(row)
             
             conn.executemany(query, rows)
+            self._rebuild_broker_daily(conn, ticker, trade_date)
             conn.commit()
             print(f"[*] Saved {len(rows)} done detail records for {ticker} on {trade_date}")
             return len(rows)
@@ -111,6 +113,15 @@ class DoneDetailRepository(BaseRepository):
         finally:
             conn.close()
     
+    @staticmethod
+    def _rebuild_broker_daily(conn, ticker: str, trade_date: str):
+        """Recompute the per-broker totals of one ticker/date from its raw records."""
+        params = (ticker.upper(), trade_date)
+        conn.execute("DELETE FROM done_detail_broker_daily WHERE ticker = ? AND trade_date = ?", params)
+        conn.execute(
+            DONE_DETAIL_BROKER_DAILY_SQL.format(where="ticker = ? AND trade_date = ?"), params + params
+        )
+    
     def get_saved_history(self) -> pd.DataFrame:
         """
         Get all saved ticker/date combinations.
@@ -152,8 +163,9 @@ class DoneDetailRepository(BaseRepository):
                 "DELETE FROM done_detail_records WHERE ticker = ? AND trade_date = ?",
                 (ticker.upper(), trade_date)
             )
-            conn.commit()
             deleted = cursor.rowcount
+            self._rebuild_broker_daily(conn, ticker, trade_date)
+            conn.commit()
             print(f"[*] Deleted {deleted} done detail records for {ticker} on {trade_date}")
             return deleted > 0
         except Exception as e:
@@ -527,23 +539,11 @@ class DoneDetailRepository(BaseRepository):
         Returns:
             Dict with status (AKUMULASI/DISTRIBUSI/NETRAL) and breakdown by category
         """
-        import json
-        import os
-        import config
+        import numpy as np
         
         conn = self._get_conn()
         try:
-            # Load broker classification
-            broker_file = os.path.join(config.DATA_DIR, "brokers_idx.json")
-            with open(broker_file, 'r', encoding='utf-8') as f:
-                broker_data = json.load(f)
-            
-            # Build category lookup
-            broker_categories = {}
-            for broker in broker_data.get('brokers', []):
-                code = broker.get('code', '')
-                categories = broker.get('category', ['unknown'])
-                broker_categories[code] = categories
+            registry = get_broker_registry()
             
             # Get all trades for this ticker/date
             query = """
@@ -565,51 +565,31 @@ class DoneDetailRepository(BaseRepository):
                     "total_volume": 0
                 }
             
-            # Calculate net lot per broker
-            broker_net = {}
-            for _, row in df.iterrows():
-                buyer = row['buyer_code']
-                seller = row['seller_code']
-                qty = row['qty']
-                
-                # Buyer gets positive, seller gets negative
-                broker_net[buyer] = broker_net.get(buyer, 0) + qty
-                broker_net[seller] = broker_net.get(seller, 0) - qty
-            
-            # Aggregate by category
-            retail_net = 0
-            institutional_net = 0
-            foreign_net = 0
-            
-            retail_brokers = []
-            institutional_brokers = []
-            foreign_brokers = []
-            
-            for broker_code, net_lot in broker_net.items():
-                categories = broker_categories.get(broker_code, ['unknown'])
-                
-                broker_info = {"code": broker_code, "net_lot": int(net_lot)}
-                
-                # Check categories (a broker can be in multiple categories)
-                if 'retail' in categories:
-                    retail_net += net_lot
-                    retail_brokers.append(broker_info)
-                if 'institutional' in categories:
-                    institutional_net += net_lot
-                    institutional_brokers.append(broker_info)
-                if 'foreign' in categories:
-                    foreign_net += net_lot
-                    foreign_brokers.append(broker_info)
-                
-                # If broker has no known category, treat as retail
-                if 'unknown' in categories or len(categories) == 0:
-                    retail_net += net_lot
-                    retail_brokers.append(broker_info)
-            
-            # Sort brokers by absolute net_lot
-            retail_brokers.sort(key=lambda x: abs(x['net_lot']), reverse=True)
-            institutional_brokers.sort(key=lambda x: abs(x['net_lot']), reverse=True)
-            foreign_brokers.sort(key=lambda x: abs(x['net_lot']), reverse=True)
+            # Net lot per broker: buyer gets positive, seller gets negative
+            # (interleaved so brokers keep their first-appearance order)
+            qty = df['qty'].to_numpy()
+            codes = np.column_stack([df['buyer_code'].to_numpy(), df['seller_code'].to_numpy()]).ravel()
+            signed = np.column_stack([qty, -qty]).ravel()
+            broker_net = pd.Series(signed).groupby(codes, sort=False).sum()
+            
+            # Category membership by broker id (a broker can be in multiple categories)
+            ids = registry.encode(broker_net.index)
+            net = broker_net.to_numpy()
+            
+            def _category(*masks):
+                selected = np.sort(np.concatenate([np.flatnonzero(m[ids]) for m in masks]), kind='stable')
+                brokers = [{"code": broker_net.index[i], "net_lot": int(net[i])} for i in selected]
+                # Sort brokers by absolute net_lot
+                brokers.sort(key=lambda x: abs(x['net_lot']), reverse=True)
+                return net[selected].sum(), brokers
+            
+            # If broker has no known category, treat as retail
+            retail_net, retail_brokers = _category(
+                registry.category_mask('retail'),
+                registry.mask(registry.unclassified, unregistered=True)
+            )
+            institutional_net, institutional_brokers = _category(registry.category_mask('institutional'))
+            foreign_net, foreign_brokers = _category(registry.category_mask('foreign'))
             
             # Determine status
             # AKUMULASI: Institusi beli (net > 0) dan Retail jual (net < 0)
@@ -750,36 +730,14 @@ class DoneDetailRepository(BaseRepository):
         Returns:
             Dict with all trades and imposter analysis results
         """
-        import json
-        import os
-        import config
         import numpy as np
         
         conn = self._get_conn()
         try:
-            # Load broker classification
-            broker_file = os.path.join(config.DATA_DIR, "brokers_idx.json")
-            with open(broker_file, 'r', encoding='utf-8') as f:
-                broker_data = json.load(f)
-            
-            # Build broker info lookup
-            broker_info = {}
-            retail_codes = set()
-            mixed_codes = set()
-            
-            for broker in broker_data.get('brokers', []):
-                code = broker.get('code', '')
-                categories = broker.get('category', [])
-                broker_info[code] = {
-                    'name': broker.get('name', code),
-                    'categories': categories
-                }
-                
-                # Retail and mixed brokers
-                if 'retail' in categories:
-                    retail_codes.add(code)
-                if 'mixed' in categories or ('retail' in categories and 'institutional' in categories):
-                    mixed_codes.add(code)
+            # Broker classification: retail and mixed brokers
+            registry = get_broker_registry()
+            retail_codes = registry.with_category('retail')
+            mixed_codes = registry.with_category('mixed') | registry.mixed
             
             
             # Get ALL transactions in date range for accurate synthesis
@@ -871,9 +829,9 @@ class DoneDetailRepository(BaseRepository):
                     "trade_date": trade_date,
                     "trade_time": trade_time,
                     "buyer_code": buyer,
-                    "buyer_name": broker_info.get(buyer, {}).get('name', buyer),
+                    "buyer_name": registry.name(buyer),
                     "seller_code": seller,
-                    "seller_name": broker_info.get(seller, {}).get('name', seller),
+                    "seller_name": registry.name(seller),
                     "qty": qty,
                     "price": price,
                     "value": value,
@@ -897,7 +855,7 @@ class DoneDetailRepository(BaseRepository):
                             "trade_date": trade_date,
                             "trade_time": trade_time,
                             "broker_code": buyer,
-                            "broker_name": broker_info.get(buyer, {}).get('name', buyer),
+                            "broker_name": registry.name(buyer),
                             "broker_type": "retail" if buyer in retail_codes else "mixed",
                             "direction": "BUY",
                             "qty": qty,
@@ -941,7 +899,7 @@ class DoneDetailRepository(BaseRepository):
                             "trade_date": trade_date,
                             "trade_time": trade_time,
                             "broker_code": seller,
-                            "broker_name": broker_info.get(seller, {}).get('name', seller),
+                            "broker_name": registry.name(seller),
                             "broker_type": "retail" if seller in retail_codes else "mixed",
                             "direction": "SELL",
                             "qty": qty,
@@ -976,7 +934,7 @@ class DoneDetailRepository(BaseRepository):
             by_broker = [
                 {
                     "broker": code,
-                    "name": broker_info.get(code, {}).get('name', code),
+                    "name": registry.name(code),
                     "broker_type": "retail" if code in retail_codes else "mixed",
                     "count": stats["count"],
                     "buy_count": stats["buy_count"],
@@ -1059,21 +1017,11 @@ class DoneDetailRepository(BaseRepository):
         Returns:
             Dict with speed analysis results
         """
-        import json
-        import os
-        import config
         from collections import defaultdict
         
         conn = self._get_conn()
         try:
-            # Load broker classification
-            broker_file = os.path.join(config.DATA_DIR, "brokers_idx.json")
-            with open(broker_file, 'r', encoding='utf-8') as f:
-                broker_data = json.load(f)
-            
-            broker_info = {b.get('code', ''): b.get('name', '') for b in broker_data.get('brokers', [])}
-            
-            
+            registry = get_broker_registry()
             
             # Get ALL transactions for accurate speed analysis
             query = """
@@ -1160,7 +1108,7 @@ class DoneDetailRepository(BaseRepository):
                 
                 speed_by_broker.append({
                     "broker": code,
-                    "name": broker_info.get(code, code),
+                    "name": registry.name(code),
                     "total_trades": stats["trades"],
                     "buy_trades": stats["buy"],
                     "sell_trades": stats["sell"],
@@ -1494,26 +1442,12 @@ class DoneDetailRepository(BaseRepository):
         """
         Get detailed profile for a specific broker (Phase 4).
         """
-        import json
-        import os
-        import config
         import numpy as np
         
         conn = self._get_conn()
         try:
             # 1. Get broker name
-            broker_name = broker_code
-            try:
-                broker_file = os.path.join(config.DATA_DIR, "brokers_idx.json")
-                if os.path.exists(broker_file):
-                    with open(broker_file, 'r', encoding='utf-8') as f:
-                        broker_data = json.load(f)
-                        for b in broker_data.get('brokers', []):
-                            if b.get('code') == broker_code:
-                                broker_name = b.get('name')
-                                break
-            except Exception as e:
-                print(f"Error loading broker name: {e}")
+            broker_name = get_broker_registry().name(broker_code)
 
             # 2. Get all trades involving this broker
             # Note: value = price * qty * 100 (Indonesian stocks)
@@ -1647,34 +1581,19 @@ class DoneDetailRepository(BaseRepository):
         2. Imposter Recurrence (Ghost Broker Detection)
         3. Battle Timeline (Daily Imposter Activity)
         """
-        import json
-        import os
         import numpy as np
         from collections import defaultdict
         
         conn = self._get_conn()
         try:
-            # Load broker classification
-            broker_file = os.path.join(os.path.dirname(__file__), "..", "data", "brokers_idx.json")
-            broker_info = {}
-            retail_codes = set()
-            mixed_codes = set()
-            
-            if os.path.exists(broker_file):
-                with open(broker_file, 'r') as f:
-                    broker_data = json.load(f)
-                # Handle both formats: {"brokers": [...]} and just [...]
-                broker_list = broker_data.get("brokers", broker_data) if isinstance(broker_data, dict) else broker_data
-                for b in broker_list:
-                    if not isinstance(b, dict):
-                        continue
-                    code = b.get("code", "")
-                    broker_info[code] = b
-                    categories = b.get("category", [])
-                    if "retail" in categories:
-                        retail_codes.add(code)
-                    if "institutional" not in categories and "foreign" not in categories:
-                        mixed_codes.add(code)
+            # Broker classification
+            registry = get_broker_registry()
+            retail_codes = registry.with_category('retail')
+            mixed_codes = (
+                set(registry.codes)
+                - registry.with_category('institutional')
+                - registry.with_category('foreign')
+            )
             
             # Get all records in range
             query = """
@@ -1755,7 +1674,7 @@ class DoneDetailRepository(BaseRepository):
                 if peak_position > 1000000:  # Only include brokers with significant activity (>1M)
                     retail_capitulation.append({
                         "broker": broker,
-                        "name": broker_info.get(broker, {}).get("name", broker),
+                        "name": registry.name(broker),
                         "peak_position": peak_position,
                         "current_position": max(0, current_position),
                         "distribution_pct": round(distribution_pct, 1),
@@ -1816,7 +1735,7 @@ class DoneDetailRepository(BaseRepository):
                 
                 imposter_recurrence.append({
                     "broker": broker,
-                    "name": broker_info.get(broker, {}).get("name", broker),
+                    "name": registry.name(broker),
                     "days_active": days_active,
                     "total_days": total_days,
                     "recurrence_pct": round(recurrence_pct, 1),
@@ -1875,7 +1794,7 @@ class DoneDetailRepository(BaseRepository):
             summary = {
                 "total_imposter_trades": total_imposter_trades,
                 "top_ghost_broker": top_ghost,
-                "top_ghost_name": broker_info.get(top_ghost, {}).get("name", top_ghost) if top_ghost else None,
+                "top_ghost_name": registry.name(top_ghost) if top_ghost else None,
                 "peak_day": peak_day["date"] if peak_day else None,
                 "peak_value": peak_day["total_imposter_value"] if peak_day else 0,
                 "avg_lot": round(avg_lot_all, 0),
@@ -1925,8 +1844,6 @@ class DoneDetailRepository(BaseRepository):
         Returns:
             Range analysis aggregated from synthesis data
         """
-        import json
-        import os
         from collections import defaultdict
         
         try:
@@ -1938,24 +1855,9 @@ class DoneDetailRepository(BaseRepository):
                 print(f"[!] No synthesis found for {ticker} {start_date}-{end_date}, falling back to raw...")
                 return self.get_range_analysis(ticker, start_date, end_date)
             
-            # Load broker info for names
-            broker_file = os.path.join(os.path.dirname(__file__), "..", "data", "brokers_idx.json")
-            broker_info = {}
-            retail_codes = set()
-            
-            if os.path.exists(broker_file):
-                with open(broker_file, 'r') as f:
-                    broker_data = json.load(f)
-                # Handle both formats: {"brokers": [...]} and just [...]
-                broker_list = broker_data.get("brokers", broker_data) if isinstance(broker_data, dict) else broker_data
-                for b in broker_list:
-                    if not isinstance(b, dict):
-                        continue
-                    code = b.get("code", "")
-                    broker_info[code] = b
-                    categories = b.get("category", [])
-                    if "retail" in categories:
-                        retail_codes.add(code)
+            # Broker names and retail codes
+            registry = get_broker_registry()
+            retail_codes = registry.with_category('retail')
             
             total_days = len(synthesis_list)
             all_dates = [s["trade_date"] for s in synthesis_list]
@@ -2022,7 +1924,7 @@ class DoneDetailRepository(BaseRepository):
                 
                 retail_capitulation.append({
                     "broker": broker,
-                    "name": broker_info.get(broker, {}).get("name", broker),
+                    "name": registry.name(broker),
                     "buy_value": int(buy),
                     "sell_value": int(sell),
                     "net_value": int(buy - sell),
@@ -2051,7 +1953,7 @@ class DoneDetailRepository(BaseRepository):
                 
                 imposter_recurrence.append({
                     "broker": broker,
-                    "name": broker_info.get(broker, {}).get("name", broker),
+                    "name": registry.name(broker),
                     "days_active": days_active,
                     "total_days": total_days,
                     "recurrence_pct": round(recurrence_pct, 1),
@@ -2089,7 +1991,7 @@ class DoneDetailRepository(BaseRepository):
             summary = {
                 "total_imposter_value": sum(daily_imposter_totals.values()),
                 "top_ghost_broker": top_ghost,
-                "top_ghost_name": broker_info.get(top_ghost, {}).get("name", top_ghost) if top_ghost else None,
+                "top_ghost_name": registry.name(top_ghost) if top_ghost else None,
                 "peak_day": peak_day["date"] if peak_day else None,
                 "peak_value": peak_day["total_imposter_value"] if peak_day else 0,
                 "total_days": total_days,
@@ -2119,3 +2021,294 @@ class DoneDetailRepository(BaseRepository):
             traceback.print_exc()
             # Fallback to raw data
             return self.get_range_analysis(ticker, start_date, end_date)
+
+    # ============================================
+    # PER-DAY AGGREGATES (bounded-cost range reads)
+    # ============================================
+    
+    def get_broker_daily_flows(self, ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
+        """
+        Per-broker buy/sell totals per day from done_detail_broker_daily.
+        
+        Returns:
+            DataFrame with trade_date, broker, buy_lot, sell_lot, buy_value, sell_value
+        """
+        conn = self._get_conn()
+        try:
+            query = """
+            SELECT trade_date, broker, buy_lot, sell_lot, buy_value, sell_value
+            FROM done_detail_broker_daily
+            WHERE ticker = ? AND trade_date >= ? AND trade_date <= ?
+            ORDER BY trade_date, broker
+            """
+            return pd.read_sql(query, conn, params=(ticker.upper(), start_date, end_date))
+        except Exception as e:
+            print(f"[!] Error fetching broker daily flows: {e}")
+            return pd.DataFrame()
+        finally:
+            conn.close()
+    
+    def get_imposter_daily_stats(self, ticker: str, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Per-day imposter totals from the synthesis table.
+        
+        Only by_broker and the summary counters are extracted (json_extract),
+        so the stored all_trades / imposter_trades lists are never decoded.
+        
+        Returns:
+            List of {trade_date, by_broker, total_transactions, imposter_trades} sorted by date
+        """
+        import json
+        
+        conn = self._get_conn()
+        try:
+            cursor = conn.execute(
+                """
+                SELECT trade_date,
+                       json_extract(imposter_data, '$.by_broker'),
+                       json_extract(imposter_data, '$.total_transactions'),
+                       json_extract(imposter_data, '$.summary.strong_count'),
+                       json_extract(imposter_data, '$.summary.possible_count')
+                FROM done_detail_synthesis
+                WHERE ticker = ? AND trade_date >= ? AND trade_date <= ?
+                ORDER BY trade_date
+                """,
+                (ticker.upper(), start_date, end_date)
+            )
+            return [
+                {
+                    "trade_date": row[0],
+                    "by_broker": json.loads(row[1]) if row[1] else [],
+                    "total_transactions": row[2] or 0,
+                    "imposter_trades": (row[3] or 0) + (row[4] or 0)
+                }
+                for row in cursor.fetchall()
+            ]
+        except Exception as e:
+            print(f"[!] Error fetching imposter daily stats: {e}")
+            return []
+        finally:
+            conn.close()
+    
+    def get_synthesized_date_range(self, ticker: str) -> Dict:
+        """
+        Date range covered by the per-day aggregates (broker totals or synthesis).
+        
+        Unlike get_date_range(), this survives the raw-record cleanup.
+        
+        Returns:
+            Dict with min_date and max_date
+        """
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                """
+                SELECT MIN(trade_date), MAX(trade_date) FROM (
+                    SELECT trade_date FROM done_detail_broker_daily WHERE ticker = ?
+                    UNION
+                    SELECT trade_date FROM done_detail_synthesis WHERE ticker = ?
+                )
+                """,
+                (ticker.upper(), ticker.upper())
+            ).fetchone()
+            return {"min_date": row[0], "max_date": row[1]}
+        except Exception as e:
+            print(f"[!] Error fetching synthesized date range: {e}")
+            return {"min_date": None, "max_date": None}
+        finally:
+            conn.close()
+    
+    def get_latest_record_date(self, ticker: str) -> Optional[str]:
+        """Most recent trade_date with raw records for a ticker, or None."""
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT MAX(trade_date) FROM done_detail_records WHERE ticker = ?",
+                (ticker.upper(),)
+            ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            print(f"[!] Error fetching latest record date: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def get_range_analysis_from_aggregates(self, ticker: str, start_date: str, end_date: str) -> Dict:
+        """
+        Range analysis (same structure as get_range_analysis) from per-day aggregates.
+        
+        - Retail capitulation: cumulative net value per retail broker from
+          done_detail_broker_daily, same peak/current method as the raw version
+        - Imposter recurrence / battle timeline / summary: each day's synthesis
+          by_broker and counters (imposter threshold is that day's P95)
+        
+        Cost depends on days x brokers, not on the number of trades, and raw
+        records are never read.
+        
+        Returns:
+            Range analysis dict, or a dict with "error" when nothing was synthesized
+        """
+        try:
+            ticker = ticker.upper()
+            flows = self.get_broker_daily_flows(ticker, start_date, end_date)
+            daily_stats = self.get_imposter_daily_stats(ticker, start_date, end_date)
+            
+            if flows.empty and not daily_stats:
+                return {
+                    "ticker": ticker,
+                    "date_range": {"start": start_date, "end": end_date},
+                    "error": "No synthesized done detail data in range"
+                }
+            
+            registry = get_broker_registry()
+            retail_broker_codes = registry.with_category('retail') | (
+                set(registry.codes)
+                - registry.with_category('institutional')
+                - registry.with_category('foreign')
+            )
+            
+            unique_dates = sorted(
+                set(flows['trade_date'] if not flows.empty else [])
+                | {s["trade_date"] for s in daily_stats}
+            )
+            total_days = len(unique_dates)
+            
+            # ===== SECTION 1: Retail Capitulation (50% Rule) =====
+            retail_capitulation = []
+            overall_peak = 0
+            overall_distributed = 0
+            safe_count = 0
+            holding_count = 0
+            
+            retail_flows = flows[flows['broker'].isin(retail_broker_codes)] if not flows.empty else flows
+            if not retail_flows.empty:
+                net = (
+                    retail_flows.assign(net=retail_flows['buy_value'] - retail_flows['sell_value'])
+                    .pivot_table(index='trade_date', columns='broker', values='net', aggfunc='sum')
+                    .reindex(unique_dates)
+                    .fillna(0.0)
+                )
+                cumulative = net.cumsum()
+                peaks = cumulative.cummax().clip(lower=0).iloc[-1]
+                currents = cumulative.iloc[-1]
+                history_dates = unique_dates[-7:]
+                
+                for broker in cumulative.columns[peaks.values > 1000000]:
+                    peak_position = float(peaks[broker])
+                    current_position = float(currents[broker])
+                    distribution_pct = (peak_position - current_position) / peak_position * 100
+                    is_safe = distribution_pct >= 50
+                    
+                    retail_capitulation.append({
+                        "broker": broker,
+                        "name": registry.name(broker),
+                        "peak_position": peak_position,
+                        "current_position": max(0, current_position),
+                        "distribution_pct": round(distribution_pct, 1),
+                        "is_safe": is_safe,
+                        "history": [
+                            {"date": date, "cumulative": float(value)}
+                            for date, value in zip(history_dates, cumulative[broker].values[-7:])
+                        ]
+                    })
+                    
+                    overall_peak += peak_position
+                    overall_distributed += max(0, peak_position - current_position)
+                    if is_safe:
+                        safe_count += 1
+                    else:
+                        holding_count += 1
+            
+            retail_capitulation.sort(key=lambda x: x["peak_position"], reverse=True)
+            overall_pct = (overall_distributed / overall_peak * 100) if overall_peak > 0 else 0
+            
+            # ===== SECTION 2: Imposter Recurrence =====
+            imposter_daily = {}  # {broker: {date: {count, value, lot}}}
+            battle_timeline = []
+            
+            for stats in daily_stats:
+                date = stats["trade_date"]
+                broker_breakdown = {}
+                for broker_stat in stats["by_broker"]:
+                    broker = broker_stat.get("broker", "")
+                    value = broker_stat.get("total_value", 0) or 0
+                    imposter_daily.setdefault(broker, {})[date] = {
+                        "count": broker_stat.get("count", 0) or 0,
+                        "value": value,
+                        "lot": broker_stat.get("total_lot", 0) or 0
+                    }
+                    broker_breakdown[broker] = value
+                
+                battle_timeline.append({
+                    "date": date,
+                    "total_imposter_value": sum(broker_breakdown.values()),
+                    "trade_count": stats["total_transactions"],
+                    "broker_breakdown": broker_breakdown
+                })
+            
+            imposter_recurrence = []
+            for broker, daily_data in imposter_daily.items():
+                days_active = len(daily_data)
+                total_count = sum(d["count"] for d in daily_data.values())
+                total_lot = sum(d["lot"] for d in daily_data.values())
+                
+                imposter_recurrence.append({
+                    "broker": broker,
+                    "name": registry.name(broker),
+                    "days_active": days_active,
+                    "total_days": total_days,
+                    "recurrence_pct": round((days_active / total_days) * 100, 1) if total_days > 0 else 0,
+                    "total_value": sum(d["value"] for d in daily_data.values()),
+                    "total_count": total_count,
+                    "avg_lot": round(total_lot / total_count, 0) if total_count else 0,
+                    "daily_activity": [
+                        {"date": date, "value": data["value"], "count": data["count"]}
+                        for date, data in sorted(daily_data.items())
+                    ]
+                })
+            
+            imposter_recurrence.sort(key=lambda x: x["recurrence_pct"], reverse=True)
+            
+            # ===== SECTION 3: Summary =====
+            total_imposter_trades = sum(s["imposter_trades"] for s in daily_stats)
+            total_trades = sum(s["total_transactions"] for s in daily_stats)
+            top_ghost = imposter_recurrence[0]["broker"] if imposter_recurrence else None
+            peak_day = max(battle_timeline, key=lambda x: x["total_imposter_value"]) if battle_timeline else None
+            avg_lot_all = sum(r["avg_lot"] for r in imposter_recurrence) / len(imposter_recurrence) if imposter_recurrence else 0
+            
+            summary = {
+                "total_imposter_trades": total_imposter_trades,
+                "top_ghost_broker": top_ghost,
+                "top_ghost_name": registry.name(top_ghost) if top_ghost else None,
+                "peak_day": peak_day["date"] if peak_day else None,
+                "peak_value": peak_day["total_imposter_value"] if peak_day else 0,
+                "avg_lot": round(avg_lot_all, 0),
+                "avg_daily_imposter_pct": round(total_imposter_trades / total_trades * 100, 1) if total_trades > 0 else 0,
+                "total_days": total_days,
+                "retail_capitulation_pct": round(overall_pct, 1)
+            }
+            
+            return {
+                "ticker": ticker,
+                "date_range": {"start": start_date, "end": end_date},
+                "retail_capitulation": {
+                    "brokers": retail_capitulation[:15],
+                    "overall_pct": round(overall_pct, 1),
+                    "safe_count": safe_count,
+                    "holding_count": holding_count
+                },
+                "imposter_recurrence": {
+                    "brokers": imposter_recurrence[:15]
+                },
+                "battle_timeline": battle_timeline,
+                "summary": summary
+            }
+        except Exception as e:
+            print(f"[!] Error in aggregate range analysis: {e}")
+            import traceback
+            traceback.print_exc()
+            return {
+                "ticker": ticker.upper(),
+                "date_range": {"start": start_date, "end": end_date},
+                "error": str(e)
+            }
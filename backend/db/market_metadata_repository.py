@@ -1,16 +1,116 @@
 """Market metadata repository for market cap caching with TTL."""
+import threading
+import time
+import numpy as np
 import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 from .connection import BaseRepository
 
 
+class MarketCapRefresher:
+    """
+    Background refresher for market_metadata (stale-while-revalidate).
+
+    Readers queue expired/missing symbols with schedule() and keep serving
+    whatever is cached; a daemon thread fetches the queue in batches and
+    writes each batch in one transaction. Symbols whose fetch failed are not
+    re-queued for RETRY_SECONDS.
+    """
+
+    BATCH_SIZE = 25
+    MAX_WORKERS = 4
+    RETRY_SECONDS = 900
+
+    def __init__(self, repo: "MarketMetadataRepository"):
+        self.repo = repo
+        self._pending: List[str] = []
+        self._queued = set()
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, symbols: Iterable[str]) -> int:
+        """Queue symbols for refresh; returns how many were newly queued."""
+        now = time.time()
+        added = 0
+        with self._lock:
+            for symbol in symbols:
+                symbol = symbol.strip().upper()
+                if not symbol or symbol in self._queued:
+                    continue
+                if now - self._failed.get(symbol, 0) < self.RETRY_SECONDS:
+                    continue
+                self._pending.append(symbol)
+                self._queued.add(symbol)
+                added += 1
+            if self._pending and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name="market-cap-refresh", daemon=True)
+                self._thread.start()
+        return added
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the current queue is drained (used by jobs and tests)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                batch = self._pending[:self.BATCH_SIZE]
+                del self._pending[:self.BATCH_SIZE]
+                if not batch:
+                    self._thread = None
+                    return
+            try:
+                self._refresh_batch(batch)
+            except Exception as e:
+                print(f"[!] Market cap refresh batch failed: {e}")
+            finally:
+                with self._lock:
+                    self._queued.difference_update(batch)
+
+    def _refresh_batch(self, symbols: List[str]) -> None:
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as pool:
+            fetched = dict(zip(symbols, pool.map(self.repo._fetch_info, symbols)))
+
+        found = {s: info for s, info in fetched.items() if info}
+        now = time.time()
+        with self._lock:
+            for symbol in symbols:
+                if symbol in found:
+                    self._failed.pop(symbol, None)
+                else:
+                    self._failed[symbol] = now
+        if found:
+            self.repo._save_cache_many(found)
+        print(f"[*] Market cap refresh: {len(found)}/{len(symbols)} updated")
+
+
+_refreshers: Dict[str, MarketCapRefresher] = {}
+_refreshers_lock = threading.Lock()
+
+
 class MarketMetadataRepository(BaseRepository):
     """Repository for market metadata with TTL-based caching."""
+
+    @property
+    def refresher(self) -> MarketCapRefresher:
+        """Background refresher shared by all repository instances on this DB."""
+        with _refreshers_lock:
+            refresher = _refreshers.get(self.db_path)
+            if refresher is None:
+                refresher = _refreshers[self.db_path] = MarketCapRefresher(self)
+            return refresher
     
     def get_market_cap(self, symbol: str, ttl_hours: int = 24) -> Optional[float]:
         """
         Get market cap with automatic caching and TTL validation.
+
+        An expired entry is returned as-is and renewed in the background;
+        yfinance is only called inline when nothing is cached yet.
         
         Args:
             symbol: Stock ticker (e.g., "BBCA")
@@ -25,11 +125,13 @@ class MarketMetadataRepository(BaseRepository):
         # Check cache first
         cached = self._get_cached_market_cap(clean_symbol)
         
-        if cached and not self._is_cache_expired(cached['cached_at'], ttl_hours):
-            # Cache hit - return cached value
+        if cached:
+            if self._is_cache_expired(cached['cached_at'], ttl_hours):
+                # Stale-while-revalidate
+                self.refresher.schedule([clean_symbol])
             return cached['market_cap']
         
-        # Cache miss or expired - fetch from yfinance
+        # Cache miss - fetch from yfinance
         market_cap = self._fetch_from_yfinance(clean_symbol)
         
         if market_cap:
@@ -37,12 +139,119 @@ class MarketMetadataRepository(BaseRepository):
             self._save_cache(clean_symbol, market_cap)
             return market_cap
         
-        # If fetch fails, return stale cache if available
-        if cached:
-            print(f"[WARNING] yfinance failed for {clean_symbol}, using stale cache")
-            return cached['market_cap']
-        
         return None
+
+    def get_market_caps(self, symbols: List[str], ttl_hours: int = 24) -> Dict[str, Optional[float]]:
+        """
+        Bulk market caps from cache; never calls yfinance.
+
+        Expired and missing symbols are queued for the background refresher
+        while the cached (possibly stale) value is returned. Symbols without
+        a market_metadata row fall back to their latest market_cap_history
+        snapshot.
+        
+        Args:
+            symbols: Stock tickers
+            ttl_hours: Cache TTL in hours (default: 24)
+            
+        Returns:
+            {SYMBOL: market cap in IDR or None}
+        """
+        clean = sorted({s.strip().upper() for s in symbols if s})
+        result: Dict[str, Optional[float]] = {s: None for s in clean}
+        if not clean:
+            return result
+
+        stale = []
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(clean), 500):
+                chunk = clean[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f"""
+                    SELECT symbol, market_cap, cached_at
+                    FROM market_metadata
+                    WHERE symbol IN ({placeholders})
+                """, chunk)
+                for symbol, market_cap, cached_at in cursor.fetchall():
+                    result[symbol] = market_cap
+                    if self._is_cache_expired(cached_at, ttl_hours):
+                        stale.append(symbol)
+        finally:
+            conn.close()
+
+        missing = [s for s in clean if result[s] is None]
+        if missing:
+            for symbol, cached in self.get_cached_market_data(missing).items():
+                result[symbol] = cached["market_cap"]
+
+        if stale or missing:
+            self.refresher.schedule(stale + missing)
+        return result
+    
+    def filter_symbols(
+        self,
+        symbols: List[str],
+        sector: Optional[str] = None,
+        mcap_min: Optional[float] = None
+    ) -> List[str]:
+        """
+        Symbols whose cached metadata matches a sector and/or minimum market cap.
+
+        Served from the indexed market_metadata table (cache only). Symbols
+        without a metadata row cannot match and are queued for the background
+        refresher so later scans can include them; with a sector filter, so
+        are rows cached before sectors were stored (sector NULL).
+        
+        Args:
+            symbols: Stock tickers to filter
+            sector: Sector name (case-insensitive), optional
+            mcap_min: Minimum market cap in IDR, optional
+            
+        Returns:
+            Matching symbols (upper-cased, sorted)
+        """
+        clean = sorted({s.strip().upper() for s in symbols if s})
+        if not clean or (not sector and mcap_min is None):
+            return clean
+
+        conditions = []
+        params: list = []
+        if sector:
+            conditions.append("sector = ? COLLATE NOCASE")
+            params.append(sector.strip())
+        if mcap_min is not None:
+            conditions.append("market_cap >= ?")
+            params.append(mcap_min)
+
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            # Filter through the (sector, market_cap) / market_cap indexes
+            cursor.execute(f"SELECT symbol FROM market_metadata WHERE {' AND '.join(conditions)}", params)
+            matched = {row[0] for row in cursor.fetchall()}
+
+            known = set()
+            without_sector = set()
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(clean), 500):
+                chunk = clean[i:i + 500]
+                cursor.execute(f"""
+                    SELECT symbol, sector FROM market_metadata WHERE symbol IN ({",".join("?" * len(chunk))})
+                """, chunk)
+                for symbol, symbol_sector in cursor.fetchall():
+                    known.add(symbol)
+                    if symbol_sector is None:
+                        without_sector.add(symbol)
+        finally:
+            conn.close()
+
+        missing = [s for s in clean if s not in known or (sector and s in without_sector)]
+        if missing:
+            self.refresher.schedule(missing)
+        return [s for s in clean if s in matched]
     
     def _get_cached_market_cap(self, symbol: str) -> Optional[dict]:
         """
@@ -95,13 +304,27 @@ class MarketMetadataRepository(BaseRepository):
         """
         Fetch market cap from yfinance.
         
+        Args:
+            symbol: Stock ticker
+            
+        Returns:
+            Market cap in IDR, or None if fetch fails
+        """
+        info = self._fetch_info(symbol)
+        return info['market_cap'] if info else None
+
+    def _fetch_info(self, symbol: str) -> Optional[dict]:
+        """
+        Fetch market cap and shares outstanding from one yfinance info call.
+        
         Handles Indonesian stocks (.JK suffix) and converts to IDR.
         
         Args:
             symbol: Stock ticker
             
         Returns:
-            Market cap in IDR, or None if fetch fails
+            {"market_cap": IDR, "shares_outstanding": float or None, "sector": str or None},
+            or None if fetch fails
         """
         try:
             # Determine yfinance ticker format
@@ -130,8 +353,13 @@ class MarketMetadataRepository(BaseRepository):
             if currency == 'USD':
                 market_cap = market_cap * 15000  # Rough conversion
             
+            shares = info.get('sharesOutstanding')
             print(f"[*] Fetched market cap for {symbol}: {market_cap:,.0f} IDR")
-            return market_cap
+            return {
+                'market_cap': market_cap,
+                'shares_outstanding': float(shares) if shares else None,
+                'sector': info.get('sector') or None
+            }
             
         except Exception as e:
             print(f"[!] Error fetching market cap for {symbol}: {e}")
@@ -163,6 +391,40 @@ class MarketMetadataRepository(BaseRepository):
         finally:
             conn.close()
     
+    def _save_cache_many(self, infos: Dict[str, dict]) -> None:
+        """
+        Save many fetched entries in one transaction.
+        
+        Unlike _save_cache this keeps an existing shares_outstanding and
+        sector when the fetch did not return one.
+        
+        Args:
+            infos: {SYMBOL: {"market_cap": ..., "shares_outstanding": ..., "sector": ...}}
+        """
+        now = datetime.now().isoformat()
+        conn = self._get_conn()
+        try:
+            conn.executemany("""
+                INSERT INTO market_metadata
+                (symbol, market_cap, currency, cached_at, source, shares_outstanding, sector)
+                VALUES (?, ?, 'IDR', ?, 'yfinance', ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    market_cap = excluded.market_cap,
+                    cached_at = excluded.cached_at,
+                    source = excluded.source,
+                    shares_outstanding = COALESCE(excluded.shares_outstanding, market_metadata.shares_outstanding),
+                    sector = COALESCE(excluded.sector, market_metadata.sector)
+            """, [
+                (symbol, info['market_cap'], now, info.get('shares_outstanding'), info.get('sector'))
+                for symbol, info in infos.items()
+            ])
+            conn.commit()
+        except Exception as e:
+            print(f"[!] Error caching market caps: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
+    
     def clear_cache(self, symbol: Optional[str] = None) -> None:
         """
         Clear market cap cache.
@@ -188,6 +450,9 @@ class MarketMetadataRepository(BaseRepository):
     def get_shares_outstanding(self, symbol: str, ttl_hours: int = 168) -> Optional[float]:
         """
         Get shares outstanding for a stock (cached for 1 week).
+
+        Like get_market_cap, an expired value is served while it is renewed in
+        the background.
         
         Args:
             symbol: Stock ticker (e.g., "BBCA")
@@ -208,7 +473,9 @@ class MarketMetadataRepository(BaseRepository):
             )
             row = cursor.fetchone()
             
-            if row and row[0] and not self._is_cache_expired(row[1], ttl_hours):
+            if row and row[0]:
+                if self._is_cache_expired(row[1], ttl_hours):
+                    self.refresher.schedule([clean_symbol])
                 return row[0]
         finally:
             conn.close()
@@ -323,6 +590,56 @@ class MarketMetadataRepository(BaseRepository):
         finally:
             conn.close()
     
+    def get_cached_market_data(self, symbols: List[str]) -> Dict[str, dict]:
+        """
+        Bulk, cache-only market cap inputs for many tickers (never calls yfinance).
+
+        Used by batch scorers that must not block on the network per ticker.
+        
+        Args:
+            symbols: Stock tickers
+            
+        Returns:
+            {SYMBOL: {"market_cap": latest market_cap_history value or None,
+                      "shares_outstanding": cached shares or None}}
+        """
+        clean = sorted({s.strip().upper() for s in symbols if s})
+        result = {s: {"market_cap": None, "shares_outstanding": None} for s in clean}
+        if not clean:
+            return result
+
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(clean), 500):
+                chunk = clean[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+
+                cursor.execute(f"""
+                    SELECT h.ticker, h.market_cap
+                    FROM market_cap_history h
+                    JOIN (
+                        SELECT ticker, MAX(trade_date) AS latest
+                        FROM market_cap_history
+                        WHERE ticker IN ({placeholders})
+                        GROUP BY ticker
+                    ) m ON h.ticker = m.ticker AND h.trade_date = m.latest
+                """, chunk)
+                for ticker, market_cap in cursor.fetchall():
+                    result[ticker]["market_cap"] = market_cap
+
+                cursor.execute(f"""
+                    SELECT symbol, shares_outstanding
+                    FROM market_metadata
+                    WHERE symbol IN ({placeholders})
+                """, chunk)
+                for symbol, shares in cursor.fetchall():
+                    result[symbol]["shares_outstanding"] = shares
+            return result
+        finally:
+            conn.close()
+    
     def calculate_and_save_market_cap_from_ohlcv(self, ticker: str, 
                                                   ohlcv_data: list,
                                                   shares_outstanding: float) -> int:
@@ -340,17 +657,128 @@ class MarketMetadataRepository(BaseRepository):
         if not ohlcv_data or not shares_outstanding:
             return 0
         
-        saved = 0
-        for record in ohlcv_data:
-            trade_date = record.get('time')
-            close_price = record.get('close')
-            
-            if trade_date and close_price:
-                market_cap = close_price * shares_outstanding
-                if self.save_market_cap_snapshot(
-                    ticker, trade_date, market_cap, shares_outstanding, close_price
-                ):
-                    saved += 1
+        now = datetime.now().isoformat()
+        rows = [
+            (ticker.upper(), r['time'], r['close'] * shares_outstanding, shares_outstanding, r['close'], now)
+            for r in ohlcv_data
+            if r.get('time') and r.get('close')
+        ]
+        if not rows:
+            return 0
         
-        return saved
+        conn = self._get_conn()
+        try:
+            conn.executemany(self._HISTORY_UPSERT, rows)
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            print(f"[!] Error saving market cap history for {ticker}: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            conn.close()
+
+    _HISTORY_UPSERT = """
+        INSERT INTO market_cap_history
+        (ticker, trade_date, market_cap, shares_outstanding, close_price, calculated_at, source)
+        VALUES (?, ?, ?, ?, ?, ?, 'calculated')
+        ON CONFLICT(ticker, trade_date) DO UPDATE SET
+            market_cap = excluded.market_cap,
+            shares_outstanding = excluded.shares_outstanding,
+            close_price = excluded.close_price,
+            calculated_at = excluded.calculated_at,
+            source = excluded.source
+    """
+
+    def generate_market_cap_history(self, tickers: Optional[List[str]] = None,
+                                    full: bool = False) -> Dict[str, int]:
+        """
+        Build market cap history (close x shares outstanding) for every ticker
+        with known shares in one set-based pass over price_volume.
+        
+        Runs as a single INSERT ... SELECT upsert inside one transaction. By
+        default only dates after each ticker's latest snapshot are added.
+        
+        Args:
+            tickers: Restrict to these tickers (default: all with shares outstanding)
+            full: Recompute every date instead of appending new ones
+            
+        Returns:
+            {"tickers": tickers with shares outstanding, "rows": snapshots written}
+        """
+        meta_conditions = ["m.shares_outstanding > 0"]
+        meta_params: List = []
+        if tickers is not None:
+            clean = sorted({t.strip().upper() for t in tickers if t})
+            if not clean:
+                return {"tickers": 0, "rows": 0}
+            meta_conditions.append(f"m.symbol IN ({','.join('?' * len(clean))})")
+            meta_params.extend(clean)
+        conditions = meta_conditions + ["pv.close > 0"]
+        if not full:
+            conditions.append("""pv.trade_date > COALESCE(
+                (SELECT MAX(h.trade_date) FROM market_cap_history h WHERE h.ticker = pv.ticker), ''
+            )""")
+
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT INTO market_cap_history
+                (ticker, trade_date, market_cap, shares_outstanding, close_price, calculated_at, source)
+                SELECT pv.ticker, pv.trade_date, pv.close * m.shares_outstanding,
+                       m.shares_outstanding, pv.close, ?, 'calculated'
+                FROM price_volume pv
+                JOIN market_metadata m ON m.symbol = pv.ticker
+                WHERE {" AND ".join(conditions)}
+                ON CONFLICT(ticker, trade_date) DO UPDATE SET
+                    market_cap = excluded.market_cap,
+                    shares_outstanding = excluded.shares_outstanding,
+                    close_price = excluded.close_price,
+                    calculated_at = excluded.calculated_at,
+                    source = excluded.source
+            """, [datetime.now().isoformat()] + meta_params)
+            rows = cursor.rowcount
+            cursor.execute(
+                f"SELECT COUNT(*) FROM market_metadata m WHERE {' AND '.join(meta_conditions)}",
+                meta_params
+            )
+            ticker_count = cursor.fetchone()[0]
+            conn.commit()
+            return {"tickers": ticker_count, "rows": rows}
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def get_market_cap_changes(self, ticker: str) -> Dict[str, Optional[float]]:
+        """
+        1d/7d/30d market cap change (%) from the latest snapshots.
+        
+        Reads at most 30 rows through idx_mcap_hist_ticker_date; the 7d and
+        30d changes compare the latest snapshot with the 7th and 30th most
+        recent ones, as the market-cap endpoint always has.
+        
+        Returns:
+            {"change_1d_pct", "change_7d_pct", "change_30d_pct"} (None when unavailable)
+        """
+        conn = self._get_conn()
+        try:
+            rows = conn.execute("""
+                SELECT market_cap FROM market_cap_history
+                WHERE ticker = ?
+                ORDER BY trade_date DESC
+                LIMIT 30
+            """, (ticker.upper(),)).fetchall()
+        finally:
+            conn.close()
 
+        caps = np.array([r[0] for r in rows], dtype=np.float64)
+        result = {}
+        for key, back in (("change_1d_pct", 1), ("change_7d_pct", 6), ("change_30d_pct", 29)):
+            change = None
+            if len(caps) > back and caps[back] > 0:
+                change = round(float((caps[0] - caps[back]) / caps[back] * 100), 2)
+            result[key] = change
+        return result
@@ -1,9 +1,11 @@
 """NeoBDM repository for market maker and fund flow analysis."""
 import pandas as pd
+import hashlib
 import json
 import re
 from typing import Optional, List, Dict
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from .broker_registry import get_broker_registry
 from .connection import BaseRepository
 
 
@@ -20,10 +22,10 @@ class NeoBDMRepository(BaseRepository):
             query = """
             SELECT method, d_0 
             FROM neobdm_records 
-            WHERE symbol = ? AND scraped_at = ?
+            WHERE symbol = ? AND trade_date = ?
             """
             cursor = conn.cursor()
-            cursor.execute(query, (symbol, scraped_at))
+            cursor.execute(query, (symbol, str(scraped_at)[:10]))
             rows = cursor.fetchall()
             
             flows = {row[0]: self._parse_numeric(row[1]) for row in rows}
@@ -65,42 +67,55 @@ class NeoBDMRepository(BaseRepository):
         finally:
             conn.close()
     
+    # Value columns of neobdm_records, in insert order (everything except the key)
+    NEOBDM_RECORD_COLUMNS = [
+        'pinky', 'crossing', 'likuid',
+        'w_4', 'w_3', 'w_2', 'w_1', 'd_4', 'd_3', 'd_2', 'd_0', 'pct_1d',
+        'c_20', 'c_10', 'c_5', 'c_3', 'pct_3d', 'pct_5d', 'pct_10d', 'pct_20d',
+        'price', 'ma5', 'ma10', 'ma20', 'ma50', 'ma100', 'unusual'
+    ]
+
     def save_neobdm_record_batch(
         self,
         method: str,
         period: str,
         data_list: List[Dict],
-        scraped_at: Optional[str] = None
-    ):
+        scraped_at: Optional[str] = None,
+        prune: bool = False
+    ) -> Dict[str, int]:
         """
-        Save a batch of neobdm records into the structured table.
+        Incrementally save a batch of neobdm records into the structured table.
+
+        Rows are keyed on (symbol, method, period, trade_date) where trade_date is
+        the date part of scraped_at. Each row's values are hashed; only new rows
+        and rows whose hash changed are written (and take this run's scraped_at),
+        so re-running a sync for the same day touches nothing unless NeoBDM's
+        numbers changed. The run itself, with its scraped_at, is logged in
+        neobdm_ingest_runs; readers select batches by trade_date.
         
         Args:
             method: Analysis method
             period: Time period
             data_list: List of records
             scraped_at: Timestamp (uses current time if None)
+            prune: Also delete stored rows of this method/period/trade_date whose
+                   symbol is not in data_list (use for complete table scrapes)
+
+        Returns:
+            {"total_rows", "inserted", "updated", "unchanged", "deleted", "changed"}
         """
+        stats = {"total_rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0, "changed": 0}
         conn = self._get_conn()
         try:
             if not scraped_at:
                 scraped_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            trade_date = scraped_at[:10]
             
-            query = """
-            INSERT INTO neobdm_records (
-                scraped_at, method, period, symbol, pinky, crossing, likuid,
-                w_4, w_3, w_2, w_1, d_4, d_3, d_2, d_0, pct_1d,
-                c_20, c_10, c_5, c_3, pct_3d, pct_5d, pct_10d, pct_20d,
-                price, ma5, ma10, ma20, ma50, ma100, unusual
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            rows_to_insert = []
+            rows_by_symbol = {}
             for item in data_list:
                 # Backend safety gate: Clean watchlist junk from symbol
                 raw_symbol = item.get('symbol', '') or ''
                 clean_symbol = re.sub(r'\|?Add\s+.*?to\s+Watchlist', '', raw_symbol, flags=re.IGNORECASE)
-                clean_symbol = re.sub(r'\|?Add\s+.*?to\s+Watchlist', '', raw_symbol, flags=re.IGNORECASE)
                 clean_symbol = re.sub(r'\|?Remove\s+from\s+Watchlist', '', clean_symbol, flags=re.IGNORECASE)
                 # Clean Star Emojis and other junk
                 clean_symbol = clean_symbol.replace('★', '').replace('⭐', '').strip('| ').strip()
@@ -109,9 +124,8 @@ class NeoBDMRepository(BaseRepository):
                 def get_val(key_lower):
                     return item.get(key_lower) or item.get(key_lower.upper())
 
-                row = (
-                    scraped_at, method, period, 
-                    clean_symbol, get_val('pinky'), get_val('crossing'), get_val('likuid'),
+                values = (
+                    get_val('pinky'), get_val('crossing'), get_val('likuid'),
                     get_val('w-4') or get_val('wn-4'), get_val('w-3') or get_val('wn-3'),
                     get_val('w-2') or get_val('wn-2'), get_val('w-1') or get_val('wn-1'),
                     get_val('d-4') or get_val('dn-4'), get_val('d-3') or get_val('dn-3'),
@@ -128,16 +142,87 @@ class NeoBDMRepository(BaseRepository):
                     get_val('ma100') or item.get('>ma100'), 
                     get_val('unusual')
                 )
-                rows_to_insert.append(row)
-            
-            conn.executemany(query, rows_to_insert)
+                row_hash = hashlib.sha1(json.dumps(values, default=str).encode('utf-8')).hexdigest()
+                # Last occurrence wins if Dash repeated a symbol across pages
+                rows_by_symbol[clean_symbol] = (values, row_hash)
+
+            stats["total_rows"] = len(rows_by_symbol)
+
+            existing = dict(conn.execute(
+                "SELECT symbol, row_hash FROM neobdm_records WHERE method = ? AND period = ? AND trade_date = ?",
+                (method, period, trade_date)
+            ).fetchall())
+
+            # Log the run first: its id marks every row this run inserts, changes or prunes
+            run_id = conn.execute(
+                "INSERT INTO neobdm_ingest_runs (method, period, trade_date, total_rows, scraped_at) VALUES (?, ?, ?, ?, ?)",
+                (method, period, trade_date, stats["total_rows"], scraped_at)
+            ).lastrowid
+
+            rows_to_write = []
+            for symbol, (values, row_hash) in rows_by_symbol.items():
+                if symbol not in existing:
+                    stats["inserted"] += 1
+                elif existing[symbol] != row_hash:
+                    stats["updated"] += 1
+                else:
+                    stats["unchanged"] += 1
+                    continue
+                rows_to_write.append((scraped_at, method, period, symbol) + values + (trade_date, row_hash, run_id))
+
+            columns = ['scraped_at', 'method', 'period', 'symbol'] + self.NEOBDM_RECORD_COLUMNS + ['trade_date', 'row_hash', 'run_id']
+            update_columns = ['scraped_at'] + self.NEOBDM_RECORD_COLUMNS + ['row_hash', 'run_id']
+            query = f"""
+            INSERT INTO neobdm_records ({', '.join(columns)})
+            VALUES ({', '.join('?' * len(columns))})
+            ON CONFLICT(symbol, method, period, trade_date) DO UPDATE SET
+                {', '.join(f'{col} = excluded.{col}' for col in update_columns)}
+            """
+            if rows_to_write:
+                conn.executemany(query, rows_to_write)
+
+            if prune:
+                stale = [symbol for symbol in existing if symbol not in rows_by_symbol]
+                if stale:
+                    keys = [(method, period, trade_date, symbol) for symbol in stale]
+                    conn.executemany(
+                        "DELETE FROM neobdm_records WHERE method = ? AND period = ? AND trade_date = ? AND symbol = ?",
+                        keys
+                    )
+                    conn.executemany(
+                        "INSERT INTO neobdm_record_deletes (run_id, method, period, trade_date, symbol) VALUES (?, ?, ?, ?, ?)",
+                        [(run_id,) + key for key in keys]
+                    )
+                stats["deleted"] = len(stale)
+
+            stats["changed"] = stats["inserted"] + stats["updated"] + stats["deleted"]
+            conn.execute(
+                "UPDATE neobdm_ingest_runs SET inserted = ?, updated = ?, unchanged = ?, deleted = ? WHERE id = ?",
+                (stats["inserted"], stats["updated"], stats["unchanged"], stats["deleted"], run_id)
+            )
             conn.commit()
-            print(f"[*] Saved {len(rows_to_insert)} structured NeoBDM records ({method}/{period}) to SQLite.")
+            print(
+                f"[*] NeoBDM records ({method}/{period} {trade_date}): {stats['total_rows']} rows, "
+                f"{stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged, "
+                f"{stats['deleted']} removed."
+            )
         except Exception as e:
             print(f"[!] Error saving structured NeoBDM batch: {e}")
             conn.rollback()
         finally:
             conn.close()
+        return stats
+
+    def get_neobdm_ingest_runs(self, limit: int = 50) -> List[Dict]:
+        """Most recent NeoBDM ingest runs with their changed-row counts."""
+        conn = self._get_conn()
+        try:
+            df = pd.read_sql(
+                "SELECT * FROM neobdm_ingest_runs ORDER BY id DESC LIMIT ?", conn, params=(limit,)
+            )
+            return df.to_dict(orient="records")
+        finally:
+            conn.close()
     
     def save_broker_summary_batch(
         self,
@@ -208,10 +293,67 @@ class NeoBDMRepository(BaseRepository):
         finally:
             conn.close()
 
+    def load_broker_summaries(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        All broker summary rows of many tickers in one query, split per ticker.
+        
+        Args:
+            tickers: Stock ticker symbols
+        
+        Returns:
+            {TICKER: DataFrame[trade_date, side, broker, nlot, nval, avg_price]}
+            (empty frames for tickers without data)
+        """
+        tickers = sorted({t.upper() for t in tickers if t})
+        columns = ['trade_date', 'side', 'broker', 'nlot', 'nval', 'avg_price']
+        if not tickers:
+            return {}
+
+        conn = self._get_conn()
+        try:
+            frames = []
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(tickers), 500):
+                chunk = tickers[i:i + 500]
+                frames.append(pd.read_sql(f"""
+                    SELECT UPPER(ticker) AS ticker, {', '.join(columns)}
+                    FROM neobdm_broker_summaries
+                    WHERE UPPER(ticker) IN ({','.join('?' * len(chunk))})
+                """, conn, params=chunk))
+        finally:
+            conn.close()
+
+        df = pd.concat(frames, ignore_index=True)
+        grouped = {ticker: group[columns].reset_index(drop=True) for ticker, group in df.groupby('ticker')}
+        return {ticker: grouped.get(ticker, pd.DataFrame(columns=columns)) for ticker in tickers}
+
+    def use_broker_summaries(self, frames: Dict[str, pd.DataFrame]):
+        """
+        Serve the per-ticker broker summary readers (get_broker_summary,
+        get_available_dates_for_ticker, get_top_holders_by_net_lot,
+        get_floor_price_analysis) from preloaded frames instead of SQLite.
+        Tickers not in `frames` still read from the database.
+        """
+        self._broker_frames = {ticker.upper(): frame for ticker, frame in frames.items()}
+
+    def _preloaded_broker_frame(self, ticker: str) -> Optional[pd.DataFrame]:
+        return getattr(self, '_broker_frames', {}).get(ticker.upper())
+
     def get_broker_summary(self, ticker: str, trade_date: str) -> Dict[str, List[Dict]]:
         """
         Get broker summary data for a specific ticker and date.
         """
+        preloaded = self._preloaded_broker_frame(ticker)
+        if preloaded is not None:
+            df = preloaded[preloaded['trade_date'] == trade_date][['side', 'broker', 'nlot', 'nval', 'avg_price']]
+            df = df.sort_values('nval', ascending=False, kind='stable')
+            if df.empty:
+                return {"buy": [], "sell": []}
+            return {
+                "buy": df[df['side'] == 'BUY'].to_dict('records'),
+                "sell": df[df['side'] == 'SELL'].to_dict('records')
+            }
+
         conn = self._get_conn()
         try:
             query = """
@@ -235,6 +377,157 @@ class NeoBDMRepository(BaseRepository):
         finally:
             conn.close()
     
+    def get_broker_net_flows(self, ticker: str, days: int) -> pd.DataFrame:
+        """
+        Net lot/value per broker per day over the latest `days` summary dates.
+        
+        BUY rows count positive and SELL rows negative, grouped in SQL so
+        callers aggregate one row per (date, broker) instead of walking the
+        per-day summaries.
+        
+        Args:
+            ticker: Stock ticker symbol
+            days: Number of most recent dates with broker summary data
+        
+        Returns:
+            DataFrame[trade_date, broker, net_lot, net_value] (broker upper-cased)
+        """
+        columns = ['trade_date', 'broker', 'net_lot', 'net_value']
+        if days <= 0:
+            return pd.DataFrame(columns=columns)
+
+        preloaded = self._preloaded_broker_frame(ticker)
+        if preloaded is not None:
+            dates = sorted(preloaded['trade_date'].unique().tolist(), reverse=True)[:days]
+            df = preloaded[preloaded['trade_date'].isin(dates) & preloaded['side'].isin(['BUY', 'SELL'])]
+            sign = df['side'].eq('BUY').map({True: 1.0, False: -1.0})
+            return (
+                df.assign(
+                    broker=df['broker'].fillna('').str.upper(),
+                    net_lot=df['nlot'].fillna(0) * sign,
+                    net_value=df['nval'].fillna(0) * sign
+                )
+                .groupby(['trade_date', 'broker'], as_index=False)[['net_lot', 'net_value']]
+                .sum()[columns]
+            )
+
+        conn = self._get_conn()
+        try:
+            query = """
+            SELECT trade_date, UPPER(COALESCE(broker, '')) AS broker,
+                   SUM(CASE side WHEN 'BUY' THEN COALESCE(nlot, 0) ELSE -COALESCE(nlot, 0) END) AS net_lot,
+                   SUM(CASE side WHEN 'BUY' THEN COALESCE(nval, 0) ELSE -COALESCE(nval, 0) END) AS net_value
+            FROM neobdm_broker_summaries
+            WHERE ticker = ? AND side IN ('BUY', 'SELL') AND trade_date IN (
+                SELECT DISTINCT trade_date FROM neobdm_broker_summaries
+                WHERE ticker = ?
+                ORDER BY trade_date DESC
+                LIMIT ?
+            )
+            GROUP BY trade_date, UPPER(COALESCE(broker, ''))
+            """
+            return pd.read_sql(query, conn, params=(ticker.upper(), ticker.upper(), days))
+        finally:
+            conn.close()
+
+    def get_market_broker_net_flows(self, days: int) -> pd.DataFrame:
+        """
+        get_broker_net_flows for every ticker at once.
+        
+        Each ticker keeps its own latest `days` summary dates (window over
+        the distinct (ticker, trade_date) pairs), so tickers scraped on
+        different days are compared over the same number of sessions.
+        
+        Returns:
+            DataFrame[ticker, trade_date, broker, net_lot, net_value]
+        """
+        if days <= 0:
+            return pd.DataFrame(columns=['ticker', 'trade_date', 'broker', 'net_lot', 'net_value'])
+
+        conn = self._get_conn()
+        try:
+            query = """
+            WITH recent AS (
+                SELECT ticker, trade_date FROM (
+                    SELECT ticker, trade_date,
+                           ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trade_date DESC) AS rn
+                    FROM (SELECT DISTINCT ticker, trade_date FROM neobdm_broker_summaries)
+                )
+                WHERE rn <= ?
+            )
+            SELECT s.ticker, s.trade_date, UPPER(COALESCE(s.broker, '')) AS broker,
+                   SUM(CASE s.side WHEN 'BUY' THEN COALESCE(s.nlot, 0) ELSE -COALESCE(s.nlot, 0) END) AS net_lot,
+                   SUM(CASE s.side WHEN 'BUY' THEN COALESCE(s.nval, 0) ELSE -COALESCE(s.nval, 0) END) AS net_value
+            FROM neobdm_broker_summaries s
+            JOIN recent r ON r.ticker = s.ticker AND r.trade_date = s.trade_date
+            WHERE s.side IN ('BUY', 'SELL')
+            GROUP BY s.ticker, s.trade_date, UPPER(COALESCE(s.broker, ''))
+            """
+            return pd.read_sql(query, conn, params=(days,))
+        finally:
+            conn.close()
+
+    def get_market_floor_prices(self, days: int = 30) -> Dict[str, float]:
+        """
+        Floor price (institutional weighted average buy price) of every ticker.
+        
+        Same calculation as get_floor_price_analysis, done as one grouped
+        query over BUY rows plus a category lookup per broker.
+        
+        Args:
+            days: Calendar days to include (0 = all available data)
+        
+        Returns:
+            {TICKER: floor_price} for tickers with institutional buys
+        """
+        institutional = sorted(get_broker_registry().with_category('institutional'))
+        if not institutional:
+            return {}
+
+        conn = self._get_conn()
+        try:
+            query = f"""
+            SELECT ticker, SUM(nlot) AS lot, SUM(nval) AS value
+            FROM neobdm_broker_summaries
+            WHERE side = 'BUY' AND broker IN ({','.join('?' * len(institutional))})
+              {"AND trade_date >= date('now', ?)" if days != 0 else ""}
+            GROUP BY ticker
+            HAVING lot > 0
+            """
+            params = institutional + ([f'-{days} days'] if days != 0 else [])
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return {
+            ticker.upper(): round(((value or 0) * 1e9) / (lot * 100), 0)
+            for ticker, lot, value in rows
+        }
+
+    def get_broker_summary_version(self) -> int:
+        """Highest broker summary row id; changes whenever summaries are (re)saved."""
+        conn = self._get_conn()
+        try:
+            row = conn.execute("SELECT MAX(id) FROM neobdm_broker_summaries").fetchone()
+            return row[0] or 0
+        finally:
+            conn.close()
+
+    def get_records_version(self) -> tuple:
+        """
+        Highest neobdm_records and ingest run ids.
+
+        Every save_* ingest logs a run and new rows get new ids, so the pair
+        changes whenever flow records may have changed.
+        """
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                "SELECT (SELECT MAX(id) FROM neobdm_records), (SELECT MAX(id) FROM neobdm_ingest_runs)"
+            ).fetchone()
+            return (row[0] or 0, row[1] or 0)
+        finally:
+            conn.close()
+
     def get_available_dates_for_ticker(self, ticker: str) -> List[str]:
         """
         Get all available dates where broker summary data exists for a ticker.
@@ -245,6 +538,10 @@ class NeoBDMRepository(BaseRepository):
         Returns:
             List of date strings (YYYY-MM-DD) in descending order
         """
+        preloaded = self._preloaded_broker_frame(ticker)
+        if preloaded is not None:
+            return sorted(preloaded['trade_date'].unique().tolist(), reverse=True)
+
         conn = self._get_conn()
         try:
             query = """
@@ -257,7 +554,40 @@ class NeoBDMRepository(BaseRepository):
             return df['trade_date'].tolist() if not df.empty else []
         finally:
             conn.close()
-    
+
+    def get_existing_broker_summary_pairs(self, tickers: List[str]) -> set:
+        """
+        Get (TICKER, trade_date) pairs that already have broker summary rows.
+
+        Used by batch scrapes to skip work that is already in the database.
+
+        Args:
+            tickers: Stock ticker symbols to check
+
+        Returns:
+            Set of (ticker_upper, trade_date) tuples
+        """
+        tickers = sorted({t.upper() for t in tickers if t})
+        if not tickers:
+            return set()
+
+        conn = self._get_conn()
+        try:
+            pairs = set()
+            # Tickers are stored upper-cased; a bare `ticker IN` can use
+            # idx_neobdm_broker_lookup. Chunked for SQLite's parameter limit.
+            for i in range(0, len(tickers), 500):
+                chunk = tickers[i:i + 500]
+                cursor = conn.execute(f"""
+                    SELECT DISTINCT ticker, trade_date
+                    FROM neobdm_broker_summaries
+                    WHERE ticker IN ({','.join('?' * len(chunk))})
+                """, chunk)
+                pairs.update((row[0], row[1]) for row in cursor.fetchall())
+            return pairs
+        finally:
+            conn.close()
+
     def get_broker_journey(
         self, 
         ticker: str,
@@ -297,7 +627,7 @@ class NeoBDMRepository(BaseRepository):
             price_data = []
             try:
                 from modules.market_data import MarketData
-                market_data = MarketData()
+                market_data = MarketData(self.db_path)
                 
                 # Calculate days from start_date to today for fetching
                 from datetime import datetime
@@ -445,6 +775,34 @@ class NeoBDMRepository(BaseRepository):
             List of dictionaries with broker_code, total_net_lot, total_net_value,
             trade_count, first_date, last_date
         """
+        preloaded = self._preloaded_broker_frame(ticker)
+        if preloaded is not None:
+            sign = preloaded['side'].eq('BUY').map({True: 1, False: -1})
+            df = (
+                preloaded.assign(net_lot=preloaded['nlot'] * sign, net_value=preloaded['nval'] * sign)
+                .groupby('broker')
+                .agg(
+                    total_net_lot=('net_lot', 'sum'),
+                    total_net_value=('net_value', 'sum'),
+                    trade_count=('trade_date', 'nunique'),
+                    first_date=('trade_date', 'min'),
+                    last_date=('trade_date', 'max')
+                )
+                .reset_index()
+            )
+            df = df[df['total_net_lot'] > 0].sort_values('total_net_lot', ascending=False).head(limit)
+            return [
+                {
+                    'broker_code': row['broker'],
+                    'total_net_lot': int(row['total_net_lot']),
+                    'total_net_value': round(float(row['total_net_value']), 2),
+                    'trade_count': int(row['trade_count']),
+                    'first_date': row['first_date'],
+                    'last_date': row['last_date']
+                }
+                for _, row in df.iterrows()
+            ]
+
         conn = self._get_conn()
         try:
             query = """
@@ -497,26 +855,24 @@ class NeoBDMRepository(BaseRepository):
         Returns:
             Dict with floor_price, confidence, and breakdown by broker
         """
-        import os
-        import config
-        
         conn = self._get_conn()
         try:
-            # Load broker classification
-            broker_file = os.path.join(config.DATA_DIR, "brokers_idx.json")
-            with open(broker_file, 'r', encoding='utf-8') as f:
-                broker_data = json.load(f)
-            
-            # Build category lookup
-            broker_categories = {}
-            for broker in broker_data.get('brokers', []):
-                code = broker.get('code', '')
-                categories = broker.get('category', ['unknown'])
-                broker_categories[code] = categories
+            # Broker classification (parsed once per file version)
+            broker_categories = get_broker_registry().categories
             
             # Get broker summary data for the ticker over the date range
             # If days=0, get all available data
-            if days == 0:
+            preloaded = self._preloaded_broker_frame(ticker)
+            if preloaded is not None:
+                df = preloaded[preloaded['side'] == 'BUY']
+                if days != 0:
+                    # Same cutoff as SQLite's date('now', '-N days') (UTC)
+                    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d')
+                    df = df[df['trade_date'] >= cutoff]
+                df = df[['broker', 'nlot', 'nval', 'avg_price', 'trade_date']].sort_values(
+                    'trade_date', ascending=False, kind='stable'
+                )
+            elif days == 0:
                 query = """
                 SELECT broker, nlot, nval, avg_price, trade_date
                 FROM neobdm_broker_summaries
@@ -533,7 +889,8 @@ class NeoBDMRepository(BaseRepository):
                 ORDER BY trade_date DESC
                 """
                 params = (ticker, f'-{days} days')
-            df = pd.read_sql(query, conn, params=params)
+            if preloaded is None:
+                df = pd.read_sql(query, conn, params=params)
             
             if df.empty:
                 return {
@@ -694,7 +1051,9 @@ class NeoBDMRepository(BaseRepository):
         conn = self._get_conn()
         try:
             # Try structured first
-            query_latest = "SELECT scraped_at FROM neobdm_records WHERE 1=1"
+            # Unchanged rows keep the stamp of the run that last wrote them, so a
+            # batch is a trade_date; its newest stamp is reported as scraped_at
+            query_latest = "SELECT trade_date, MAX(scraped_at) FROM neobdm_records WHERE trade_date IS NOT NULL"
             params = []
             
             if method:
@@ -704,27 +1063,27 @@ class NeoBDMRepository(BaseRepository):
                 query_latest += " AND period = ?"
                 params.append(period)
             if start_date:
-                query_latest += " AND date(scraped_at) >= date(?)"
+                query_latest += " AND trade_date >= date(?)"
                 params.append(start_date)
             if end_date:
-                query_latest += " AND date(scraped_at) <= date(?)"
+                query_latest += " AND trade_date <= date(?)"
                 params.append(end_date)
             
-            query_latest += " ORDER BY scraped_at DESC LIMIT 1"
+            query_latest += " GROUP BY trade_date ORDER BY trade_date DESC LIMIT 1"
             cursor = conn.cursor()
             cursor.execute(query_latest, params)
             latest_row = cursor.fetchone()
             
             if latest_row:
-                scraped_at = latest_row[0]
-                # Fetch all records for this latest scrape
+                trade_date, scraped_at = latest_row
+                # Fetch all records of this latest trade date
                 query_data = """
                 SELECT * FROM neobdm_records 
-                WHERE scraped_at = ? AND method = ? AND period = ?
+                WHERE trade_date = ? AND method = ? AND period = ?
                 GROUP BY symbol
                 ORDER BY symbol ASC
                 """
-                df = pd.read_sql(query_data, conn, params=(scraped_at, method, period))
+                df = pd.read_sql(query_data, conn, params=(trade_date, method, period))
                 
                 # Convert to expected format
                 data_list = []
@@ -787,7 +1146,7 @@ class NeoBDMRepository(BaseRepository):
         """
         conn = self._get_conn()
         try:
-            query = "SELECT DISTINCT substr(scraped_at, 1, 10) as scrape_date FROM neobdm_records ORDER BY scrape_date DESC"
+            query = "SELECT DISTINCT trade_date as scrape_date FROM neobdm_records WHERE trade_date IS NOT NULL ORDER BY scrape_date DESC"
             df = pd.read_sql(query, conn)
             return df['scrape_date'].astype(str).tolist()
         finally:
@@ -795,29 +1154,24 @@ class NeoBDMRepository(BaseRepository):
     
     def _get_trading_date(self, base_date_str: str, days_back: int) -> str:
         """
-        Calculate trading date going back N days, accounting for weekends.
+        Calculate trading date going back N days, accounting for weekends and holidays.
         
         Args:
             base_date_str: Base date in 'YYYY-MM-DD' format
             days_back: Number of days to go back
         
         Returns:
-            Date string in 'YYYY-MM-DD' format
+            Last trading session on or before the target date ('YYYY-MM-DD')
         """
-        from datetime import datetime, timedelta
+        from .trading_calendar import get_trading_calendar
         
         try:
             base = datetime.strptime(base_date_str, '%Y-%m-%d')
-        except:
+        except (TypeError, ValueError):
             base = datetime.now()
         
         target = base - timedelta(days=days_back)
-        
-        # Adjust for weekends
-        while target.weekday() >= 5:  # Saturday=5, Sunday=6
-            target -= timedelta(days=1)
-        
-        return target.strftime('%Y-%m-%d')
+        return get_trading_calendar(self.db_path).offset(target.strftime('%Y-%m-%d'), 0)
     
     def _parse_numeric(self, value) -> float:
         """
@@ -851,12 +1205,12 @@ class NeoBDMRepository(BaseRepository):
             WHERE symbol = ? 
               AND method = 'm' 
               AND period = 'c'
-              AND scraped_at < ?
-            ORDER BY scraped_at DESC 
+              AND trade_date < ?
+            ORDER BY trade_date DESC 
             LIMIT 30
             """
             cursor = conn.cursor()
-            cursor.execute(query, (symbol, current_scraped_at))
+            cursor.execute(query, (symbol, str(current_scraped_at)[:10]))
             rows = cursor.fetchall()
             
             if len(rows) < 5:  # Need minimum 5 data points
@@ -968,7 +1322,7 @@ class NeoBDMRepository(BaseRepository):
         try:
             # 1. Fetch historical records
             query = """
-            SELECT scraped_at, symbol, pinky, crossing, unusual, likuid,
+            SELECT trade_date, symbol, pinky, crossing, unusual, likuid,
                    d_0, d_2, d_3, d_4,
                    w_1, w_2,
                    c_3, c_5, c_10, c_20,
@@ -976,7 +1330,7 @@ class NeoBDMRepository(BaseRepository):
             FROM neobdm_records 
             WHERE UPPER(symbol) = UPPER(?)
             AND (method = ? AND (period = ? OR period = 'd'))
-            ORDER BY scraped_at DESC, period ASC
+            ORDER BY trade_date DESC, period ASC
             LIMIT ?
             """
             # Fetch loose limit to handle duplicates
@@ -999,7 +1353,7 @@ class NeoBDMRepository(BaseRepository):
             # Within same date, period ASC means 'c' first, 'd' second.
             
             for _, row in df.iterrows():
-                scraped_date = row['scraped_at'][:10]  # Extract date part
+                scraped_date = row['trade_date']
                 
                 # If date already exists, check if we should overwrite
                 # We prefer the requested 'period' (usually 'c').
@@ -1115,6 +1469,33 @@ class NeoBDMRepository(BaseRepository):
         finally:
             conn.close()
     
+    def get_latest_flows(self, method: str = 'm', period: str = 'c') -> Dict[str, float]:
+        """
+        Latest daily flow (d_0) of every symbol in one query.
+        
+        Picks the same record as get_neobdm_history(symbol, method, period, limit=1):
+        the most recently scraped row of the method for the period or 'd'.
+        
+        Returns:
+            {SYMBOL: flow_d0}
+        """
+        conn = self._get_conn()
+        try:
+            rows = conn.execute("""
+                SELECT symbol, d_0 FROM (
+                    SELECT UPPER(symbol) AS symbol, d_0,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY UPPER(symbol) ORDER BY trade_date DESC, period ASC
+                           ) AS rn
+                    FROM neobdm_records
+                    WHERE method = ? AND (period = ? OR period = 'd')
+                )
+                WHERE rn = 1
+            """, (method, period)).fetchall()
+        finally:
+            conn.close()
+        return {symbol: self._parse_numeric(d_0) for symbol, d_0 in rows if symbol}
+    
     def get_neobdm_tickers(self) -> List[str]:
         """
         Get list of all unique tickers in NeoBDM data.
@@ -1660,10 +2041,10 @@ class NeoBDMRepository(BaseRepository):
         """
         conn = self._get_conn()
         try:
-            # 1. Get latest scrape timestamp for DAILY period (has d_0 and pct_1d data)
+            # 1. Get latest trade date for DAILY period (has d_0 and pct_1d data)
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT MAX(scraped_at) FROM neobdm_records 
+                SELECT MAX(trade_date) FROM neobdm_records 
                 WHERE method='m' AND period='d'
             """)
             latest = cursor.fetchone()[0]
@@ -1692,7 +2073,7 @@ class NeoBDMRepository(BaseRepository):
                    MAX(price) as price, 
                    MAX(pct_1d) as pct_1d
             FROM neobdm_records
-            WHERE scraped_at = ? AND method = 'm' AND period = 'd'
+            WHERE trade_date = ? AND method = 'm' AND period = 'd'
             GROUP BY symbol
             """
             df = pd.read_sql(query, conn, params=(latest,))
@@ -1780,7 +2161,7 @@ class NeoBDMRepository(BaseRepository):
     def save_volume_batch(self, ticker: str, records: List[Dict]):
         """
         Save a batch of volume records for a ticker.
-        Uses INSERT OR REPLACE to handle duplicates.
+        Stored in the shared price_volume OHLCV table (upsert on ticker/date).
         
         Args:
             ticker: Stock ticker
@@ -1789,35 +2170,27 @@ class NeoBDMRepository(BaseRepository):
                 - volume: Trading volume
                 - open_price, high_price, low_price, close_price: OHLC data
         """
-        conn = self._get_conn()
+        from modules.ohlcv_service import get_ohlcv_service
+        
+        # price_volume needs full bars; volume-only rows can't be stored
+        bars = [
+            {
+                'time': record['trade_date'],
+                'open': record['open_price'],
+                'high': record['high_price'],
+                'low': record['low_price'],
+                'close': record['close_price'],
+                'volume': record['volume']
+            }
+            for record in records
+            if None not in (record.get('open_price'), record.get('high_price'),
+                            record.get('low_price'), record.get('close_price'))
+        ]
         try:
-            query = """
-            INSERT OR REPLACE INTO volume_daily_records (
-                ticker, trade_date, volume, open_price, high_price, low_price, close_price
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """
-            
-            rows = []
-            for record in records:
-                rows.append((
-                    ticker.upper(),
-                    record['trade_date'],
-                    record['volume'],
-                    record.get('open_price'),
-                    record.get('high_price'),
-                    record.get('low_price'),
-                    record.get('close_price')
-                ))
-            
-            conn.executemany(query, rows)
-            conn.commit()
-            print(f"[*] Saved {len(rows)} volume records for {ticker}")
-            
+            get_ohlcv_service(self.db_path).save_records(ticker, bars)
+            print(f"[*] Saved {len(bars)} volume records for {ticker}")
         except Exception as e:
             print(f"[!] Error saving volume batch for {ticker}: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
     
     def get_volume_history(
         self, 
@@ -1836,44 +2209,26 @@ class NeoBDMRepository(BaseRepository):
         Returns:
             List of volume records sorted by date descending
         """
-        conn = self._get_conn()
-        try:
-            query = """
-            SELECT trade_date, volume, open_price, high_price, low_price, close_price
-            FROM volume_daily_records
-            WHERE UPPER(ticker) = UPPER(?)
-            """
-            params = [ticker]
-            
-            if start_date:
-                query += " AND trade_date >= ?"
-                params.append(start_date)
-            
-            if end_date:
-                query += " AND trade_date <= ?"
-                params.append(end_date)
-            
-            query += " ORDER BY trade_date DESC"
-            
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            results = []
-            for row in rows:
-                results.append({
-                    'trade_date': row[0],
-                    'volume': row[1],
-                    'open_price': row[2],
-                    'high_price': row[3],
-                    'low_price': row[4],
-                    'close_price': row[5]
-                })
-            
-            return results
-            
-        finally:
-            conn.close()
+        from modules.ohlcv_service import get_ohlcv_service
+        
+        series = get_ohlcv_service(self.db_path).repo.get_ohlcv_arrays(ticker, start_date, end_date)
+        # Zero-volume bars are market holidays; volume consumers never saw them
+        traded = series.volume > 0
+        return [
+            {
+                'trade_date': t,
+                'volume': v,
+                'open_price': o,
+                'high_price': h,
+                'low_price': l,
+                'close_price': c
+            }
+            for t, v, o, h, l, c in zip(
+                series.dates[traded][::-1].tolist(), series.volume[traded][::-1].tolist(),
+                series.open[traded][::-1].tolist(), series.high[traded][::-1].tolist(),
+                series.low[traded][::-1].tolist(), series.close[traded][::-1].tolist()
+            )
+        ]
     
     def get_latest_volume_date(self, ticker: str) -> Optional[str]:
         """
@@ -1889,11 +2244,11 @@ class NeoBDMRepository(BaseRepository):
         try:
             query = """
             SELECT MAX(trade_date)
-            FROM volume_daily_records
-            WHERE UPPER(ticker) = UPPER(?)
+            FROM price_volume
+            WHERE ticker = ? AND volume > 0
             """
             cursor = conn.cursor()
-            cursor.execute(query, (ticker,))
+            cursor.execute(query, (ticker.upper(),))
             row = cursor.fetchone()
             
             return row[0] if row and row[0] else None
@@ -1901,11 +2256,57 @@ class NeoBDMRepository(BaseRepository):
         finally:
             conn.close()
     
+    def get_latest_close(self, ticker: str) -> Optional[float]:
+        """
+        Get the close of the latest traded bar (indexed single-row lookup).
+        
+        Args:
+            ticker: Stock ticker
+        
+        Returns:
+            Latest close price or None if no data
+        """
+        conn = self._get_conn()
+        try:
+            row = conn.execute("""
+                SELECT close
+                FROM price_volume
+                WHERE ticker = ? AND volume > 0
+                ORDER BY trade_date DESC
+                LIMIT 1
+            """, (ticker.upper(),)).fetchone()
+            return row[0] if row and row[0] is not None else None
+        finally:
+            conn.close()
+    
+    def get_latest_closes(self) -> Dict[str, float]:
+        """
+        Get the close of the latest traded bar of every ticker in one query.
+        
+        Returns:
+            {TICKER: latest close}
+        """
+        conn = self._get_conn()
+        try:
+            rows = conn.execute("""
+                SELECT p.ticker, p.close
+                FROM price_volume p
+                JOIN (
+                    SELECT ticker, MAX(trade_date) AS trade_date
+                    FROM price_volume
+                    WHERE volume > 0
+                    GROUP BY ticker
+                ) latest ON latest.ticker = p.ticker AND latest.trade_date = p.trade_date
+            """).fetchall()
+            return {ticker: close for ticker, close in rows if close is not None}
+        finally:
+            conn.close()
+    
     def get_or_fetch_volume(self, ticker: str) -> Dict:
         """
         Smart volume fetching with incremental updates.
         
-        Logic:
+        Logic (shared OHLCV fetch policy):
         - If ticker has no data: fetch from 2025-12-22 to today
         - If ticker has data: fetch from (latest_date + 1) to today
         - Returns all historical data from database
@@ -1921,40 +2322,15 @@ class NeoBDMRepository(BaseRepository):
                 "records_added": 10
             }
         """
+        from modules.ohlcv_service import get_ohlcv_service
         from modules.volume_fetcher import VolumeFetcher
         
-        latest_date = self.get_latest_volume_date(ticker)
-        fetcher = VolumeFetcher()
-        records_added = 0
-        source = "database"
-        
-        if latest_date is None:
-            # First time fetch: get all data from START_DATE
-            print(f"[*] First time fetching volume for {ticker} from {fetcher.START_DATE}")
-            records = fetcher.get_volume_data(ticker, start_date=fetcher.START_DATE)
-            
-            if records:
-                self.save_volume_batch(ticker, records)
-                records_added = len(records)
-                source = "fetched_full"
-        else:
-            # Incremental fetch: only get new data
-            next_date = (datetime.strptime(latest_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
-            today = datetime.now().strftime('%Y-%m-%d')
-            
-            if next_date <= today:
-                print(f"[*] Incremental fetch for {ticker} from {next_date} to {today}")
-                records = fetcher.get_volume_data(ticker, start_date=next_date, end_date=today)
-                
-                if records:
-                    self.save_volume_batch(ticker, records)
-                    records_added = len(records)
-                    source = "fetched_incremental"
-            else:
-                print(f"[*] Volume data for {ticker} is up to date (latest: {latest_date})")
+        fetch_result = get_ohlcv_service(self.db_path).ensure_history(ticker, VolumeFetcher.START_DATE)
+        source = fetch_result["source"]
+        records_added = fetch_result["records_added"]
         
         # Get all historical data from database
-        all_data = self.get_volume_history(ticker, start_date=fetcher.START_DATE)
+        all_data = self.get_volume_history(ticker, start_date=VolumeFetcher.START_DATE)
         
         return {
             "ticker": ticker.upper(),
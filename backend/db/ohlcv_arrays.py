@@ -0,0 +1,134 @@
+"""Columnar (NumPy) view of a ticker's daily OHLCV series."""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+_EPOCH = date(1970, 1, 1)
+
+
+def to_day_number(value: str) -> int:
+    """YYYY-MM-DD -> days since 1970-01-01."""
+    return (datetime.strptime(value[:10], '%Y-%m-%d').date() - _EPOCH).days
+
+
+def from_day_number(day: int) -> str:
+    """Days since 1970-01-01 -> YYYY-MM-DD."""
+    return str(np.datetime64(int(day), 'D'))
+
+
+class OHLCVArrays:
+    """
+    Date-ordered OHLCV columns of one ticker.
+
+    days are int32 day numbers (see to_day_number), open/high/low/close are
+    float64 and volume is int64. slice() returns views into the same buffers,
+    so cached series must be treated as read-only.
+    """
+
+    __slots__ = ("days", "open", "high", "low", "close", "volume")
+
+    def __init__(self, days, open_, high, low, close, volume):
+        self.days = days
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_rows(cls, rows: List[tuple]) -> "OHLCVArrays":
+        """Build from (trade_date, open, high, low, close, volume) rows sorted by date."""
+        n = len(rows)
+        if not n:
+            return cls.empty()
+        dates, opens, highs, lows, closes, volumes = zip(*rows)
+        days = (np.array(dates, dtype='datetime64[D]') - np.datetime64('1970-01-01', 'D')).astype(np.int32)
+        arrays = cls(
+            days,
+            np.array(opens, dtype=np.float64),
+            np.array(highs, dtype=np.float64),
+            np.array(lows, dtype=np.float64),
+            np.array(closes, dtype=np.float64),
+            np.array(volumes, dtype=np.int64)
+        )
+        for column in (arrays.days, arrays.open, arrays.high, arrays.low, arrays.close, arrays.volume):
+            column.flags.writeable = False
+        return arrays
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "OHLCVArrays":
+        """Build from repository records (time/open/high/low/close/volume) sorted by date."""
+        return cls.from_rows([
+            (r['time'], r['open'], r['high'], r['low'], r['close'], r['volume']) for r in records
+        ])
+
+    @classmethod
+    def empty(cls) -> "OHLCVArrays":
+        return cls(
+            np.empty(0, dtype=np.int32), np.empty(0), np.empty(0), np.empty(0), np.empty(0),
+            np.empty(0, dtype=np.int64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def bounds(self, start_date: Optional[str], end_date: Optional[str]) -> tuple:
+        """(lo, hi) positions of the inclusive date range start_date..end_date."""
+        lo = int(np.searchsorted(self.days, to_day_number(start_date), 'left')) if start_date else 0
+        hi = int(np.searchsorted(self.days, to_day_number(end_date), 'right')) if end_date else len(self.days)
+        return lo, max(lo, hi)
+
+    def slice(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> "OHLCVArrays":
+        """Rows with start_date <= date <= end_date (inclusive), as views."""
+        lo, hi = self.bounds(start_date, end_date)
+        return self[lo:hi]
+
+    def __getitem__(self, index: slice) -> "OHLCVArrays":
+        return OHLCVArrays(
+            self.days[index], self.open[index], self.high[index],
+            self.low[index], self.close[index], self.volume[index]
+        )
+
+    def tail(self, count: int) -> "OHLCVArrays":
+        return self[max(len(self) - count, 0):]
+
+    def index_of(self, trade_date: str) -> Optional[int]:
+        """Position of an exact date, or None."""
+        day = to_day_number(trade_date)
+        i = int(np.searchsorted(self.days, day))
+        return i if i < len(self.days) and self.days[i] == day else None
+
+    def index_at_or_before(self, trade_date: str) -> Optional[int]:
+        """Position of the last row on or before a date, or None."""
+        i = int(np.searchsorted(self.days, to_day_number(trade_date), 'right')) - 1
+        return i if i >= 0 else None
+
+    def date_at(self, i: int) -> str:
+        return from_day_number(self.days[i])
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Trade dates as YYYY-MM-DD strings."""
+        return self.days.astype('datetime64[D]').astype(str)
+
+    def record(self, i: int) -> Dict[str, Any]:
+        """One row in the repository's record format (time/open/high/low/close/volume)."""
+        return {
+            'time': self.date_at(i),
+            'open': float(self.open[i]),
+            'high': float(self.high[i]),
+            'low': float(self.low[i]),
+            'close': float(self.close[i]),
+            'volume': int(self.volume[i])
+        }
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """All rows as records (for JSON responses and list-based callers)."""
+        return [
+            {'time': t, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+            for t, o, h, l, c, v in zip(
+                self.dates.tolist(), self.open.tolist(), self.high.tolist(),
+                self.low.tolist(), self.close.tolist(), self.volume.tolist()
+            )
+        ]
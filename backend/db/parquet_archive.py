@@ -0,0 +1,355 @@
+"""
+Parquet archive of OHLCV and flow history for bulk backtests.
+
+Datasets are written under the archive root as hive-partitioned Parquet
+(<dataset>/year=YYYY/ticker=XXXX/part-*.parquet):
+
+- price_volume: daily OHLCV
+- neobdm_flows: neobdm_records with flow/price columns decoded to floats
+- broker_summaries: neobdm_broker_summaries
+- done_detail_daily: per-broker daily buy/sell aggregates of done_detail_records
+
+Exports are incremental: _state.json keeps a high-water mark per dataset and
+each run appends the rows past it as new part files. For price_volume, broker
+summaries and done detail the mark is the source row id (re-saved summaries
+and re-fetched done detail days come back with new ids). neobdm_records are
+upserted in place and keep their id, so neobdm_flows tracks the ingest run id
+instead: every run stamps the rows it inserts or changes with its run_id and
+leaves a tombstone for each row it prunes. Later copies supersede the archived
+ones on read. Rows edited by the maintenance scripts are not tracked; export
+with full=True after running them.
+"""
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import config
+from .connection import BaseRepository
+from .neobdm_repository import NeoBDMRepository
+from .price_volume_repository import PriceVolumeRepository
+
+
+NEOBDM_NUMERIC_COLUMNS = [
+    'w_4', 'w_3', 'w_2', 'w_1', 'd_4', 'd_3', 'd_2', 'd_0', 'pct_1d',
+    'c_20', 'c_10', 'c_5', 'c_3', 'pct_3d', 'pct_5d', 'pct_10d', 'pct_20d', 'price'
+]
+
+# Source query per dataset. Every query yields `ticker` and `trade_date` for
+# source rows with :last_id < mark <= :high_id, where mark is the id of `table`
+# (the ingest run id for neobdm_flows).
+DATASETS = {
+    "price_volume": {
+        "table": "price_volume",
+        "query": """
+            SELECT t.ticker, t.trade_date, t.open, t.high, t.low, t.close, t.volume
+            FROM price_volume t
+            WHERE t.id > :last_id AND t.id <= :high_id
+        """,
+        "key": ["ticker", "trade_date"],
+    },
+    "neobdm_flows": {
+        "table": "neobdm_ingest_runs",
+        "query": f"""
+            SELECT t.symbol AS ticker, t.trade_date, t.scraped_at, t.method, t.period,
+                   {', '.join('t.' + c for c in NeoBDMRepository.NEOBDM_RECORD_COLUMNS)},
+                   t.run_id, 0 AS deleted
+            FROM neobdm_records t
+            WHERE t.run_id > :last_id AND t.run_id <= :high_id AND t.trade_date IS NOT NULL
+            UNION ALL
+            SELECT d.symbol, d.trade_date, NULL, d.method, d.period,
+                   {', '.join('NULL' for _ in NeoBDMRepository.NEOBDM_RECORD_COLUMNS)},
+                   d.run_id, 1
+            FROM neobdm_record_deletes d
+            WHERE d.run_id > :last_id AND d.run_id <= :high_id
+        """,
+        "key": ["ticker", "trade_date", "method", "period"],
+        # Upserts keep their row id; the ingest run orders copies and flags prunes
+        "version": "run_id",
+        "tombstone": "deleted",
+    },
+    "broker_summaries": {
+        "table": "neobdm_broker_summaries",
+        "query": """
+            SELECT t.ticker, t.trade_date, t.side, t.broker, t.nlot, t.nval, t.avg_price, t.scraped_at
+            FROM neobdm_broker_summaries t
+            WHERE t.id > :last_id AND t.id <= :high_id AND t.trade_date IS NOT NULL
+        """,
+        "key": ["ticker", "trade_date", "side", "broker"],
+        # Each save replaces the whole (ticker, trade_date) snapshot
+        "snapshot": "scraped_at",
+    },
+    "done_detail_daily": {
+        "table": "done_detail_records",
+        # Whole days are re-aggregated whenever one of their rows is new
+        "query": """
+            WITH days AS (
+                SELECT DISTINCT ticker, trade_date FROM done_detail_records
+                WHERE id > :last_id AND id <= :high_id
+            ),
+            r AS (
+                SELECT d.* FROM done_detail_records d
+                JOIN days ON days.ticker = d.ticker AND days.trade_date = d.trade_date
+            )
+            SELECT t.ticker, t.trade_date, t.broker,
+                   SUM(t.buy_qty) AS buy_qty, SUM(t.buy_value) AS buy_value, SUM(t.buy_trades) AS buy_trades,
+                   SUM(t.sell_qty) AS sell_qty, SUM(t.sell_value) AS sell_value, SUM(t.sell_trades) AS sell_trades
+            FROM (
+                SELECT ticker, trade_date, buyer_code AS broker,
+                       qty AS buy_qty, price * qty AS buy_value, 1 AS buy_trades,
+                       0 AS sell_qty, 0.0 AS sell_value, 0 AS sell_trades
+                FROM r
+                UNION ALL
+                SELECT ticker, trade_date, seller_code,
+                       0, 0.0, 0,
+                       qty, price * qty, 1
+                FROM r
+            ) t
+            GROUP BY t.ticker, t.trade_date, t.broker
+        """,
+        "key": ["ticker", "trade_date", "broker"],
+    },
+}
+
+PARTITIONING = ds.partitioning(pa.schema([("year", pa.string()), ("ticker", pa.string())]), flavor="hive")
+
+# Datasets that restore() can write back (done_detail_daily is derived only)
+RESTORABLE = ("price_volume", "neobdm_flows", "broker_summaries")
+
+
+def decode_numeric(values: pd.Series) -> pd.Series:
+    """Vectorized NeoBDMRepository._parse_numeric: '1,234.5B|x' -> 1234.5, invalid -> 0.0."""
+    text = values.astype(object).where(values.notna(), '').astype(str)
+    text = text.str.split('|').str[0].str.replace(',', '', regex=False).str.replace('B', '', regex=False).str.strip()
+    return pd.to_numeric(text, errors='coerce').fillna(0.0).astype(np.float64)
+
+
+class ParquetArchive(BaseRepository):
+    """Export/import of the history tables to partitioned Parquet files."""
+
+    def __init__(self, root: Optional[str] = None, db_path: Optional[str] = None):
+        super().__init__(db_path)
+        self.root = root if root else os.path.join(config.DATA_DIR, "parquet")
+
+    # ==================== EXPORT ====================
+
+    def export(self, datasets: Optional[List[str]] = None, full: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Append rows inserted since the last export to the archive.
+
+        Args:
+            datasets: Dataset names (default: all)
+            full: Drop the existing files and export everything again
+
+        Returns:
+            {dataset: {"rows": rows written, "tickers": tickers touched}}
+        """
+        state = self._load_state()
+        summary = {}
+        for name in datasets or list(DATASETS):
+            if name not in DATASETS:
+                raise ValueError(f"Unknown dataset: {name}")
+            # States written before the current mark (per-ticker dates, neobdm row ids)
+            # lack it; those datasets are rebuilt from scratch
+            mark = DATASETS[name].get("version", "id")
+            previous = state.get(name, {})
+            if full or "last_id" not in previous or previous.get("mark", "id") != mark:
+                self._drop_dataset(name)
+                state[name] = {}
+            last_id = state[name].get("last_id", 0)
+            frame, high_id = self._read_new_rows(name, last_id)
+            if high_id > last_id:
+                if not frame.empty:
+                    self._write(name, frame)
+                state[name] = {"last_id": high_id, "mark": mark}
+                # Persist per dataset so a failure later keeps earlier progress
+                self._save_state(state)
+            summary[name] = {"rows": len(frame), "tickers": int(frame['ticker'].nunique()) if len(frame) else 0}
+            print(f"[*] Parquet export {name}: {summary[name]['rows']} rows, {summary[name]['tickers']} tickers")
+        if full:
+            self._save_state(state)
+        return summary
+
+    def _read_new_rows(self, name: str, last_id: int) -> Tuple[pd.DataFrame, int]:
+        """Rows marked after last_id, and the high-water mark they were read up to."""
+        spec = DATASETS[name]
+        conn = self._get_conn()
+        try:
+            high_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {spec['table']}").fetchone()[0]
+            if high_id <= last_id:
+                return pd.DataFrame(), high_id
+            frame = pd.read_sql(spec["query"], conn, params={"last_id": last_id, "high_id": high_id})
+        finally:
+            conn.close()
+
+        if frame.empty:
+            return frame, high_id
+        frame['ticker'] = frame['ticker'].str.upper()
+        frame['trade_date'] = frame['trade_date'].astype(str).str[:10]
+        if name == "neobdm_flows":
+            for column in NEOBDM_NUMERIC_COLUMNS:
+                frame[column] = decode_numeric(frame[column])
+        return frame, high_id
+
+    def _write(self, name: str, frame: pd.DataFrame) -> None:
+        frame = frame.assign(year=frame['trade_date'].str[:4])
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        ds.write_dataset(
+            table,
+            os.path.join(self.root, name),
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"part-{datetime.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def _drop_dataset(self, name: str) -> None:
+        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    # ==================== READ / IMPORT ====================
+
+    def read(
+        self,
+        name: str,
+        tickers: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Load an archived dataset (partition-pruned by ticker and year).
+
+        Rows exported more than once (re-saved in SQLite, or re-exported by
+        an interrupted run) are de-duplicated on the dataset key, latest part
+        wins (highest run_id for neobdm_flows, whose pruned rows are dropped);
+        broker summaries keep only the latest snapshot of each day.
+
+        Returns:
+            DataFrame sorted by ticker, trade_date (empty if nothing archived)
+        """
+        if name not in DATASETS:
+            raise ValueError(f"Unknown dataset: {name}")
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(path):
+            return pd.DataFrame()
+
+        dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+        conditions = []
+        if tickers:
+            conditions.append(ds.field("ticker").isin([t.upper() for t in tickers]))
+        if start_date:
+            conditions.append(ds.field("year") >= start_date[:4])
+            conditions.append(ds.field("trade_date") >= start_date)
+        if end_date:
+            conditions.append(ds.field("year") <= end_date[:4])
+            conditions.append(ds.field("trade_date") <= end_date)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        frame = dataset.to_table(filter=expression).to_pandas()
+        if frame.empty:
+            return frame
+        spec = DATASETS[name]
+        key = spec["key"]
+        snapshot = spec.get("snapshot")
+        if snapshot:
+            stamps = frame[snapshot].fillna('')
+            frame = frame[stamps == stamps.groupby([frame['ticker'], frame['trade_date']]).transform('max')]
+        if spec.get("version"):
+            frame = frame.sort_values(spec["version"], kind="stable")
+        frame = frame.drop_duplicates(subset=key, keep='last')
+        if spec.get("tombstone"):
+            frame = frame[frame[spec["tombstone"]] == 0].drop(columns=[spec["tombstone"]])
+        return (
+            frame.drop(columns=['year'])
+            .sort_values(key)
+            .reset_index(drop=True)
+        )
+
+    def restore(self, name: str, tickers: Optional[List[str]] = None) -> int:
+        """
+        Write an archived dataset back into SQLite.
+
+        price_volume upserts bars, neobdm_flows inserts only missing
+        (symbol, method, period, trade_date) rows with the decoded numbers as
+        plain text, and broker_summaries replaces the archived ticker/dates.
+
+        Returns:
+            Number of rows written
+        """
+        if name not in RESTORABLE:
+            raise ValueError(f"Dataset {name} cannot be restored (restorable: {', '.join(RESTORABLE)})")
+        frame = self.read(name, tickers)
+        if frame.empty:
+            return 0
+
+        if name == "price_volume":
+            data_by_ticker = {
+                ticker: group.rename(columns={'trade_date': 'time'})[
+                    ['time', 'open', 'high', 'low', 'close', 'volume']
+                ].to_dict('records')
+                for ticker, group in frame.groupby('ticker')
+            }
+            return sum(PriceVolumeRepository(self.db_path).bulk_upsert_ohlcv(data_by_ticker).values())
+
+        conn = self._get_conn()
+        try:
+            if name == "neobdm_flows":
+                for column in NEOBDM_NUMERIC_COLUMNS:
+                    frame[column] = frame[column].astype(str)
+                # Restored rows belong to one ingest run so later exports carry them
+                run_id = conn.execute(
+                    "INSERT INTO neobdm_ingest_runs (total_rows, inserted, updated, unchanged, deleted) VALUES (?, 0, 0, 0, 0)",
+                    (len(frame),)
+                ).lastrowid
+                frame['run_id'] = run_id
+                columns = ['scraped_at', 'method', 'period', 'symbol'] + NeoBDMRepository.NEOBDM_RECORD_COLUMNS + ['trade_date', 'run_id']
+                frame = frame.rename(columns={'ticker': 'symbol'})
+                cursor = conn.executemany(
+                    f"INSERT OR IGNORE INTO neobdm_records ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    frame[columns].astype(object).where(frame[columns].notna(), None).itertuples(index=False, name=None)
+                )
+                conn.execute("UPDATE neobdm_ingest_runs SET inserted = ? WHERE id = ?", (cursor.rowcount, run_id))
+            else:
+                pairs = frame[['ticker', 'trade_date']].drop_duplicates().itertuples(index=False, name=None)
+                conn.executemany(
+                    "DELETE FROM neobdm_broker_summaries WHERE UPPER(ticker) = ? AND trade_date = ?", list(pairs)
+                )
+                columns = ['ticker', 'trade_date', 'side', 'broker', 'nlot', 'nval', 'avg_price', 'scraped_at']
+                cursor = conn.executemany(
+                    f"INSERT INTO neobdm_broker_summaries ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    frame[columns].astype(object).where(frame[columns].notna(), None).itertuples(index=False, name=None)
+                )
+            conn.commit()
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ==================== STATE ====================
+
+    def _state_path(self) -> str:
+        return os.path.join(self.root, "_state.json")
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._state_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._state_path())
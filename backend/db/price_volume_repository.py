@@ -8,18 +8,384 @@ Supports incremental updates to avoid re-fetching historical data.
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 import logging
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
 
 from .connection import BaseRepository
+from .ohlcv_arrays import OHLCVArrays
 
 logger = logging.getLogger(__name__)
 
+# Full per-ticker OHLCV arrays, shared by every repository instance in the
+# process and keyed by (db_path, ticker) so a write through one instance
+# invalidates what the others read. Entries are (series, marker, checked_at);
+# the marker catches writes from other processes (see _cached_series).
+_SERIES_CACHE = OrderedDict()
+_SERIES_CACHE_LOCK = threading.Lock()
+# Per-db_path counter bumped on every OHLCV write (derived caches such as the
+# trading calendar compare it to know when to rebuild)
+_DATA_VERSIONS: Dict[str, int] = {}
+# Per-(db_path, ticker) (rewrites, writes) counters: writes counts every OHLCV
+# write of the ticker, rewrites only those that touched existing dates (a pure
+# append of later bars leaves it unchanged)
+_SERIES_VERSIONS: Dict[tuple, tuple] = {}
+# Per-db_path ticker count when first opened; the series cache holds them all
+_TICKER_COUNTS: Dict[str, int] = {}
+
+
+def _rolling_prev_median(
+    values: np.ndarray,
+    group_start: np.ndarray,
+    window: int,
+    min_periods: int
+) -> tuple:
+    """
+    Median of the previous `window` values of each row, within its group.
+
+    Rows must be sorted by (group, date). `group_start[i]` is the index of the
+    first row of row i's group. The current row is excluded, so this is the
+    "median of the N days before" baseline used by the volume scanners.
+
+    Returns:
+        (medians, counts) as float arrays; medians is NaN where fewer than
+        `min_periods` previous values exist.
+    """
+    n = len(values)
+    if n == 0:
+        return np.array([], dtype=float), np.array([], dtype=int)
+
+    padded = np.concatenate([np.full(window, np.nan), values.astype(float)])
+    # windows[i] = values[i - window : i]
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)[:n].copy()
+
+    # Blank out slots that belong to the previous group (or before the data)
+    position = np.arange(n) - group_start
+    windows[np.arange(window)[None, :] < (window - position)[:, None]] = np.nan
+
+    counts = np.sum(~np.isnan(windows), axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        medians = np.nanmedian(windows, axis=1)
+    medians[counts < min_periods] = np.nan
+    return medians, counts
+
 
 class PriceVolumeRepository(BaseRepository):
     """Repository for OHLCV price and volume data."""
+
+    # Computed spike series kept per (ticker, latest trade_date, params)
+    SPIKE_CACHE_SIZE = 256
+    # Minimum number of full OHLCV series kept in the shared read cache; it
+    # grows to the ticker count of the open databases (+25% for new listings)
+    # so a whole-universe pass doesn't evict itself
+    SERIES_CACHE_SIZE = 512
+    # Seconds a cached series is served before its marker is compared with the
+    # database again (catches writes made by other processes)
+    SERIES_RECHECK_SECONDS = 2.0
     
     def __init__(self, db_path: Optional[str] = None):
         super().__init__(db_path)
         self._ensure_table_exists()
+        self._count_tickers()
+        self._spike_cache = OrderedDict()
+        self._spike_cache_lock = threading.Lock()
+
+    def _invalidate_ticker_caches(self, ticker: str, appended: bool = False):
+        """
+        Drop cached series and spike markers of a ticker (its OHLCV changed).
+
+        appended: The write only added bars after the ticker's latest date
+        """
+        key = (self.db_path, ticker)
+        with _SERIES_CACHE_LOCK:
+            _SERIES_CACHE.pop(key, None)
+            _DATA_VERSIONS[self.db_path] = _DATA_VERSIONS.get(self.db_path, 0) + 1
+            rewrites, writes = _SERIES_VERSIONS.get(key, (0, 0))
+            _SERIES_VERSIONS[key] = (rewrites + (0 if appended else 1), writes + 1)
+        with self._spike_cache_lock:
+            for key in [k for k in self._spike_cache if k[0] == ticker]:
+                del self._spike_cache[key]
+
+    def _count_tickers(self):
+        with _SERIES_CACHE_LOCK:
+            if self.db_path in _TICKER_COUNTS:
+                return
+        conn = self._get_conn()
+        try:
+            count = conn.execute("SELECT COUNT(DISTINCT ticker) FROM price_volume").fetchone()[0]
+        finally:
+            conn.close()
+        with _SERIES_CACHE_LOCK:
+            _TICKER_COUNTS[self.db_path] = count
+
+    def _series_cache_limit(self) -> int:
+        """Cache capacity (call with _SERIES_CACHE_LOCK held)."""
+        return max(self.SERIES_CACHE_SIZE, int(sum(_TICKER_COUNTS.values()) * 1.25))
+
+    def data_version(self) -> int:
+        """Write counter of this database file (changes whenever OHLCV rows are written)."""
+        with _SERIES_CACHE_LOCK:
+            return _DATA_VERSIONS.get(self.db_path, 0)
+
+    def series_version(self, ticker: str) -> tuple:
+        """
+        (rewrites, writes) of a ticker's series.
+
+        writes changes on every write; rewrites only when existing bars may
+        have changed, so an unchanged rewrites means earlier bars are intact.
+        Read it before the series so a concurrent write can only make it stale
+        in the conservative direction.
+        """
+        with _SERIES_CACHE_LOCK:
+            return _SERIES_VERSIONS.get((self.db_path, ticker.upper()), (0, 0))
+
+    @staticmethod
+    def _latest_dates(conn, tickers: List[str]) -> Dict[str, str]:
+        """MAX(trade_date) per ticker (index-only), for telling appends from rewrites."""
+        latest = {}
+        for i in range(0, len(tickers), 500):
+            chunk = tickers[i:i + 500]
+            latest.update(conn.execute(f"""
+                SELECT ticker, MAX(trade_date) FROM price_volume
+                WHERE ticker IN ({','.join('?' * len(chunk))})
+                GROUP BY ticker
+            """, chunk).fetchall())
+        return latest
+
+    def get_ohlcv_arrays(
+        self,
+        ticker: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> OHLCVArrays:
+        """
+        Columnar OHLCV series of a ticker, served from the process-wide cache.
+        
+        The full series is loaded once per ticker and kept until it changes
+        (see _cached_series); date ranges are returned as views into the
+        cached arrays.
+        
+        Args:
+            ticker: Stock ticker symbol
+            start_date: Start date (YYYY-MM-DD), inclusive, optional
+            end_date: End date (YYYY-MM-DD), inclusive, optional
+        """
+        series = self.load_ohlcv_arrays([ticker])[ticker.upper()]
+        if start_date or end_date:
+            return series.slice(start_date, end_date)
+        return series
+
+    def load_ohlcv_arrays(self, tickers: List[str]) -> Dict[str, OHLCVArrays]:
+        """
+        Full series of many tickers: cached ones from memory, the rest in one query.
+        
+        Args:
+            tickers: Stock ticker symbols
+            
+        Returns:
+            {TICKER: OHLCVArrays} (empty arrays for tickers without data)
+        """
+        wanted = sorted({t.upper() for t in tickers if t})
+        result = self._cached_series(wanted)
+        missing = [ticker for ticker in wanted if ticker not in result]
+        if not missing:
+            return result
+
+        conn = self._get_conn()
+        try:
+            # Marker first: a write in between only makes the next check reload again
+            markers = self._series_markers(conn, missing)
+            loaded = self._read_series(conn, missing)
+        finally:
+            conn.close()
+        self.prime_ohlcv_arrays(loaded, markers)
+        result.update(loaded)
+        return result
+
+    def load_ohlcv_window(self, tickers: List[str], start_date: str, end_date: str) -> Dict[str, OHLCVArrays]:
+        """
+        start_date..end_date (inclusive) of many tickers, without priming the cache.
+        
+        For whole-market passes over a short window: cached tickers are sliced
+        from memory, the rest are read with one date-bounded query and not
+        kept, so a scan neither loads years of history nor evicts warm series.
+        
+        Returns:
+            {TICKER: OHLCVArrays} (empty arrays for tickers without data)
+        """
+        wanted = sorted({t.upper() for t in tickers if t})
+        result = {
+            ticker: series.slice(start_date, end_date)
+            for ticker, series in self._cached_series(wanted).items()
+        }
+        missing = [ticker for ticker in wanted if ticker not in result]
+        if not missing:
+            return result
+
+        rows_by_ticker = {ticker: [] for ticker in missing}
+        conn = self._get_conn()
+        try:
+            # Chunk to stay under SQLite's bound-parameter limit
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                cursor = conn.execute(f"""
+                    SELECT ticker, trade_date, open, high, low, close, volume
+                    FROM price_volume
+                    WHERE ticker IN ({','.join('?' * len(chunk))})
+                      AND trade_date >= ? AND trade_date <= ?
+                    ORDER BY ticker, trade_date ASC
+                """, chunk + [start_date, end_date])
+                for row in cursor:
+                    rows_by_ticker[row[0]].append(row[1:])
+        finally:
+            conn.close()
+
+        result.update({ticker: OHLCVArrays.from_rows(rows) for ticker, rows in rows_by_ticker.items()})
+        return result
+
+    def prime_ohlcv_arrays(
+        self,
+        series_by_ticker: Dict[str, OHLCVArrays],
+        markers: Optional[Dict[str, tuple]] = None
+    ):
+        """
+        Install full series into the process-wide cache (e.g. series preloaded
+        by a parent process and handed to a worker).
+
+        markers: _series_markers of the series as read; without them the
+        series are trusted as current and stamped with the marker at their
+        first check.
+        """
+        checked_at = time.monotonic()
+        with _SERIES_CACHE_LOCK:
+            for ticker, series in series_by_ticker.items():
+                for column in (series.days, series.open, series.high, series.low, series.close, series.volume):
+                    column.flags.writeable = False
+                ticker = ticker.upper()
+                marker = markers.get(ticker, (0, None)) if markers is not None else None
+                key = (self.db_path, ticker)
+                _SERIES_CACHE[key] = (series, marker, checked_at)
+                _SERIES_CACHE.move_to_end(key)
+            limit = self._series_cache_limit()
+            while len(_SERIES_CACHE) > limit:
+                _SERIES_CACHE.popitem(last=False)
+
+    def series_marker(self, ticker: str) -> tuple:
+        """
+        (row count, highest row id) of a ticker as stored right now.
+
+        Also re-validates the ticker's cached series, so a key built from the
+        marker never pairs with a series older than it.
+        """
+        ticker = ticker.upper()
+        self._cached_series([ticker], recheck_seconds=0)
+        with _SERIES_CACHE_LOCK:
+            entry = _SERIES_CACHE.get((self.db_path, ticker))
+        if entry is not None:
+            return entry[1]
+        conn = self._get_conn()
+        try:
+            return self._series_markers(conn, [ticker]).get(ticker, (0, None))
+        finally:
+            conn.close()
+
+    def _cached_series(self, tickers: List[str], recheck_seconds: Optional[float] = None) -> Dict[str, OHLCVArrays]:
+        """
+        Cached full series of tickers that still match the database.
+
+        Writes through any repository in this process drop the entry right
+        away. Writes from other processes are caught by comparing the entry's
+        marker with the stored one once it is older than recheck_seconds
+        (default SERIES_RECHECK_SECONDS); changed tickers are reloaded and
+        invalidated like a local write (a pure append when the cached bars are
+        an unchanged prefix of the new series).
+        """
+        if recheck_seconds is None:
+            recheck_seconds = self.SERIES_RECHECK_SECONDS
+        now = time.monotonic()
+        result = {}
+        unchecked = {}
+        with _SERIES_CACHE_LOCK:
+            for ticker in tickers:
+                key = (self.db_path, ticker)
+                entry = _SERIES_CACHE.get(key)
+                if entry is None:
+                    continue
+                _SERIES_CACHE.move_to_end(key)
+                if now - entry[2] < recheck_seconds:
+                    result[ticker] = entry[0]
+                else:
+                    unchecked[ticker] = entry
+        if not unchecked:
+            return result
+
+        conn = self._get_conn()
+        try:
+            markers = self._series_markers(conn, sorted(unchecked))
+            changed = [
+                ticker for ticker, entry in unchecked.items()
+                if entry[1] is not None and markers.get(ticker, (0, None)) != entry[1]
+            ]
+            reloaded = self._read_series(conn, changed) if changed else {}
+        finally:
+            conn.close()
+
+        for ticker, (series, _, _) in unchecked.items():
+            if ticker in reloaded:
+                fresh = reloaded[ticker]
+                n = len(series)
+                appended = len(fresh) > n and all(
+                    np.array_equal(getattr(fresh, column)[:n], getattr(series, column))
+                    for column in ("days", "open", "high", "low", "close", "volume")
+                )
+                self._invalidate_ticker_caches(ticker, appended)
+                series = fresh
+            result[ticker] = series
+        self.prime_ohlcv_arrays({ticker: result[ticker] for ticker in unchecked}, markers)
+        return result
+
+    @staticmethod
+    def _series_markers(conn, tickers: List[str]) -> Dict[str, tuple]:
+        """
+        (COUNT(*), MAX(id)) per ticker, read from the (ticker, trade_date) index.
+
+        INSERT OR REPLACE gives a rewritten bar a new id, so the pair changes
+        on every upsert or delete, whichever process made it (a bare UPDATE
+        keeps the id and goes unnoticed). Tickers without rows are left out.
+        """
+        markers = {}
+        # Chunk to stay under SQLite's bound-parameter limit
+        for i in range(0, len(tickers), 500):
+            chunk = tickers[i:i + 500]
+            for ticker, count, max_id in conn.execute(f"""
+                SELECT ticker, COUNT(*), MAX(id) FROM price_volume
+                WHERE ticker IN ({','.join('?' * len(chunk))})
+                GROUP BY ticker
+            """, chunk):
+                markers[ticker] = (count, max_id)
+        return markers
+
+    @staticmethod
+    def _read_series(conn, tickers: List[str]) -> Dict[str, OHLCVArrays]:
+        """Full series of tickers (empty arrays for tickers without data)."""
+        rows_by_ticker = {ticker: [] for ticker in tickers}
+        # Chunk to stay under SQLite's bound-parameter limit
+        for i in range(0, len(tickers), 500):
+            chunk = tickers[i:i + 500]
+            cursor = conn.execute(f"""
+                SELECT ticker, trade_date, open, high, low, close, volume
+                FROM price_volume
+                WHERE ticker IN ({','.join('?' * len(chunk))})
+                ORDER BY ticker, trade_date ASC
+            """, chunk)
+            for row in cursor:
+                rows_by_ticker[row[0]].append(row[1:])
+        return {ticker: OHLCVArrays.from_rows(rows) for ticker, rows in rows_by_ticker.items()}
     
     def _ensure_table_exists(self):
         """Create the price_volume table if it doesn't exist."""
@@ -46,6 +412,11 @@ class PriceVolumeRepository(BaseRepository):
                 CREATE INDEX IF NOT EXISTS idx_price_volume_ticker_date 
                 ON price_volume(ticker, trade_date)
             """)
+            # Whole-market date range scans (unusual volume scanner)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_price_volume_date
+                ON price_volume(trade_date)
+            """)
             conn.commit()
         finally:
             conn.close()
@@ -72,30 +443,7 @@ class PriceVolumeRepository(BaseRepository):
         if not end_date:
             end_date = datetime.now().strftime('%Y-%m-%d')
         
-        conn = self._get_conn()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT trade_date, open, high, low, close, volume
-                FROM price_volume
-                WHERE ticker = ? AND trade_date BETWEEN ? AND ?
-                ORDER BY trade_date ASC
-            """, (ticker.upper(), start_date, end_date))
-            
-            rows = cursor.fetchall()
-            return [
-                {
-                    'time': row[0],
-                    'open': row[1],
-                    'high': row[2],
-                    'low': row[3],
-                    'close': row[4],
-                    'volume': row[5]
-                }
-                for row in rows
-            ]
-        finally:
-            conn.close()
+        return self.get_ohlcv_arrays(ticker, start_date, end_date).to_records()
     
     def get_latest_date(self, ticker: str) -> Optional[str]:
         """
@@ -107,6 +455,7 @@ class PriceVolumeRepository(BaseRepository):
         Returns:
             Date string (YYYY-MM-DD) or None if no data exists
         """
+        # Not answered from the series cache: other processes write too
         conn = self._get_conn()
         try:
             cursor = conn.cursor()
@@ -157,6 +506,8 @@ class PriceVolumeRepository(BaseRepository):
         try:
             cursor = conn.cursor()
             rows_affected = 0
+            latest = self._latest_dates(conn, [ticker.upper()]).get(ticker.upper())
+            appended = latest is None or min(r['time'] for r in data) > latest
             
             for record in data:
                 try:
@@ -178,10 +529,99 @@ class PriceVolumeRepository(BaseRepository):
                     logger.error(f"Error inserting record for {ticker}: {e}")
             
             conn.commit()
+            self._invalidate_ticker_caches(ticker.upper(), appended)
             return rows_affected
         finally:
             conn.close()
     
+    def bulk_upsert_ohlcv(self, data_by_ticker: Dict[str, List[Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        Insert or update OHLCV data for many tickers in a single transaction.
+        
+        Args:
+            data_by_ticker: Mapping of ticker -> list of OHLCV records
+                (same record format as upsert_ohlcv_data)
+            
+        Returns:
+            Mapping of ticker -> number of rows written
+        """
+        rows = []
+        counts = {}
+        first_dates = {}
+        for ticker, records in data_by_ticker.items():
+            ticker = ticker.upper()
+            counts[ticker] = len(records)
+            if records:
+                first_dates[ticker] = min(r['time'] for r in records)
+            rows.extend(
+                (ticker, r['time'], r['open'], r['high'], r['low'], r['close'], r['volume'])
+                for r in records
+            )
+        if not rows:
+            return counts
+        
+        conn = self._get_conn()
+        try:
+            latest = self._latest_dates(conn, list(first_dates))
+            conn.executemany("""
+                INSERT OR REPLACE INTO price_volume 
+                (ticker, trade_date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        for ticker, written in counts.items():
+            if written:
+                appended = latest.get(ticker) is None or first_dates[ticker] > latest[ticker]
+                self._invalidate_ticker_caches(ticker, appended)
+        return counts
+    
+    def get_latest_dates(self) -> Dict[str, str]:
+        """
+        Get the most recent trade date of every ticker in one query.
+        
+        Returns:
+            Mapping of ticker -> latest date (YYYY-MM-DD)
+        """
+        conn = self._get_conn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT ticker, MAX(trade_date) FROM price_volume GROUP BY ticker
+            """)
+            return {row[0]: row[1] for row in cursor.fetchall() if row[1]}
+        finally:
+            conn.close()
+    
+    def get_session_dates(self, min_share: float = 0.2) -> List[str]:
+        """
+        Dates the exchange was open, derived from the stored OHLCV history.
+        
+        A date counts as a session when at least `min_share` of a typical
+        day's ticker count has a bar with non-zero volume on it, so stray
+        zero-volume bars on holidays do not turn them into sessions.
+        
+        Returns:
+            Sorted list of session dates (YYYY-MM-DD)
+        """
+        conn = self._get_conn()
+        try:
+            rows = conn.execute("""
+                SELECT trade_date, COUNT(*) FROM price_volume
+                WHERE volume > 0
+                GROUP BY trade_date
+                ORDER BY trade_date
+            """).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return []
+        counts = np.array([row[1] for row in rows])
+        threshold = max(1.0, float(np.median(counts)) * min_share)
+        return [row[0][:10] for row, count in zip(rows, counts) if count >= threshold]
+    
     def has_data_for_ticker(self, ticker: str) -> bool:
         """
         Check if any data exists for a ticker.
@@ -282,6 +722,67 @@ class PriceVolumeRepository(BaseRepository):
         finally:
             conn.close()
     
+    def _load_volume_panel(self, scan_start: str, end_date: str, lookback_days: int) -> pd.DataFrame:
+        """
+        Load trade_date/volume/close/open for ALL tickers from scan_start to
+        end_date, plus the lookback_days rows before scan_start of each ticker.
+
+        One range query over a calendar buffer normally covers the lookback;
+        only tickers with a data gap in that buffer get a top-up query.
+
+        Returns a long-format panel sorted by (ticker, trade_date).
+        """
+        columns = "ticker, trade_date, volume, close, open, high, low"
+        buffer_start = (
+            datetime.strptime(scan_start, '%Y-%m-%d') - timedelta(days=lookback_days * 2 + 14)
+        ).strftime('%Y-%m-%d')
+
+        conn = self._get_conn()
+        try:
+            df = pd.read_sql(
+                f"SELECT {columns} FROM price_volume WHERE trade_date BETWEEN ? AND ?",
+                conn,
+                params=(buffer_start, end_date)
+            )
+
+            pre_counts = df[df['trade_date'] < scan_start].groupby('ticker').size()
+            short = [t for t in df['ticker'].unique() if pre_counts.get(t, 0) < lookback_days]
+            if short:
+                placeholders = ",".join("?" * len(short))
+                extra = pd.read_sql(
+                    f"""
+                    SELECT {columns} FROM (
+                        SELECT {columns},
+                               ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trade_date DESC) AS rn
+                        FROM price_volume
+                        WHERE ticker IN ({placeholders}) AND trade_date < ?
+                    ) WHERE rn <= ?
+                    """,
+                    conn,
+                    params=(*short, buffer_start, lookback_days)
+                )
+                if not extra.empty:
+                    df = pd.concat([df, extra], ignore_index=True)
+        finally:
+            conn.close()
+        return df.sort_values(['ticker', 'trade_date'], kind='mergesort').reset_index(drop=True)
+
+    @staticmethod
+    def _add_volume_baseline(panel: pd.DataFrame, lookback_days: int) -> pd.DataFrame:
+        """Add median_volume (previous lookback_days, min 10) and ratio columns to a sorted panel."""
+        tickers = panel['ticker'].to_numpy()
+        is_first = np.ones(len(panel), dtype=bool)
+        is_first[1:] = tickers[1:] != tickers[:-1]
+        group_start = np.maximum.accumulate(np.where(is_first, np.arange(len(panel)), 0))
+
+        medians, _ = _rolling_prev_median(
+            panel['volume'].to_numpy(), group_start, lookback_days, min_periods=10
+        )
+        panel = panel.assign(median_volume=medians)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            panel['ratio'] = np.where(medians > 0, panel['volume'].to_numpy() / medians, np.nan)
+        return panel
+
     def detect_unusual_volumes(
         self, 
         scan_days: int = 30,
@@ -292,6 +793,8 @@ class PriceVolumeRepository(BaseRepository):
         Detect unusual volume events across all tickers.
         
         Uses Median of lookback_days as baseline. Unusual = volume > min_ratio * median.
+        The whole scan + lookback window is loaded for every ticker in a single
+        query and the rolling medians are computed with NumPy.
         
         Args:
             scan_days: Number of recent days to scan for unusual volumes
@@ -301,79 +804,69 @@ class PriceVolumeRepository(BaseRepository):
         Returns:
             List of unusual volume events sorted by ratio descending
         """
-        import statistics
-        
-        end_date = datetime.now().strftime('%Y-%m-%d')
-        start_date = (datetime.now() - timedelta(days=scan_days)).strftime('%Y-%m-%d')
-        
-        unusual_volumes = []
-        tickers = self.get_all_tickers()
-        
-        conn = self._get_conn()
-        try:
-            cursor = conn.cursor()
-            
-            for ticker in tickers:
-                # Get all data for this ticker in scan period
-                cursor.execute("""
-                    SELECT trade_date, volume, close, open
-                    FROM price_volume
-                    WHERE ticker = ? AND trade_date BETWEEN ? AND ?
-                    ORDER BY trade_date DESC
-                """, (ticker, start_date, end_date))
-                
-                scan_data = cursor.fetchall()
-                
-                for i, (trade_date, volume, close, open_price) in enumerate(scan_data):
-                    # Get previous N days for median calculation
-                    cursor.execute("""
-                        SELECT volume
-                        FROM price_volume
-                        WHERE ticker = ? AND trade_date < ?
-                        ORDER BY trade_date DESC
-                        LIMIT ?
-                    """, (ticker, trade_date, lookback_days))
-                    
-                    prev_volumes = [row[0] for row in cursor.fetchall()]
-                    
-                    if len(prev_volumes) < 10:  # Need minimum data for reliable median
-                        continue
-                    
-                    median_volume = statistics.median(prev_volumes)
-                    
-                    if median_volume > 0:
-                        ratio = volume / median_volume
-                        
-                        if ratio >= min_ratio:
-                            # Determine category
-                            if ratio >= 5:
-                                category = 'extreme'
-                            elif ratio >= 3:
-                                category = 'high'
-                            else:
-                                category = 'elevated'
-                            
-                            # Calculate price change
-                            price_change = ((close - open_price) / open_price * 100) if open_price > 0 else 0
-                            
-                            unusual_volumes.append({
-                                'ticker': ticker,
-                                'date': trade_date,
-                                'volume': volume,
-                                'median_20d': round(median_volume),
-                                'ratio': round(ratio, 2),
-                                'category': category,
-                                'close': close,
-                                'price_change': round(price_change, 2)
-                            })
-            
-            # Sort by ratio descending
-            unusual_volumes.sort(key=lambda x: x['ratio'], reverse=True)
-            
-            return unusual_volumes
-            
-        finally:
-            conn.close()
+        events, _ = self._find_unusual_volumes(scan_days, lookback_days, min_ratio)
+        return events
+
+    def _find_unusual_volumes(
+        self,
+        scan_days: int,
+        lookback_days: int,
+        min_ratio: float,
+        history_rows: int = 0
+    ) -> tuple:
+        """
+        Vectorized unusual volume scan shared by detect_unusual_volumes and scan_with_scoring.
+
+        Args:
+            history_rows: Guarantee at least this many most-recent rows per ticker
+                          in the returned panel (e.g. for compression stats)
+
+        Returns:
+            (events, panel): events as dicts sorted by ratio descending, and the
+            loaded OHLCV panel (sorted by ticker, trade_date)
+        """
+        now = datetime.now()
+        end_date = now.strftime('%Y-%m-%d')
+        start_date = (now - timedelta(days=scan_days)).strftime('%Y-%m-%d')
+
+        panel = self._load_volume_panel(start_date, end_date, max(lookback_days, history_rows))
+        if panel.empty:
+            return [], panel
+        panel = self._add_volume_baseline(panel, lookback_days)
+
+        events = panel[
+            (panel['trade_date'] >= start_date)
+            & (panel['ratio'] >= min_ratio)
+        ].copy()
+        if events.empty:
+            return [], panel
+
+        events['category'] = np.select(
+            [events['ratio'] >= 5, events['ratio'] >= 3], ['extreme', 'high'], default='elevated'
+        )
+        opens = events['open'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            events['price_change'] = np.where(
+                opens > 0, (events['close'].to_numpy(dtype=float) - opens) / opens * 100, 0.0
+            )
+        events = events.sort_values('ratio', ascending=False, kind='mergesort')
+
+        return [
+            {
+                'ticker': ticker,
+                'date': trade_date,
+                'volume': int(volume),
+                'median_20d': round(float(median_volume)),
+                'ratio': round(float(ratio), 2),
+                'category': str(category),
+                'close': float(close),
+                'price_change': round(float(price_change), 2)
+            }
+            for ticker, trade_date, volume, median_volume, ratio, category, close, price_change in zip(
+                events['ticker'], events['trade_date'], events['volume'], events['median_volume'],
+                events['ratio'], events['category'], events['close'], events['price_change']
+            )
+        ], panel
     
     def get_volume_spike_markers(
         self,
@@ -395,79 +888,85 @@ class PriceVolumeRepository(BaseRepository):
         Returns:
             List of spike markers with date, volume, ratio, and category
         """
-        import statistics
-        
-        conn = self._get_conn()
-        try:
-            cursor = conn.cursor()
-            
-            # Get all data for this ticker, ordered by date
-            cursor.execute("""
-                SELECT trade_date, volume, close, open
-                FROM price_volume
-                WHERE ticker = ?
-                ORDER BY trade_date ASC
-            """, (ticker.upper(),))
-            
-            rows = cursor.fetchall()
-            
-            if len(rows) < lookback_days + 1:
-                return []  # Not enough data
-            
-            spike_markers = []
-            
-            # For each day (starting after lookback period), check for spikes
-            for i in range(lookback_days, len(rows)):
-                trade_date = rows[i][0]
-                volume = rows[i][1]
-                close = rows[i][2]
-                open_price = rows[i][3]
-                
-                # Calculate median of previous N days
-                prev_volumes = [rows[j][1] for j in range(i - lookback_days, i)]
-                
-                if len(prev_volumes) < 10:
-                    continue
-                
-                median_volume = statistics.median(prev_volumes)
-                
-                if median_volume > 0:
-                    ratio = volume / median_volume
-                    
-                    # Calculate price change
-                    price_change = ((close - open_price) / open_price * 100) if open_price > 0 else 0
-                    
-                    # Filter: Must have BOTH significant volume AND price movement
-                    if ratio >= min_ratio and abs(price_change) >= min_price_change:
-                        # Determine category based on ratio
-                        if ratio >= 8:
-                            category = 'extreme'
-                            color = '#ef4444'  # red
-                        elif ratio >= 5:
-                            category = 'high'
-                            color = '#f59e0b'  # amber
-                        else:
-                            category = 'elevated'
-                            color = '#22c55e'  # green
-                        
-                        spike_markers.append({
-                            'time': trade_date,
-                            'volume': volume,
-                            'median_20d': round(median_volume),
-                            'ratio': round(ratio, 2),
-                            'category': category,
-                            'color': color,
-                            'close': close,
-                            'price_change': round(price_change, 2),
-                            'position': 'aboveBar' if price_change >= 0 else 'belowBar',
-                            'shape': 'arrowUp' if price_change >= 0 else 'arrowDown',
-                            'text': f'{ratio:.1f}x'
-                        })
-            
-            return spike_markers
+        ticker = ticker.upper()
+        series = self.get_ohlcv_arrays(ticker)
+        if not len(series):
+            return []
+
+        # Reuse the computed series until new OHLCV arrives for this ticker
+        key = (ticker, int(series.days[-1]), lookback_days, min_ratio, min_price_change)
+        with self._spike_cache_lock:
+            cached = self._spike_cache.get(key)
+            if cached is not None:
+                self._spike_cache.move_to_end(key)
+        if cached is not None:
+            return [dict(marker) for marker in cached]
+
+        spike_markers = self._compute_spike_markers(series, lookback_days, min_ratio, min_price_change)
+
+        with self._spike_cache_lock:
+            self._spike_cache[key] = spike_markers
+            self._spike_cache.move_to_end(key)
+            while len(self._spike_cache) > self.SPIKE_CACHE_SIZE:
+                self._spike_cache.popitem(last=False)
+        return [dict(marker) for marker in spike_markers]
+
+    @staticmethod
+    def _compute_spike_markers(
+        series: OHLCVArrays,
+        lookback_days: int,
+        min_ratio: float,
+        min_price_change: float
+    ) -> List[Dict[str, Any]]:
+        """Vectorized spike detection over one ticker's columnar OHLCV series."""
+        if len(series) < lookback_days + 1:
+            return []  # Not enough data
+
+        volumes = series.volume
+        # Median of the previous N days; a full window (and at least 10 days) is required
+        medians, _ = _rolling_prev_median(
+            volumes, np.zeros(len(series), dtype=int), lookback_days, min_periods=max(lookback_days, 10)
+        )
+        closes = series.close
+        opens = series.open
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(medians > 0, volumes / medians, np.nan)
+            price_changes = np.where(opens > 0, (closes - opens) / opens * 100, 0.0)
+
+        # Filter: Must have BOTH significant volume AND price movement
+        hits = np.flatnonzero((ratios >= min_ratio) & (np.abs(price_changes) >= min_price_change))
+
+        spike_markers = []
+        dates = series.dates[hits] if len(hits) else []
+        for date_str, i in zip(dates, hits):
+            ratio = float(ratios[i])
+            price_change = float(price_changes[i])
+            # Determine category based on ratio
+            if ratio >= 8:
+                category = 'extreme'
+                color = '#ef4444'  # red
+            elif ratio >= 5:
+                category = 'high'
+                color = '#f59e0b'  # amber
+            else:
+                category = 'elevated'
+                color = '#22c55e'  # green
             
-        finally:
-            conn.close()
+            spike_markers.append({
+                'time': str(date_str),
+                'volume': int(volumes[i]),
+                'median_20d': round(float(medians[i])),
+                'ratio': round(ratio, 2),
+                'category': category,
+                'color': color,
+                'close': float(closes[i]),
+                'price_change': round(price_change, 2),
+                'position': 'aboveBar' if price_change >= 0 else 'belowBar',
+                'shape': 'arrowUp' if price_change >= 0 else 'arrowDown',
+                'text': f'{ratio:.1f}x'
+            })
+        
+        return spike_markers
     
     def detect_sideways_compression(
         self, 
@@ -496,82 +995,97 @@ class PriceVolumeRepository(BaseRepository):
                 "avg_close": float
             }
         """
-        conn = self._get_conn()
-        try:
-            cursor = conn.cursor()
-            
-            # Get recent OHLCV data
-            cursor.execute("""
-                SELECT trade_date, high, low, close
-                FROM price_volume
-                WHERE ticker = ?
-                ORDER BY trade_date DESC
-                LIMIT ?
-            """, (ticker.upper(), days + 5))  # Extra buffer
-            
-            rows = cursor.fetchall()
-            
-            if len(rows) < days:
-                return {
-                    "is_sideways": False,
-                    "compression_score": 0,
-                    "sideways_days": 0,
-                    "volatility_pct": 999.0,
-                    "price_range_pct": 999.0,
-                    "avg_close": 0
-                }
-            
-            # Use most recent 'days' records
-            rows = rows[:days]
-            
-            closes = [row[3] for row in rows]
-            highs = [row[1] for row in rows]
-            lows = [row[2] for row in rows]
-            
-            # Calculate Coefficient of Variation (CV)
-            import statistics
-            mean_close = statistics.mean(closes)
-            std_close = statistics.stdev(closes) if len(closes) > 1 else 0
+        # Most recent 'days' records from the cached series
+        series = self.get_ohlcv_arrays(ticker)
+        if len(series) < days:
+            return self._no_compression()
+        window = series.tail(days)
+        
+        # Calculate Coefficient of Variation (CV)
+        mean_close = float(window.close.mean())
+        std_close = float(window.close.std(ddof=1)) if days > 1 else 0
+        cv = (std_close / mean_close * 100) if mean_close > 0 else 999.0
+        
+        # Calculate price range percentage
+        overall_high = float(window.high.max())
+        overall_low = float(window.low.min())
+        price_range_pct = ((overall_high - overall_low) / mean_close * 100) if mean_close > 0 else 999.0
+        
+        return self._compression_result(cv, price_range_pct, mean_close, days)
+
+    @staticmethod
+    def _no_compression() -> Dict[str, Any]:
+        return {
+            "is_sideways": False,
+            "compression_score": 0,
+            "sideways_days": 0,
+            "volatility_pct": 999.0,
+            "price_range_pct": 999.0,
+            "avg_close": 0
+        }
+
+    @staticmethod
+    def _compression_result(cv: float, price_range_pct: float, mean_close: float, days: int) -> Dict[str, Any]:
+        """Map close-price CV (%) to the compression score payload."""
+        # Determine compression score based on CV
+        if cv < 2.0:  # Very tight compression (<2% variability)
+            score = 30
+            sideways_days = days
+            is_sideways = True
+        elif cv < 3.0:  # Tight compression (<3%)
+            score = 25
+            sideways_days = days
+            is_sideways = True
+        elif cv < 4.0:  # Moderate compression (<4%)
+            score = 20
+            sideways_days = max(days - 3, 5)
+            is_sideways = True
+        elif cv < 5.0:  # Loose compression (<5%)
+            score = 10
+            sideways_days = max(days - 5, 3)
+            is_sideways = True
+        else:
+            score = 0
+            sideways_days = 0
+            is_sideways = False
+        
+        return {
+            "is_sideways": is_sideways,
+            "compression_score": score,
+            "sideways_days": sideways_days,
+            "volatility_pct": round(cv, 2),
+            "price_range_pct": round(price_range_pct, 2),
+            "avg_close": round(mean_close, 2)
+        }
+
+    @staticmethod
+    def _compression_from_panel(panel: pd.DataFrame, tickers: List[str], days: int = 15) -> Dict[str, Dict[str, Any]]:
+        """
+        detect_sideways_compression for many tickers at once, from an OHLCV
+        panel sorted by (ticker, trade_date) that holds each ticker's recent rows.
+        """
+        result = {ticker: PriceVolumeRepository._no_compression() for ticker in tickers}
+        recent = panel[panel['ticker'].isin(tickers)].groupby('ticker', sort=False).tail(days)
+        if recent.empty:
+            return result
+
+        stats = recent.groupby('ticker').agg(
+            n=('close', 'size'),
+            mean_close=('close', 'mean'),
+            std_close=('close', 'std'),
+            high=('high', 'max'),
+            low=('low', 'min')
+        )
+        stats = stats[stats['n'] >= days]
+        for ticker, row in zip(stats.index, stats.itertuples(index=False)):
+            mean_close = float(row.mean_close)
+            std_close = float(row.std_close) if days > 1 else 0.0
             cv = (std_close / mean_close * 100) if mean_close > 0 else 999.0
-            
-            # Calculate price range percentage
-            overall_high = max(highs)
-            overall_low = min(lows)
-            price_range_pct = ((overall_high - overall_low) / mean_close * 100) if mean_close > 0 else 999.0
-            
-            # Determine compression score based on CV
-            if cv < 2.0:  # Very tight compression (<2% variability)
-                score = 30
-                sideways_days = days
-                is_sideways = True
-            elif cv < 3.0:  # Tight compression (<3%)
-                score = 25
-                sideways_days = days
-                is_sideways = True
-            elif cv < 4.0:  # Moderate compression (<4%)
-                score = 20
-                sideways_days = max(days - 3, 5)
-                is_sideways = True
-            elif cv < 5.0:  # Loose compression (<5%)
-                score = 10
-                sideways_days = max(days - 5, 3)
-                is_sideways = True
-            else:
-                score = 0
-                sideways_days = 0
-                is_sideways = False
-            
-            return {
-                "is_sideways": is_sideways,
-                "compression_score": score,
-                "sideways_days": sideways_days,
-                "volatility_pct": round(cv, 2),
-                "price_range_pct": round(price_range_pct, 2),
-                "avg_close": round(mean_close, 2)
-            }
-            
-        finally:
-            conn.close()
+            price_range_pct = ((row.high - row.low) / mean_close * 100) if mean_close > 0 else 999.0
+            result[ticker] = PriceVolumeRepository._compression_result(
+                cv, float(price_range_pct), mean_close, days
+            )
+        return result
     
     def calculate_flow_impact(
         self, 
@@ -600,79 +1114,75 @@ class PriceVolumeRepository(BaseRepository):
         """
         from db.market_metadata_repository import MarketMetadataRepository
         
-        conn = self._get_conn()
-        try:
-            cursor = conn.cursor()
-            
-            # Get volume and close for the date
-            cursor.execute("""
-                SELECT volume, close
-                FROM price_volume
-                WHERE ticker = ? AND trade_date = ?
-            """, (ticker.upper(), trade_date))
-            
-            row = cursor.fetchone()
-            
-            if not row:
-                return {
-                    "flow_impact_pct": 0,
-                    "value_traded": 0,
-                    "market_cap": 0,
-                    "flow_score": 0,
-                    "has_market_cap": False
-                }
-            
-            volume = row[0]
-            close = row[1]
-            value_traded = volume * close
-            
-            # Get market cap from market metadata
-            market_repo = MarketMetadataRepository()
-            mcap_data = market_repo.get_market_cap_history(ticker, days=1)
-            
-            if not mcap_data or mcap_data[0].get('market_cap', 0) <= 0:
-                # Try to get shares outstanding and calculate
-                shares = market_repo.get_shares_outstanding(ticker)
-                if shares and shares > 0:
-                    market_cap = shares * close
-                else:
-                    return {
-                        "flow_impact_pct": 0,
-                        "value_traded": value_traded,
-                        "market_cap": 0,
-                        "flow_score": 0,
-                        "has_market_cap": False
-                    }
-            else:
-                market_cap = mcap_data[0]['market_cap']
-            
-            # Calculate flow impact percentage
-            flow_impact_pct = (value_traded / market_cap * 100) if market_cap > 0 else 0
-            
-            # Determine score based on flow impact
-            if flow_impact_pct >= 5.0:  # Very high impact
-                score = 30
-            elif flow_impact_pct >= 3.0:  # High impact
-                score = 25
-            elif flow_impact_pct >= 2.0:  # Notable impact
-                score = 20
-            elif flow_impact_pct >= 1.0:  # Moderate impact
-                score = 15
-            elif flow_impact_pct >= 0.5:  # Low impact
-                score = 10
+        # Get volume and close for the date
+        series = self.get_ohlcv_arrays(ticker)
+        i = series.index_of(trade_date)
+        
+        if i is None:
+            return {
+                "flow_impact_pct": 0,
+                "value_traded": 0,
+                "market_cap": 0,
+                "flow_score": 0,
+                "has_market_cap": False
+            }
+        
+        volume = int(series.volume[i])
+        close = float(series.close[i])
+        value_traded = volume * close
+        
+        # Get market cap from market metadata (cache-only, never waits on yfinance)
+        market_repo = MarketMetadataRepository(self.db_path)
+        cached = market_repo.get_cached_market_data([ticker]).get(ticker.upper(), {})
+        market_cap = cached.get('market_cap')
+        
+        if not market_cap or market_cap <= 0:
+            # Try shares outstanding, then the (possibly stale) cached market cap;
+            # misses are renewed by the background refresher
+            shares = cached.get('shares_outstanding')
+            if shares and shares > 0:
+                market_cap = shares * close
             else:
-                score = 0
-            
+                market_cap = market_repo.get_market_caps([ticker]).get(ticker.upper())
+        
+        return self._flow_result(value_traded, market_cap)
+
+    @staticmethod
+    def _flow_result(value_traded: float, market_cap: Optional[float]) -> Dict[str, Any]:
+        """Flow impact payload for a day's traded value against market cap (None/0 = unknown)."""
+        if not market_cap or market_cap <= 0:
             return {
-                "flow_impact_pct": round(flow_impact_pct, 3),
-                "value_traded": round(value_traded),
-                "market_cap": round(market_cap),
-                "flow_score": score,
-                "has_market_cap": True
+                "flow_impact_pct": 0,
+                "value_traded": value_traded,
+                "market_cap": 0,
+                "flow_score": 0,
+                "has_market_cap": False
             }
-            
-        finally:
-            conn.close()
+
+        # Calculate flow impact percentage
+        flow_impact_pct = value_traded / market_cap * 100
+        
+        # Determine score based on flow impact
+        if flow_impact_pct >= 5.0:  # Very high impact
+            score = 30
+        elif flow_impact_pct >= 3.0:  # High impact
+            score = 25
+        elif flow_impact_pct >= 2.0:  # Notable impact
+            score = 20
+        elif flow_impact_pct >= 1.0:  # Moderate impact
+            score = 15
+        elif flow_impact_pct >= 0.5:  # Low impact
+            score = 10
+        else:
+            score = 0
+        
+        return {
+            "flow_impact_pct": round(flow_impact_pct, 3),
+            "value_traded": round(value_traded),
+            "market_cap": round(market_cap),
+            "flow_score": score,
+            "has_market_cap": True
+        }
     
     def calculate_anomaly_score(
         self,
@@ -711,6 +1221,21 @@ class PriceVolumeRepository(BaseRepository):
                 "flow_data": {...}
             }
         """
+        # 2. Compression Score (0-30)
+        compression_data = self.detect_sideways_compression(ticker, days=15)
+        
+        # 3. Flow Impact Score (0-30)
+        flow_data = self.calculate_flow_impact(ticker, trade_date)
+        
+        return self._combine_anomaly_score(volume_ratio, compression_data, flow_data)
+
+    @staticmethod
+    def _combine_anomaly_score(
+        volume_ratio: float,
+        compression_data: Dict[str, Any],
+        flow_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Combine volume ratio, compression and flow payloads into the anomaly score."""
         # 1. Volume Score (0-40)
         if volume_ratio >= 5.0:
             volume_score = 40
@@ -725,12 +1250,7 @@ class PriceVolumeRepository(BaseRepository):
         else:
             volume_score = 0
         
-        # 2. Compression Score (0-30)
-        compression_data = self.detect_sideways_compression(ticker, days=15)
         compression_score = compression_data.get("compression_score", 0)
-        
-        # 3. Flow Impact Score (0-30)
-        flow_data = self.calculate_flow_impact(ticker, trade_date)
         flow_score = flow_data.get("flow_score", 0)
         
         # Total Score
@@ -770,6 +1290,9 @@ class PriceVolumeRepository(BaseRepository):
         
         This is the main entry point for Alpha Hunter Stage 1 scanner.
         It detects unusual volumes AND calculates composite anomaly scores.
+        All events are scored in one pass: compression comes from the same
+        OHLCV panel the scan loaded and market caps from one bulk cache lookup,
+        so there are no per-event queries or network calls.
         
         Args:
             scan_days: Number of recent days to scan
@@ -780,26 +1303,34 @@ class PriceVolumeRepository(BaseRepository):
         Returns:
             List of scored anomaly events, sorted by total_score descending
         """
-        # First, get basic unusual volumes
-        unusual = self.detect_unusual_volumes(
-            scan_days=scan_days,
-            lookback_days=lookback_days,
-            min_ratio=min_ratio
+        from db.market_metadata_repository import MarketMetadataRepository
+
+        compression_days = 15
+
+        # One DB read: unusual events + the panel they were found in
+        unusual, panel = self._find_unusual_volumes(
+            scan_days, lookback_days, min_ratio, history_rows=compression_days + 5
         )
+        if not unusual:
+            return []
+
+        tickers = sorted({event['ticker'] for event in unusual})
+        compression = self._compression_from_panel(panel, tickers, days=compression_days)
+        # Cache-only market cap inputs: no per-event yfinance calls
+        market_data = MarketMetadataRepository(self.db_path).get_cached_market_data(tickers)
         
         scored_results = []
         
         for event in unusual:
             ticker = event['ticker']
-            trade_date = event['date']
-            volume_ratio = event['ratio']
-            
-            # Calculate full anomaly score
-            score_data = self.calculate_anomaly_score(
-                ticker=ticker,
-                trade_date=trade_date,
-                volume_ratio=volume_ratio
-            )
+            cached = market_data.get(ticker, {})
+            market_cap = cached.get('market_cap')
+            if not market_cap or market_cap <= 0:
+                shares = cached.get('shares_outstanding')
+                market_cap = shares * event['close'] if shares and shares > 0 else None
+            flow_data = self._flow_result(event['volume'] * event['close'], market_cap)
+
+            score_data = self._combine_anomaly_score(event['ratio'], compression[ticker], flow_data)
             
             if score_data['total_score'] >= min_score:
                 # Merge event data with score data
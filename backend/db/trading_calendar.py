@@ -0,0 +1,161 @@
+"""
+IDX trading calendar derived from the stored OHLCV history.
+
+Sessions are kept as a sorted int array of day numbers (see
+ohlcv_arrays.to_day_number), so offsets, counts and ranges are binary
+searches and coverage checks are array set operations. Outside the stored
+history the calendar falls back to plain weekdays.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .ohlcv_arrays import to_day_number
+from .price_volume_repository import PriceVolumeRepository, price_volume_repo
+
+
+def _as_dates(days) -> np.ndarray:
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]')
+
+
+def _to_days(dates: Iterable[str]) -> np.ndarray:
+    values = [d[:10] for d in dates if d]
+    return np.array(values, dtype='datetime64[D]').astype(np.int64)
+
+
+class TradingCalendar:
+    """
+    Sorted session days with O(log n) offset / count / range queries.
+
+    Every method takes and returns YYYY-MM-DD strings; dates before the first
+    or after the last known session are answered with weekdays.
+    """
+
+    def __init__(self, days: np.ndarray):
+        self.days = np.unique(np.asarray(days, dtype=np.int64))
+        self.days.flags.writeable = False
+
+    @classmethod
+    def from_dates(cls, dates: Iterable[str]) -> "TradingCalendar":
+        return cls(_to_days(dates))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    # ==================== RANK ARITHMETIC ====================
+
+    def _rank(self, day: int) -> int:
+        """Number of sessions before `day`, counted from the first known session."""
+        days = self.days
+        if not len(days):
+            return int(np.busday_count(_as_dates(0), _as_dates(day)))
+        first, last = int(days[0]), int(days[-1])
+        if day <= first:
+            return -int(np.busday_count(_as_dates(day), _as_dates(first)))
+        if day <= last + 1:
+            return int(np.searchsorted(days, day, 'left'))
+        return len(days) + int(np.busday_count(_as_dates(last + 1), _as_dates(day)))
+
+    def _days_at(self, ranks: np.ndarray) -> np.ndarray:
+        """Session days at the given ranks (inverse of _rank)."""
+        ranks = np.asarray(ranks, dtype=np.int64)
+        days = self.days
+        n = len(days)
+        if not n:
+            return np.busday_offset(_as_dates(0), ranks, roll='forward').astype(np.int64)
+        result = np.empty(len(ranks), dtype=np.int64)
+        inside = (ranks >= 0) & (ranks < n)
+        result[inside] = days[ranks[inside]]
+        before = ranks < 0
+        if before.any():
+            result[before] = np.busday_offset(_as_dates(days[0]), ranks[before], roll='forward').astype(np.int64)
+        after = ranks >= n
+        if after.any():
+            result[after] = np.busday_offset(_as_dates(days[-1] + 1), ranks[after] - n, roll='forward').astype(np.int64)
+        return result
+
+    # ==================== QUERIES ====================
+
+    def is_session(self, date: str) -> bool:
+        return self.count(date, date) == 1
+
+    def offset(self, date: str, sessions: int) -> str:
+        """
+        Session `sessions` trading days from `date` (negative goes back).
+
+        A non-session date first rolls back to the previous session, so
+        offset(date, 0) is the last session on or before `date`.
+        """
+        base = self._rank(to_day_number(date) + 1) - 1
+        return str(_as_dates(self._days_at(np.array([base + sessions]))[0]))
+
+    def count(self, start_date: str, end_date: str) -> int:
+        """Number of sessions in start_date..end_date (inclusive)."""
+        lo = self._rank(to_day_number(start_date))
+        hi = self._rank(to_day_number(end_date) + 1)
+        return max(0, hi - lo)
+
+    def session_days(self, start_date: str, end_date: str) -> np.ndarray:
+        """Session day numbers in start_date..end_date (inclusive)."""
+        lo = self._rank(to_day_number(start_date))
+        hi = self._rank(to_day_number(end_date) + 1)
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+        n = len(self.days)
+        if n and 0 <= lo and hi <= n:
+            return self.days[lo:hi]
+        return self._days_at(np.arange(lo, hi))
+
+    def sessions(self, start_date: str, end_date: str) -> List[str]:
+        """Session dates in start_date..end_date (inclusive)."""
+        return _as_dates(self.session_days(start_date, end_date)).astype(str).tolist()
+
+    def missing(self, available_dates: Iterable[str], start_date: str, end_date: str) -> List[str]:
+        """Sessions in start_date..end_date that are not in available_dates."""
+        expected = self.session_days(start_date, end_date)
+        gaps = np.setdiff1d(expected, _to_days(available_dates), assume_unique=False)
+        return _as_dates(gaps).astype(str).tolist()
+
+
+# ==================== SHARED CALENDARS ====================
+
+# Rebuild at least this often so writes from other processes are picked up
+MAX_AGE_SECONDS = 3600
+# ...and at most this often after OHLCV writes in this process. A refresh writes
+# ticker after ticker; between rebuilds the calendar is at most this stale, and
+# sessions after the last known one are answered as weekdays meanwhile.
+MIN_REBUILD_SECONDS = 60
+
+_calendars: Dict[str, tuple] = {}
+_repos: Dict[str, PriceVolumeRepository] = {}
+_calendars_lock = threading.Lock()
+
+
+def get_trading_calendar(db_path: Optional[str] = None) -> TradingCalendar:
+    """
+    Calendar of a database file (the default store when db_path is None).
+
+    Built once from price_volume and rebuilt after OHLCV writes in this
+    process (at most once per MIN_REBUILD_SECONDS) or when older than
+    MAX_AGE_SECONDS.
+    """
+    key = db_path or price_volume_repo.db_path
+    with _calendars_lock:
+        repo = _repos.get(key)
+        if repo is None:
+            repo = price_volume_repo if key == price_volume_repo.db_path else PriceVolumeRepository(key)
+            _repos[key] = repo
+        cached = _calendars.get(key)
+
+    version = repo.data_version()
+    if cached:
+        age = time.monotonic() - cached[1]
+        if age < MAX_AGE_SECONDS and (cached[0] == version or age < MIN_REBUILD_SECONDS):
+            return cached[2]
+
+    calendar = TradingCalendar.from_dates(repo.get_session_dates())
+    with _calendars_lock:
+        _calendars[key] = (version, time.monotonic(), calendar)
+    return calendar
@@ -2,22 +2,25 @@
 Alpha Hunter Smart Money Flow Analyzer.
 Provides validation logic for Stage 3: smart money vs retail flow and floor price safety.
 """
+from datetime import datetime
 from typing import Dict, List, Optional, Set
 import math
+import threading
+
+import numpy as np
+import pandas as pd
+
 from db.broker_five_repository import BrokerFiveRepository
+from db.price_volume_repository import PriceVolumeRepository
+from db.trading_calendar import get_trading_calendar
 from modules.database import DatabaseManager
-from modules.broker_utils import (
-    get_retail_brokers,
-    get_institutional_brokers,
-    get_foreign_brokers,
-    get_stage3_smart_money_overrides,
-    get_stage3_retail_overrides
-)
+from db.broker_registry import STAGE3_RETAIL_OVERRIDES, get_broker_registry, get_broker_registry_mtime
 
 
 class AlphaHunterFlow:
     def __init__(self):
         self.db = DatabaseManager()
+        self.price_repo = PriceVolumeRepository(self.db.db_path)
         
     def analyze_smart_money_flow(self, ticker: str, days: int = 7) -> Dict:
         """
@@ -119,9 +122,8 @@ class AlphaHunterFlow:
                 floor_price = floor_data.get('floor_price', 0)
                 result["floor_price_safe"]["floor_price"] = floor_price
 
-                vol_history = self.db.get_volume_history(ticker)
-                if vol_history:
-                    current_price = vol_history[-1].get('close_price', 0)
+                current_price = self.db.get_latest_close(ticker)
+                if current_price:
                     result["floor_price_safe"]["current_price"] = current_price
 
                     if floor_price > 0 and current_price > 0:
@@ -151,22 +153,16 @@ class AlphaHunterFlow:
         broker_five_repo = BrokerFiveRepository()
         broker_five_rows = broker_five_repo.list_brokers(ticker)
         broker_five = {item["broker_code"].upper() for item in broker_five_rows}
+        return self._build_broker_groups(broker_five)
 
-        smart_overrides = get_stage3_smart_money_overrides()
-        retail_overrides = get_stage3_retail_overrides()
-
-        smart_money = set(smart_overrides) | broker_five
-        retail = set(retail_overrides)
-
-        if not smart_money:
-            smart_money.update(get_institutional_brokers())
-            smart_money.update(get_foreign_brokers())
-        if not retail:
-            retail.update(get_retail_brokers())
-
-        # Overrides win in case of overlaps.
-        smart_money -= retail_overrides
-        retail -= smart_overrides
+    @staticmethod
+    def _build_broker_groups(broker_five: Set[str]) -> Dict[str, List[str]]:
+        """Smart money / retail groups given a ticker's broker 5% codes."""
+        registry = get_broker_registry()
+        # Stage 3 groups already have the overrides applied; broker 5% codes
+        # join smart money unless overridden as retail.
+        smart_money = set(registry.stage3_smart_money) | (broker_five - STAGE3_RETAIL_OVERRIDES)
+        retail = set(registry.stage3_retail)
 
         smart_money.discard("")
         retail.discard("")
@@ -184,103 +180,198 @@ class AlphaHunterFlow:
         smart_brokers: Set[str],
         retail_brokers: Set[str]
     ) -> Optional[Dict]:
-        """Aggregate net flow for broker groups across recent dates."""
-        available_dates = self.db.get_available_dates_for_ticker(ticker)
-        if not available_dates:
-            return None
+        """
+        Aggregate net flow for broker groups across recent dates.
 
-        dates_to_check = sorted(available_dates, reverse=True)[:min(days, len(available_dates))]
-        if not dates_to_check:
+        One grouped query yields net lot/value per (date, broker); the group
+        totals, per-day signs and per-broker totals are pandas groupbys on it.
+        """
+        flows = self.db.get_broker_net_flows(ticker, days)
+        if flows.empty:
             return None
+        flows = flows.assign(ticker=ticker.upper())
+        summaries = _group_flow_summaries(
+            flows, flows['broker'].isin(smart_brokers), flows['broker'].isin(retail_brokers)
+        )
+        return summaries.get(ticker.upper())
 
-        smart_net_lot = 0.0
-        smart_net_value = 0.0
-        retail_net_lot = 0.0
-        retail_net_value = 0.0
-        smart_days_buy = 0
-        retail_days_sell = 0
-        days_checked = 0
-        smart_broker_net = {}
-
-        for date in dates_to_check:
-            summary = self.db.get_broker_summary(ticker, date)
-            if not summary:
-                continue
-
-            net_by_broker = {}
-            for item in summary.get('buy', []):
-                broker = (item.get('broker') or '').upper()
-                lot = float(item.get('nlot', 0) or 0)
-                value = float(item.get('nval', 0) or 0)
-                net_by_broker.setdefault(broker, {"net_lot": 0.0, "net_value": 0.0})
-                net_by_broker[broker]["net_lot"] += lot
-                net_by_broker[broker]["net_value"] += value
-
-            for item in summary.get('sell', []):
-                broker = (item.get('broker') or '').upper()
-                lot = float(item.get('nlot', 0) or 0)
-                value = float(item.get('nval', 0) or 0)
-                net_by_broker.setdefault(broker, {"net_lot": 0.0, "net_value": 0.0})
-                net_by_broker[broker]["net_lot"] -= lot
-                net_by_broker[broker]["net_value"] -= value
-
-            if not net_by_broker:
-                continue
-
-            days_checked += 1
-            smart_day_lot = 0.0
-            smart_day_value = 0.0
-            retail_day_lot = 0.0
-            retail_day_value = 0.0
-
-            for broker, net in net_by_broker.items():
-                if broker in smart_brokers:
-                    smart_day_lot += net["net_lot"]
-                    smart_day_value += net["net_value"]
-                    smart_broker_net.setdefault(broker, {"net_lot": 0.0, "net_value": 0.0})
-                    smart_broker_net[broker]["net_lot"] += net["net_lot"]
-                    smart_broker_net[broker]["net_value"] += net["net_value"]
-                if broker in retail_brokers:
-                    retail_day_lot += net["net_lot"]
-                    retail_day_value += net["net_value"]
-
-            smart_net_lot += smart_day_lot
-            smart_net_value += smart_day_value
-            retail_net_lot += retail_day_lot
-            retail_net_value += retail_day_value
-
-            if smart_day_lot > 0:
-                smart_days_buy += 1
-            if retail_day_lot < 0:
-                retail_days_sell += 1
-
-        if days_checked == 0:
-            return None
+    # ==================== MARKET SCREENER ====================
 
-        denom = abs(smart_net_value) + abs(retail_net_value)
-        dominance_pct = round((abs(smart_net_value) / denom) * 100, 1) if denom > 0 else 0
-        consistency_threshold = max(1, math.ceil(days_checked * 0.5))
-
-        top_brokers = [
-            {
-                "code": broker,
-                "net_lot": int(net["net_lot"]),
-                "net_value": round(net["net_value"], 2)
-            }
-            for broker, net in smart_broker_net.items()
-            if net["net_lot"] > 0
+    def screen_market(self, days: int = 7) -> Dict:
+        """
+        Evaluate the four Stage 3 checks for every ticker with broker summaries.
+
+        Uses one windowed net-flow query over neobdm_broker_summaries, one
+        grouped floor-price query and one latest-close query; broker groups
+        are resolved per ticker (broker 5% codes) as boolean masks. Results
+        are cached per trading day and invalidated when broker summaries,
+        OHLCV bars, broker 5% codes or brokers_idx.json change.
+
+        Returns:
+            {"trading_date", "days", "results": [row per ticker]}
+        """
+        trading_date = get_trading_calendar(self.db.db_path).offset(datetime.now().strftime('%Y-%m-%d'), 0)
+        key = (
+            self.db.db_path, days, trading_date,
+            self.db.get_broker_summary_version(),
+            self.price_repo.data_version(),
+            BrokerFiveRepository(self.db.db_path).get_version(),
+            get_broker_registry_mtime()
+        )
+        with _screen_cache_lock:
+            cached = _screen_cache.get(key)
+        if cached is not None:
+            return cached
+
+        flows = self.db.get_market_broker_net_flows(days)
+        summaries = {}
+        if not flows.empty:
+            flows['ticker'] = flows['ticker'].str.upper()
+            is_smart, is_retail = self._market_group_masks(flows)
+            summaries = _group_flow_summaries(flows, is_smart, is_retail)
+
+        floor_prices = self.db.get_market_floor_prices(days if days > 0 else 0)
+        closes = self.db.get_latest_closes()
+        results = [
+            _screen_row(ticker, summaries.get(ticker), floor_prices.get(ticker, 0), closes.get(ticker, 0))
+            for ticker in sorted(set(summaries) | set(floor_prices))
         ]
-        top_brokers.sort(key=lambda x: x["net_lot"], reverse=True)
 
-        return {
-            "smart_net_lot": int(smart_net_lot),
+        screen = {"trading_date": trading_date, "days": days, "results": results}
+        with _screen_cache_lock:
+            # One screen per (days) is enough: older trading days are never asked again
+            for stale in [k for k in _screen_cache if k[:2] == key[:2]]:
+                del _screen_cache[stale]
+            _screen_cache[key] = screen
+        return screen
+
+    def _market_group_masks(self, flows: pd.DataFrame):
+        """Smart money / retail membership of every (ticker, broker) flow row."""
+        base = self._build_broker_groups(set())
+        is_smart = flows['broker'].isin(base["smart_money"]).to_numpy()
+        is_retail = flows['broker'].isin(base["retail"]).to_numpy()
+
+        five_by_ticker = BrokerFiveRepository().get_codes_by_ticker()
+        custom = {ticker: self._build_broker_groups(set(codes)) for ticker, codes in five_by_ticker.items()}
+        if custom:
+            pairs = pd.MultiIndex.from_frame(flows[['ticker', 'broker']])
+            smart_pairs = pd.MultiIndex.from_tuples(
+                [(t, b) for t, g in custom.items() for b in g["smart_money"]], names=['ticker', 'broker']
+            )
+            retail_pairs = pd.MultiIndex.from_tuples(
+                [(t, b) for t, g in custom.items() for b in g["retail"]], names=['ticker', 'broker']
+            )
+            has_custom = flows['ticker'].isin(custom).to_numpy()
+            is_smart = np.where(has_custom, pairs.isin(smart_pairs), is_smart)
+            is_retail = np.where(has_custom, pairs.isin(retail_pairs), is_retail)
+        return pd.Series(is_smart, index=flows.index), pd.Series(is_retail, index=flows.index)
+
+
+# Market screens keyed by (db_path, days, trading_date, summary version)
+_screen_cache: Dict[tuple, Dict] = {}
+_screen_cache_lock = threading.Lock()
+
+
+def _group_flow_summaries(flows: pd.DataFrame, is_smart: pd.Series, is_retail: pd.Series) -> Dict[str, Dict]:
+    """
+    Stage 3 group metrics per ticker from net flows per (ticker, trade_date, broker).
+
+    Returns:
+        {ticker: flow summary} in the _aggregate_group_flow format
+    """
+    keys = ['ticker', 'trade_date']
+    days_checked = flows.groupby('ticker')['trade_date'].nunique()
+    smart_daily = flows[is_smart].groupby(keys)[['net_lot', 'net_value']].sum()
+    retail_daily = flows[is_retail].groupby(keys)[['net_lot', 'net_value']].sum()
+
+    table = pd.DataFrame({
+        "days_checked": days_checked,
+        "smart_net_lot": smart_daily['net_lot'].groupby(level='ticker').sum(),
+        "smart_net_value": smart_daily['net_value'].groupby(level='ticker').sum(),
+        "retail_net_lot": retail_daily['net_lot'].groupby(level='ticker').sum(),
+        "retail_net_value": retail_daily['net_value'].groupby(level='ticker').sum(),
+        "smart_days_buy": (smart_daily['net_lot'] > 0).groupby(level='ticker').sum(),
+        "retail_days_sell": (retail_daily['net_lot'] < 0).groupby(level='ticker').sum(),
+    }, index=days_checked.index).fillna(0)
+
+    smart_broker_net = flows[is_smart].groupby(['ticker', 'broker'])[['net_lot', 'net_value']].sum().reset_index()
+    accumulating = smart_broker_net[smart_broker_net['net_lot'] > 0]
+    accumulating = accumulating.sort_values(['ticker', 'net_lot'], ascending=[True, False], kind='stable')
+    top_by_ticker = {
+        ticker: [
+            {"code": row.broker, "net_lot": int(row.net_lot), "net_value": round(float(row.net_value), 2)}
+            for row in group.head(5).itertuples(index=False)
+        ]
+        for ticker, group in accumulating.groupby('ticker', sort=False)
+    }
+
+    summaries = {}
+    for row in table.itertuples():
+        smart_net_value = float(row.smart_net_value)
+        retail_net_value = float(row.retail_net_value)
+        denom = abs(smart_net_value) + abs(retail_net_value)
+        summaries[row.Index] = {
+            "smart_net_lot": int(row.smart_net_lot),
             "smart_net_value": round(smart_net_value, 2),
-            "retail_net_lot": int(retail_net_lot),
+            "retail_net_lot": int(row.retail_net_lot),
             "retail_net_value": round(retail_net_value, 2),
-            "smart_days_buy": smart_days_buy,
-            "retail_days_sell": retail_days_sell,
-            "days_checked": days_checked,
-            "dominance_pct": dominance_pct,
-            "consistency_threshold": consistency_threshold,
-            "smart_top_brokers": top_brokers[:5]
+            "smart_days_buy": int(row.smart_days_buy),
+            "retail_days_sell": int(row.retail_days_sell),
+            "days_checked": int(row.days_checked),
+            "dominance_pct": round((abs(smart_net_value) / denom) * 100, 1) if denom > 0 else 0,
+            "consistency_threshold": max(1, math.ceil(row.days_checked * 0.5)),
+            "smart_top_brokers": top_by_ticker.get(row.Index, [])
         }
+    return summaries
+
+
+def _screen_row(ticker: str, flow_summary: Optional[Dict], floor_price: float, current_price: float) -> Dict:
+    """One screener row: the analyze_smart_money_flow checks, flattened."""
+    flow_summary = flow_summary or {}
+    smart_net_lot = flow_summary.get("smart_net_lot", 0)
+    retail_net_lot = flow_summary.get("retail_net_lot", 0)
+    threshold = flow_summary.get("consistency_threshold", 1)
+    smart_pass = bool(flow_summary) and smart_net_lot > 0 and flow_summary["smart_days_buy"] >= threshold
+    retail_pass = bool(flow_summary) and retail_net_lot < 0 and flow_summary["retail_days_sell"] >= threshold
+    dominance_pass = (
+        flow_summary.get("dominance_pct", 0) >= 60
+        and smart_net_lot > 0
+        and retail_net_lot < 0
+    )
+
+    gap_pct = 0
+    floor_pass = False
+    if floor_price > 0 and current_price and current_price > 0:
+        gap_pct = round(((current_price - floor_price) / floor_price) * 100, 2)
+        floor_pass = gap_pct <= 10
+
+    checks_passed = sum([smart_pass, retail_pass, dominance_pass, floor_pass])
+    if checks_passed >= 4:
+        conviction = "HIGH"
+    elif checks_passed >= 3:
+        conviction = "MEDIUM"
+    else:
+        conviction = "LOW"
+
+    return {
+        "ticker": ticker,
+        "checks_passed": checks_passed,
+        "total_checks": 4,
+        "overall_conviction": conviction,
+        "smart_money_accumulation": smart_pass,
+        "retail_capitulation": retail_pass,
+        "smart_vs_retail": dominance_pass,
+        "floor_price_safe": floor_pass,
+        "smart_net_lot": smart_net_lot,
+        "smart_net_value": flow_summary.get("smart_net_value", 0),
+        "smart_active_days": flow_summary.get("smart_days_buy", 0),
+        "retail_net_lot": retail_net_lot,
+        "retail_net_value": flow_summary.get("retail_net_value", 0),
+        "retail_active_days": flow_summary.get("retail_days_sell", 0),
+        "total_days": flow_summary.get("days_checked", 0),
+        "dominance_pct": flow_summary.get("dominance_pct", 0),
+        "floor_price": floor_price,
+        "current_price": current_price or 0,
+        "gap_pct": gap_pct,
+        "top_brokers": flow_summary.get("smart_top_brokers", [])
+    }
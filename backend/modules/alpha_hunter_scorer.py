@@ -2,10 +2,11 @@
 Alpha Hunter Scoring Engine.
 Responsible for detecting volume anomalies (Tukang Parkir) and calculating conviction scores.
 """
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from db.ohlcv_arrays import OHLCVArrays, from_day_number
+from db.price_volume_repository import price_volume_repo
 from modules.database import DatabaseManager
 
 class AlphaHunterScorer:
@@ -16,16 +17,34 @@ class AlphaHunterScorer:
         """
         Scan market for anomaly signals.
         Returns list of scored tickers.
+
+        Sector / market cap filters run first against the cached metadata
+        table. The OHLCV window, latest NeoBDM flows and market caps for the
+        remaining tickers are then loaded in a few bulk queries, so scoring
+        itself does no per-ticker I/O.
         """
         # 1. Get list of tickers to scan
         #Ideally we want all tickers, but for performance maybe stick to NeoBDM tickers first
         tickers = self.db.get_neobdm_tickers()
+        if sector or mcap_min is not None:
+            tickers = self.db.filter_symbols(tickers, sector=sector, mcap_min=mcap_min)
+        if not tickers:
+            return []
+
+        # 2. Shared preload (scoring window only; the shared series cache is left alone)
+        start_date, end_date = self._volume_window()
+        series_by_ticker = price_volume_repo.load_ohlcv_window(tickers, start_date, end_date)
+        latest_flows = self.db.get_latest_flows()
+        mcaps = self.db.get_market_caps([t for t in tickers if t in latest_flows])
         
         results = []
         for ticker in tickers:
-            # Skip if filtered by sector/mcap (TODO: implement filters)
-            
-            score_data = self.calculate_score(ticker)
+            score_data = self._score(
+                ticker,
+                series_by_ticker.get(ticker),
+                latest_flows.get(ticker),
+                mcaps.get(ticker)
+            )
             if score_data['total_score'] >= min_score:
                 results.append(score_data)
                 
@@ -33,47 +52,76 @@ class AlphaHunterScorer:
         results.sort(key=lambda x: x['total_score'], reverse=True)
         return results
 
+    @staticmethod
+    def _volume_window():
+        # Last ~25 trading days
+        now = datetime.now()
+        return (now - timedelta(days=40)).strftime('%Y-%m-%d'), now.strftime('%Y-%m-%d')
+
     def calculate_score(self, ticker: str) -> Dict:
         """
         Calculate Alpha Hunter score (0-100) for a single ticker.
         """
+        series = None
+        try:
+            # Recent volume history as columnar views of the cached series
+            start_date, end_date = self._volume_window()
+            series = price_volume_repo.get_ohlcv_arrays(ticker, start_date, end_date)
+        except Exception as e:
+            print(f"[!] Error getting volume history for {ticker}: {e}")
+
+        flow_d0 = None
+        mcap = None
+        try:
+            # Check latest history record
+            history = self.db.get_neobdm_history(ticker, limit=1)
+            if history:
+                flow_d0 = history[0].get('flow_d0', 0)
+                # Cached market cap only: scans must not wait on yfinance
+                mcap = self.db.get_market_caps([ticker]).get(ticker.upper())
+        except Exception as e:
+            print(f"Error calcing flow impact for {ticker}: {e}")
+
+        return self._score(ticker, series, flow_d0, mcap)
+
+    def _score(
+        self,
+        ticker: str,
+        series: Optional[OHLCVArrays],
+        flow_d0: Optional[float],
+        mcap: Optional[float]
+    ) -> Dict:
+        """
+        Score one ticker from already loaded inputs.
+
+        Args:
+            series: OHLCV of the last ~40 calendar days (None if unavailable)
+            flow_d0: Latest NeoBDM daily flow (None if no NeoBDM record)
+            mcap: Cached market cap in IDR (None if unknown)
+        """
         score = 0
         breakdown = {}
         
         # --- 1. Volume Anomaly (40 pts) ---
-        # Get recent volume history (last 30 days)
-        vol_history = []
         vol_score = 0
         vol_ratio = 1.0
         spike_date = None
+        volumes = closes = dates = None
         
-        try:
-            # Calculate date range for last 25 trading days
-            from datetime import datetime, timedelta
-            end_date = datetime.now().strftime('%Y-%m-%d')
-            start_date = (datetime.now() - timedelta(days=40)).strftime('%Y-%m-%d')  # ~25 trading days
-            
-            vol_history = self.db.get_volume_history(ticker, start_date=start_date, end_date=end_date) or []
-        except Exception as e:
-            print(f"[!] Error getting volume history for {ticker}: {e}")
-            vol_history = []
+        if series is not None:
+            traded = series.volume > 0  # holidays carry zero volume
+            volumes = series.volume[traded]
+            closes = series.close[traded]
+            dates = series.days[traded]
         
-        if vol_history and len(vol_history) >= 21:
-            # Sort by date asc
-            df = pd.DataFrame(vol_history)
-            df['trade_date'] = pd.to_datetime(df['trade_date'])
-            df = df.sort_values('trade_date')
-            
+        if volumes is not None and len(volumes) >= 21:
             # Check last 3 days for spike
             # Compare with 20-day avg BEFORE the spike candidate
-            
-            last_day = df.iloc[-1]
-            prev_20 = df.iloc[-21:-1]
-            avg_vol_20 = prev_20['volume'].mean()
+            avg_vol_20 = volumes[-21:-1].mean()
             
             if avg_vol_20 > 0:
-                current_vol = last_day['volume']
-                vol_ratio = current_vol / avg_vol_20
+                current_vol = volumes[-1]
+                vol_ratio = float(current_vol / avg_vol_20)
                 
                 if vol_ratio >= 3.0:
                     vol_score = 40
@@ -83,7 +131,7 @@ class AlphaHunterScorer:
                     vol_score = 15
                 
                 if vol_score > 0:
-                    spike_date = last_day['trade_date'].strftime('%Y-%m-%d')
+                    spike_date = from_day_number(dates[-1])
             
         score += vol_score
         breakdown['volume_score'] = vol_score
@@ -96,17 +144,12 @@ class AlphaHunterScorer:
         is_sideways = False
         sideways_days = 0
         
-        if spike_date and vol_history and len(vol_history) >= 21:
+        if spike_date:
             try:
-                df = pd.DataFrame(vol_history)
-                df['trade_date'] = pd.to_datetime(df['trade_date'])
-                df = df.sort_values('trade_date')
-                
-                # Calculate ATR or simple High-Low range pct
-                # Using close price std dev for simplicity if OHLC not fully avail
-                prices = df.iloc[-21:-1]['close_price'].dropna()
-                if not prices.empty and len(prices) > 1:
-                    std_dev = prices.std()
+                # Using close price std dev for simplicity
+                prices = closes[-21:-1]
+                if len(prices) > 1:
+                    std_dev = prices.std(ddof=1)
                     mean_price = prices.mean()
                     cv = std_dev / mean_price if mean_price > 0 else 1.0 # Coefficient of Variation
                     
@@ -131,33 +174,19 @@ class AlphaHunterScorer:
         flow_score = 0
         flow_impact = 0.0
         
-        try:
-            # Check latest history record
-            history = self.db.get_neobdm_history(ticker, limit=1)
-            if history:
-                latest = history[0]
-                # Calculate impact if not present (need market cap)
-                flow_d0 = latest.get('flow_d0', 0)
-                
-                from data_provider import data_provider
-                mcap = data_provider.get_market_cap(ticker)
-                
-                if mcap and mcap > 0:
-                    flow_impact = (flow_d0 / mcap) * 100
-                    
-                    if abs(flow_impact) >= 0.3:
-                         flow_score = 30
-                    elif abs(flow_impact) >= 0.1:
-                         flow_score = 20
-                    elif abs(flow_impact) >= 0.05:
-                         flow_score = 10
-                         
-                    # Bonus: Must be positive flow for max score
-                    if flow_impact < 0:
-                        flow_score = flow_score // 2 # Penalty for big outflow
-                        
-        except Exception as e:
-            print(f"Error calcing flow impact for {ticker}: {e}")
+        if flow_d0 is not None and mcap and mcap > 0:
+            flow_impact = (flow_d0 / mcap) * 100
+            
+            if abs(flow_impact) >= 0.3:
+                 flow_score = 30
+            elif abs(flow_impact) >= 0.1:
+                 flow_score = 20
+            elif abs(flow_impact) >= 0.05:
+                 flow_score = 10
+                 
+            # Bonus: Must be positive flow for max score
+            if flow_impact < 0:
+                flow_score = flow_score // 2 # Penalty for big outflow
             
         score += flow_score
         breakdown['flow_score'] = flow_score
@@ -3,15 +3,15 @@ Alpha Hunter Supply Analyzer.
 Provides analysis for Stage 4: retail inventory (50% rule), imposter detection,
 one-click hunter, and entry zone recommendations.
 """
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional
 import math
+
+import numpy as np
+import pandas as pd
+
 from db import DoneDetailRepository
+from db.broker_registry import get_broker_registry
 from modules.database import DatabaseManager
-from modules.broker_utils import (
-    get_retail_brokers,
-    get_mixed_brokers,
-    classify_broker
-)
 
 
 class AlphaHunterSupply:
@@ -80,12 +80,13 @@ class AlphaHunterSupply:
         # Try to get data from DB if not provided
         if not done_detail_data:
             try:
-                date_range = repo.get_date_range(ticker)
+                date_range = repo.get_synthesized_date_range(ticker)
                 range_start = analysis_start_date or date_range.get("min_date")
                 range_end = analysis_end_date or date_range.get("max_date")
 
                 if range_start and range_end:
-                    range_analysis = repo.get_range_analysis_from_synthesis(
+                    # Per-day aggregates only: cost is bounded by days x brokers
+                    range_analysis = repo.get_range_analysis_from_aggregates(
                         ticker,
                         range_start,
                         range_end
@@ -95,72 +96,49 @@ class AlphaHunterSupply:
                         result["fifty_pct_rule"]["source"] = "range"
                         result["imposter_detection"]["source"] = "range"
 
-                latest_date = date_range.get("max_date") or (date_range.get("dates") or [None])[0]
+                latest_date = repo.get_latest_record_date(ticker)
                 if latest_date:
-                    records_df = repo.get_records(ticker, latest_date)
-                    done_detail_data = self._normalize_trades(records_df.to_dict("records"))
+                    trades = self._trades_frame(repo.get_records(ticker, latest_date))
+                else:
+                    trades = self._trades_frame([])
             except Exception as e:
                 print(f"[!] Could not fetch from DB: {e}")
+                trades = self._trades_frame([])
         else:
-            done_detail_data = self._normalize_trades(done_detail_data)
+            trades = self._trades_frame(done_detail_data)
         
-        if not done_detail_data and not (range_analysis and not range_analysis.get("error")):
+        has_range = bool(range_analysis and not range_analysis.get("error"))
+        if trades.empty and not has_range:
             return result
 
-        done_detail_data = done_detail_data or []
-        if done_detail_data:
-            result["data_available"] = True
-            result["total_trades"] = len(done_detail_data)
-        elif range_analysis and not range_analysis.get("error"):
-            result["data_available"] = True
-        
-        # Analyze trades
-        broker_buy = {}  # broker -> {lot, value}
-        broker_sell = {}
-        large_orders = []
+        result["data_available"] = True
+        result["total_trades"] = len(trades)
         
-        for trade in done_detail_data:
-            buyer = trade.get('buyer', '')
-            seller = trade.get('seller', '')
-            lot = int(trade.get('lot', 0) or 0)
-            price = float(trade.get('price', 0) or 0)
-            time_str = trade.get('time', '')
-            value = lot * price * 100  # value in IDR
-            
-            # Aggregate buyer
-            if buyer:
-                if buyer not in broker_buy:
-                    broker_buy[buyer] = {"lot": 0, "value": 0}
-                broker_buy[buyer]["lot"] += lot
-                broker_buy[buyer]["value"] += value
-            
-            # Aggregate seller
-            if seller:
-                if seller not in broker_sell:
-                    broker_sell[seller] = {"lot": 0, "value": 0}
-                broker_sell[seller]["lot"] += lot
-                broker_sell[seller]["value"] += value
-            
-            # Detect large orders (One-Click Hunter)
-            if lot >= 100:  # Threshold: 100 lot = significant
-                large_orders.append({
-                    "buyer": buyer,
-                    "seller": seller,
-                    "lot": lot,
-                    "price": price,
-                    "time": time_str,
-                    "type": "ONE_CLICK" if lot >= 500 else "LARGE"
-                })
+        # Single columnar pass over the latest day
+        buy_lots = trades.loc[trades["buyer"] != "", ["buyer", "lot"]].groupby("buyer")["lot"].sum()
+        sell_lots = trades.loc[trades["seller"] != "", ["seller", "lot"]].groupby("seller")["lot"].sum()
         
-        # Sort large orders by lot
-        large_orders.sort(key=lambda x: x["lot"], reverse=True)
-        result["one_click_orders"] = large_orders[:20]  # Top 20
+        large = trades[trades["lot"] >= 100].sort_values("lot", ascending=False, kind="stable").head(20)
+        result["one_click_orders"] = [
+            {
+                "buyer": buyer,
+                "seller": seller,
+                "lot": lot,
+                "price": price,
+                "time": time_str,
+                "type": "ONE_CLICK" if lot >= 500 else "LARGE"
+            }
+            for buyer, seller, lot, price, time_str in zip(
+                large["buyer"].tolist(), large["seller"].tolist(), large["lot"].tolist(),
+                large["price"].tolist(), large["time"].tolist()
+            )
+        ]
         
         # Calculate net positions by category
-        result["broker_positions"] = self._calculate_positions(broker_buy, broker_sell)
+        result["broker_positions"] = self._calculate_positions(buy_lots, sell_lots)
         
         # Range-based inventory + imposter detection (preferred)
-        if range_analysis and not range_analysis.get("error"):
+        if has_range:
             result["fifty_pct_rule"] = self._build_fifty_rule_from_range(range_analysis)
             result["imposter_detection"] = self._build_imposter_from_range(range_analysis)
             result["analysis_range"] = {
@@ -168,95 +146,80 @@ class AlphaHunterSupply:
                 "end": range_analysis.get("date_range", {}).get("end")
             }
         else:
-            result["fifty_pct_rule"] = self._check_fifty_rule_single_day(broker_buy, broker_sell)
-            result["imposter_detection"] = self._detect_imposter_from_trades(done_detail_data)
+            result["fifty_pct_rule"] = self._check_fifty_rule_single_day(buy_lots, sell_lots)
+            result["imposter_detection"] = self._detect_imposter_from_trades(trades)
         
         # Calculate entry recommendation
-        if done_detail_data:
-            prices = [float(t.get('price', 0) or 0) for t in done_detail_data if t.get('price')]
-            if prices:
-                avg_price = sum(prices) / len(prices)
-                min_price = min(prices)
-                max_price = max(prices)
-                
-                result["entry_recommendation"] = {
-                    "zone_low": round(min_price, 0),
-                    "zone_high": round(avg_price, 0),
-                    "stop_loss": round(min_price * 0.95, 0),  # 5% below min
-                    "strategy": self._get_strategy(result)
-                }
+        prices = trades["price"][trades["price"] != 0]
+        if not prices.empty:
+            min_price = float(prices.min())
+            
+            result["entry_recommendation"] = {
+                "zone_low": round(min_price, 0),
+                "zone_high": round(float(prices.mean()), 0),
+                "stop_loss": round(min_price * 0.95, 0),  # 5% below min
+                "strategy": self._get_strategy(result)
+            }
         
         return result
     
-    def _normalize_trades(self, trades: List[Dict]) -> List[Dict]:
-        """Normalize trade fields from DB or pasted TSV into a common schema."""
-        normalized = []
-        for trade in trades or []:
-            buyer = trade.get('buyer')
-            seller = trade.get('seller')
-            if buyer is None:
-                buyer = trade.get('buyer_code', '')
-            if seller is None:
-                seller = trade.get('seller_code', '')
+    @staticmethod
+    def _trades_frame(trades) -> pd.DataFrame:
+        """
+        Normalize trades from DB (DataFrame) or pasted TSV (list of dicts) into
+        columns time/price/lot/buyer/seller.
+        """
+        frame = trades if isinstance(trades, pd.DataFrame) else pd.DataFrame(list(trades or []))
 
-            lot = trade.get('lot')
-            if lot is None:
-                lot = trade.get('qty', 0)
+        def column(*names, default=None):
+            for name in names:
+                if name in frame.columns:
+                    return frame[name]
+            return pd.Series(default, index=frame.index, dtype=object)
 
-            time_str = trade.get('time')
-            if time_str is None:
-                time_str = trade.get('trade_time', '')
+        def codes(*names):
+            return column(*names, default="").fillna("").astype(str).str.strip()
 
-            normalized.append({
-                "time": time_str or "",
-                "price": float(trade.get('price', 0) or 0),
-                "lot": int(lot or 0),
-                "buyer": str(buyer or "").strip(),
-                "seller": str(seller or "").strip()
-            })
-        return normalized
+        return pd.DataFrame({
+            "time": column("time", "trade_time", default="").fillna("").astype(str),
+            "price": pd.to_numeric(column("price", default=0), errors="coerce").fillna(0.0).astype(float),
+            "lot": pd.to_numeric(column("lot", "qty", default=0), errors="coerce").fillna(0).astype(np.int64),
+            "buyer": codes("buyer", "buyer_code"),
+            "seller": codes("seller", "seller_code")
+        })
 
-    def _calculate_positions(self, broker_buy: Dict, broker_sell: Dict) -> Dict:
-        """Calculate net positions grouped by broker type."""
+    def _calculate_positions(self, buy_lots: pd.Series, sell_lots: pd.Series) -> Dict:
+        """Calculate net positions grouped by broker type (buy/sell lots indexed by broker)."""
         positions = {
             "institutional": [],
             "retail": [],
             "foreign": []
         }
         
-        # Get all brokers
-        all_brokers = set(broker_buy.keys()) | set(broker_sell.keys())
+        flows = pd.DataFrame({"buy_lot": buy_lots, "sell_lot": sell_lots}).fillna(0).astype(np.int64)
+        if flows.empty:
+            return positions
+        flows["net_lot"] = flows["buy_lot"] - flows["sell_lot"]
+        flows = flows.sort_values("net_lot", ascending=False, kind="stable")
         
-        for broker in all_brokers:
-            buy_lot = broker_buy.get(broker, {}).get("lot", 0)
-            sell_lot = broker_sell.get(broker, {}).get("lot", 0)
-            net_lot = buy_lot - sell_lot
-            
-            entry = {
-                "broker": broker,
-                "buy_lot": buy_lot,
-                "sell_lot": sell_lot,
-                "net_lot": net_lot
-            }
-            
-            # Use centralized broker classification
-            broker_type = classify_broker(broker)
-            
-            if broker_type == "foreign":
-                positions["foreign"].append(entry)
-            elif broker_type == "institutional":
-                positions["institutional"].append(entry)
-            else:
-                positions["retail"].append(entry)
+        # Use centralized broker classification (mixed/unknown count as retail)
+        registry = get_broker_registry()
+        category = flows.index.map(
+            lambda b: {"foreign": "foreign", "institutional": "institutional"}.get(registry.classify(b), "retail")
+        )
         
-        # Sort each category by net_lot
-        for category in positions:
-            positions[category].sort(key=lambda x: x["net_lot"], reverse=True)
-            positions[category] = positions[category][:10]  # Top 10
+        for name in positions:
+            top = flows[category == name].head(10)  # Top 10
+            positions[name] = [
+                {"broker": broker, "buy_lot": buy, "sell_lot": sell, "net_lot": net}
+                for broker, buy, sell, net in zip(
+                    top.index.tolist(), top["buy_lot"].tolist(), top["sell_lot"].tolist(), top["net_lot"].tolist()
+                )
+            ]
         
         return positions
     
-    def _check_fifty_rule_single_day(self, broker_buy: Dict, broker_sell: Dict) -> Dict:
+    def _check_fifty_rule_single_day(self, buy_lots: pd.Series, sell_lots: pd.Series) -> Dict:
         """
         Check 50% Rule: Retail should have sold at least 50% of their holdings.
         """
@@ -276,9 +239,9 @@ class AlphaHunterSupply:
         }
         
         # Calculate retail buy and sell using centralized classification
-        retail_brokers = get_retail_brokers()
-        retail_buy = sum(broker_buy.get(b, {}).get("lot", 0) for b in retail_brokers if b in broker_buy)
-        retail_sell = sum(broker_sell.get(b, {}).get("lot", 0) for b in retail_brokers if b in broker_sell)
+        retail_brokers = get_broker_registry().retail
+        retail_buy = int(buy_lots[buy_lots.index.isin(retail_brokers)].sum())
+        retail_sell = int(sell_lots[sell_lots.index.isin(retail_brokers)].sum())
         
         result["retail_buy"] = retail_buy
         result["retail_sell"] = retail_sell
@@ -373,12 +336,12 @@ class AlphaHunterSupply:
             "date_range": range_analysis.get("date_range", {"start": None, "end": None})
         }
 
-    def _detect_imposter_from_trades(self, trades: List[Dict]) -> Dict:
-        """Detect imposters from a single-day trade list."""
-        retail_brokers = set(get_retail_brokers()) | set(get_mixed_brokers())
-        lots = [int(t.get("lot", 0) or 0) for t in trades if int(t.get("lot", 0) or 0) > 0]
+    def _detect_imposter_from_trades(self, trades: pd.DataFrame) -> Dict:
+        """Detect imposters from a single-day trade frame (see _trades_frame)."""
+        lots = trades["lot"].values
+        positive = np.sort(lots[lots > 0])
 
-        if not lots:
+        if not len(positive):
             return {
                 "passed": False,
                 "total_imposter_trades": 0,
@@ -390,42 +353,38 @@ class AlphaHunterSupply:
                 "date_range": {"start": None, "end": None}
             }
 
-        lots_sorted = sorted(lots)
-        threshold_index = max(0, int(math.ceil(len(lots_sorted) * 0.95)) - 1)
-        threshold = lots_sorted[threshold_index]
-
-        broker_stats = {}
-        total_imposter = 0
-        for trade in trades:
-            lot = int(trade.get("lot", 0) or 0)
-            if lot < threshold:
-                continue
+        threshold = positive[max(0, int(math.ceil(len(positive) * 0.95)) - 1)]
+        registry = get_broker_registry()
+        retail_brokers = registry.retail | registry.mixed
 
-            buyer = trade.get("buyer", "")
-            seller = trade.get("seller", "")
-            price = float(trade.get("price", 0) or 0)
-            value = lot * price * 100
+        # One row per (trade, retail-like side), buyer side before seller side
+        large = trades[trades["lot"] >= threshold]
+        sides = pd.concat([
+            large[["buyer", "lot", "price"]].rename(columns={"buyer": "broker"}).assign(side=0),
+            large[["seller", "lot", "price"]].rename(columns={"seller": "broker"}).assign(side=1)
+        ])
+        sides = sides[sides["broker"].isin(retail_brokers)]
+        sides = sides.assign(order=sides.index, value=sides["lot"] * sides["price"] * 100)
+        sides = sides.sort_values(["order", "side"], kind="stable")
 
-            for broker in [buyer, seller]:
-                if broker in retail_brokers:
-                    stats = broker_stats.setdefault(broker, {"total_value": 0, "total_count": 0, "lot_sum": 0})
-                    stats["total_value"] += value
-                    stats["total_count"] += 1
-                    stats["lot_sum"] += lot
-                    total_imposter += 1
+        stats = sides.groupby("broker", sort=False).agg(
+            total_value=("value", "sum"), total_count=("lot", "size"), lot_sum=("lot", "sum")
+        ).sort_values("total_value", ascending=False, kind="stable")
+        total_imposter = len(sides)
 
-        brokers = []
-        for broker, stats in broker_stats.items():
-            avg_lot = stats["lot_sum"] / max(1, stats["total_count"])
-            brokers.append({
+        brokers = [
+            {
                 "broker": broker,
                 "recurrence_pct": 100,
-                "avg_lot": round(avg_lot, 0),
-                "total_value": round(stats["total_value"], 2),
-                "total_count": stats["total_count"]
-            })
-
-        brokers.sort(key=lambda x: x["total_value"], reverse=True)
+                "avg_lot": round(lot_sum / max(1, count), 0),
+                "total_value": round(value, 2),
+                "total_count": count
+            }
+            for broker, value, count, lot_sum in zip(
+                stats.index.tolist(), stats["total_value"].tolist(),
+                stats["total_count"].tolist(), stats["lot_sum"].tolist()
+            )
+        ]
         avg_daily_pct = round((total_imposter / max(1, len(trades))) * 100, 1)
 
         return {
@@ -9,15 +9,29 @@ Analyzes watchlist tickers using the existing price-volume engine:
 """
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple
-import statistics
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import multiprocessing
+import os
 import logging
+import threading
 
+import numpy as np
+
+import config
 from db.alpha_hunter_repository import AlphaHunterRepository
-from db.price_volume_repository import price_volume_repo
+from db.ohlcv_arrays import OHLCVArrays
+from db.price_volume_repository import PriceVolumeRepository, price_volume_repo
+from db.trading_calendar import get_trading_calendar
 from db.neobdm_repository import NeoBDMRepository
 from modules.alpha_hunter_flow import AlphaHunterFlow
+from modules.indicators import indicators_for_records, spec_name
+from modules.ohlcv_service import ohlcv_service
+from modules import vpa_patterns
 
 logger = logging.getLogger(__name__)
 
@@ -35,10 +49,12 @@ class AlphaHunterStage2VPA:
         pre_spike_days: int = 15,
         post_spike_days: int = 10,
         min_ratio: float = 2.0,
-        persist_tracking: bool = False
+        persist_tracking: bool = False,
+        watchlist_item: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         ticker = ticker.upper()
-        watchlist_item = self.watchlist_repo.get_watchlist_item(ticker)
+        if watchlist_item is None:
+            watchlist_item = self.watchlist_repo.get_watchlist_item(ticker)
         if not watchlist_item:
             return {"error": f"{ticker} not found in watchlist"}
 
@@ -52,86 +68,54 @@ class AlphaHunterStage2VPA:
         start_date = (spike_dt - timedelta(days=lookback_days + pre_spike_days + 5)).strftime("%Y-%m-%d")
         end_date = (spike_dt + timedelta(days=post_spike_days + 2)).strftime("%Y-%m-%d")
 
-        records = price_volume_repo.get_ohlcv_data(ticker, start_date=start_date, end_date=end_date)
+        # Columnar view into the cached series (no DB round trip once warm)
+        series = price_volume_repo.get_ohlcv_arrays(ticker, start_date=start_date, end_date=end_date)
         
         # Auto-fetch from yfinance if no data available
-        if not records:
+        if not len(series):
             logger.info(f"No OHLCV data for {ticker}, auto-fetching from yfinance...")
-            try:
-                import yfinance as yf
-                yf_ticker = f"{ticker}.JK"
-                stock = yf.Ticker(yf_ticker)
-                
-                # Fetch 9 months of data to cover analysis needs
-                fetch_start = (datetime.now() - timedelta(days=270)).strftime('%Y-%m-%d')
-                fetch_end = datetime.now().strftime('%Y-%m-%d')
-                
-                df = stock.history(start=fetch_start, end=fetch_end)
-                
-                if not df.empty:
-                    new_records = []
-                    for date_idx, row in df.iterrows():
-                        new_records.append({
-                            'time': date_idx.strftime('%Y-%m-%d'),
-                            'open': float(row['Open']),
-                            'high': float(row['High']),
-                            'low': float(row['Low']),
-                            'close': float(row['Close']),
-                            'volume': int(row['Volume'])
-                        })
-                    
-                    records_added = price_volume_repo.upsert_ohlcv_data(ticker, new_records)
-                    logger.info(f"Fetched and stored {records_added} OHLCV records for {ticker}")
-                    
-                    # Re-fetch from database
-                    records = price_volume_repo.get_ohlcv_data(ticker, start_date=start_date, end_date=end_date)
-                else:
-                    logger.warning(f"No data returned from yfinance for {yf_ticker}")
-            except Exception as e:
-                logger.error(f"Error fetching from yfinance for {ticker}: {e}")
+            # Fetch 9 months of data to cover analysis needs
+            fetch_start = (datetime.now() - timedelta(days=270)).strftime('%Y-%m-%d')
+            ohlcv_service.ensure_history(ticker, min(fetch_start, start_date))
+            series = price_volume_repo.get_ohlcv_arrays(ticker, start_date=start_date, end_date=end_date)
         
-        if not records:
+        if not len(series):
             return {"error": f"No OHLCV data found for {ticker}. Unable to fetch from yfinance."}
 
-        spike_record, resolved_spike_date = self._resolve_spike_record(records, spike_candidate)
-        if not spike_record:
-            return {"error": f"Spike date not found for {ticker}"}
-
-        spike_index = next(
-            (i for i, row in enumerate(records) if row["time"] == resolved_spike_date),
-            None
-        )
+        # Exact spike date, else the last trading day before it
+        spike_index = series.index_at_or_before(spike_candidate)
         if spike_index is None:
-            return {"error": f"Spike date not found in OHLCV data for {ticker}"}
+            return {"error": f"Spike date not found for {ticker}"}
+        resolved_spike_date = series.date_at(spike_index)
 
-        prev_day = records[spike_index - 1] if spike_index > 0 else None
+        spike_volume = int(series.volume[spike_index])
         volume_ratio, volume_category, volume_score = self._calculate_volume_metrics(
-            records[:spike_index], spike_record["volume"], lookback_days
+            series.volume[:spike_index], spike_volume, lookback_days
+        )
+        volume_change_pct = self._pct_change(
+            spike_volume, int(series.volume[spike_index - 1]) if spike_index > 0 else None
         )
-        volume_change_pct = self._pct_change(spike_record["volume"], prev_day["volume"] if prev_day else None)
-        price_change_pct = self._pct_change(spike_record["close"], spike_record["open"])
+        price_change_pct = self._pct_change(float(series.close[spike_index]), float(series.open[spike_index]))
 
         trend_status = self._classify_spike_trend(price_change_pct, volume_change_pct)
 
-        compression = self._calculate_compression(records[:spike_index], pre_spike_days)
+        compression = self._calculate_compression(series[:spike_index], pre_spike_days)
         flow_impact = price_volume_repo.calculate_flow_impact(ticker, resolved_spike_date)
 
         anomaly_score = volume_score + compression["compression_score"] + flow_impact.get("flow_score", 0)
         signal_level = self._signal_level(anomaly_score)
 
-        pullback = self._calculate_pullback(records, spike_index, post_spike_days)
+        pullback = self._calculate_pullback(series, spike_index, post_spike_days)
         health_score = pullback["health_score"]
         
         # NEW: HK Method - Volume Asymmetry (Bandar masih pegang?)
         volume_asymmetry = self._calculate_volume_asymmetry(pullback["log"])
         
-        # NEW: HK Method - Dynamic Lookback & Pre-Spike Accumulation
-        accumulation_start, detection_method = self._detect_accumulation_start(records, spike_index)
-        accumulation = self._analyze_pre_spike_accumulation(records, accumulation_start, spike_index)
-        accumulation["detection_method"] = detection_method
-        
-        # NEW: Breakout Setup Detection (Resistance & Entry Point)
-        breakout_setup = self._detect_breakout_setup(records, spike_index, post_spike_days)
+        # NEW: HK Method - Dynamic Lookback & Pre-Spike Accumulation,
+        # plus Breakout Setup Detection (Resistance & Entry Point)
+        spike_patterns = vpa_patterns.analyze_spike(series, spike_index, post_spike_days)
+        accumulation = spike_patterns["accumulation"]
+        breakout_setup = spike_patterns["breakout_setup"]
         
         # NEW: Big Player Analysis (broker accumulation, floor price, inventory)
         accumulation_start_date = accumulation.get("period_start")
@@ -148,24 +132,8 @@ class AlphaHunterStage2VPA:
         stage2_score = round(anomaly_score * 0.6 + adjusted_health_score * 0.4)
         verdict = self._stage2_verdict(anomaly_score, adjusted_health_score, pullback["distribution_days"])
 
-        if persist_tracking and pullback["log"]:
-            for entry in pullback["log"]:
-                self.watchlist_repo.save_tracking_snapshot(
-                    ticker,
-                    entry["date"],
-                    {
-                        "price": entry["price"],
-                        "price_change_pct": entry["price_chg"],
-                        "volume": entry["volume"],
-                        "volume_change_pct": entry["vol_chg"],
-                        "health_status": entry["status"],
-                        "health_score": health_score,
-                        "meta_data": {
-                            "stage2_score": stage2_score,
-                            "spike_date": resolved_spike_date
-                        }
-                    }
-                )
+        if persist_tracking:
+            self._persist_tracking(ticker, series, spike_index, post_spike_days, end_date, stage2_score)
 
         return {
             "ticker": ticker,
@@ -211,6 +179,167 @@ class AlphaHunterStage2VPA:
             "verdict": verdict
         }
 
+    # ========================================================================
+    # WATCHLIST BATCH
+    # ========================================================================
+
+    def use_broker_summaries(self, frames: Dict[str, Any]):
+        """Answer broker summary lookups (big player + flow) from preloaded frames."""
+        self.neobdm_repo.use_broker_summaries(frames)
+        self.flow_analyzer.db.neobdm_repo.use_broker_summaries(frames)
+
+    def prepare_watchlist_batch(
+        self,
+        tickers: Optional[List[str]] = None,
+        **params: Any
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Preload everything analyze_watchlist needs for many tickers.
+
+        The watchlist, OHLCV series and broker summaries are read with a
+        handful of set-based queries; tickers without OHLCV are fetched in one
+        grouped provider call instead of one yfinance request each.
+
+        Args:
+            tickers: Watchlist tickers to analyze (default: whole watchlist)
+            **params: analyze_watchlist keyword arguments
+
+        Returns:
+            (tasks for analyze_preloaded_task, error results for unknown tickers)
+        """
+        watchlist = {item["ticker"].upper(): item for item in self.watchlist_repo.get_watchlist()}
+        wanted = [t.upper() for t in tickers] if tickers else list(watchlist)
+        errors = [{"ticker": t, "error": f"{t} not found in watchlist"} for t in wanted if t not in watchlist]
+        wanted = [t for t in dict.fromkeys(wanted) if t in watchlist]
+        if not wanted:
+            return [], errors
+
+        series_by_ticker = price_volume_repo.load_ohlcv_arrays(wanted)
+        missing = [t for t in wanted if not len(series_by_ticker[t])]
+        if missing:
+            fetch_start = (datetime.now() - timedelta(days=270)).strftime('%Y-%m-%d')
+            ohlcv_service.ensure_histories(missing, fetch_start)
+            series_by_ticker.update(price_volume_repo.load_ohlcv_arrays(missing))
+
+        broker_frames = self.neobdm_repo.load_broker_summaries(wanted)
+        tasks = [
+            {
+                "ticker": ticker,
+                "watchlist_item": watchlist[ticker],
+                "series": series_by_ticker[ticker],
+                "broker_summaries": broker_frames[ticker],
+                "params": params,
+                "data_dir": config.DATA_DIR,
+                "db_path": price_volume_repo.db_path
+            }
+            for ticker in wanted
+        ]
+        return tasks, errors
+
+    # ========================================================================
+    # INCREMENTAL TRACKING
+    # ========================================================================
+
+    def _persist_tracking(
+        self,
+        ticker: str,
+        series: OHLCVArrays,
+        spike_index: int,
+        post_spike_days: int,
+        track_until: str,
+        stage2_score: int
+    ):
+        """Store pullback days not tracked yet; a new spike restarts tracking."""
+        fresh = self._new_tracking_state(series, spike_index, post_spike_days, track_until)
+        state = self.watchlist_repo.get_tracking_states([ticker]).get(ticker)
+        reset = state is None or any(
+            state[key] != fresh[key] for key in ("spike_date", "post_spike_days", "track_until")
+        )
+        if reset:
+            state = fresh
+        previous_score = state["stage2_score"]
+
+        state, log, scores = self._advance_tracking({**state, "stage2_score": stage2_score}, series)
+        if not (reset or log) and previous_score == stage2_score:
+            return
+        self.watchlist_repo.save_tracking_progress([{
+            "ticker": ticker,
+            "state": state,
+            "snapshots": self._tracking_snapshots(state, log, scores),
+            "reset": reset
+        }])
+
+    def update_tracking(
+        self,
+        tickers: Optional[List[str]] = None,
+        lookback_days: int = 20,
+        post_spike_days: int = 10,
+        min_ratio: float = 2.0
+    ) -> Dict[str, Any]:
+        """
+        Daily job: advance the pullback tracking of watchlist tickers.
+
+        Only bars after each ticker's last processed bar are classified, and
+        all new snapshots and states are written in one transaction. Tickers
+        without tracking state start from their resolved spike date.
+
+        Args:
+            tickers: Watchlist tickers to advance (default: whole watchlist)
+            lookback_days / min_ratio: Spike auto-detection for new tickers
+            post_spike_days: Pullback length for new tickers
+
+        Returns:
+            Dict with per-ticker results and the number of updated tickers
+        """
+        watchlist = {item["ticker"].upper(): item for item in self.watchlist_repo.get_watchlist()}
+        wanted = [t.upper() for t in tickers] if tickers else list(watchlist)
+        wanted = [t for t in dict.fromkeys(wanted) if t in watchlist]
+        if not wanted:
+            return {"tickers": 0, "updated": 0, "results": []}
+
+        states = self.watchlist_repo.get_tracking_states(wanted)
+        series_by_ticker = price_volume_repo.load_ohlcv_arrays(wanted)
+
+        updates = []
+        results = []
+        for ticker in wanted:
+            series = series_by_ticker[ticker]
+            state = states.get(ticker)
+            reset = state is None
+            if reset:
+                spike_candidate, _ = self._resolve_spike_candidate(
+                    ticker, watchlist[ticker], lookback_days, min_ratio
+                )
+                spike_index = series.index_at_or_before(spike_candidate) if spike_candidate and len(series) else None
+                if spike_index is None:
+                    results.append({"ticker": ticker, "status": "no_data"})
+                    continue
+                track_until = (
+                    datetime.strptime(spike_candidate, "%Y-%m-%d") + timedelta(days=post_spike_days + 2)
+                ).strftime("%Y-%m-%d")
+                state = self._new_tracking_state(series, spike_index, post_spike_days, track_until)
+
+            state, log, scores = self._advance_tracking(state, series)
+            if log or reset:
+                updates.append({
+                    "ticker": ticker,
+                    "state": state,
+                    "snapshots": self._tracking_snapshots(state, log, scores),
+                    "reset": reset
+                })
+            results.append({
+                "ticker": ticker,
+                "status": "advanced" if log else "up_to_date",
+                "new_days": len(log),
+                "days_tracked": state["days_tracked"],
+                "last_bar_date": state["last_bar_date"],
+                "health_score": state["health_score"]
+            })
+
+        if not self.watchlist_repo.save_tracking_progress(updates):
+            return {"tickers": len(wanted), "updated": 0, "results": results, "error": "Failed to save tracking"}
+        return {"tickers": len(wanted), "updated": len(updates), "results": results}
+
     def _resolve_spike_candidate(
         self,
         ticker: str,
@@ -241,40 +370,17 @@ class AlphaHunterStage2VPA:
 
         return None, "no_data"
 
-    def _resolve_spike_record(
-        self,
-        records: List[Dict[str, Any]],
-        target_date: str
-    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
-        for record in records:
-            if record["time"] == target_date:
-                return record, target_date
-
-        fallback = None
-        for record in records:
-            if record["time"] <= target_date:
-                fallback = record
-
-        if fallback:
-            return fallback, fallback["time"]
-
-        return None, None
-
     def _calculate_volume_metrics(
         self,
-        prior_records: List[Dict[str, Any]],
+        prior_volumes: np.ndarray,
         spike_volume: float,
         lookback_days: int
     ) -> Tuple[Optional[float], str, int]:
-        if len(prior_records) < 10:
-            return None, "insufficient_data", 0
-
-        recent_prior = prior_records[-lookback_days:]
-        volumes = [row["volume"] for row in recent_prior if row["volume"] is not None]
-        if len(volumes) < 10:
+        recent_prior = prior_volumes[-lookback_days:]
+        if len(recent_prior) < 10:
             return None, "insufficient_data", 0
 
-        median_volume = statistics.median(volumes)
+        median_volume = float(np.median(recent_prior))
         if median_volume <= 0:
             return None, "invalid_baseline", 0
 
@@ -293,10 +399,10 @@ class AlphaHunterStage2VPA:
 
     def _calculate_compression(
         self,
-        prior_records: List[Dict[str, Any]],
+        prior: OHLCVArrays,
         days: int
     ) -> Dict[str, Any]:
-        if len(prior_records) < max(days, 5):
+        if len(prior) < max(days, 5):
             return {
                 "is_sideways": False,
                 "compression_score": 0,
@@ -306,17 +412,14 @@ class AlphaHunterStage2VPA:
                 "avg_close": 0
             }
 
-        window = prior_records[-days:]
-        closes = [row["close"] for row in window]
-        highs = [row["high"] for row in window]
-        lows = [row["low"] for row in window]
+        window = prior.tail(days)
 
-        mean_close = statistics.mean(closes)
-        std_close = statistics.stdev(closes) if len(closes) > 1 else 0
+        mean_close = float(window.close.mean())
+        std_close = float(window.close.std(ddof=1)) if len(window) > 1 else 0
         cv = (std_close / mean_close * 100) if mean_close > 0 else 999.0
 
-        overall_high = max(highs)
-        overall_low = min(lows)
+        overall_high = float(window.high.max())
+        overall_low = float(window.low.min())
         price_range_pct = ((overall_high - overall_low) / mean_close * 100) if mean_close > 0 else 999.0
 
         if cv < 2.0:
@@ -351,46 +454,121 @@ class AlphaHunterStage2VPA:
 
     def _calculate_pullback(
         self,
-        records: List[Dict[str, Any]],
+        series: OHLCVArrays,
         spike_index: int,
         post_spike_days: int
     ) -> Dict[str, Any]:
-        log = []
-        health_score = 100
-        healthy_days = 0
-        distribution_days = 0
+        state = self._new_tracking_state(series, spike_index, post_spike_days)
+        state, log, _ = self._advance_tracking(state, series)
+        return {
+            "days_tracked": state["days_tracked"],
+            "health_score": state["health_score"],
+            "healthy_days": state["healthy_days"],
+            "distribution_days": state["distribution_days"],
+            "log": log
+        }
 
-        end_index = min(spike_index + 1 + post_spike_days, len(records))
-        for i in range(spike_index + 1, end_index):
-            prev = records[i - 1]
-            curr = records[i]
+    def _new_tracking_state(
+        self,
+        series: OHLCVArrays,
+        spike_index: int,
+        post_spike_days: int,
+        track_until: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Pullback state before the first tracked day (spike day = previous bar)."""
+        return {
+            "spike_date": series.date_at(spike_index),
+            "post_spike_days": post_spike_days,
+            "track_until": track_until,
+            "last_bar_date": series.date_at(spike_index),
+            "last_close": float(series.close[spike_index]),
+            "last_volume": int(series.volume[spike_index]),
+            "days_tracked": 0,
+            "healthy_days": 0,
+            "distribution_days": 0,
+            "health_score": 100,
+            "stage2_score": None
+        }
 
-            price_chg = self._pct_change(curr["close"], prev["close"])
-            vol_chg = self._pct_change(curr["volume"], prev["volume"])
+    def _advance_tracking(
+        self,
+        state: Dict[str, Any],
+        series: OHLCVArrays
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[int]]:
+        """
+        Step the pullback state over bars after state["last_bar_date"].
+
+        Only the bars not processed yet are classified; the health score
+        carries over. Tracking stops after post_spike_days tracked days or
+        after state["track_until"] (the analysis window end, if set).
+
+        Returns:
+            (new state, log entries of the new days, health score after each day)
+        """
+        state = dict(state)
+        remaining = state["post_spike_days"] - state["days_tracked"]
+        lo = series.index_at_or_before(state["last_bar_date"])
+        lo = 0 if lo is None else lo + 1
+        hi = min(lo + max(remaining, 0), series.bounds(None, state.get("track_until"))[1])
+        window = series[lo:max(lo, hi)]
+        if not len(window):
+            return state, [], []
+
+        prev_close, prev_volume = state["last_close"], state["last_volume"]
+        log = []
+        scores = []
+        for date, close, volume in zip(window.dates.tolist(), window.close.tolist(), window.volume.tolist()):
+            price_chg = self._pct_change(close, prev_close)
+            vol_chg = self._pct_change(volume, prev_volume)
 
             status, penalty = self._classify_pullback_day(price_chg, vol_chg)
             if status == "HEALTHY":
-                healthy_days += 1
+                state["healthy_days"] += 1
             if status == "DANGER":
-                distribution_days += 1
+                state["distribution_days"] += 1
 
-            health_score = max(0, health_score - penalty)
+            state["health_score"] = max(0, state["health_score"] - penalty)
+            scores.append(state["health_score"])
             log.append({
-                "date": curr["time"],
-                "price": curr["close"],
-                "volume": curr["volume"],
+                "date": date,
+                "price": close,
+                "volume": volume,
                 "price_chg": price_chg,
                 "vol_chg": vol_chg,
                 "status": status
             })
+            prev_close, prev_volume = close, volume
 
-        return {
-            "days_tracked": len(log),
-            "health_score": health_score,
-            "healthy_days": healthy_days,
-            "distribution_days": distribution_days,
-            "log": log
-        }
+        state.update(
+            last_bar_date=log[-1]["date"],
+            last_close=prev_close,
+            last_volume=prev_volume,
+            days_tracked=state["days_tracked"] + len(log)
+        )
+        return state, log, scores
+
+    @staticmethod
+    def _tracking_snapshots(
+        state: Dict[str, Any],
+        log: List[Dict[str, Any]],
+        scores: List[int]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Tracking rows of new log entries, each with its running health score."""
+        return [
+            (entry["date"], {
+                "price": entry["price"],
+                "price_change_pct": entry["price_chg"],
+                "volume": entry["volume"],
+                "volume_change_pct": entry["vol_chg"],
+                "health_status": entry["status"],
+                "health_score": score,
+                "meta_data": {
+                    "stage2_score": state.get("stage2_score"),
+                    "spike_date": state["spike_date"]
+                }
+            })
+            for entry, score in zip(log, scores)
+        ]
 
     def _calculate_volume_asymmetry(self, pullback_log: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -438,145 +616,6 @@ class AlphaHunterStage2VPA:
             "score_bonus": score_bonus
         }
 
-    def _detect_accumulation_start(
-        self,
-        records: List[Dict[str, Any]],
-        spike_index: int,
-        max_lookback: int = 60
-    ) -> Tuple[int, str]:
-        """
-        Dynamic lookback: Auto-detect start of accumulation period.
-        
-        Logic:
-        1. Search backward from spike date
-        2. Find where: (a) previous volume spike occurs, OR (b) sideways compression starts
-        3. Return start index and detection method
-        """
-        if spike_index < 5:
-            return 0, "insufficient_data"
-        
-        # Calculate median volume for baseline
-        lookback_end = max(0, spike_index - 5)
-        lookback_start = max(0, spike_index - max_lookback)
-        
-        if lookback_end - lookback_start < 10:
-            return lookback_start, "short_history"
-        
-        baseline_volumes = [r['volume'] for r in records[lookback_start:lookback_end]]
-        median_volume = statistics.median(baseline_volumes) if baseline_volumes else 0
-        
-        # Search backward for accumulation start
-        accumulation_start = lookback_start
-        detection_method = "max_lookback"
-        
-        for i in range(spike_index - 5, lookback_start, -1):
-            # Check for previous volume spike (potential start of move)
-            if median_volume > 0 and records[i]['volume'] > median_volume * 2.5:
-                accumulation_start = i
-                detection_method = "previous_spike"
-                break
-            
-            # Check for volatility change (entering sideways)
-            if i > lookback_start + 10:
-                window = [r['close'] for r in records[i-10:i]]
-                if len(window) >= 10:
-                    mean_close = statistics.mean(window)
-                    std_close = statistics.stdev(window) if len(window) > 1 else 0
-                    cv = (std_close / mean_close * 100) if mean_close > 0 else 999
-                    
-                    # If volatility suddenly increases (leaving sideways zone)
-                    if cv > 6:
-                        accumulation_start = i
-                        detection_method = "volatility_change"
-                        break
-        
-        return accumulation_start, detection_method
-
-    def _analyze_pre_spike_accumulation(
-        self,
-        records: List[Dict[str, Any]],
-        start_index: int,
-        spike_index: int
-    ) -> Dict[str, Any]:
-        """
-        Analyze accumulation BEFORE spike (HK Method: "Isi Perut" analysis).
-        
-        Returns:
-        - Period start/end dates
-        - Total volume accumulated
-        - Average daily volume (compare with baseline)
-        - Volume trend: increasing, stable, or decreasing
-        """
-        if start_index >= spike_index or spike_index >= len(records):
-            return {
-                "period_start": None,
-                "period_end": None,
-                "accumulation_days": 0,
-                "total_volume": 0,
-                "avg_daily_volume": 0,
-                "volume_trend": "NO_DATA",
-                "up_days": 0,
-                "down_days": 0,
-                "net_movement_pct": 0
-            }
-        
-        accumulation_records = records[start_index:spike_index]
-        accumulation_days = len(accumulation_records)
-        
-        if accumulation_days < 3:
-            return {
-                "period_start": records[start_index]['time'] if start_index < len(records) else None,
-                "period_end": records[spike_index - 1]['time'] if spike_index > 0 else None,
-                "accumulation_days": accumulation_days,
-                "total_volume": 0,
-                "avg_daily_volume": 0,
-                "volume_trend": "INSUFFICIENT_DATA",
-                "up_days": 0,
-                "down_days": 0,
-                "net_movement_pct": 0
-            }
-        
-        total_volume = sum(r['volume'] for r in accumulation_records)
-        avg_daily_volume = total_volume / accumulation_days if accumulation_days > 0 else 0
-        
-        # Count up/down days
-        up_days = 0
-        down_days = 0
-        for i in range(1, len(accumulation_records)):
-            if accumulation_records[i]['close'] > accumulation_records[i-1]['close']:
-                up_days += 1
-            elif accumulation_records[i]['close'] < accumulation_records[i-1]['close']:
-                down_days += 1
-        
-        # Calculate net price movement
-        start_price = accumulation_records[0]['close']
-        end_price = accumulation_records[-1]['close']
-        net_movement_pct = ((end_price - start_price) / start_price * 100) if start_price > 0 else 0
-        
-        # Determine volume trend (first half vs second half)
-        half = accumulation_days // 2
-        first_half_vol = sum(r['volume'] for r in accumulation_records[:half]) / half if half > 0 else 0
-        second_half_vol = sum(r['volume'] for r in accumulation_records[half:]) / (accumulation_days - half) if (accumulation_days - half) > 0 else 0
-        
-        if second_half_vol > first_half_vol * 1.3:
-            volume_trend = "INCREASING"
-        elif second_half_vol < first_half_vol * 0.7:
-            volume_trend = "DECREASING"
-        else:
-            volume_trend = "STABLE"
-        
-        return {
-            "period_start": accumulation_records[0]['time'],
-            "period_end": accumulation_records[-1]['time'],
-            "accumulation_days": accumulation_days,
-            "total_volume": total_volume,
-            "avg_daily_volume": round(avg_daily_volume),
-            "volume_trend": volume_trend,
-            "up_days": up_days,
-            "down_days": down_days,
-            "net_movement_pct": round(net_movement_pct, 2)
-        }
-
     def _classify_pullback_day(self, price_chg: float, vol_chg: float) -> Tuple[str, int]:
         if price_chg < 0:
             if vol_chg < -20:
@@ -637,104 +676,6 @@ class AlphaHunterStage2VPA:
             return 0.0
         return round((current - previous) / previous * 100, 2)
 
-    def _detect_breakout_setup(
-        self, 
-        records: List[Dict], 
-        spike_index: int,
-        post_spike_days: int = 10
-    ) -> Dict[str, Any]:
-        """
-        Detect breakout setup after spike.
-        
-        Strategy: After spike, track pullback and identify resistance level.
-        Entry when price breaks above post-spike resistance with volume confirmation.
-        
-        Args:
-            records: List of OHLCV records
-            spike_index: Index of the volume spike day
-            post_spike_days: Days to look after spike for resistance
-            
-        Returns:
-            Dictionary with resistance level, current price, distance, and status
-        """
-        if spike_index >= len(records) - 1:
-            return {
-                "resistance_price": None,
-                "current_price": None,
-                "distance_pct": None,
-                "status": "NO_DATA",
-                "is_breakout": False,
-                "breakout_info": None
-            }
-        
-        # Get post-spike records (from spike day to either end of data or post_spike_days)
-        end_index = min(spike_index + post_spike_days + 1, len(records))
-        post_spike_records = records[spike_index:end_index]
-        
-        if len(post_spike_records) < 2:
-            return {
-                "resistance_price": None,
-                "current_price": None,
-                "distance_pct": None,
-                "status": "NO_DATA",
-                "is_breakout": False,
-                "breakout_info": None
-            }
-        
-        # Find resistance: highest high after spike (including spike day)
-        resistance_price = max(r['high'] for r in post_spike_records)
-        resistance_date = next(r['time'] for r in post_spike_records if r['high'] == resistance_price)
-        
-        # Current price is the last record in our data
-        current_record = records[-1]
-        current_price = current_record['close']
-        current_date = current_record['time']
-        
-        # Calculate distance to resistance
-        if resistance_price > 0:
-            distance_pct = round(((resistance_price - current_price) / current_price) * 100, 2)
-        else:
-            distance_pct = 0
-        
-        # Determine status
-        is_breakout = current_price > resistance_price
-        
-        if is_breakout:
-            # Check breakout quality (volume confirmation)
-            breakout_volume = current_record['volume']
-            # Get average volume from post-spike period (excluding spike day)
-            avg_volume = sum(r['volume'] for r in post_spike_records[1:]) / max(1, len(post_spike_records) - 1)
-            volume_ratio = breakout_volume / avg_volume if avg_volume > 0 else 0
-            
-            breakout_info = {
-                "break_price": current_price,
-                "break_date": current_date,
-                "volume": breakout_volume,
-                "volume_ratio": round(volume_ratio, 2),
-                "quality": "STRONG" if volume_ratio >= 2 else "MODERATE" if volume_ratio >= 1.5 else "WEAK"
-            }
-            status = "ENTRY"
-        else:
-            breakout_info = None
-            # How close to breakout?
-            if distance_pct <= 3:
-                status = "NEAR_BREAKOUT"
-            elif distance_pct <= 10:
-                status = "WAITING"
-            else:
-                status = "FAR"
-        
-        return {
-            "resistance_price": round(resistance_price, 2),
-            "resistance_date": resistance_date,
-            "current_price": round(current_price, 2),
-            "current_date": current_date,
-            "distance_pct": distance_pct,
-            "status": status,
-            "is_breakout": is_breakout,
-            "breakout_info": breakout_info
-        }
-
     def _analyze_big_player_activity(
         self,
         ticker: str,
@@ -767,10 +708,11 @@ class AlphaHunterStage2VPA:
                 }
             }
         
-        # Check which dates in our range are missing
+        # Check which trading sessions in our range are missing
+        calendar = get_trading_calendar(price_volume_repo.db_path)
         try:
-            start_dt = datetime.strptime(accumulation_start, "%Y-%m-%d")
-            end_dt = datetime.strptime(spike_date, "%Y-%m-%d")
+            missing_dates = calendar.missing(available_dates, accumulation_start, spike_date)
+            total_expected = calendar.count(accumulation_start, spike_date)
         except ValueError:
             return {
                 "data_status": "error",
@@ -778,21 +720,7 @@ class AlphaHunterStage2VPA:
                 "top_accumulators": []
             }
         
-        available_set = set(available_dates)
-        missing_dates = []
-        
-        # Check each trading day in range (approximate, skip weekends)
-        current = start_dt
-        while current <= end_dt:
-            if current.weekday() < 5:  # Mon-Fri
-                date_str = current.strftime("%Y-%m-%d")
-                if date_str not in available_set:
-                    missing_dates.append(date_str)
-            current += timedelta(days=1)
-        
         # Determine data status
-        total_expected = sum(1 for d in range((end_dt - start_dt).days + 1) 
-                            if (start_dt + timedelta(days=d)).weekday() < 5)
         coverage_pct = ((total_expected - len(missing_dates)) / total_expected * 100) if total_expected > 0 else 0
         
         if len(missing_dates) == 0:
@@ -1016,6 +944,9 @@ class AlphaHunterStage2VPA:
     # STAGE 2 VISUALIZATION SYSTEM
     # ========================================================================
 
+    # Built payloads kept per (ticker, day, last bar, flow version, params)
+    VISUALIZATION_CACHE_SIZE = 128
+
     def get_stage2_visualization_data(
         self,
         ticker: str,
@@ -1030,13 +961,79 @@ class AlphaHunterStage2VPA:
         
         Returns:
             Dict with price_chart, volume_chart, money_flow_chart, 
-            resistance_lines, and recommendation
+            resistance_lines, and recommendation (shared cached payload,
+            treat as read-only)
         """
-        ticker = ticker.upper()
-        today = datetime.now().strftime("%Y-%m-%d")
+        return self.get_stage2_visualization(ticker, selling_climax_date)[1]
+
+    def get_stage2_visualization(
+        self,
+        ticker: str,
+        selling_climax_date: Optional[str] = None
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Cached visualization payload and its ETag.
         
-        # Step 1: Get OHLCV data (fetch if needed)
-        records = self._fetch_ohlcv_for_visualization(ticker)
+        The payload is rebuilt only when its inputs change: the day, the
+        ticker's last stored OHLCV bar, the NeoBDM flow records or the
+        parameters. Missing bars are fetched in the background (the new bar
+        then changes the key); only a ticker with no stored bars at all is
+        fetched inline.
+        
+        Returns:
+            (etag, payload); etag is None for error payloads (not cached)
+        """
+        ticker = ticker.upper()
+        start_date = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d")
+        if ohlcv_service.repo.get_latest_date(ticker):
+            ohlcv_service.schedule_history(ticker, start_date)
+        else:
+            ohlcv_service.ensure_history(ticker, start_date)
+        key = self._visualization_key(ticker, selling_climax_date)
+        with _visualization_cache_lock:
+            cached = _visualization_cache.get(key)
+            if cached is not None:
+                _visualization_cache.move_to_end(key)
+        if cached is not None:
+            return cached
+
+        payload = self._build_stage2_visualization(ticker, selling_climax_date, today=key[2])
+        if payload.get("error"):
+            return None, payload
+
+        entry = (_visualization_etag(key), payload)
+        with _visualization_cache_lock:
+            _visualization_cache[key] = entry
+            _visualization_cache.move_to_end(key)
+            while len(_visualization_cache) > self.VISUALIZATION_CACHE_SIZE:
+                _visualization_cache.popitem(last=False)
+        return entry
+
+    def stage2_visualization_etag(self, ticker: str, selling_climax_date: Optional[str] = None) -> str:
+        """ETag the visualization payload has right now, without building or fetching anything."""
+        return _visualization_etag(self._visualization_key(ticker.upper(), selling_climax_date))
+
+    def _visualization_key(self, ticker: str, selling_climax_date: Optional[str]) -> tuple:
+        """Cache key of a visualization, from stored state only (no provider calls)."""
+        return (
+            ohlcv_service.repo.db_path,
+            ticker,
+            datetime.now().strftime("%Y-%m-%d"),
+            # Changes with any bar write (also from other processes) and re-validates the cached series
+            ohlcv_service.repo.series_marker(ticker),
+            self.neobdm_repo.get_records_version(),
+            selling_climax_date
+        )
+
+    def _build_stage2_visualization(
+        self,
+        ticker: str,
+        selling_climax_date: Optional[str],
+        today: str
+    ) -> Dict[str, Any]:
+        """Compute the visualization payload (see get_stage2_visualization_data)."""
+        # Step 1: Get OHLCV data (stored bars; see get_stage2_visualization)
+        records = self._fetch_ohlcv_for_visualization(ticker, refresh=False)
         if not records:
             return {"error": f"No OHLCV data available for {ticker}"}
         
@@ -1045,7 +1042,7 @@ class AlphaHunterStage2VPA:
             climax_date = selling_climax_date
             climax_info = self._find_climax_info(records, selling_climax_date)
         else:
-            climax_date, climax_info = self._detect_selling_climax(records)
+            climax_date, climax_info = vpa_patterns.detect_selling_climax(OHLCVArrays.from_records(records))
         
         if not climax_date:
             # No selling climax found, use earliest spike
@@ -1061,7 +1058,7 @@ class AlphaHunterStage2VPA:
             start_date = records[0]["time"]
         
         # Step 4: Calculate MAs from FULL records first (need 20+ data points)
-        full_ma_data = self._calculate_all_moving_averages(records)
+        full_ma_data = self._calculate_all_moving_averages(records, ticker)
         
         # Step 5: Detect volume spikes from full records (needs MA20 values)
         volume_spikes = self._detect_volume_spikes_with_price(
@@ -1089,8 +1086,8 @@ class AlphaHunterStage2VPA:
         }
         
         # Step 7: Detect resistance levels
-        resistance_lines = self._detect_resistance_levels(
-            filtered_records, volume_spikes, today
+        resistance_lines = vpa_patterns.detect_resistance_levels(
+            OHLCVArrays.from_records(filtered_records), volume_spikes, today
         )
         
         # Step 8: Get money flow data
@@ -1145,81 +1142,12 @@ class AlphaHunterStage2VPA:
             "recommendation": recommendation
         }
 
-    def _fetch_ohlcv_for_visualization(self, ticker: str) -> List[Dict]:
-        """Fetch OHLCV data, auto-fetch from yfinance if not available."""
-        # Try to get 6 months of data
+    def _fetch_ohlcv_for_visualization(self, ticker: str, refresh: bool = True) -> List[Dict]:
+        """Fetch 6 months of OHLCV data, auto-fetching missing ranges from yfinance."""
         end_date = datetime.now().strftime("%Y-%m-%d")
         start_date = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d")
         
-        records = price_volume_repo.get_ohlcv_data(
-            ticker, start_date=start_date, end_date=end_date
-        )
-        
-        if not records or len(records) < 30:
-            # Auto-fetch from yfinance
-            logger.info(f"Fetching OHLCV from yfinance for {ticker}")
-            try:
-                import yfinance as yf
-                stock = yf.Ticker(f"{ticker}.JK")
-                df = stock.history(period="6mo")
-                
-                if not df.empty:
-                    new_records = []
-                    for date_idx, row in df.iterrows():
-                        new_records.append({
-                            'time': date_idx.strftime('%Y-%m-%d'),
-                            'open': float(row['Open']),
-                            'high': float(row['High']),
-                            'low': float(row['Low']),
-                            'close': float(row['Close']),
-                            'volume': int(row['Volume'])
-                        })
-                    
-                    price_volume_repo.upsert_ohlcv_data(ticker, new_records)
-                    records = new_records
-            except Exception as e:
-                logger.error(f"Error fetching from yfinance: {e}")
-        
-        return records
-
-    def _detect_selling_climax(
-        self, records: List[Dict]
-    ) -> Tuple[Optional[str], Dict]:
-        """
-        Detect selling climax: Volume spike (≥2x MA20) + Price DOWN.
-        
-        Returns:
-            Tuple of (climax_date, climax_info)
-        """
-        if len(records) < 25:
-            return None, {}
-        
-        # Calculate volume MA20
-        volumes = [r["volume"] for r in records]
-        
-        for i in range(len(records) - 1, 19, -1):  # Search backward
-            vol_ma20 = statistics.mean(volumes[i-20:i]) if i >= 20 else statistics.mean(volumes[:i])
-            
-            current_vol = volumes[i]
-            current_close = records[i]["close"]
-            prev_close = records[i-1]["close"]
-            
-            # Check: Volume ≥ 2x MA20 AND Price DOWN
-            if vol_ma20 > 0:
-                ratio = current_vol / vol_ma20
-                price_change = (current_close - prev_close) / prev_close * 100 if prev_close > 0 else 0
-                
-                if ratio >= 2.0 and price_change < -1:  # At least 1% down
-                    return records[i]["time"], {
-                        "date": records[i]["time"],
-                        "price": current_close,
-                        "volume": current_vol,
-                        "volume_ratio": round(ratio, 2),
-                        "price_change_pct": round(price_change, 2),
-                        "detected": True
-                    }
-        
-        return None, {"detected": False}
+        return ohlcv_service.get_history(ticker, start_date, end_date, refresh=refresh)
 
     def _find_climax_info(self, records: List[Dict], date: str) -> Dict:
         """Get climax info for a specific date."""
@@ -1237,33 +1165,26 @@ class AlphaHunterStage2VPA:
         return {"date": date, "detected": False}
 
     def _calculate_all_moving_averages(
-        self, records: List[Dict]
+        self, records: List[Dict], ticker: Optional[str] = None
     ) -> Dict[str, List[Dict]]:
-        """Calculate all required MAs for price and volume."""
-        closes = [r["close"] for r in records]
-        volumes = [r["volume"] for r in records]
+        """Calculate all required MAs for price and volume (shared indicator cache)."""
+        specs = {
+            "price_ma5": ("sma", "close", 5),
+            "price_ma10": ("sma", "close", 10),
+            "price_ma20": ("sma", "close", 20),
+            "volume_ma20": ("sma", "volume", 20)
+        }
+        values = indicators_for_records(records, list(specs.values()), price_volume_repo, ticker)
         dates = [r["time"] for r in records]
         
         return {
-            "price_ma5": self._calculate_sma(dates, closes, 5),
-            "price_ma10": self._calculate_sma(dates, closes, 10),
-            "price_ma20": self._calculate_sma(dates, closes, 20),
-            "volume_ma20": self._calculate_sma(dates, volumes, 20)
+            key: [
+                {"date": d, "value": None if np.isnan(v) else round(float(v), 2)}
+                for d, v in zip(dates, values[spec_name(spec)])
+            ]
+            for key, spec in specs.items()
         }
 
-    def _calculate_sma(
-        self, dates: List[str], values: List[float], period: int
-    ) -> List[Dict]:
-        """Calculate Simple Moving Average."""
-        result = []
-        for i in range(len(values)):
-            if i < period - 1:
-                result.append({"date": dates[i], "value": None})
-            else:
-                avg = statistics.mean(values[i-period+1:i+1])
-                result.append({"date": dates[i], "value": round(avg, 2)})
-        return result
-
     def _detect_volume_spikes_with_price(
         self,
         records: List[Dict],
@@ -1306,54 +1227,6 @@ class AlphaHunterStage2VPA:
         
         return spikes
 
-    def _detect_resistance_levels(
-        self,
-        records: List[Dict],
-        volume_spikes: List[Dict],
-        today: str
-    ) -> List[Dict]:
-        """
-        Detect resistance lines from volume spike + price UP.
-        Line extends until broken.
-        """
-        resistance_lines = []
-        
-        # Filter spikes with price UP in last 30 days
-        recent_up_spikes = [
-            s for s in volume_spikes 
-            if s["price_direction"] == "UP"
-        ]
-        
-        for spike in recent_up_spikes:
-            spike_date = spike["date"]
-            resistance_price = spike["high"]
-            
-            # Find if resistance is broken
-            is_broken = False
-            break_date = None
-            
-            for r in records:
-                if r["time"] > spike_date:
-                    if r["close"] > resistance_price:
-                        is_broken = True
-                        break_date = r["time"]
-                        break
-            
-            resistance_lines.append({
-                "start_date": spike_date,
-                "end_date": break_date if is_broken else today,
-                "price": resistance_price,
-                "is_broken": is_broken,
-                "break_date": break_date,
-                "source": "volume_spike_up",
-                "spike_info": {
-                    "ratio": spike["ratio"],
-                    "price_change_pct": spike["price_change_pct"]
-                }
-            })
-        
-        return resistance_lines
-
     def _get_money_flow_chart_data(
         self,
         ticker: str,
@@ -1435,11 +1308,11 @@ class AlphaHunterStage2VPA:
         today_date = records[-1]["time"]
         current_price = records[-1]["close"]
         
-        # Check for recent volume spike + price UP (last 7 days)
+        # Check for recent volume spike + price UP (last trading week)
         recent_up_spikes = [
             s for s in volume_spikes 
             if s["price_direction"] == "UP" 
-            and self._days_between(s["date"], today_date) <= 7
+            and self._days_between(s["date"], today_date) <= 5
         ]
         
         # Check for today's spike
@@ -1517,10 +1390,104 @@ class AlphaHunterStage2VPA:
         }
 
     def _days_between(self, date1: str, date2: str) -> int:
-        """Calculate days between two date strings."""
+        """Trading sessions between two date strings (0 for the same session)."""
         try:
-            d1 = datetime.strptime(date1, "%Y-%m-%d")
-            d2 = datetime.strptime(date2, "%Y-%m-%d")
-            return abs((d2 - d1).days)
+            start, end = sorted([date1, date2])
+            calendar = get_trading_calendar(price_volume_repo.db_path)
+            return max(0, calendar.count(start, end) - 1)
         except ValueError:
             return 999
+
+
+# Stage 2 visualization payloads: cache key -> (etag, payload), least recently used first
+_visualization_cache: "OrderedDict[tuple, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+_visualization_cache_lock = threading.Lock()
+
+
+def _visualization_etag(key: tuple) -> str:
+    """Strong ETag for a visualization cache key."""
+    return '"%s"' % hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+
+
+def analyze_preloaded_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run analyze_watchlist for one prepared batch task (see prepare_watchlist_batch).
+
+    Module-level so it can run in a worker process: the preloaded series is
+    installed into that process's OHLCV cache and broker summaries are
+    served from the task, so the analysis does no per-ticker bulk reads.
+    Spawned workers start from a fresh import, so they first point their
+    repositories at the parent's database.
+    """
+    global price_volume_repo
+    if price_volume_repo.db_path != task["db_path"]:
+        config.DATA_DIR = task["data_dir"]
+        price_volume_repo = PriceVolumeRepository(task["db_path"])
+    ticker = task["ticker"]
+    price_volume_repo.prime_ohlcv_arrays({ticker: task["series"]})
+    try:
+        analyzer = AlphaHunterStage2VPA()
+        analyzer.use_broker_summaries({ticker: task["broker_summaries"]})
+        result = analyzer.analyze_watchlist(ticker, watchlist_item=task["watchlist_item"], **task["params"])
+    except Exception as e:
+        logger.error(f"Stage 2 batch analysis failed for {ticker}: {e}")
+        result = {"error": str(e)}
+    result.setdefault("ticker", ticker)
+    return result
+
+
+# Worker processes shared by every batch request, created on first use
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    """
+    The shared batch pool. Workers are spawned, not forked: a fork taken while
+    another thread holds a lock (the OHLCV cache lock, logging) would leave
+    that lock held forever in the child.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _batch_pool
+
+
+async def iter_watchlist_batch(
+    tasks: List[Dict[str, Any]],
+    max_workers: int = 4
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyze prepared tasks on the shared process pool, yielding each result as
+    soon as it finishes (completion order, not watchlist order).
+
+    At most max_workers tasks of this batch are in flight at once.
+    """
+    if not tasks:
+        return
+    workers = max(1, min(max_workers, len(tasks), os.cpu_count() or 1))
+    if workers == 1:
+        for task in tasks:
+            yield await asyncio.to_thread(analyze_preloaded_task, task)
+        return
+
+    loop = asyncio.get_running_loop()
+    pool = _get_batch_pool()
+    pending = {loop.run_in_executor(pool, analyze_preloaded_task, task) for task in tasks[:workers]}
+    queued = iter(tasks[workers:])
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                task = next(queued, None)
+                if task is not None:
+                    pending.add(loop.run_in_executor(pool, analyze_preloaded_task, task))
+                yield future.result()
+    finally:
+        # Client went away: drop this batch's queued work, the pool stays up
+        for future in pending:
+            future.cancel()
@@ -65,8 +65,11 @@ class DatabaseManager:
     def save_neobdm_summary(self, method, period, data_list):
         return self.neobdm_repo.save_neobdm_summary(method, period, data_list)
     
-    def save_neobdm_record_batch(self, method, period, data_list, scraped_at=None):
-        return self.neobdm_repo.save_neobdm_record_batch(method, period, data_list, scraped_at)
+    def save_neobdm_record_batch(self, method, period, data_list, scraped_at=None, prune=False):
+        return self.neobdm_repo.save_neobdm_record_batch(method, period, data_list, scraped_at, prune)
+    
+    def get_neobdm_ingest_runs(self, limit=50):
+        return self.neobdm_repo.get_neobdm_ingest_runs(limit)
     
     def get_neobdm_summaries(self, method=None, period=None, start_date=None, end_date=None):
         return self.neobdm_repo.get_neobdm_summaries(method, period, start_date, end_date)
@@ -80,6 +83,9 @@ class DatabaseManager:
     def get_neobdm_tickers(self):
         return self.neobdm_repo.get_neobdm_tickers()
     
+    def get_latest_flows(self, method='m', period='c'):
+        return self.neobdm_repo.get_latest_flows(method, period)
+    
     def get_latest_hot_signals(self):
         return self.neobdm_repo.get_latest_hot_signals()
     
@@ -92,6 +98,18 @@ class DatabaseManager:
     def get_available_dates_for_ticker(self, ticker):
         return self.neobdm_repo.get_available_dates_for_ticker(ticker)
     
+    def get_broker_net_flows(self, ticker, days):
+        return self.neobdm_repo.get_broker_net_flows(ticker, days)
+    
+    def get_market_broker_net_flows(self, days):
+        return self.neobdm_repo.get_market_broker_net_flows(days)
+    
+    def get_broker_summary_version(self):
+        return self.neobdm_repo.get_broker_summary_version()
+    
+    def get_existing_broker_summary_pairs(self, tickers):
+        return self.neobdm_repo.get_existing_broker_summary_pairs(tickers)
+    
     def get_broker_journey(self, ticker, brokers, start_date, end_date):
         return self.neobdm_repo.get_broker_journey(ticker, brokers, start_date, end_date)
     
@@ -101,10 +119,19 @@ class DatabaseManager:
     def get_floor_price_analysis(self, ticker, days=30):
         return self.neobdm_repo.get_floor_price_analysis(ticker, days)
     
+    def get_market_floor_prices(self, days=30):
+        return self.neobdm_repo.get_market_floor_prices(days)
+    
     # Market Metadata operations - delegate to MarketMetadataRepository
     def get_market_cap(self, symbol: str, ttl_hours: int = 24):
         return self.market_meta_repo.get_market_cap(symbol, ttl_hours)
     
+    def get_market_caps(self, symbols, ttl_hours: int = 24):
+        return self.market_meta_repo.get_market_caps(symbols, ttl_hours)
+    
+    def filter_symbols(self, symbols, sector=None, mcap_min=None):
+        return self.market_meta_repo.filter_symbols(symbols, sector, mcap_min)
+    
     # Volume Daily operations - delegate to NeoBDMRepository
     def save_volume_batch(self, ticker, records):
         return self.neobdm_repo.save_volume_batch(ticker, records)
@@ -114,6 +141,12 @@ class DatabaseManager:
     
     def get_latest_volume_date(self, ticker):
         return self.neobdm_repo.get_latest_volume_date(ticker)
+    
+    def get_latest_close(self, ticker):
+        return self.neobdm_repo.get_latest_close(ticker)
+    
+    def get_latest_closes(self):
+        return self.neobdm_repo.get_latest_closes()
 
     # Alpha Hunter operations - delegate to AlphaHunterRepository
     def get_alpha_hunter_repo(self):
@@ -0,0 +1,373 @@
+"""
+Indicator Engine
+Vectorized technical indicators shared by the price-volume routes, Alpha
+Hunter Stage-2 and the technical analyst.
+
+- Pure functions (sma, ema, rolling_std, true_range, atr, vwap,
+  rolling_max/rolling_min) over NumPy arrays; NaN marks warm-up positions.
+- IndicatorEngine caches the full-series results per ticker and, when the
+  series grew by exactly one bar, appends that bar in O(1) per indicator
+  instead of recomputing everything.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from db.ohlcv_arrays import OHLCVArrays
+
+
+# ==================== VECTORIZED INDICATORS ====================
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple moving average; NaN for the first period-1 positions."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (period + 1)), seeded with the first SMA."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    seeded = values[period - 1:].copy()
+    seeded[0] = values[:period].mean()
+    # Recursive (adjust=False) EWM runs the y = a*x + (1-a)*y_prev recurrence in compiled code
+    out[period - 1:] = pd.Series(seeded).ewm(alpha=2.0 / (period + 1), adjust=False).mean().to_numpy()
+    return out
+
+
+def rolling_std(values: np.ndarray, period: int, ddof: int = 1) -> np.ndarray:
+    """Rolling standard deviation over the last `period` values."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if period <= ddof or len(values) < period:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(values, period)
+    out[period - 1:] = windows.std(axis=1, ddof=ddof)
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """max(high-low, |high-prev close|, |low-prev close|); the first bar is high-low."""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    tr = high - low
+    if len(tr) > 1:
+        prev_close = close[:-1]
+        tr[1:] = np.maximum.reduce([tr[1:], np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)])
+    return tr
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Average True Range as a simple rolling mean of the true range."""
+    return sma(true_range(high, low, close), period)
+
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """Cumulative VWAP of the typical price (H+L+C)/3."""
+    typical = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)
+               + np.asarray(close, dtype=np.float64)) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    cum_volume = np.cumsum(volume)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(cum_volume > 0, np.cumsum(typical * volume) / cum_volume, np.nan)
+
+
+def _rolling_extreme(values: np.ndarray, window: int, center: bool, reducer) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return out
+    reduced = reducer(np.lib.stride_tricks.sliding_window_view(values, window), axis=1)
+    offset = (window - 1) // 2 if center else window - 1
+    out[offset:offset + len(reduced)] = reduced
+    return out
+
+
+def rolling_max(values: np.ndarray, window: int, center: bool = False) -> np.ndarray:
+    """Rolling maximum (pandas-compatible placement, NaN where the window is incomplete)."""
+    return _rolling_extreme(values, window, center, np.max)
+
+
+def rolling_min(values: np.ndarray, window: int, center: bool = False) -> np.ndarray:
+    """Rolling minimum (pandas-compatible placement, NaN where the window is incomplete)."""
+    return _rolling_extreme(values, window, center, np.min)
+
+
+def window_values(values: np.ndarray, lo: int, hi: int, warmup: int) -> np.ndarray:
+    """
+    Slice full-series indicator values to [lo, hi) as if computed on that window
+    alone: the first `warmup` positions are blanked (NaN).
+    """
+    out = np.array(values[lo:hi], dtype=np.float64)
+    out[:warmup] = np.nan
+    return out
+
+
+# ==================== CACHED / INCREMENTAL ENGINE ====================
+
+# (kind, source column, period); source is ignored for atr/vwap
+IndicatorSpec = Tuple[str, Optional[str], int]
+
+# Window-local indicators: the full-series value at a position only depends on
+# the last `period` bars, so a sliced full-series result equals a computation
+# on the window once the warm-up is blanked. EMA, ATR (true range uses the
+# previous close) and VWAP (cumulative) carry state from before the window.
+WINDOW_LOCAL_KINDS = ("sma", "std")
+
+
+def spec_name(spec: IndicatorSpec) -> str:
+    kind, source, period = spec
+    if kind == "vwap":
+        return "vwap"
+    if kind == "atr":
+        return f"atr_{period}"
+    return f"{kind}_{source}_{period}"
+
+
+class _Buffer:
+    """Growable float array so appending a bar is amortized O(1)."""
+
+    def __init__(self, values: np.ndarray):
+        self.data = np.empty(max(16, len(values) * 2))
+        self.data[:len(values)] = values
+        self.size = len(values)
+
+    def append(self, value: float):
+        if self.size == len(self.data):
+            grown = np.empty(len(self.data) * 2)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class IndicatorEngine:
+    """Per-ticker cache of full-series indicators with one-bar incremental updates."""
+
+    MAX_ENTRIES = 512
+
+    def __init__(self):
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(
+        self,
+        key: Any,
+        series: OHLCVArrays,
+        specs: Sequence[IndicatorSpec],
+        version: tuple
+    ) -> Dict[str, np.ndarray]:
+        """
+        Indicators over the whole series, keyed by spec_name.
+
+        Args:
+            key: Cache key of the series (e.g. (db_path, ticker))
+            series: Full date-ordered series of that key
+            specs: Indicators to compute
+            version: (rewrites, writes) of the series, read before it was loaded
+                (PriceVolumeRepository.series_version). Cached values are
+                served for the same version, extended by one bar when only
+                writes moved on, and rebuilt whenever rewrites changed.
+        """
+        specs = tuple(specs)
+        cache_key = (key, specs)
+        n = len(series)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                if entry["version"] == version and self._matches(entry, series, n):
+                    return {name: buf.view() for name, buf in entry["values"].items()}
+                if entry["version"][0] == version[0] and self._matches(entry, series, n - 1):
+                    self._append_bar(entry, series, specs)
+                    entry["version"] = version
+                    return {name: buf.view() for name, buf in entry["values"].items()}
+
+        entry = self._build(series, specs)
+        entry["version"] = version
+        with self._lock:
+            self._entries[cache_key] = entry
+            while len(self._entries) > self.MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return {name: buf.view() for name, buf in entry["values"].items()}
+
+    @staticmethod
+    def _matches(entry: Dict[str, Any], series: OHLCVArrays, n: int) -> bool:
+        """Cached entry covers exactly the first n bars of series (spot-checked at both ends)."""
+        if n <= 0 or entry["n"] != n:
+            return False
+        return (
+            entry["first_day"] == series.days[0]
+            and entry["last_day"] == series.days[n - 1]
+            and entry["last_bar"] == (series.close[n - 1], series.volume[n - 1])
+        )
+
+    def _build(self, series: OHLCVArrays, specs: Tuple[IndicatorSpec, ...]) -> Dict[str, Any]:
+        values: Dict[str, _Buffer] = {}
+        state: Dict[str, Dict[str, float]] = {}
+        tr = true_range(series.high, series.low, series.close)
+        for spec in specs:
+            kind, source, period = spec
+            name = spec_name(spec)
+            column = getattr(series, source).astype(np.float64) if source else None
+            if kind == "sma":
+                result = sma(column, period)
+            elif kind == "ema":
+                result = ema(column, period)
+            elif kind == "std":
+                result = rolling_std(column, period)
+                tail = column[-period:]
+                state[name] = {"sum": float(tail.sum()), "sumsq": float((tail * tail).sum())}
+            elif kind == "atr":
+                result = sma(tr, period)
+            elif kind == "vwap":
+                typical = (series.high + series.low + series.close) / 3
+                state[name] = {
+                    "pv": float((typical * series.volume).sum()),
+                    "v": float(series.volume.sum())
+                }
+                result = vwap(series.high, series.low, series.close, series.volume)
+            else:
+                raise ValueError(f"Unknown indicator: {kind}")
+            values[name] = _Buffer(result)
+        return {
+            "n": len(series),
+            "first_day": series.days[0] if len(series) else None,
+            "last_day": series.days[-1] if len(series) else None,
+            "last_bar": (series.close[-1], series.volume[-1]) if len(series) else None,
+            "tr": _Buffer(tr),
+            "values": values,
+            "state": state
+        }
+
+    def _append_bar(self, entry: Dict[str, Any], series: OHLCVArrays, specs: Tuple[IndicatorSpec, ...]):
+        """Extend every indicator by the newest bar in O(1) each."""
+        i = entry["n"]
+        high, low, close = series.high[i], series.low[i], series.close[i]
+        volume = float(series.volume[i])
+        prev_close = series.close[i - 1]
+        tr_value = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        entry["tr"].append(tr_value)
+        tr = entry["tr"].view()
+
+        for spec in specs:
+            kind, source, period = spec
+            name = spec_name(spec)
+            buf = entry["values"][name]
+            prev = buf.view()[-1]
+            column = getattr(series, source) if source else None
+            if kind in ("sma", "atr"):
+                data = tr if kind == "atr" else column
+                if i + 1 < period:
+                    value = np.nan
+                elif np.isnan(prev):
+                    value = float(np.mean(data[i + 1 - period:i + 1]))
+                else:
+                    value = prev + (float(data[i]) - float(data[i - period])) / period
+            elif kind == "ema":
+                if i + 1 < period:
+                    value = np.nan
+                elif np.isnan(prev):
+                    value = float(np.mean(column[:period]))
+                else:
+                    alpha = 2.0 / (period + 1)
+                    value = alpha * float(column[i]) + (1 - alpha) * prev
+            elif kind == "std":
+                st = entry["state"][name]
+                x_new = float(column[i])
+                st["sum"] += x_new
+                st["sumsq"] += x_new * x_new
+                if i >= period:
+                    x_old = float(column[i - period])
+                    st["sum"] -= x_old
+                    st["sumsq"] -= x_old * x_old
+                if i + 1 < period:
+                    value = np.nan
+                else:
+                    variance = (st["sumsq"] - st["sum"] * st["sum"] / period) / (period - 1)
+                    value = float(np.sqrt(max(variance, 0.0)))
+            else:  # vwap
+                st = entry["state"][name]
+                st["pv"] += (high + low + close) / 3 * volume
+                st["v"] += volume
+                value = st["pv"] / st["v"] if st["v"] > 0 else np.nan
+            buf.append(value)
+
+        entry["n"] = i + 1
+        entry["last_day"] = series.days[i]
+        entry["last_bar"] = (series.close[i], series.volume[i])
+
+
+# Global instance
+indicator_engine = IndicatorEngine()
+
+
+def indicators_for_records(
+    records: Sequence[Dict[str, Any]],
+    specs: Sequence[IndicatorSpec],
+    repo=None,
+    ticker: Optional[str] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Indicator values aligned with a list of OHLCV records (keyed by spec_name).
+
+    When the records are a contiguous date range of the ticker's stored series,
+    SMA and rolling std come from the cached full-series computation sliced to
+    the range (warm-up positions blanked, so they match a computation on the
+    records alone). Everything else (and every indicator when the records are
+    not a stored range) is computed on the records directly.
+    """
+    n = len(records)
+    if not n:
+        return {spec_name(spec): np.empty(0) for spec in specs}
+
+    result = {}
+    if repo is not None and ticker:
+        local = [spec for spec in specs if spec[0] in WINDOW_LOCAL_KINDS]
+        version = repo.series_version(ticker) if local else None
+        full = repo.get_ohlcv_arrays(ticker) if local else None
+        lo = full.index_of(records[0]["time"]) if local and len(full) else None
+        if lo is not None and lo + n <= len(full) and full.date_at(lo + n - 1) == records[-1]["time"]:
+            values = indicator_engine.compute((repo.db_path, ticker.upper()), full, local, version)
+            result = {
+                spec_name(spec): window_values(values[spec_name(spec)], lo, lo + n, spec[2] - 1)
+                for spec in local
+            }
+            specs = [spec for spec in specs if spec[0] not in WINDOW_LOCAL_KINDS]
+            if not specs:
+                return result
+
+    columns = {
+        column: np.array([r[column] for r in records], dtype=np.float64)
+        for column in ("high", "low", "close", "volume")
+        if all(column in r for r in records)
+    }
+    for kind, source, period in specs:
+        spec = (kind, source, period)
+        if kind == "sma":
+            result[spec_name(spec)] = sma(columns[source], period)
+        elif kind == "ema":
+            result[spec_name(spec)] = ema(columns[source], period)
+        elif kind == "std":
+            result[spec_name(spec)] = rolling_std(columns[source], period)
+        elif kind == "atr":
+            result[spec_name(spec)] = atr(columns["high"], columns["low"], columns["close"], period)
+        elif kind == "vwap":
+            result[spec_name(spec)] = vwap(columns["high"], columns["low"], columns["close"], columns["volume"])
+        else:
+            raise ValueError(f"Unknown indicator: {kind}")
+    return result
@@ -0,0 +1,419 @@
+"""
+NeoBDM Dash API Client - Fast path that talks to the NeoBDM Dash backend directly.
+
+The NeoBDM pages are Dash apps: every table refresh is a POST to
+`<page>/_dash-update-component` with the current component values, answered
+with JSON containing the new table data. This client replays those callbacks
+over plain HTTP (authenticated requests session) instead of driving a browser,
+turning a tens-of-seconds Playwright scrape into a sub-second request.
+
+Callbacks are discovered from `<page>/_dash-layout` and `<page>/_dash-dependencies`
+by the component ids the Playwright scraper relies on. When those components or
+callbacks can't be found, DashLayoutChanged is raised so the caller can fall
+back to the browser (NeoBDMScraper does this automatically). Server-side
+paginated tables are walked page by page through their page_current callback.
+
+The protocol is reverse-engineered, so NeoBDMScraper only uses this client
+when NEOBDM_DASH_API=1.
+
+Usage:
+    client = NeoBDMDashClient()
+    client.login()
+    df, reference_date = client.get_market_summary('m', 'd')
+    data = client.get_broker_summary('ANTM', '2026-01-12')
+"""
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+REFERENCE_DATE_PATTERN = re.compile(r'\[(\d{4}-\d{2}-\d{2})\]')
+
+
+class DashLayoutChanged(Exception):
+    """The Dash layout/callbacks no longer match what the client expects."""
+
+
+class DashAuthError(Exception):
+    """The Dash endpoints redirected to the login page."""
+
+
+def _clean_text(value: str) -> str:
+    """Same cleanup the Playwright scraper applies to table cell text."""
+    if not value:
+        return ''
+    clean = re.sub(r'\|?Add\s+.*?to\s+Watchlist', '', value, flags=re.IGNORECASE).strip()
+    clean = re.sub(r'\|?Remove\s+from\s+Watchlist', '', clean, flags=re.IGNORECASE).strip()
+    return clean.strip('|').strip()
+
+
+def _cell_text(value: Any) -> str:
+    """Render a JSON cell value the way the DataTable shows it."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _broker_header_key(header: str, avg_key: str) -> Optional[str]:
+    """Python port of the broker table header mapping used by the Playwright scraper."""
+    norm = re.sub(r'[^a-z0-9]', '', header.lower())
+    if not norm:
+        return None
+    if 'broker' in norm or norm == 'brk':
+        return 'broker'
+    if 'nlot' in norm or 'netlot' in norm or norm == 'lot':
+        return 'nlot'
+    if 'nval' in norm or 'netval' in norm or norm == 'val' or 'value' in norm:
+        return 'nval'
+    if 'bavg' in norm or 'savg' in norm or 'avg' in norm:
+        return avg_key
+    return None
+
+
+class NeoBDMDashClient:
+    """HTTP client replaying NeoBDM Dash callbacks."""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        email: Optional[str] = None,
+        password: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        timeout: float = 20.0
+    ):
+        self.base_url = (base_url or os.getenv("NEOBDM_BASE_URL") or "https://neobdm.tech").rstrip('/')
+        self.email = email or os.getenv("NEOBDM_EMAIL")
+        self.password = password or os.getenv("NEOBDM_PASSWORD")
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        # page -> {"layout": ..., "dependencies": ...}
+        self._apps: Dict[str, Dict[str, Any]] = {}
+
+    # ==================== SESSION ====================
+
+    def login(self) -> bool:
+        """Log in with the Django allauth form (same form the browser fills)."""
+        if not self.email or not self.password:
+            return False
+
+        login_url = f"{self.base_url}/accounts/login/"
+        page = self.session.get(login_url, timeout=self.timeout)
+        payload = {"login": self.email, "password": self.password}
+        match = re.search(r'name="csrfmiddlewaretoken"\s+value="([^"]+)"', page.text)
+        if match:
+            payload["csrfmiddlewaretoken"] = match.group(1)
+
+        response = self.session.post(
+            login_url, data=payload, headers={"Referer": login_url}, timeout=self.timeout
+        )
+        return response.url.rstrip('/').endswith('/home')
+
+    def load_cookies(self, cookies: List[Dict[str, Any]]):
+        """Reuse an existing (e.g. Playwright) session: [{"name", "value", "domain", "path"}, ...]."""
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain', ''), path=cookie.get('path', '/')
+            )
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request, logging in again once if the session has expired."""
+        for attempt in range(2):
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            if '/accounts/login' not in response.url:
+                return response
+            if attempt == 0 and self.login():
+                continue
+        raise DashAuthError(f"Not authenticated for {url}")
+
+    # ==================== DASH PROTOCOL ====================
+
+    def _app(self, page: str) -> Dict[str, Any]:
+        """Fetch (and cache) the layout and callback dependencies of a Dash page."""
+        if page not in self._apps:
+            app = {}
+            for key, endpoint in (("layout", "_dash-layout"), ("dependencies", "_dash-dependencies")):
+                response = self._request("GET", f"{self.base_url}/{page}/{endpoint}")
+                if response.status_code != 200:
+                    raise DashLayoutChanged(f"{page}/{endpoint} returned HTTP {response.status_code}")
+                try:
+                    app[key] = response.json()
+                except ValueError:
+                    raise DashLayoutChanged(f"{page}/{endpoint} did not return JSON")
+            self._apps[page] = app
+        return self._apps[page]
+
+    @staticmethod
+    def _walk(node: Any) -> Iterator[Dict[str, Any]]:
+        """Yield every component of a Dash layout tree, in document order."""
+        if isinstance(node, list):
+            for child in node:
+                yield from NeoBDMDashClient._walk(child)
+        elif isinstance(node, dict) and 'props' in node:
+            yield node
+            yield from NeoBDMDashClient._walk(node['props'].get('children'))
+
+    @staticmethod
+    def _parse_outputs(output: str) -> List[Tuple[str, str]]:
+        """'..a.data...b.data..' (multi) or 'a.data' (single) -> [(id, prop), ...]."""
+        if output.startswith('..') and output.endswith('..'):
+            parts = output[2:-2].split('...')
+        else:
+            parts = [output]
+        return [tuple(part.rsplit('.', 1)) for part in parts]
+
+    @staticmethod
+    def _find_callback(dependencies: List[Dict], required_ids: List[str], table_ids: List[str]) -> Dict:
+        """Callback that reads all required_ids (as input or state) and outputs every table's data."""
+        for callback in dependencies:
+            if callback.get('clientside_function'):
+                continue
+            read_ids = {dep['id'] for dep in callback.get('inputs', []) + callback.get('state', [])}
+            outputs = NeoBDMDashClient._parse_outputs(callback.get('output', ''))
+            output_data_ids = {cid for cid, prop in outputs if prop == 'data'}
+            if set(required_ids) <= read_ids and set(table_ids) <= output_data_ids:
+                return callback
+        raise DashLayoutChanged(f"No callback reads {required_ids} and updates {table_ids}")
+
+    def _call(self, page: str, callback: Dict, overrides: Dict[Tuple[str, str], Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Replay one callback. Inputs/state take their value from overrides,
+        falling back to the value in the initial layout.
+
+        Returns {component_id: {prop: value}}.
+        """
+        app = self._app(page)
+        components = {c['props'].get('id'): c for c in self._walk(app['layout']) if c['props'].get('id')}
+
+        def resolve(dep):
+            key = (dep['id'], dep['property'])
+            if key in overrides:
+                value = overrides[key]
+            else:
+                value = components.get(dep['id'], {}).get('props', {}).get(dep['property'])
+            return {"id": dep['id'], "property": dep['property'], "value": value}
+
+        outputs = self._parse_outputs(callback['output'])
+        payload = {
+            "output": callback['output'],
+            "outputs": [{"id": cid, "property": prop} for cid, prop in outputs],
+            "inputs": [resolve(dep) for dep in callback.get('inputs', [])],
+            "state": [resolve(dep) for dep in callback.get('state', [])],
+            "changedPropIds": [f"{cid}.{prop}" for cid, prop in overrides]
+        }
+        if len(outputs) == 1:
+            payload["outputs"] = payload["outputs"][0]
+
+        headers = {"Content-Type": "application/json", "Referer": f"{self.base_url}/{page}/"}
+        csrf = self.session.cookies.get('csrftoken')
+        if csrf:
+            headers["X-CSRFToken"] = csrf
+
+        response = self._request(
+            "POST", f"{self.base_url}/{page}/_dash-update-component", json=payload, headers=headers
+        )
+        if response.status_code == 204:
+            # PreventUpdate: nothing to show for these inputs
+            return {}
+        if response.status_code != 200:
+            raise DashLayoutChanged(f"{page} callback returned HTTP {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            raise DashLayoutChanged(f"{page} callback did not return JSON")
+
+        result = body.get('response', {})
+        if 'props' in result and len(outputs) == 1:
+            # Legacy single-output format: {"response": {"props": {...}}}
+            return {outputs[0][0]: result['props']}
+        return result
+
+    @staticmethod
+    def _table_rows(table: Dict[str, Any], update: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        DataTable rows keyed by the visible column names (what the DOM scrape sees),
+        with tooltips appended as "value|tooltip".
+        """
+        columns = update.get('columns') or table['props'].get('columns') or []
+        names = {}
+        for column in columns:
+            name = column.get('name', column['id'])
+            if isinstance(name, list):
+                # Multi-row headers: the DOM scrape keeps the last (leaf) header
+                name = name[-1]
+            names[column['id']] = name
+
+        tooltips = update.get('tooltip_data') or []
+        rows = []
+        for index, record in enumerate(update.get('data') or []):
+            row_tips = tooltips[index] if index < len(tooltips) else {}
+            row = {}
+            for column_id, name in names.items():
+                text = _clean_text(_cell_text(record.get(column_id)))
+                tip = row_tips.get(column_id) if row_tips else None
+                if isinstance(tip, dict):
+                    tip = tip.get('value')
+                tip = _clean_text(_cell_text(tip))
+                if tip and tip != text:
+                    text = f"{text}|{tip}" if text else tip
+                row[name] = text
+            rows.append(row)
+        return rows
+
+    # ==================== PAGES ====================
+
+    def get_market_summary(self, method: str = 'm', period: str = 'd') -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """
+        Market Summary table via the Dash callback.
+        Same return shape as NeoBDMScraper.get_market_summary: (DataFrame | None, reference_date).
+        """
+        page = "market_summary"
+        app = self._app(page)
+        components = list(self._walk(app['layout']))
+        ids = {c['props'].get('id') for c in components}
+        if not {'method', 'summary-mode'} <= ids:
+            raise DashLayoutChanged("market_summary: method/summary-mode controls not found")
+
+        tables = [c for c in components if c.get('type') == 'DataTable']
+        if not tables:
+            raise DashLayoutChanged("market_summary: no DataTable in layout")
+        table = tables[0]
+        table_id = table['props']['id']
+
+        overrides = {('method', 'value'): method, ('summary-mode', 'value'): period}
+        # Checklists: Normalize OFF, Moving Average ON, Compatible Only ON
+        for component in components:
+            option_values = {o.get('value') for o in component['props'].get('options') or [] if isinstance(o, dict)}
+            if option_values & {'normalize', 'ma', 'compatible'} and component['props'].get('id'):
+                value = [v for v in component['props'].get('value') or [] if v != 'normalize']
+                value += [v for v in ('ma', 'compatible') if v in option_values and v not in value]
+                overrides[(component['props']['id'], 'value')] = value
+
+        callback = self._find_callback(app['dependencies'], ['method', 'summary-mode'], [table_id])
+        response = self._call(page, callback, self._reads(callback, overrides))
+        if table_id not in response:
+            return None, None
+
+        reference_date = None
+        match = REFERENCE_DATE_PATTERN.search(str({k: v for k, v in response.items() if k != table_id}))
+        if match:
+            reference_date = match.group(1)
+
+        rows = self._table_rows(table, response[table_id])
+        for update in self._remaining_pages(page, table, response[table_id], overrides):
+            rows += self._table_rows(table, update)
+        if not rows:
+            return None, reference_date
+
+        df = pd.DataFrame(rows).drop_duplicates().reset_index(drop=True)
+        return df, reference_date
+
+    @staticmethod
+    def _reads(callback: Dict, overrides: Dict[Tuple[str, str], Any]) -> Dict[Tuple[str, str], Any]:
+        """The overrides a callback actually reads (as input or state)."""
+        read = {dep['id'] for dep in callback.get('inputs', []) + callback.get('state', [])}
+        return {k: v for k, v in overrides.items() if k[0] in read}
+
+    def _remaining_pages(
+        self,
+        page: str,
+        table: Dict[str, Any],
+        first: Dict[str, Any],
+        overrides: Dict[Tuple[str, str], Any]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Table updates of pages 2..page_count of a server-side paginated DataTable.
+
+        Native pagination needs nothing (the first response holds every row).
+        Custom (server-side) pagination is replayed through the callback that
+        reads the table's page_current; without one, DashLayoutChanged sends the
+        caller back to the browser, which pages through the table itself.
+        """
+        props = table['props']
+        table_id = props['id']
+        page_action = first.get('page_action', props.get('page_action', 'native'))
+        page_count = first.get('page_count', props.get('page_count')) or 1
+        if page_action != 'custom' or page_count <= 1:
+            return
+
+        callback = next((
+            cb for cb in self._app(page)['dependencies']
+            if not cb.get('clientside_function')
+            and (table_id, 'page_current') in {(d['id'], d['property']) for d in cb.get('inputs', [])}
+            and (table_id, 'data') in self._parse_outputs(cb.get('output', ''))
+        ), None)
+        if callback is None:
+            raise DashLayoutChanged(f"{page}: {page_count} table pages but no page_current callback")
+
+        for page_current in range(1, page_count):
+            page_overrides = self._reads(callback, overrides)
+            page_overrides[(table_id, 'page_current')] = page_current
+            response = self._call(page, callback, page_overrides)
+            if table_id not in response:
+                raise DashLayoutChanged(f"{page}: page {page_current + 1} of {page_count} returned no table")
+            yield response[table_id]
+
+    def get_broker_summary(self, ticker: str, date_str: str) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Broker Summary (net buy / net sell tables) via the Dash callback.
+        Same return shape as NeoBDMScraper.get_broker_summary: {"buy": [...], "sell": [...]} or None.
+        """
+        page = "broker_summary"
+        app = self._app(page)
+        components = list(self._walk(app['layout']))
+
+        dropdowns = [c for c in components if c.get('type') == 'Dropdown' and c['props'].get('id')]
+        ticker_control = next(
+            (c for c in dropdowns if re.search(r'ticker|stock|symbol|emiten', str(c['props']['id']), re.I)),
+            dropdowns[0] if dropdowns else None
+        )
+        date_control = next(
+            (c for c in components if c['props'].get('placeholder') == 'Tanggal' and c['props'].get('id')),
+            next((c for c in components if c.get('type') == 'DatePickerSingle' and c['props'].get('id')), None)
+        )
+        if not ticker_control or not date_control:
+            raise DashLayoutChanged("broker_summary: ticker/date controls not found")
+
+        date_prop = 'date' if date_control.get('type') == 'DatePickerSingle' else 'value'
+        ticker_id = ticker_control['props']['id']
+        date_id = date_control['props']['id']
+
+        tables = [c for c in components if c.get('type') == 'DataTable']
+        if len(tables) < 2:
+            raise DashLayoutChanged("broker_summary: expected buy and sell DataTables")
+        buy_table, sell_table = tables[0], tables[1]
+
+        callback = self._find_callback(
+            app['dependencies'], [ticker_id, date_id],
+            [buy_table['props']['id'], sell_table['props']['id']]
+        )
+        response = self._call(page, callback, {
+            (ticker_id, 'value'): ticker.upper(),
+            (date_id, date_prop): date_str
+        })
+
+        def extract(table, avg_key):
+            rows = []
+            for row in self._table_rows(table, response.get(table['props']['id'], {})):
+                mapped = {}
+                for header, value in row.items():
+                    key = _broker_header_key(header, avg_key)
+                    if key and key not in mapped:
+                        mapped[key] = value
+                if mapped.get('broker'):
+                    rows.append(mapped)
+            return rows
+
+        data = {"buy": extract(buy_table, 'bavg'), "sell": extract(sell_table, 'savg')}
+        if not data['buy'] and not data['sell']:
+            return None
+        return data
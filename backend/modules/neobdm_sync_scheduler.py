@@ -0,0 +1,178 @@
+"""
+NeoBDM Sync Scheduler - Parallel isolated browser contexts for NeoBDM scraping.
+
+Runs a list of scrape jobs concurrently on ONE Chromium process. Every job gets
+its own BrowserContext (separate cookies/storage), performs its own login, and
+is retried with a brand-new context if it fails. This keeps the isolation that
+the old "fresh browser per task" approach gave us, without paying for six
+browser launches and six strictly sequential scrapes.
+
+Usage:
+    scheduler = NeoBDMSyncScheduler(concurrency=3)
+    report = await scheduler.run([
+        {"name": "m/d", "run": some_async_fn},   # some_async_fn(scraper) -> result
+        ...
+    ])
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from modules.scraper_neobdm import NeoBDMScraper
+
+JobFn = Callable[[NeoBDMScraper], Awaitable[Any]]
+
+
+class NeoBDMSyncScheduler:
+    """Bounded-concurrency scheduler for NeoBDM scrape jobs."""
+
+    def __init__(
+        self,
+        concurrency: int = 3,
+        max_retries: int = 2,
+        retry_delay: float = 3.0,
+        login_stagger: float = 1.0,
+        headless: bool = True,
+        base_url: Optional[str] = None,
+        scraper_factory: Optional[Callable[[], NeoBDMScraper]] = None
+    ):
+        """
+        Args:
+            concurrency: Number of browser contexts running at the same time
+            max_retries: Extra attempts per job after the first failure
+            retry_delay: Base delay (seconds) before a retry, multiplied by attempt number
+            login_stagger: Delay (seconds) between job starts so logins don't hit NeoBDM at once
+            headless: Launch Chromium headless
+            base_url: Override NeoBDM base URL (e.g. a local mock Dash app)
+            scraper_factory: Callable returning a fresh scraper (defaults to NeoBDMScraper)
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_delay = retry_delay
+        self.login_stagger = login_stagger
+        self.headless = headless
+        self.scraper_factory = scraper_factory or (lambda: NeoBDMScraper(base_url=base_url))
+
+    async def run(self, jobs: List[Dict], browser=None) -> Dict[str, Any]:
+        """
+        Execute all jobs and return a report with per-job timing metrics.
+
+        Args:
+            jobs: List of {"name": str, "run": async fn(scraper) -> result}
+            browser: Optional already-launched browser to share. When omitted a
+                     Chromium instance is launched and closed by the scheduler.
+
+        Returns:
+            {
+                "jobs": [ {name, status, attempts, login_seconds, job_seconds,
+                           queued_seconds, total_seconds, result, error, waits}, ... ],
+                "concurrency": int,
+                "wall_seconds": float,
+                "sum_job_seconds": float,
+                "speedup": float,
+                "success_count": int,
+                "failed_count": int
+            }
+        """
+        started = time.perf_counter()
+        playwright = None
+        owns_browser = browser is None
+
+        if owns_browser:
+            from playwright.async_api import async_playwright
+            playwright = await async_playwright().start()
+            browser = await playwright.chromium.launch(headless=self.headless)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            results = await asyncio.gather(*[
+                self._run_job(browser, job, semaphore, index)
+                for index, job in enumerate(jobs)
+            ])
+        finally:
+            if owns_browser:
+                await browser.close()
+                await playwright.stop()
+
+        wall_seconds = time.perf_counter() - started
+        sum_job_seconds = sum(r['total_seconds'] for r in results)
+
+        return {
+            "jobs": results,
+            "concurrency": self.concurrency,
+            "wall_seconds": round(wall_seconds, 2),
+            "sum_job_seconds": round(sum_job_seconds, 2),
+            "speedup": round(sum_job_seconds / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+            "success_count": sum(1 for r in results if r['status'] == 'success'),
+            "failed_count": sum(1 for r in results if r['status'] != 'success')
+        }
+
+    async def _run_job(self, browser, job: Dict, semaphore: asyncio.Semaphore, index: int) -> Dict[str, Any]:
+        """Run one job with retries inside its own isolated context."""
+        name = job.get('name', f"job-{index}")
+        metrics = {
+            "name": name,
+            "status": "pending",
+            "attempts": 0,
+            "login_seconds": 0.0,
+            "job_seconds": 0.0,
+            "queued_seconds": 0.0,
+            "total_seconds": 0.0,
+            "result": None,
+            "error": None,
+            "waits": {}
+        }
+
+        queued_at = time.perf_counter()
+        async with semaphore:
+            metrics['queued_seconds'] = round(time.perf_counter() - queued_at, 2)
+
+            # Spread logins of the first wave so NeoBDM doesn't see a burst
+            if self.login_stagger and index < self.concurrency:
+                await asyncio.sleep(self.login_stagger * index)
+
+            job_started = time.perf_counter()
+            for attempt in range(1, self.max_retries + 2):
+                metrics['attempts'] = attempt
+                scraper = self.scraper_factory()
+                try:
+                    await scraper.init_context(browser)
+
+                    login_started = time.perf_counter()
+                    login_success = await scraper.login()
+                    metrics['login_seconds'] = round(
+                        metrics['login_seconds'] + time.perf_counter() - login_started, 2
+                    )
+                    if not login_success:
+                        raise RuntimeError("Login failed")
+
+                    run_started = time.perf_counter()
+                    metrics['result'] = await job['run'](scraper)
+                    metrics['job_seconds'] = round(time.perf_counter() - run_started, 2)
+                    metrics['status'] = "success"
+                    metrics['error'] = None
+                    break
+                except Exception as e:
+                    metrics['status'] = "failed"
+                    metrics['error'] = str(e)
+                    print(f"[{name}] Attempt {attempt} failed: {e}", flush=True)
+                finally:
+                    # Wait durations of the last attempt (per wait label), for tuning/graphing
+                    if hasattr(scraper, 'get_wait_metrics'):
+                        metrics['waits'] = scraper.get_wait_metrics()
+                    try:
+                        await scraper.close()
+                    except Exception:
+                        pass
+
+                if attempt <= self.max_retries:
+                    await asyncio.sleep(self.retry_delay * attempt)
+
+            metrics['total_seconds'] = round(time.perf_counter() - job_started, 2)
+
+        print(
+            f"[{name}] {metrics['status']} after {metrics['attempts']} attempt(s) "
+            f"in {metrics['total_seconds']}s (login {metrics['login_seconds']}s)",
+            flush=True
+        )
+        return metrics
@@ -0,0 +1,264 @@
+"""
+OHLCV Refresh Engine
+Brings every ticker in price_volume up to date in one pass.
+
+Tickers are grouped by their missing date range (same latest stored date =>
+same fetch window) and fetched in multi-ticker batches with bounded
+concurrency and a minimum spacing between provider requests. All fetched rows
+are written in a single bulk transaction at the end of the run.
+
+The data source is pluggable: anything with a
+`fetch(tickers, start_date, end_date) -> {ticker: [records]}` method works,
+so tests can use a local fake instead of Yahoo Finance.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from modules.ohlcv_service import YahooOHLCVProvider
+
+logger = logging.getLogger(__name__)
+
+
+class _RateLimiter:
+    """Enforce a minimum interval between provider requests."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            delay = self._last + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+
+class OHLCVRefreshJob:
+    """Progress and result of one refresh run."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.status = "pending"
+        self.started_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.total_tickers = 0
+        self.tickers_done = 0
+        self.total_batches = 0
+        self.batches_done = 0
+        self.result = None
+        self.error = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {
+                "tickers_total": self.total_tickers,
+                "tickers_done": self.tickers_done,
+                "batches_total": self.total_batches,
+                "batches_done": self.batches_done,
+                "percent": round(self.tickers_done / self.total_tickers * 100, 1) if self.total_tickers else 0.0
+            }
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class OHLCVRefreshEngine:
+    """Incremental refresh of all stored tickers in grouped, concurrent batches."""
+
+    def __init__(
+        self,
+        repo,
+        provider=None,
+        batch_size: int = 40,
+        concurrency: int = 4,
+        min_interval: float = 0.5
+    ):
+        self.repo = repo
+        self.provider = provider or YahooOHLCVProvider()
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.min_interval = max(0.0, min_interval)
+
+    def plan(self, today=None) -> Dict[str, Any]:
+        """
+        Split stored tickers into skipped ones and fetch batches.
+
+        Returns:
+            {"results": [...skipped ticker results...],
+             "batches": [(start_date, [tickers]), ...],
+             "latest": {ticker: latest_date}}
+        """
+        today = today or datetime.now().date()
+        latest = self.repo.get_latest_dates()
+        results = []
+        groups: Dict[str, List[str]] = {}
+
+        for ticker in self.repo.get_all_tickers():
+            latest_date = latest.get(ticker)
+            if not latest_date:
+                results.append({"ticker": ticker, "status": "no_existing_data", "records_added": 0})
+                continue
+            latest_dt = datetime.strptime(latest_date, "%Y-%m-%d").date()
+            # Check if data is already up to date
+            if latest_dt >= today - timedelta(days=1):
+                results.append({
+                    "ticker": ticker,
+                    "status": "already_up_to_date",
+                    "records_added": 0,
+                    "latest_date": latest_date
+                })
+                continue
+            start = (latest_dt + timedelta(days=1)).strftime("%Y-%m-%d")
+            groups.setdefault(start, []).append(ticker)
+
+        batches = [
+            (start, tickers[i:i + self.batch_size])
+            for start, tickers in sorted(groups.items())
+            for i in range(0, len(tickers), self.batch_size)
+        ]
+        return {"results": results, "batches": batches, "latest": latest}
+
+    async def run(self, job: Optional[OHLCVRefreshJob] = None) -> Dict[str, Any]:
+        """
+        Refresh every stored ticker and return the refresh-all summary.
+
+        Args:
+            job: Optional job object updated with progress while running
+        """
+        job = job or OHLCVRefreshJob(uuid.uuid4().hex[:12])
+        job.status = "running"
+        plan = self.plan()
+        batches = plan["batches"]
+        results = plan["results"]
+        errors = []
+        job.total_tickers = len(results) + sum(len(tickers) for _, tickers in batches)
+        job.tickers_done = len(results)
+        job.total_batches = len(batches)
+
+        end_date = datetime.now().strftime("%Y-%m-%d")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = _RateLimiter(self.min_interval)
+        fetched: Dict[str, List[Dict[str, Any]]] = {}
+
+        async def fetch_batch(start_date: str, tickers: List[str]):
+            async with semaphore:
+                await limiter.wait()
+                try:
+                    data = await asyncio.to_thread(self.provider.fetch, tickers, start_date, end_date)
+                    for ticker in tickers:
+                        fetched[ticker] = data.get(ticker) or []
+                except Exception as e:
+                    logger.error(f"Error refreshing batch {tickers[0]}..{tickers[-1]} from {start_date}: {e}")
+                    errors.extend({"ticker": ticker, "error": str(e)} for ticker in tickers)
+                finally:
+                    job.batches_done += 1
+                    job.tickers_done += len(tickers)
+
+        await asyncio.gather(*(fetch_batch(start, tickers) for start, tickers in batches))
+
+        # Store everything in one transaction
+        written = await asyncio.to_thread(
+            self.repo.bulk_upsert_ohlcv, {t: records for t, records in fetched.items() if records}
+        )
+        new_latest = self.repo.get_latest_dates() if written else plan["latest"]
+
+        total_records_added = 0
+        tickers_updated = 0
+        for _, tickers in batches:
+            for ticker in tickers:
+                if ticker not in fetched:
+                    continue  # batch failed, reported in errors
+                previous = plan["latest"].get(ticker)
+                records_added = written.get(ticker, 0)
+                if not records_added:
+                    results.append({
+                        "ticker": ticker,
+                        "status": "no_new_data",
+                        "records_added": 0,
+                        "latest_date": previous
+                    })
+                    continue
+                total_records_added += records_added
+                tickers_updated += 1
+                results.append({
+                    "ticker": ticker,
+                    "status": "updated",
+                    "records_added": records_added,
+                    "previous_latest": previous,
+                    "new_latest": new_latest.get(ticker)
+                })
+
+        logger.info(
+            f"OHLCV refresh {job.job_id}: {tickers_updated} tickers updated, "
+            f"{total_records_added} records in {len(batches)} batches"
+        )
+        results.sort(key=lambda r: r["ticker"])
+        summary = {
+            "tickers_processed": job.total_tickers,
+            "tickers_updated": tickers_updated,
+            "total_records_added": total_records_added,
+            "results": results,
+            "errors": errors
+        }
+        job.result = summary
+        job.status = "completed"
+        job.finished_at = datetime.now().isoformat()
+        return summary
+
+
+class RefreshJobRegistry:
+    """In-process registry of recent refresh jobs for the progress endpoint."""
+
+    MAX_JOBS = 20
+
+    def __init__(self):
+        self._jobs: Dict[str, OHLCVRefreshJob] = {}
+        self._lock = threading.Lock()
+
+    def create(self) -> OHLCVRefreshJob:
+        job = OHLCVRefreshJob(uuid.uuid4().hex[:12])
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.MAX_JOBS:
+                self._jobs.pop(next(iter(self._jobs)))
+        return job
+
+    def get(self, job_id: str) -> Optional[OHLCVRefreshJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def running(self) -> Optional[OHLCVRefreshJob]:
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status in ("pending", "running"):
+                    return job
+        return None
+
+
+refresh_jobs = RefreshJobRegistry()
+
+
+async def run_refresh_job(engine: OHLCVRefreshEngine, job: OHLCVRefreshJob) -> Optional[Dict[str, Any]]:
+    """Run an engine for a registered job, recording failures on the job."""
+    try:
+        return await engine.run(job)
+    except Exception as e:
+        logger.error(f"OHLCV refresh job {job.job_id} failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+        job.finished_at = datetime.now().isoformat()
+        return None
@@ -0,0 +1,327 @@
+"""
+OHLCV Service
+Single entry point for daily bars: one canonical table (price_volume), one
+incremental fetch policy and the repository's in-process read cache.
+
+Every consumer (price-volume routes, MarketData, the NeoBDM volume endpoints,
+Alpha Hunter) reads through here so a ticker is downloaded at most once per
+missing range instead of once per cache.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from db.price_volume_repository import PriceVolumeRepository, price_volume_repo
+
+logger = logging.getLogger(__name__)
+
+
+class YahooOHLCVProvider:
+    """Multi-ticker OHLCV source backed by yfinance.download."""
+
+    def __init__(self, suffix: str = ".JK"):
+        self.suffix = suffix
+
+    def _symbol(self, ticker: str) -> str:
+        # Tickers that already carry an exchange suffix (e.g. AAPL.US, BRMS.JK) are used as-is
+        return ticker if "." in ticker else f"{ticker}{self.suffix}"
+
+    def fetch(self, tickers: List[str], start_date: str, end_date: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Download daily bars for several tickers in one request.
+
+        Args:
+            tickers: Ticker symbols without exchange suffix
+            start_date: Inclusive start date (YYYY-MM-DD)
+            end_date: Exclusive end date (YYYY-MM-DD)
+
+        Returns:
+            Mapping of ticker -> list of OHLCV records (time/open/high/low/close/volume)
+        """
+        import yfinance as yf
+
+        symbols = {self._symbol(t): t for t in tickers}
+        df = yf.download(
+            list(symbols), start=start_date, end=end_date, group_by="ticker",
+            auto_adjust=True, progress=False, threads=False
+        )
+        results = {t: [] for t in tickers}
+        if df is None or df.empty:
+            return results
+
+        for symbol, ticker in symbols.items():
+            if isinstance(df.columns, pd.MultiIndex):
+                if symbol not in df.columns.get_level_values(0):
+                    continue
+                frame = df[symbol]
+            else:
+                # Older yfinance returns flat columns for a single symbol
+                frame = df
+            results[ticker] = self._frame_to_records(frame)
+        return results
+
+    @staticmethod
+    def _frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+        # Dates where only other tickers in the batch traded come back as NaN rows
+        frame = frame.dropna(subset=["Open", "High", "Low", "Close", "Volume"])
+        return [
+            {
+                "time": date_idx.strftime("%Y-%m-%d"),
+                "open": float(row["Open"]),
+                "high": float(row["High"]),
+                "low": float(row["Low"]),
+                "close": float(row["Close"]),
+                "volume": int(row["Volume"])
+            }
+            for date_idx, row in frame.iterrows()
+        ]
+
+
+class OHLCVService:
+    """Incremental fetch-and-store of daily bars on top of PriceVolumeRepository."""
+
+    # Don't hit the provider again for the same missing range within this window
+    # (weekends/holidays legitimately return nothing)
+    RETRY_SECONDS = 900
+
+    # A start_date this many calendar days (or fewer) before the first stored bar
+    # is already covered: the gap is a weekend/holiday run, not missing history
+    BACKFILL_GAP_DAYS = 7
+
+    def __init__(self, repo: Optional[PriceVolumeRepository] = None, provider=None):
+        self.repo = repo or price_volume_repo
+        self.provider = provider or YahooOHLCVProvider()
+        self._attempts: Dict[Tuple[str, str], float] = {}
+        # ticker -> oldest start_date a full fetch has already covered (recent
+        # listings have no bars that far back, so the store alone can't tell)
+        self._covered_from: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        # Background top-ups (schedule_history): ticker -> start_date, last scheduled time
+        self._pending: Dict[str, str] = {}
+        self._scheduled: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def clean_ticker(ticker: str) -> str:
+        """Strip watchlist decorations and normalize case."""
+        return ticker.replace('★', '').replace('⭐', '').strip().upper()
+
+    def _plan_fetch(self, ticker: str, start_date: str) -> Tuple[Optional[str], str]:
+        """
+        Decide what (if anything) must be downloaded to cover start_date..today.
+
+        Returns:
+            (fetch_start or None, source label)
+        """
+        latest_date = self.repo.get_latest_date(ticker)
+        if not latest_date:
+            return start_date, "fetched_full"
+
+        # Requested range is older than what we have (and than what was already fetched)
+        covered_from = min(self.repo.get_earliest_date(ticker), self._covered_from.get(ticker, latest_date))
+        gap = datetime.strptime(covered_from, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')
+        if gap.days > self.BACKFILL_GAP_DAYS:
+            return start_date, "fetched_full"
+
+        latest_dt = datetime.strptime(latest_date, '%Y-%m-%d').date()
+        if latest_dt < datetime.now().date() - timedelta(days=1):
+            return (latest_dt + timedelta(days=1)).strftime('%Y-%m-%d'), "fetched_incremental"
+        return None, "database"
+
+    def ensure_history(self, ticker: str, start_date: str) -> Dict[str, Any]:
+        """
+        Make sure the store covers start_date..yesterday for a ticker.
+
+        Args:
+            ticker: Stock ticker symbol
+            start_date: Oldest date the caller needs (YYYY-MM-DD)
+
+        Returns:
+            {"source": "database" | "fetched_full" | "fetched_incremental", "records_added": int}
+        """
+        ticker = self.clean_ticker(ticker)
+        fetch_start, source = self._plan_fetch(ticker, start_date)
+        if not fetch_start:
+            return {"source": source, "records_added": 0}
+
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        if fetch_start >= end_date:
+            return {"source": "database", "records_added": 0}
+
+        key = (ticker, fetch_start)
+        with self._lock:
+            last_attempt = self._attempts.get(key)
+            if last_attempt is not None and time.monotonic() - last_attempt < self.RETRY_SECONDS:
+                return {"source": "database", "records_added": 0}
+            self._attempts[key] = time.monotonic()
+
+        try:
+            logger.info(f"Fetching OHLCV for {ticker} from {fetch_start} ({source})")
+            records = self.provider.fetch([ticker], fetch_start, end_date).get(ticker) or []
+        except Exception as e:
+            logger.error(f"Error fetching OHLCV for {ticker}: {e}")
+            return {"source": "database", "records_added": 0}
+
+        if not records:
+            logger.warning(f"No OHLCV data returned for {ticker} from {fetch_start}")
+            return {"source": "database", "records_added": 0}
+
+        records_added = self.repo.upsert_ohlcv_data(ticker, records)
+        self._mark_covered(ticker, fetch_start, source)
+        return {"source": source, "records_added": records_added}
+
+    def _mark_covered(self, ticker: str, fetch_start: str, source: str):
+        """Remember how far back a full fetch went (the attempt stamp is kept as well)."""
+        if source != "fetched_full":
+            return
+        with self._lock:
+            covered_from = self._covered_from.get(ticker)
+            if covered_from is None or fetch_start < covered_from:
+                self._covered_from[ticker] = fetch_start
+
+    def ensure_histories(self, tickers: List[str], start_date: str) -> Dict[str, Dict[str, Any]]:
+        """
+        ensure_history for many tickers: tickers needing the same range are
+        fetched in one provider call and stored in one bulk transaction.
+
+        Returns:
+            {TICKER: {"source", "records_added"}}
+        """
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        results = {}
+        groups: Dict[Tuple[str, str], List[str]] = {}
+        now = time.monotonic()
+        for ticker in {self.clean_ticker(t) for t in tickers if t}:
+            results[ticker] = {"source": "database", "records_added": 0}
+            fetch_start, source = self._plan_fetch(ticker, start_date)
+            if not fetch_start or fetch_start >= end_date:
+                continue
+            with self._lock:
+                last_attempt = self._attempts.get((ticker, fetch_start))
+                if last_attempt is not None and now - last_attempt < self.RETRY_SECONDS:
+                    continue
+                self._attempts[(ticker, fetch_start)] = now
+            groups.setdefault((fetch_start, source), []).append(ticker)
+
+        fetched = {}
+        for (fetch_start, source), group in groups.items():
+            try:
+                logger.info(f"Fetching OHLCV for {len(group)} tickers from {fetch_start} ({source})")
+                data = self.provider.fetch(sorted(group), fetch_start, end_date)
+            except Exception as e:
+                logger.error(f"Error fetching OHLCV for {len(group)} tickers: {e}")
+                continue
+            for ticker in group:
+                if data.get(ticker):
+                    fetched[ticker] = data[ticker]
+                    results[ticker]["source"] = source
+                    self._mark_covered(ticker, fetch_start, source)
+
+        if fetched:
+            for ticker, count in self.repo.bulk_upsert_ohlcv(fetched).items():
+                results[ticker]["records_added"] = count
+        return results
+
+    def schedule_history(self, ticker: str, start_date: str) -> bool:
+        """
+        Queue ensure_history for a background thread and return immediately.
+
+        Readers that must not wait on the provider (ETag checks, cached
+        payloads) serve what is stored and let this top it up. A ticker is
+        queued at most once per RETRY_SECONDS.
+
+        Returns:
+            True if the ticker was newly queued
+        """
+        ticker = self.clean_ticker(ticker)
+        now = time.monotonic()
+        with self._lock:
+            if ticker in self._pending or now - self._scheduled.get(ticker, -self.RETRY_SECONDS) < self.RETRY_SECONDS:
+                return False
+            self._pending[ticker] = start_date
+            self._scheduled[ticker] = now
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_scheduled, name="ohlcv-topup", daemon=True)
+                self._thread.start()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the scheduled top-ups are done (used by jobs and tests)."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run_scheduled(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                batch, self._pending = self._pending, {}
+            by_start: Dict[str, List[str]] = {}
+            for ticker, start_date in batch.items():
+                by_start.setdefault(start_date, []).append(ticker)
+            for start_date, tickers in by_start.items():
+                try:
+                    self.ensure_histories(tickers, start_date)
+                except Exception as e:
+                    logger.error(f"Background OHLCV top-up failed for {len(tickers)} tickers: {e}")
+
+    def get_history(
+        self,
+        ticker: str,
+        start_date: str,
+        end_date: Optional[str] = None,
+        refresh: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Daily bars for a ticker (ascending), fetching missing ranges first.
+
+        Args:
+            ticker: Stock ticker symbol
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD), defaults to today
+            refresh: Fetch missing data before reading (False = store only)
+        """
+        ticker = self.clean_ticker(ticker)
+        if refresh:
+            self.ensure_history(ticker, start_date)
+        end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+        return self.repo.get_ohlcv_data(ticker, start_date, end_date)
+
+    def get_history_frame(self, ticker: str, start_date: str, end_date: Optional[str] = None) -> pd.DataFrame:
+        """get_history as a DataFrame indexed by date with open/high/low/close/volume columns."""
+        records = self.get_history(ticker, start_date, end_date)
+        if not records:
+            return pd.DataFrame(columns=['open', 'high', 'low', 'close', 'volume'])
+        df = pd.DataFrame(records)
+        df['date'] = pd.to_datetime(df.pop('time'))
+        return df.set_index('date')
+
+    def save_records(self, ticker: str, records: List[Dict[str, Any]]) -> int:
+        """Store externally obtained bars (time/open/high/low/close/volume)."""
+        return self.repo.upsert_ohlcv_data(self.clean_ticker(ticker), records)
+
+
+_services: Dict[str, OHLCVService] = {}
+_services_lock = threading.Lock()
+
+
+def get_ohlcv_service(db_path: Optional[str] = None) -> OHLCVService:
+    """Shared service for a database file (the default store when db_path is None)."""
+    repo = price_volume_repo if db_path is None else None
+    key = db_path or price_volume_repo.db_path
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = OHLCVService(repo or PriceVolumeRepository(db_path))
+            _services[key] = service
+        return service
+
+
+# Global instance over the default store
+ohlcv_service = get_ohlcv_service()
@@ -1,25 +1,260 @@
 import os
 import asyncio
+import time
+from collections import deque
 import pandas as pd
 from playwright.async_api import async_playwright
 from dotenv import load_dotenv
+from modules.neobdm_dash_client import NeoBDMDashClient, DashLayoutChanged
 
 load_dotenv()
 
 class NeoBDMScraper:
-    def __init__(self):
+    # Event-driven wait layer settings
+    WAIT_POLL_INTERVAL = 0.2      # seconds between fingerprint polls
+    WAIT_MIN_TIMEOUT = 3.0        # adaptive timeouts never go below this
+    WAIT_SAMPLE_SIZE = 20         # recent samples kept per wait label
+    WAIT_QUIET_PERIOD = 1.0       # no Dash traffic for this long = callback chain settled
+
+    def __init__(self, base_url=None):
         self.email = os.getenv("NEOBDM_EMAIL")
         self.password = os.getenv("NEOBDM_PASSWORD")
-        self.base_url = "https://neobdm.tech"
+        # NEOBDM_BASE_URL allows pointing the scraper at a local mock Dash app
+        self.base_url = (base_url or os.getenv("NEOBDM_BASE_URL") or "https://neobdm.tech").rstrip('/')
         self.browser = None
         self.context = None
         self.page = None
+        self._owns_browser = True
+        self._owns_context = True
+        # Dash callback tracking (see _attach_dash_listeners)
+        self._dash_inflight = 0
+        self._dash_completed = 0
+        self._dash_last_activity = 0.0
+        # Wait metrics: every wait is logged, recent durations drive adaptive timeouts
+        self.wait_log = []
+        self._wait_samples = {}
+        # Direct Dash callback fast path, opt-in while it is validated (NEOBDM_DASH_API=1 enables it)
+        self.use_dash_api = os.getenv("NEOBDM_DASH_API", "0") == "1"
+        self._dash_client = None
 
     async def init_browser(self, headless=True):
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(headless=headless)
         self.context = await self.browser.new_context()
         self.page = await self.context.new_page()
+        self._attach_dash_listeners()
+
+    async def init_context(self, browser):
+        """
+        Attach to an already running browser with a fresh, isolated context.
+
+        Used by the sync scheduler so several scrapers share one Chromium
+        process while keeping separate cookies/sessions. close() will only
+        dispose of this context, never the shared browser.
+        """
+        self.browser = browser
+        self._owns_browser = False
+        self.context = await browser.new_context()
+        self.page = await self.context.new_page()
+        self._attach_dash_listeners()
+
+    async def init_page(self, context):
+        """
+        Open a new page (tab) in an existing, already logged-in context.
+
+        Pages of one context share cookies, so a scraper created this way
+        reuses the parent's login session. close() only closes this page.
+        """
+        self.context = context
+        self._owns_browser = False
+        self._owns_context = False
+        self.page = await context.new_page()
+        self._attach_dash_listeners()
+
+    # ==================== WAIT LAYER ====================
+    # Replaces fixed sleeps with waits on real signals: Dash callback traffic
+    # (_dash-update-component requests) and the table data fingerprint.
+
+    def _attach_dash_listeners(self):
+        """Count in-flight and completed Dash callback requests on the page."""
+        if not self.page or not hasattr(self.page, 'on'):
+            return
+
+        def is_dash(request):
+            return '_dash-update-component' in request.url
+
+        def on_request(request):
+            if is_dash(request):
+                self._on_dash_request()
+
+        def on_done(request):
+            if is_dash(request):
+                self._on_dash_done()
+
+        self.page.on('request', on_request)
+        self.page.on('requestfinished', on_done)
+        self.page.on('requestfailed', on_done)
+
+    def _on_dash_request(self):
+        self._dash_inflight += 1
+        self._dash_last_activity = time.perf_counter()
+
+    def _on_dash_done(self):
+        self._dash_inflight = max(0, self._dash_inflight - 1)
+        self._dash_completed += 1
+        self._dash_last_activity = time.perf_counter()
+
+    def _adaptive_timeout(self, label: str, default: float) -> float:
+        """
+        Timeout for a wait based on how long the same wait took recently.
+        Uses 3x the slowest recent sample (+1s margin), capped at `default`.
+        """
+        samples = self._wait_samples.get(label)
+        if not samples or len(samples) < 3:
+            return default
+        return min(default, max(self.WAIT_MIN_TIMEOUT, max(samples) * 3 + 1.0))
+
+    def _record_wait(self, label: str, seconds: float, outcome: str, timeout: float):
+        self.wait_log.append({
+            "label": label,
+            "seconds": round(seconds, 3),
+            "outcome": outcome,
+            "timeout": round(timeout, 2)
+        })
+        if outcome == 'timeout':
+            # Fall back to the full default next time
+            self._wait_samples.pop(label, None)
+        elif outcome == 'fingerprint_changed':
+            # Only real re-renders are samples: a quiet "nothing changed" exit says
+            # nothing about how long the table takes to render
+            self._wait_samples.setdefault(label, deque(maxlen=self.WAIT_SAMPLE_SIZE)).append(seconds)
+
+    async def _wait_for_dash_render(
+        self,
+        label: str,
+        previous_fingerprint=None,
+        action=None,
+        timeout: float = 20.0
+    ) -> str:
+        """
+        Run `action` (optional coroutine function) and wait until Dash has re-rendered.
+
+        Finishes as soon as either:
+        - the table fingerprint differs from `previous_fingerprint` and no Dash
+          callback is still in flight ("fingerprint_changed"), or
+        - at least one Dash callback completed after the action, none are in
+          flight, the fingerprint is stable across two polls and no Dash request
+          started or finished for WAIT_QUIET_PERIOD ("dash_response"). The quiet
+          period keeps chained callbacks (param -> checkbox -> table) from ending
+          the wait after the first, unrelated one.
+
+        Returns the outcome string ("timeout" if neither happened in time).
+        """
+        timeout = self._adaptive_timeout(label, timeout)
+        completed_before = self._dash_completed
+        started = time.perf_counter()
+
+        if action is not None:
+            await action()
+
+        outcome = 'timeout'
+        last_fingerprint = None
+        while time.perf_counter() - started < timeout:
+            fingerprint = await self._get_data_fingerprint()
+            idle = self._dash_inflight == 0
+            if (previous_fingerprint is not None and fingerprint
+                    and fingerprint != previous_fingerprint and idle):
+                outcome = 'fingerprint_changed'
+                break
+            quiet = time.perf_counter() - self._dash_last_activity >= self.WAIT_QUIET_PERIOD
+            if (idle and quiet and self._dash_completed > completed_before
+                    and fingerprint == last_fingerprint):
+                outcome = 'dash_response'
+                break
+            last_fingerprint = fingerprint
+            await asyncio.sleep(self.WAIT_POLL_INTERVAL)
+
+        elapsed = time.perf_counter() - started
+        self._record_wait(label, elapsed, outcome, timeout)
+        print(f"   [WAIT] {label}: {outcome} after {elapsed:.2f}s (timeout {timeout:.1f}s)", flush=True)
+        return outcome
+
+    async def _wait_until(self, getter, predicate, label: str, timeout: float = 3.0):
+        """
+        Poll an async getter until predicate(value) holds (e.g. the date input
+        reflecting a new value). Returns the last value seen.
+        """
+        started = time.perf_counter()
+        value = None
+        matched = False
+        while time.perf_counter() - started < timeout:
+            value = await getter()
+            if predicate(value):
+                matched = True
+                break
+            await asyncio.sleep(0.1)
+        self._record_wait(label, time.perf_counter() - started, 'matched' if matched else 'timeout', timeout)
+        return value
+
+    def get_wait_metrics(self) -> dict:
+        """
+        Summarize recorded waits per label (count, avg/p50/p95/max seconds, timeouts).
+        Raw samples are included so they can be graphed.
+        """
+        summary = {}
+        for entry in self.wait_log:
+            summary.setdefault(entry['label'], []).append(entry)
+
+        result = {}
+        for label, entries in summary.items():
+            seconds = sorted(e['seconds'] for e in entries)
+            n = len(seconds)
+            result[label] = {
+                "count": n,
+                "avg_seconds": round(sum(seconds) / n, 3),
+                "p50_seconds": seconds[n // 2],
+                "p95_seconds": seconds[min(n - 1, int(n * 0.95))],
+                "max_seconds": seconds[-1],
+                "timeouts": sum(1 for e in entries if e['outcome'] == 'timeout'),
+                "samples": [e['seconds'] for e in entries]
+            }
+        return result
+
+    # ==================== DASH API FAST PATH ====================
+
+    async def _dash_api_call(self, method_name: str, *args):
+        """
+        Run a NeoBDMDashClient method (direct _dash-update-component replay).
+
+        Reuses the browser session cookies when available, otherwise the client
+        logs in itself. Returns None when the fast path is unavailable so the
+        caller continues with Playwright; a layout change disables the fast
+        path for the rest of this scraper's life.
+        """
+        if not self.use_dash_api:
+            return None
+
+        started = time.perf_counter()
+        try:
+            if self._dash_client is None:
+                client = NeoBDMDashClient(base_url=self.base_url, email=self.email, password=self.password)
+                cookies = await self.context.cookies() if self.context else []
+                if cookies:
+                    client.load_cookies(cookies)
+                elif not await asyncio.to_thread(client.login):
+                    print("   [DASH-API] Login failed, using browser")
+                    return None
+                self._dash_client = client
+
+            result = await asyncio.to_thread(getattr(self._dash_client, method_name), *args)
+            print(f"   [DASH-API] {method_name} answered in {time.perf_counter() - started:.2f}s", flush=True)
+            return result
+        except DashLayoutChanged as e:
+            print(f"   [DASH-API] Layout changed ({e}), falling back to browser", flush=True)
+            self.use_dash_api = False
+        except Exception as e:
+            print(f"   [DASH-API] Request failed ({e}), falling back to browser", flush=True)
+        return None
 
     async def login(self):
         print(f"Attempting login for {self.email}...")
@@ -52,18 +287,23 @@ class NeoBDMScraper:
         method: 'm' (Market Maker), 'nr' (Non-Retail), 'f' (Foreign Flow)
         period: 'd' (Daily), 'c' (Cumulative)
         """
+        fast = await self._dash_api_call('get_market_summary', method, period)
+        if fast and fast[0] is not None and not fast[0].empty:
+            return fast
+
         if not self.page:
             return None, None
             
         try:
             target_url = f"{self.base_url}/market_summary/"
             
-            # CRITICAL FIX: Hard reload to clear ALL Dash state (especially after long daily scraping)
-            print(f"   [SYNC] Performing hard refresh to clear state...", flush=True)
-            await self.page.goto(target_url, wait_until='networkidle', timeout=60000)
-            
-            # Additional: Reload again to ensure no cached Dash callbacks
-            await self.page.reload(wait_until='networkidle', timeout=60000)
+            if self.page.url.startswith(target_url):
+                # Reused page: hard reload to clear ALL Dash state (e.g. after daily scraping)
+                print(f"   [SYNC] Performing hard refresh to clear state...", flush=True)
+                await self.page.reload(wait_until='networkidle', timeout=60000)
+            else:
+                # Fresh page/context has no stale Dash state, a single load is enough
+                await self.page.goto(target_url, wait_until='networkidle', timeout=60000)
             
             # DEBUG: Check where we actually are
             current_url = self.page.url
@@ -76,34 +316,40 @@ class NeoBDMScraper:
             
             # Clear any existing table state by scrolling to top
             await self.page.evaluate("window.scrollTo(0, 0);")
-            await asyncio.sleep(2)
             
-            # Trigger change events manually to ensure Dash sees the update
-            await self.page.evaluate("""
-                (args) => {
-                    const methodSelect = document.querySelector('#method');
-                    const periodSelect = document.querySelector('#summary-mode');
-                    if (methodSelect) {
-                        methodSelect.value = args.m;
-                        methodSelect.dispatchEvent(new Event('change', { bubbles: true }));
-                    }
-                    if (periodSelect) {
-                        periodSelect.value = args.p;
-                        periodSelect.dispatchEvent(new Event('change', { bubbles: true }));
+            async def set_parameters():
+                # Trigger change events manually to ensure Dash sees the update
+                await self.page.evaluate("""
+                    (args) => {
+                        const methodSelect = document.querySelector('#method');
+                        const periodSelect = document.querySelector('#summary-mode');
+                        if (methodSelect) {
+                            methodSelect.value = args.m;
+                            methodSelect.dispatchEvent(new Event('change', { bubbles: true }));
+                        }
+                        if (periodSelect) {
+                            periodSelect.value = args.p;
+                            periodSelect.dispatchEvent(new Event('change', { bubbles: true }));
+                        }
                     }
-                }
-            """, {"m": method, "p": period})
+                """, {"m": method, "p": period})
 
             print(f"   [SYNC] Setting analysis parameters...", flush=True)
-            # CRITICAL: Extended wait especially for cumulative after daily (Dash needs time to clear old pagination state)
-            await asyncio.sleep(12) # Increased from 8 to 12 seconds for full Dash re-render
+            # Wait for the Dash callbacks triggered by the parameter change
+            # (previously a fixed 12s sleep)
+            await self._wait_for_dash_render(
+                'market_summary_params',
+                previous_fingerprint=await self._get_data_fingerprint(),
+                action=set_parameters,
+                timeout=30.0
+            )
 
         except Exception as e:
             print(f"   [SYNC] Error refreshing/setting parameters: {e}")
             # We continue, hoping that the checkboxes/scraping might still work or it will fail later gracefully
 
         # --- Handle Checkboxes (Normalize OFF, Moving Average ON) ---
-        try:
+        async def toggle_checkboxes():
             # 1. Normalize -> Uncheck
             # Using value="normalize" if available, else label text
             norm_cb = self.page.locator('input[value="normalize"]')
@@ -145,54 +391,31 @@ class NeoBDMScraper:
                         await comp_cb.check()
                         print("Checked 'Compatible Only'")
 
-            # Wait a bit for table update after checkboxes
-            await asyncio.sleep(5)
-            
+        try:
+            # Wait for table update after checkboxes (previously a fixed 5s + 8s sleep)
+            print("  [LOADING] Waiting for Dash to complete rendering...")
+            await self._wait_for_dash_render(
+                'market_summary_checkboxes',
+                previous_fingerprint=await self._get_data_fingerprint(),
+                action=toggle_checkboxes,
+                timeout=30.0
+            )
         except Exception as e:
             print(f"Error toggling checkboxes: {e}")
 
-        # Wait for the Dash table to load or refresh
-        # CRITICAL FIX: Wait for ALL loading indicators to complete
-        print("  [LOADING] Waiting for Dash to complete rendering...")
-        
-        # 1. Wait for primary loading spinner (dash-spreadsheet)
-        try:
-            await self.page.wait_for_selector('.dash-spreadsheet-inner.dash-loading', timeout=2000)
-            print("  [LOADING] Primary spinner detected, waiting for it to hide...")
-            await self.page.wait_for_selector('.dash-spreadsheet-inner.dash-loading', state='hidden', timeout=30000)
-        except:
-            pass
-        
-        # 2. Wait for global Dash loading overlay (sometimes appears for heavy calculations)
-        try:
-            await self.page.wait_for_selector('._dash-loading-callback', timeout=2000)
-            print("  [LOADING] Global Dash callback spinner detected, waiting...")
-            await self.page.wait_for_selector('._dash-loading-callback', state='hidden', timeout=30000)
-        except:
-            pass
-        
-        # 3. Additional hard wait to let pagination info update (CRITICAL for cumulative)
-        print("  [LOADING] Waiting additional time for pagination to update...")
-        await asyncio.sleep(8)  # Give Dash extra time to update pagination counter
-
-        # 4. Wait for the table row content to be present and STABLE
-        # Issue: Dash might show old rows for a split second before clearing/updating.
-        # Fix: Wait for at least 10 rows if we expect data, or wait for stability
+        # Wait for the table row content to be present
         print("  Waiting for table rows...")
         try:
             # Basic wait for any cell
             await self.page.wait_for_selector('.dash-cell', timeout=20000)
             
-            # Additional wait to ensure it's not the old table or empty skeleton
-            # We poll the row count until it stabilizes or > 5
-            for _ in range(10): # Try for 5 seconds
-                row_count = await self.page.locator('.dash-spreadsheet-container tr').count()
-                if row_count > 5:
-                    break
-                await asyncio.sleep(0.5)
-            
-            # One final hard wait to let Dash render everything
-            await asyncio.sleep(2)
+            # Wait for the row count to exceed 5 (or give up after 5 seconds)
+            await self._wait_until(
+                self.page.locator('.dash-spreadsheet-container tr').count,
+                lambda count: count > 5,
+                'market_summary_rows',
+                timeout=5.0
+            )
             
         except Exception as e:
              print(f"  Warning: waiting for rows timed out: {e}")
@@ -212,48 +435,15 @@ class NeoBDMScraper:
         current_page = 1
         total_pages = 1
 
-        # Detect total pages with retry loop - wait for container to be VISIBLE, not just present
+        # Detect total pages once the footer is rendered for the current data.
         # CRITICAL: After Daily scraping, Cumulative needs MORE time for Dash to reset pagination
-        for attempt in range(15):  # Increased from 10 to 15 attempts (up to 75 seconds total)
-            try:
-                # Wait for pagination container to be VISIBLE (not just present)
-                await self.page.wait_for_selector('.previous-next-container', state='visible', timeout=10000)
-                
-                # Additional check: Ensure the pagination is NOT from the old/previous data
-                # by waiting for any loading indicators to finish
-                try:
-                    await self.page.wait_for_selector('.dash-loading', state='hidden', timeout=2000)
-                except:
-                    pass  # No loading indicator found, which is fine
-                
-                total_pages_text = await self.page.inner_text('.page-number .last-page')
-                clean_text = total_pages_text.strip().split('/')[-1].strip()
-                
-                if clean_text and clean_text.isdigit():
-                    total_pages = int(clean_text)
-                    if total_pages > 0:
-                        print(f"   [PAGINATION] Total pages detected: {total_pages} (Attempt {attempt+1})", flush=True)
-                        
-                        # Additional verification: Check if next button state matches expected pages
-                        next_btn = self.page.locator('button.next-page')
-                        is_next_enabled = await next_btn.is_enabled() if await next_btn.count() > 0 else False
-                        
-                        # If total_pages > 1, next button SHOULD be enabled
-                        if total_pages > 1 and not is_next_enabled:
-                            print(f"   [PAGINATION] WARNING: {total_pages} pages detected but next button disabled. Retrying...", flush=True)
-                            await asyncio.sleep(5)
-                            continue
-                        
-                        # Pagination looks good, proceed
-                        break
-                        
-                print(f"   [PAGINATION] Waiting for total pages text... (Attempt {attempt+1})", flush=True)
-                await asyncio.sleep(5)  # Increased from 3 to 5 seconds
-            except Exception as e:
-                # Don't print full error every time, just on last attempt
-                if attempt >= 7:
-                    print(f"   [PAGINATION] Detection attempt {attempt+1} failed: {e}", flush=True)
-                await asyncio.sleep(3)
+        # (previously up to 15 attempts with fixed 5s/3s sleeps)
+        state = await self._wait_for_pagination()
+        if state is not None and state[0] > 0:
+            total_pages = state[0]
+            if total_pages > 1 and not state[1]:
+                print(f"   [PAGINATION] WARNING: {total_pages} pages detected but next button disabled.", flush=True)
+            print(f"   [PAGINATION] Total pages detected: {total_pages}", flush=True)
         else:
             print(f"   [PAGINATION] Could not detect total pages after retries, defaulting to 1", flush=True)
 
@@ -327,37 +517,22 @@ class NeoBDMScraper:
 
             if current_page < total_pages:
                 try:
-                    # Capture signature of first row to detect change
-                    first_row_signature = str(page_data[0]) if page_data else None
-                    
                     # Click Next
                     next_btn = self.page.locator('button.next-page')
                     
-                    # Retry logic: Wait for button to be enabled (sometimes it lags)
-                    btn_enabled = False
-                    for _ in range(10): # Wait up to 10s
-                        if await next_btn.is_enabled():
-                            btn_enabled = True
-                            break
-                        await asyncio.sleep(1)
+                    # Wait for button to be enabled (sometimes it lags)
+                    btn_enabled = await self._wait_until(
+                        next_btn.is_enabled, bool, 'market_summary_next_enabled', timeout=10.0
+                    )
                         
                     if btn_enabled:
-                        await next_btn.click()
-                        
-                        # Wait for either spinner OR content change
-                        # Wait for up to 5 seconds for change
-                        for _ in range(10):
-                            await asyncio.sleep(0.5)
-                            new_page_data = await self.page.evaluate("""
-                                () => {
-                                    const firstCell = document.querySelector('.dash-cell');
-                                    return firstCell ? firstCell.textContent.trim() : null;
-                                }
-                            """)
-                            # If we had data and now first cell text is different, we definitely moved pages
-                            # (Simplification: just checking if table refreshed)
-                            if page_data and new_page_data != page_data[0].get(list(page_data[0].keys())[0]):
-                                break
+                        # Wait for the page change to render (fingerprint change or Dash response)
+                        await self._wait_for_dash_render(
+                            'market_summary_next_page',
+                            previous_fingerprint=await self._get_data_fingerprint(),
+                            action=next_btn.click,
+                            timeout=10.0
+                        )
                         
                         current_page += 1
                     else:
@@ -379,6 +554,48 @@ class NeoBDMScraper:
             print("No data found across any pages.")
             return None, reference_date
 
+    async def _get_pagination_state(self):
+        """
+        (total pages, next button enabled, loading) from the table footer, or
+        None while the footer isn't rendered. Never blocks on missing elements.
+        """
+        try:
+            if not await self.page.locator('.previous-next-container').first.is_visible():
+                return None
+            last_page = self.page.locator('.page-number .last-page')
+            if await last_page.count() == 0:
+                return None
+            clean_text = (await last_page.first.inner_text()).strip().split('/')[-1].strip()
+            if not clean_text.isdigit():
+                return None
+            next_btn = self.page.locator('button.next-page')
+            next_enabled = await next_btn.is_enabled() if await next_btn.count() > 0 else False
+            loading = await self.page.locator('.dash-loading').count() > 0
+            return int(clean_text), next_enabled, loading
+        except Exception:
+            return None
+
+    async def _wait_for_pagination(self, timeout: float = 75.0):
+        """
+        Footer state (see _get_pagination_state) once it is settled: pages
+        known, no loading indicator and Next enabled when there is more than
+        one page. Returns the last state seen on timeout.
+        """
+        return await self._wait_until(
+            self._get_pagination_state,
+            lambda state: state is not None and state[0] > 0 and not state[2] and (state[0] == 1 or state[1]),
+            'market_summary_pagination',
+            timeout=timeout
+        )
+
+    async def _is_ticker_dropdown_ready(self) -> bool:
+        """Ticker dropdown is visible with its option menu closed."""
+        try:
+            return (await self.page.locator('.Select-control').first.is_visible()
+                    and await self.page.locator('.Select-menu-outer').count() == 0)
+        except Exception:
+            return False
+
     async def _get_data_fingerprint(self):
         """
         Extract a fingerprint of current broker summary data.
@@ -418,11 +635,9 @@ class NeoBDMScraper:
                     
                     # Click to open dropdown
                     await self.page.click('.Select-control', force=True)
-                    await asyncio.sleep(1.5)
                     
                     # Type ticker to filter
                     await self.page.keyboard.type(ticker)
-                    await asyncio.sleep(2)
                     
                     # Wait for option to appear with longer timeout
                     option_selector = f".Select-option:has-text('{ticker}')"
@@ -432,16 +647,12 @@ class NeoBDMScraper:
                         print(f"   [TICKER] Successfully selected {ticker} from dropdown")
                         
                         # Click away to close dropdown
-                        await asyncio.sleep(1)
                         await self.page.click('body', force=True)
-                        await asyncio.sleep(1)
                         return True
                     except Exception as e:
                         print(f"   [TICKER] Option not found: {e}. Trying Enter key...")
                         await self.page.keyboard.press('Enter')
-                        await asyncio.sleep(2)
                         await self.page.click('body', force=True)
-                        await asyncio.sleep(1)
                         # Assume success if no error
                         return True
                         
@@ -454,12 +665,10 @@ class NeoBDMScraper:
                     input_field = self.page.locator('.Select-control input')
                     if await input_field.count() > 0:
                         await input_field.click()
-                        await asyncio.sleep(0.5)
                         await input_field.fill('')
                         await input_field.type(ticker)
-                        await asyncio.sleep(1.5)
+                        await self.page.wait_for_selector('.Select-option', state='visible', timeout=5000)
                         await self.page.keyboard.press('Enter')
-                        await asyncio.sleep(2)
                         await self.page.click('body', force=True)
                         print(f"   [TICKER] Direct input method completed")
                         return True
@@ -469,9 +678,9 @@ class NeoBDMScraper:
             except Exception as e:
                 print(f"   [TICKER] Attempt {attempt+1} failed completely: {e}")
                 
-            # Wait before retry
+            # Before retrying, wait for the dropdown to be closed and ready again
             if attempt < retry_count - 1:
-                await asyncio.sleep(2)
+                await self._wait_until(self._is_ticker_dropdown_ready, bool, 'ticker_retry', timeout=2.0)
         
         print(f"   [TICKER] Failed to select {ticker} after {retry_count} attempts")
         return False
@@ -549,15 +758,19 @@ class NeoBDMScraper:
                     if await arrow_button.count() > 0:
                         await arrow_button.click(force=True)
                         clicks_made += 1
-                        await asyncio.sleep(1.0)
                         
-                        new_date = await self._get_broker_summary_date_value()
+                        seen = last_seen_date
+                        new_date = await self._wait_until(
+                            self._get_broker_summary_date_value,
+                            lambda value: value != seen,
+                            'broker_summary_arrow_click',
+                            timeout=2.0
+                        )
                         print(f"   [DATE] After click {i+1}, date is: {new_date}")
                         
                         # Check if we reached target
                         if new_date == target_date:
                             print(f"   [DATE] Successfully reached target via arrows")
-                            await asyncio.sleep(1.5)
                             return True
                         
                         # If date didn't change, give up on arrow method
@@ -629,30 +842,33 @@ class NeoBDMScraper:
                 }
             """, target_date)
             
-            # Wait for Dash to process the change
+            # Wait for the input to reflect the change; data loading is awaited by the caller
             print(f"   [JS] Waiting for Dash to process date change...")
-            await asyncio.sleep(3)
-            
-            # Verify the date was set correctly
-            final_date = await self._get_broker_summary_date_value()
+            final_date = await self._wait_until(
+                self._get_broker_summary_date_value,
+                lambda value: value == target_date,
+                'broker_summary_date_input',
+                timeout=3.0
+            )
             print(f"   [JS] Verification - date is now: {final_date}")
             
             if final_date == target_date:
                 print(f"   [JS] Successfully set date to {target_date}")
-                # Extra wait for data to load
-                await asyncio.sleep(2)
                 return True
             else:
                 print(f"   [JS] Warning: Date mismatch after JS set. Expected {target_date}, got {final_date}")
                 # Try one more time with a different approach
                 await self.page.fill('input[placeholder="Tanggal"]', target_date)
                 await self.page.press('input[placeholder="Tanggal"]', 'Enter')
-                await asyncio.sleep(3)
                 
-                verify_date = await self._get_broker_summary_date_value()
+                verify_date = await self._wait_until(
+                    self._get_broker_summary_date_value,
+                    lambda value: value == target_date,
+                    'broker_summary_date_input',
+                    timeout=3.0
+                )
                 if verify_date == target_date:
                     print(f"   [JS] Successfully set date on second attempt")
-                    await asyncio.sleep(2)
                     return True
                 else:
                     print(f"   [JS] Failed to set date even with fill method")
@@ -662,26 +878,48 @@ class NeoBDMScraper:
             print(f"   [JS] JavaScript date setting failed: {e}")
             return False
 
-    async def _wait_for_broker_summary_render(self):
-        if not self.page:
-            return
-        try:
-            await self.page.wait_for_selector('.dash-spreadsheet-inner.dash-loading', timeout=1500)
-            await self.page.wait_for_selector('.dash-spreadsheet-inner.dash-loading', state='hidden', timeout=20000)
-        except Exception:
-            pass
-        try:
-            await self.page.wait_for_selector('._dash-loading-callback', timeout=1500)
-            await self.page.wait_for_selector('._dash-loading-callback', state='hidden', timeout=20000)
-        except Exception:
-            pass
-        await asyncio.sleep(1.5)
+    async def _select_ticker_and_settle(self, ticker: str) -> bool:
+        """Select ticker and wait until the Dash callbacks it triggers have rendered."""
+        selected = {"ok": False}
+
+        async def select():
+            selected["ok"] = await self._select_ticker_robust(ticker)
+
+        await self._wait_for_dash_render(
+            'broker_summary_ticker',
+            previous_fingerprint=await self._get_data_fingerprint(),
+            action=select,
+            timeout=15.0
+        )
+        return selected["ok"]
+
+    async def _navigate_date_and_wait(self, date_str: str, previous_fingerprint, timeout: float):
+        """
+        Navigate to date and wait for the table to re-render.
+        Returns (navigated, data_changed).
+        """
+        navigated = {"ok": False}
+
+        async def navigate():
+            navigated["ok"] = await self._navigate_to_date_via_arrows(date_str)
+
+        outcome = await self._wait_for_dash_render(
+            'broker_summary_date',
+            previous_fingerprint=previous_fingerprint,
+            action=navigate,
+            timeout=timeout
+        )
+        return navigated["ok"], outcome == 'fingerprint_changed'
 
     async def get_broker_summary(self, ticker: str, date_str: str):
         """
         Scrapes the Broker Summary table for a specific ticker and date.
         date_str: 'YYYY-MM-DD'
         """
+        fast = await self._dash_api_call('get_broker_summary', ticker, date_str)
+        if fast:
+            return fast
+
         if not self.page:
             return None, None
 
@@ -697,8 +935,8 @@ class NeoBDMScraper:
             else:
                 print(f"   [SYNC] Already on {target_url}, skipping navigation.", flush=True)
 
-            # 1. Select Ticker using robust method
-            if not await self._select_ticker_robust(ticker):
+            # 1. Select Ticker using robust method (waits for the ticker's table to render)
+            if not await self._select_ticker_and_settle(ticker):
                 print(f"   [ERROR] Failed to select ticker {ticker}")
                 return None
 
@@ -706,75 +944,38 @@ class NeoBDMScraper:
             previous_fingerprint = await self._get_data_fingerprint()
             print(f"   [VERIFY] Previous data fingerprint: {previous_fingerprint}")
 
-            # 2. Navigate to Date using arrow buttons
+            # 2. Navigate to Date and wait for DATA to change (not just spinners)
             print(f"   [SYNC] Navigating to date {date_str}...", flush=True)
-            if not await self._navigate_to_date_via_arrows(date_str):
+            navigated, data_changed = await self._navigate_date_and_wait(date_str, previous_fingerprint, timeout=15.0)
+            if not navigated:
                 actual_date = await self._get_broker_summary_date_value()
                 print(f"   [WARNING] Failed to navigate to {date_str}. Currently at: {actual_date}")
                 return None
-
-            # CRITICAL: Wait for Dash to process and fetch new data
-            #  Don't just wait for spinner to disappear, wait for DATA to change!
-            await self._wait_for_broker_summary_render()
-            
-            # Poll until data changes (up to 15 seconds)
-            print(f"   [WAIT] Polling until data changes for date {date_str}...")
-            data_changed = False
-            for poll_attempt in range(15):  # 15 attempts x 1sec = 15 seconds max
-                await asyncio.sleep(1)
-                current_fingerprint = await self._get_data_fingerprint()
-                
-                if current_fingerprint != previous_fingerprint:
-                    print(f"   [SUCCESS] Data changed after {poll_attempt+1} seconds!")
-                    print(f"   [VERIFY] New fingerprint: {current_fingerprint}")
-                    data_changed = True
-                    break
-                    
-                if poll_attempt % 3 == 0:  # Log every 3 seconds
-                    print(f"   [WAIT] Still waiting... ({poll_attempt+1}s)")
             
             if not data_changed:
-                print(f"   [WARNING] Data did not change after 15 seconds!")
-                print(f"   [WARNING] Current fingerprint still: {current_fingerprint}")
+                print(f"   [WARNING] Data did not change for {date_str}!")
                 print(f"   [RELOAD] Forcing full page reload to try again...")
                 
                 # Force reload as last resort
                 await self.page.goto(f"{self.base_url}/broker_summary/", wait_until='networkidle', timeout=60000)
                 await self.page.wait_for_selector('.Select-control', state='visible', timeout=20000)
-                await asyncio.sleep(3)
                 
                 # Re-select ticker
-                if not await self._select_ticker_robust(ticker):
+                if not await self._select_ticker_and_settle(ticker):
                     print(f"   [ERROR] Failed to re-select ticker {ticker} after reload")
                     return None
                 
                 # Re-navigate to date using arrows
                 print(f"   [RELOAD] Re-navigating to date {date_str} after reload...")
-                if not await self._navigate_to_date_via_arrows(date_str):
+                navigated, data_changed = await self._navigate_date_and_wait(date_str, previous_fingerprint, timeout=10.0)
+                if not navigated:
                     print(f"   [ERROR] Failed to navigate to date even after reload")
                     return None
                 
-                await self._wait_for_broker_summary_render()
-                
-                # Poll again after reload
-                print(f"   [WAIT] Polling after reload...")
-                for poll_attempt in range(10):
-                    await asyncio.sleep(1)
-                    final_fingerprint = await self._get_data_fingerprint()
-                    
-                    if final_fingerprint != previous_fingerprint:
-                        print(f"   [SUCCESS] Data changed after reload! ({poll_attempt+1}s)")
-                        print(f"   [VERIFY] Final fingerprint: {final_fingerprint}")
-                        data_changed = True
-                        break
-                
                 if not data_changed:
                     print(f"   [ERROR] Data still did not change even after reload!")
                     print(f"   [ERROR] This date may not have data available: {date_str}")
                     # Continue anyway and extract whatever is shown
-            
-            # Extra safety wait
-            await asyncio.sleep(2)
 
             # 4. Extract Data
             print("   [DATA] Extracting rows from tables...")
@@ -893,59 +1094,148 @@ class NeoBDMScraper:
             print(f"   [ERROR] Failed to scrape broker summary: {e}")
             return None
 
-    async def get_broker_summary_batch(self, tasks: list):
+    @staticmethod
+    def _expand_broker_summary_tasks(tasks: list, skip_pairs=None) -> list:
         """
-        Execute multiple broker summary scrapes in a single session.
+        Flatten batch tasks into unique (TICKER, date) pairs, in input order,
+        leaving out pairs contained in skip_pairs.
+        """
+        skip_pairs = skip_pairs or set()
+        pairs = []
+        seen = set()
+        for task in tasks:
+            ticker = (task.get('ticker') or '').upper()
+            if not ticker:
+                continue
+            for date_str in task.get('dates', []):
+                pair = (ticker, date_str)
+                if pair in seen or pair in skip_pairs:
+                    continue
+                seen.add(pair)
+                pairs.append(pair)
+        return pairs
+
+    async def _open_broker_summary(self):
+        await self.page.goto(f"{self.base_url}/broker_summary/", wait_until='networkidle', timeout=60000)
+        await self.page.wait_for_selector('.Select-control', state='visible', timeout=20000)
+
+    async def get_broker_summary_batch(self, tasks: list, workers: int = 1, skip_pairs=None, on_result=None):
+        """
+        Execute multiple broker summary scrapes in a single login session.
         tasks format: [{"ticker": "ANTM", "dates": ["2026-01-12", "2026-01-11"]}, ...]
+
+        Args:
+            tasks: Tickers and the dates to scrape for each
+            workers: Pages (tabs) scraping in parallel. Extra pages are opened in
+                     this scraper's context, so they share its login.
+            skip_pairs: Set of (TICKER, date) already stored; these are not scraped
+            on_result: Optional callable(result) invoked as soon as each item
+                       completes (e.g. to save it), instead of waiting for the batch
+
+        Returns:
+            List of results in completion order:
+            {"ticker", "trade_date", "buy", "sell"} or {"ticker", "trade_date", "error"}
         """
         if not self.page:
             return []
 
         results = []
+        queue = asyncio.Queue()
+        for pair in self._expand_broker_summary_tasks(tasks, skip_pairs):
+            queue.put_nowait(pair)
+
+        if queue.empty():
+            print("[*] Batch Sync: Nothing to scrape, all requested pairs are already stored.")
+            return results
+
+        def emit(result):
+            results.append(result)
+            if on_result:
+                try:
+                    on_result(result)
+                except Exception as e:
+                    print(f"[!] Batch Sync: Result handler failed for {result.get('ticker')} {result.get('trade_date')}: {e}")
+
+        async def run_worker(scraper, worker_id):
+            try:
+                await scraper._open_broker_summary()
+            except Exception as e:
+                print(f"[!] Batch Sync: Worker {worker_id} could not open broker summary: {e}")
+                return
+
+            while not queue.empty():
+                ticker, date_str = queue.get_nowait()
+                print(f"[*] Batch Sync [w{worker_id}]: Processing {ticker} for {date_str}...")
+                try:
+                    data = await scraper.get_broker_summary(ticker, date_str)
+                except Exception as e:
+                    print(f"[!] Batch Sync [w{worker_id}]: {ticker} on {date_str} failed: {e}")
+                    data = None
+
+                if data:
+                    emit({
+                        "ticker": ticker,
+                        "trade_date": date_str,
+                        "buy": data.get('buy', []),
+                        "sell": data.get('sell', [])
+                    })
+                else:
+                    print(f"[!] Batch Sync: No data found for {ticker} on {date_str}")
+                    emit({
+                        "ticker": ticker,
+                        "trade_date": date_str,
+                        "error": "No data found or date mismatch"
+                    })
+
+        scrapers = [self]
         try:
-            # Login once
+            # Login once; every worker page shares this session
             login_success = await self.login()
             if not login_success:
                 return [{"error": "Login failed"}]
 
-            # Navigate once
-            target_url = f"{self.base_url}/broker_summary/"
-            await self.page.goto(target_url, wait_until='networkidle', timeout=60000)
-            await self.page.wait_for_selector('.Select-control', state='visible', timeout=20000)
+            worker_count = max(1, min(int(workers), queue.qsize()))
+            for _ in range(worker_count - 1):
+                worker = type(self)(base_url=self.base_url)
+                await worker.init_page(self.context)
+                scrapers.append(worker)
 
-            for task in tasks:
-                ticker = task.get('ticker')
-                dates = task.get('dates', [])
-                
-                for date_str in dates:
-                    print(f"[*] Batch Sync: Processing {ticker} for {date_str}...")
-                    data = await self.get_broker_summary(ticker, date_str)
-                    
-                    if data:
-                        results.append({
-                            "ticker": ticker,
-                            "trade_date": date_str,
-                            "buy": data.get('buy', []),
-                            "sell": data.get('sell', [])
-                        })
-                    else:
-                        print(f"[!] Batch Sync: No data found for {ticker} on {date_str}")
-                        results.append({
-                            "ticker": ticker,
-                            "trade_date": date_str,
-                            "error": "No data found or date mismatch"
-                        })
-                    
-                    # Small cooldown between ticker/date changes to let Dash breathe
-                    await asyncio.sleep(2)
+            print(f"[*] Batch Sync: {queue.qsize()} items on {len(scrapers)} page(s)")
+            await asyncio.gather(*[
+                run_worker(scraper, worker_id)
+                for worker_id, scraper in enumerate(scrapers, start=1)
+            ])
+
+            # Items left over if every worker failed to open the page
+            while not queue.empty():
+                ticker, date_str = queue.get_nowait()
+                emit({"ticker": ticker, "trade_date": date_str, "error": "No worker available"})
 
             return results
 
         except Exception as e:
             print(f"[!] Critical error in Batch Sync: {e}")
             return results
+        finally:
+            for worker in scrapers[1:]:
+                try:
+                    await worker.close()
+                except Exception:
+                    pass
 
     async def close(self):
+        if not self._owns_context:
+            if self.page:
+                await self.page.close()
+            self.context = None
+            self.page = None
+            return
+        if not self._owns_browser:
+            if self.context:
+                await self.context.close()
+            self.context = None
+            self.page = None
+            return
         if self.browser:
             await self.browser.close()
         if hasattr(self, 'playwright'):
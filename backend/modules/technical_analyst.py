@@ -9,6 +9,8 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict, Tuple
 
+from modules.indicators import atr, rolling_max, rolling_min
+
 class TechnicalAnalyst:
     
     @staticmethod
@@ -30,12 +32,12 @@ class TechnicalAnalyst:
         # Identify Swing Highs
         # Only if High[i] is max in window centered at i
         # Using rolling max with center=True
-        rolling_max = df['high'].rolling(window=window*2+1, center=True).max()
-        swing_highs = df[df['high'] == rolling_max]['high'].tolist()
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
+        swing_highs = highs[highs == rolling_max(highs, window*2+1, center=True)].tolist()
         
         # Identify Swing Lows
-        rolling_min = df['low'].rolling(window=window*2+1, center=True).min()
-        swing_lows = df[df['low'] == rolling_min]['low'].tolist()
+        swing_lows = lows[lows == rolling_min(lows, window*2+1, center=True)].tolist()
         
         # Clean and Filter (Remove duplicates and very close levels)
         # Sort and group levels within 2% distance
@@ -68,22 +70,15 @@ class TechnicalAnalyst:
         if len(df) < period + 1:
             return 0.0
             
-        high = df['high']
-        low = df['low']
-        close = df['close']
-        
-        # True Range Calculation
-        tr1 = high - low
-        tr2 = (high - close.shift()).abs()
-        tr3 = (low - close.shift()).abs()
-        
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # RMA (Running Moving Average) usually used for ATR, or simple rolling mean
-        # Using simple rolling mean for simplicity and robustness here
-        atr = tr.rolling(window=period).mean().iloc[-1]
-        
-        return float(atr) if not pd.isna(atr) else 0.0
+        # Simple rolling mean of the True Range (shared indicator implementation)
+        value = atr(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            period
+        )[-1]
+        
+        return float(value) if not np.isnan(value) else 0.0
 
     def generate_trade_plan(self, current_price: float, supports: List[float], resistances: List[float], atr: float) -> Dict:
         """
@@ -1,18 +1,20 @@
 """Volume data fetcher using Yahoo Finance for Indonesian stocks."""
-import yfinance as yf
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 import logging
 
+from modules.ohlcv_service import YahooOHLCVProvider
+
 
 class VolumeFetcher:
     """Fetch volume data from Yahoo Finance for Indonesian stocks."""
     
     START_DATE = "2025-12-22"  # Fixed start date as per requirement
     
-    def __init__(self):
-        """Initialize volume fetcher."""
+    def __init__(self, provider=None):
+        """Initialize volume fetcher (same OHLCV provider as the price_volume store)."""
         self.logger = logging.getLogger(__name__)
+        self.provider = provider or YahooOHLCVProvider()
     
     def _format_ticker(self, ticker: str) -> str:
         """
@@ -70,27 +72,26 @@ class VolumeFetcher:
             self.logger.info(f"Fetching volume data for {yf_ticker} from {start_date} to {end_date}")
             
             # Fetch data from yfinance
-            stock = yf.Ticker(yf_ticker)
-            hist = stock.history(start=start_date, end=end_date)
+            bars = self.provider.fetch([yf_ticker], start_date, end_date).get(yf_ticker) or []
             
-            if hist.empty:
+            if not bars:
                 self.logger.warning(f"No data found for {yf_ticker}")
                 return []
             
             # Convert to list of dicts
             records = []
-            for date, row in hist.iterrows():
+            for bar in bars:
                 # Skip if volume is 0 (market holiday/weekend)
-                if row['Volume'] == 0:
+                if bar['volume'] == 0:
                     continue
                 
                 record = {
-                    'trade_date': date.strftime('%Y-%m-%d'),
-                    'volume': int(row['Volume']),
-                    'open_price': float(row['Open']),
-                    'high_price': float(row['High']),
-                    'low_price': float(row['Low']),
-                    'close_price': float(row['Close'])
+                    'trade_date': bar['time'],
+                    'volume': bar['volume'],
+                    'open_price': bar['open'],
+                    'high_price': bar['high'],
+                    'low_price': bar['low'],
+                    'close_price': bar['close']
                 }
                 records.append(record)
             
@@ -113,20 +114,20 @@ class VolumeFetcher:
         """
         try:
             yf_ticker = self._format_ticker(ticker)
-            stock = yf.Ticker(yf_ticker)
             
             # Get last 5 days to ensure we get at least one trading day
             end_date = datetime.now()
             start_date = end_date - timedelta(days=5)
             
-            hist = stock.history(start=start_date, end=end_date)
+            bars = self.provider.fetch(
+                [yf_ticker], start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+            ).get(yf_ticker) or []
             
-            if hist.empty:
+            if not bars:
                 return None
             
             # Get the latest date
-            latest_date = hist.index[-1].strftime('%Y-%m-%d')
-            return latest_date
+            return bars[-1]['time']
             
         except Exception as e:
             self.logger.error(f"Error getting latest date for {ticker}: {e}")
@@ -0,0 +1,376 @@
+"""
+VPA Pattern Detection
+Vectorized volume-price patterns used by Alpha Hunter Stage 2.
+
+- Pure functions over OHLCVArrays: accumulation start, pre-spike
+  accumulation, post-spike breakout setup, selling climax and resistance
+  lines. Rolling windows replace the per-bar loops and the "first/last bar
+  matching a condition" searches are argmax over boolean masks.
+- scan_spikes / scan_selling_climaxes run the same detectors over a
+  {ticker: OHLCVArrays} mapping (e.g. price_volume_repo.load_ohlcv_arrays).
+
+Results are plain Python values (str/int/float/bool) ready for JSON.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db.ohlcv_arrays import OHLCVArrays, to_day_number
+from modules.indicators import sma
+
+
+def _last_true(mask: np.ndarray) -> Optional[int]:
+    """Position of the last True in a boolean mask, or None."""
+    if not mask.any():
+        return None
+    return len(mask) - 1 - int(np.argmax(mask[::-1]))
+
+
+# ==================== PRE-SPIKE ACCUMULATION ====================
+
+def detect_accumulation_start(
+    series: OHLCVArrays,
+    spike_index: int,
+    max_lookback: int = 60
+) -> Tuple[int, str]:
+    """
+    Dynamic lookback: start of the accumulation period before a spike.
+
+    Walking back from 5 bars before the spike, the start is the latest bar
+    that is either a previous volume spike (> 2.5x the median volume of the
+    lookback window) or ends a sideways zone (CV of the 10 prior closes > 6%).
+
+    Returns:
+        (start_index, detection_method) with detection_method one of
+        previous_spike, volatility_change, max_lookback, short_history,
+        insufficient_data
+    """
+    if spike_index < 5:
+        return 0, "insufficient_data"
+
+    lookback_end = max(0, spike_index - 5)
+    lookback_start = max(0, spike_index - max_lookback)
+
+    if lookback_end - lookback_start < 10:
+        return lookback_start, "short_history"
+
+    volume = series.volume
+    close = series.close
+    baseline = volume[lookback_start:lookback_end]
+    median_volume = float(np.median(baseline)) if len(baseline) else 0
+
+    # Candidates i = lookback_start + 1 .. spike_index - 5
+    first = lookback_start + 1
+    last = spike_index - 5
+    if median_volume > 0:
+        previous_spike = volume[first:last + 1] > median_volume * 2.5
+    else:
+        previous_spike = np.zeros(last - first + 1, dtype=bool)
+
+    # Close CV over the 10 bars before i, for i > lookback_start + 10
+    volatile = np.zeros_like(previous_spike)
+    if last - lookback_start > 10:
+        windows = np.lib.stride_tricks.sliding_window_view(close[first:last], 10)
+        means = windows.mean(axis=1)
+        stds = windows.std(axis=1, ddof=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cv = np.where(means > 0, stds / means * 100, 999)
+        volatile[10:] = cv > 6
+
+    hit = _last_true(previous_spike | volatile)
+    if hit is None:
+        return lookback_start, "max_lookback"
+    method = "previous_spike" if previous_spike[hit] else "volatility_change"
+    return first + hit, method
+
+
+def analyze_pre_spike_accumulation(
+    series: OHLCVArrays,
+    start_index: int,
+    spike_index: int
+) -> Dict[str, Any]:
+    """
+    Accumulation BEFORE the spike (HK Method: "Isi Perut" analysis).
+
+    Returns:
+        Period start/end dates, total and average daily volume, volume trend
+        (second half vs first half: INCREASING / STABLE / DECREASING), up and
+        down day counts and the net price movement of the period
+    """
+    n = len(series)
+    if start_index >= spike_index or spike_index >= n:
+        return {
+            "period_start": None,
+            "period_end": None,
+            "accumulation_days": 0,
+            "total_volume": 0,
+            "avg_daily_volume": 0,
+            "volume_trend": "NO_DATA",
+            "up_days": 0,
+            "down_days": 0,
+            "net_movement_pct": 0
+        }
+
+    period = series[start_index:spike_index]
+    accumulation_days = len(period)
+
+    if accumulation_days < 3:
+        return {
+            "period_start": series.date_at(start_index) if start_index < n else None,
+            "period_end": series.date_at(spike_index - 1) if spike_index > 0 else None,
+            "accumulation_days": accumulation_days,
+            "total_volume": 0,
+            "avg_daily_volume": 0,
+            "volume_trend": "INSUFFICIENT_DATA",
+            "up_days": 0,
+            "down_days": 0,
+            "net_movement_pct": 0
+        }
+
+    total_volume = int(period.volume.sum())
+    avg_daily_volume = total_volume / accumulation_days
+
+    steps = np.diff(period.close)
+    up_days = int(np.count_nonzero(steps > 0))
+    down_days = int(np.count_nonzero(steps < 0))
+
+    start_price = float(period.close[0])
+    end_price = float(period.close[-1])
+    net_movement_pct = ((end_price - start_price) / start_price * 100) if start_price > 0 else 0
+
+    half = accumulation_days // 2
+    first_half_vol = int(period.volume[:half].sum()) / half if half > 0 else 0
+    second_half_vol = int(period.volume[half:].sum()) / (accumulation_days - half)
+
+    if second_half_vol > first_half_vol * 1.3:
+        volume_trend = "INCREASING"
+    elif second_half_vol < first_half_vol * 0.7:
+        volume_trend = "DECREASING"
+    else:
+        volume_trend = "STABLE"
+
+    return {
+        "period_start": period.date_at(0),
+        "period_end": period.date_at(accumulation_days - 1),
+        "accumulation_days": accumulation_days,
+        "total_volume": total_volume,
+        "avg_daily_volume": round(avg_daily_volume),
+        "volume_trend": volume_trend,
+        "up_days": up_days,
+        "down_days": down_days,
+        "net_movement_pct": round(net_movement_pct, 2)
+    }
+
+
+# ==================== BREAKOUT SETUP ====================
+
+def detect_breakout_setup(
+    series: OHLCVArrays,
+    spike_index: int,
+    post_spike_days: int = 10
+) -> Dict[str, Any]:
+    """
+    Breakout setup after a spike.
+
+    Resistance is the highest high from the spike day through
+    post_spike_days after it; the last bar of the series is the current
+    price. A close above resistance is an ENTRY, graded by its volume
+    against the post-spike average (spike day excluded).
+    """
+    no_data = {
+        "resistance_price": None,
+        "current_price": None,
+        "distance_pct": None,
+        "status": "NO_DATA",
+        "is_breakout": False,
+        "breakout_info": None
+    }
+    n = len(series)
+    if spike_index >= n - 1:
+        return no_data
+
+    end_index = min(spike_index + post_spike_days + 1, n)
+    post_spike = series[spike_index:end_index]
+    if len(post_spike) < 2:
+        return no_data
+
+    peak = int(np.argmax(post_spike.high))
+    resistance_price = float(post_spike.high[peak])
+    resistance_date = post_spike.date_at(peak)
+
+    current_price = float(series.close[-1])
+    current_date = series.date_at(n - 1)
+
+    if resistance_price > 0:
+        distance_pct = round(((resistance_price - current_price) / current_price) * 100, 2)
+    else:
+        distance_pct = 0
+
+    is_breakout = current_price > resistance_price
+
+    if is_breakout:
+        breakout_volume = int(series.volume[-1])
+        avg_volume = int(post_spike.volume[1:].sum()) / max(1, len(post_spike) - 1)
+        volume_ratio = breakout_volume / avg_volume if avg_volume > 0 else 0
+
+        breakout_info = {
+            "break_price": current_price,
+            "break_date": current_date,
+            "volume": breakout_volume,
+            "volume_ratio": round(volume_ratio, 2),
+            "quality": "STRONG" if volume_ratio >= 2 else "MODERATE" if volume_ratio >= 1.5 else "WEAK"
+        }
+        status = "ENTRY"
+    else:
+        breakout_info = None
+        if distance_pct <= 3:
+            status = "NEAR_BREAKOUT"
+        elif distance_pct <= 10:
+            status = "WAITING"
+        else:
+            status = "FAR"
+
+    return {
+        "resistance_price": round(resistance_price, 2),
+        "resistance_date": resistance_date,
+        "current_price": round(current_price, 2),
+        "current_date": current_date,
+        "distance_pct": distance_pct,
+        "status": status,
+        "is_breakout": is_breakout,
+        "breakout_info": breakout_info
+    }
+
+
+# ==================== SELLING CLIMAX & RESISTANCE ====================
+
+def detect_selling_climax(series: OHLCVArrays) -> Tuple[Optional[str], Dict]:
+    """
+    Latest selling climax: volume >= 2x the MA20 of the 20 prior bars and
+    close down more than 1%.
+
+    Returns:
+        (climax_date, climax_info); (None, {}) with fewer than 25 bars
+    """
+    n = len(series)
+    if n < 25:
+        return None, {}
+
+    volume = series.volume
+    close = series.close
+    # MA20 of the 20 bars before i, for i = 20 .. n-1
+    vol_ma20 = sma(volume, 20)[19:-1]
+    current_vol = volume[20:]
+    prev_close = close[19:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(vol_ma20 > 0, current_vol / vol_ma20, 0)
+        price_change = np.where(prev_close > 0, (close[20:] - prev_close) / prev_close * 100, 0)
+
+    hit = _last_true((vol_ma20 > 0) & (ratio >= 2.0) & (price_change < -1))
+    if hit is None:
+        return None, {"detected": False}
+
+    i = hit + 20
+    date = series.date_at(i)
+    return date, {
+        "date": date,
+        "price": float(close[i]),
+        "volume": int(volume[i]),
+        "volume_ratio": round(float(ratio[hit]), 2),
+        "price_change_pct": round(float(price_change[hit]), 2),
+        "detected": True
+    }
+
+
+def detect_resistance_levels(
+    series: OHLCVArrays,
+    volume_spikes: List[Dict],
+    today: str
+) -> List[Dict]:
+    """
+    Resistance lines at the high of each volume spike with price UP.
+
+    A line extends until the first later close above it (break_date), else
+    until today.
+    """
+    up_spikes = [s for s in volume_spikes if s["price_direction"] == "UP"]
+    if not up_spikes:
+        return []
+
+    spike_days = np.array([to_day_number(s["date"]) for s in up_spikes])
+    prices = np.array([s["high"] for s in up_spikes], dtype=np.float64)
+    # One row per spike: bars after the spike closing above its high
+    broken = (series.days[None, :] > spike_days[:, None]) & (series.close[None, :] > prices[:, None])
+    is_broken = broken.any(axis=1)
+    first_break = broken.argmax(axis=1)
+
+    resistance_lines = []
+    for spike, hit, i in zip(up_spikes, is_broken.tolist(), first_break.tolist()):
+        break_date = series.date_at(i) if hit else None
+        resistance_lines.append({
+            "start_date": spike["date"],
+            "end_date": break_date if hit else today,
+            "price": spike["high"],
+            "is_broken": hit,
+            "break_date": break_date,
+            "source": "volume_spike_up",
+            "spike_info": {
+                "ratio": spike["ratio"],
+                "price_change_pct": spike["price_change_pct"]
+            }
+        })
+    return resistance_lines
+
+
+# ==================== MULTI-TICKER ====================
+
+def analyze_spike(
+    series: OHLCVArrays,
+    spike_index: int,
+    post_spike_days: int = 10,
+    max_lookback: int = 60
+) -> Dict[str, Any]:
+    """Accumulation (with its detection method) and breakout setup around one spike."""
+    start, method = detect_accumulation_start(series, spike_index, max_lookback)
+    accumulation = analyze_pre_spike_accumulation(series, start, spike_index)
+    accumulation["detection_method"] = method
+    return {
+        "accumulation": accumulation,
+        "breakout_setup": detect_breakout_setup(series, spike_index, post_spike_days)
+    }
+
+
+def scan_spikes(
+    series_by_ticker: Dict[str, OHLCVArrays],
+    spike_dates: Dict[str, str],
+    post_spike_days: int = 10,
+    max_lookback: int = 60
+) -> Dict[str, Dict[str, Any]]:
+    """
+    analyze_spike for many tickers.
+
+    The spike of each ticker is the bar at (or the last one before) its
+    spike date; tickers without data on or before it are skipped.
+
+    Returns:
+        {ticker: {"spike_date", "spike_index", "accumulation", "breakout_setup"}}
+    """
+    results = {}
+    for ticker, spike_date in spike_dates.items():
+        series = series_by_ticker.get(ticker)
+        if series is None or not len(series):
+            continue
+        spike_index = series.index_at_or_before(spike_date)
+        if spike_index is None:
+            continue
+        results[ticker] = {
+            "spike_date": series.date_at(spike_index),
+            "spike_index": spike_index,
+            **analyze_spike(series, spike_index, post_spike_days, max_lookback)
+        }
+    return results
+
+
+def scan_selling_climaxes(series_by_ticker: Dict[str, OHLCVArrays]) -> Dict[str, Tuple[Optional[str], Dict]]:
+    """detect_selling_climax for many tickers: {ticker: (climax_date, climax_info)}."""
+    return {ticker: detect_selling_climax(series) for ticker, series in series_by_ticker.items()}
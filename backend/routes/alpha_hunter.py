@@ -1,12 +1,15 @@
 """
 API Routes for Alpha Hunter.
 """
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
 from modules.alpha_hunter_scorer import AlphaHunterScorer
 from modules.alpha_hunter_health import AlphaHunterHealth
-from modules.alpha_hunter_vpa import AlphaHunterStage2VPA
+from modules.alpha_hunter_vpa import AlphaHunterStage2VPA, iter_watchlist_batch
 from modules.alpha_hunter_flow import AlphaHunterFlow
 from modules.alpha_hunter_supply import AlphaHunterSupply
 from modules.database import DatabaseManager
@@ -16,12 +19,13 @@ router = APIRouter(prefix="/api/alpha-hunter", tags=["alpha_hunter"])
 @router.get("/scan")
 async def scan_anomalies(
     min_score: int = 60,
-    sector: Optional[str] = None
+    sector: Optional[str] = None,
+    mcap_min: Optional[float] = Query(None, ge=0, description="Minimum market cap in IDR")
 ):
     """[LEGACY] Scan market for volume anomalies (Stage 1 - volume-based)."""
     scorer = AlphaHunterScorer()
     try:
-        results = scorer.scan_market(min_score=min_score, sector=sector)
+        results = scorer.scan_market(min_score=min_score, sector=sector, mcap_min=mcap_min)
         return {"results": results, "count": len(results)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -239,6 +243,59 @@ async def get_pullback_health(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/stage2/vpa/batch")
+async def stream_stage2_vpa_batch(
+    tickers: Optional[str] = Query(None, description="Comma-separated watchlist tickers (default: whole watchlist)"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse (Server-Sent Events)"),
+    workers: int = Query(4, ge=1, le=16, description="Worker processes"),
+    lookback_days: int = Query(20, ge=10, le=60, description="Baseline days for median volume"),
+    pre_spike_days: int = Query(15, ge=5, le=40, description="Days to evaluate compression before spike"),
+    post_spike_days: int = Query(10, ge=3, le=30, description="Days to evaluate pullback after spike"),
+    min_ratio: float = Query(2.0, ge=1.5, le=10.0, description="Min volume/median ratio for auto spike detection"),
+    persist_tracking: bool = Query(False, description="Persist daily pullback snapshots to tracking table")
+):
+    """
+    Stage 2 VPA for the whole watchlist in one request.
+
+    OHLCV and broker summaries for all tickers are preloaded with a few
+    set-based queries, tickers are analyzed in parallel on a process pool,
+    and each result is streamed as soon as it finishes: one JSON object per
+    line (ndjson) or one `data:` event per ticker (sse). Every object is the
+    single-ticker /stage2/vpa/{ticker} payload, or {"ticker", "error"}.
+    A final {"done": true, "count": N} line/event closes the stream.
+    """
+    analyzer = AlphaHunterStage2VPA()
+    try:
+        tasks, errors = await asyncio.to_thread(
+            analyzer.prepare_watchlist_batch,
+            [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None,
+            lookback_days=lookback_days,
+            pre_spike_days=pre_spike_days,
+            post_spike_days=post_spike_days,
+            min_ratio=min_ratio,
+            persist_tracking=persist_tracking
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def encode(payload: dict) -> str:
+        body = json.dumps(payload, default=str)
+        return f"data: {body}\n\n" if format == "sse" else f"{body}\n"
+
+    async def stream():
+        count = 0
+        for error in errors:
+            count += 1
+            yield encode(error)
+        async for result in iter_watchlist_batch(tasks, max_workers=workers):
+            count += 1
+            yield encode(result)
+        yield encode({"done": True, "count": count})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+
 @router.get("/stage2/vpa/{ticker}")
 async def get_stage2_vpa(
     ticker: str,
@@ -268,13 +325,54 @@ async def get_stage2_vpa(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stage2/tracking/update")
+async def update_stage2_tracking(
+    tickers: Optional[str] = Query(None, description="Comma-separated watchlist tickers (default: whole watchlist)"),
+    lookback_days: int = Query(20, ge=10, le=60, description="Baseline days for spike auto-detection (new tickers)"),
+    post_spike_days: int = Query(10, ge=3, le=30, description="Days to track the pullback (new tickers)"),
+    min_ratio: float = Query(2.0, ge=1.5, le=10.0, description="Min volume/median ratio for auto spike detection")
+):
+    """
+    Daily Stage 2 tracking job.
+
+    Classifies only the bars after each ticker's last processed bar and
+    writes all new pullback snapshots in one transaction. Run it after the
+    daily OHLCV refresh (see scripts/update_stage2_tracking.py).
+    """
+    analyzer = AlphaHunterStage2VPA()
+    try:
+        return await asyncio.to_thread(
+            analyzer.update_tracking,
+            [t.strip() for t in tickers.split(",") if t.strip()] if tickers else None,
+            lookback_days=lookback_days,
+            post_spike_days=post_spike_days,
+            min_ratio=min_ratio
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stage2/tracking/{ticker}")
+async def get_stage2_tracking(ticker: str):
+    """Persisted pullback tracking (latest first) and its incremental state."""
+    db = DatabaseManager()
+    repo = db.get_alpha_hunter_repo()
+    ticker = ticker.upper()
+    return {
+        "ticker": ticker,
+        "state": repo.get_tracking_states([ticker]).get(ticker),
+        "history": repo.get_tracking_history(ticker)
+    }
+
+
 @router.get("/stage2/visualization/{ticker}")
 async def get_stage2_visualization(
     ticker: str,
     selling_climax_date: Optional[str] = Query(
         None, 
         description="Override selling climax date (YYYY-MM-DD)"
-    )
+    ),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Stage 2 VPA Visualization Data.
@@ -285,21 +383,109 @@ async def get_stage2_visualization(
     - money_flow_chart: Positive/negative flow bars + price overlay
     - resistance_lines: Horizontal lines from volume spike+UP until broken
     - recommendation: Trading action based on current state
+    
+    Responses carry an ETag; a request with a matching If-None-Match gets
+    304 Not Modified without the payload being rebuilt or sent.
     """
     analyzer = AlphaHunterStage2VPA()
     try:
-        result = analyzer.get_stage2_visualization_data(
-            ticker=ticker,
-            selling_climax_date=selling_climax_date
-        )
+        if if_none_match:
+            etag = await asyncio.to_thread(analyzer.stage2_visualization_etag, ticker, selling_climax_date)
+            if _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+        etag, result = await asyncio.to_thread(analyzer.get_stage2_visualization, ticker, selling_climax_date)
         if result.get("error"):
             raise HTTPException(status_code=404, detail=result["error"])
-        return result
+        return JSONResponse(content=result, headers={"ETag": etag, "Cache-Control": "no-cache"})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)."""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+FLOW_SCREEN_CHECKS = {
+    "smart_money": "smart_money_accumulation",
+    "retail_capitulation": "retail_capitulation",
+    "dominance": "smart_vs_retail",
+    "floor_price": "floor_price_safe",
+}
+
+
+@router.get("/flow/screener")
+async def screen_smart_money_flow(
+    days: int = Query(7, ge=1, le=60, description="Recent broker summary dates per ticker"),
+    min_checks: int = Query(0, ge=0, le=4, description="Minimum Stage 3 checks passed"),
+    conviction: Optional[str] = Query(None, pattern="^(HIGH|MEDIUM|LOW)$", description="Filter by overall conviction"),
+    require: Optional[List[str]] = Query(
+        None,
+        description="Checks that must pass: smart_money, retail_capitulation, dominance, floor_price"
+    ),
+    min_dominance: Optional[float] = Query(None, ge=0, le=100, description="Minimum smart money dominance %"),
+    max_gap_pct: Optional[float] = Query(None, description="Maximum gap of current price above floor %"),
+    sort_by: str = Query(
+        "checks_passed",
+        pattern="^(checks_passed|smart_net_lot|smart_net_value|retail_net_lot|retail_net_value|dominance_pct|gap_pct|ticker)$"
+    ),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
+    """
+    [ALPHA HUNTER STAGE 3] Market-wide smart money flow screener.
+
+    Runs the four /flow/{ticker} checks (smart money accumulation, retail
+    capitulation, smart vs retail dominance, floor price gap) for every
+    ticker with broker summary data in one columnar pass. The full screen is
+    cached per trading day; filters, sorting and paging are applied on top.
+    """
+    unknown = [name for name in require or [] if name not in FLOW_SCREEN_CHECKS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown checks: {', '.join(unknown)}")
+
+    analyzer = AlphaHunterFlow()
+    try:
+        screen = await asyncio.to_thread(analyzer.screen_market, days)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    rows = [
+        row for row in screen["results"]
+        if row["checks_passed"] >= min_checks
+        and (conviction is None or row["overall_conviction"] == conviction)
+        and all(row[FLOW_SCREEN_CHECKS[name]] for name in require or [])
+        and (min_dominance is None or row["dominance_pct"] >= min_dominance)
+        and (max_gap_pct is None or (row["floor_price"] > 0 and row["gap_pct"] <= max_gap_pct))
+    ]
+    if sort_by == "checks_passed":
+        # Ties broken by smart money net value
+        rows.sort(key=lambda r: (r["checks_passed"], r["smart_net_value"]), reverse=order == "desc")
+    else:
+        rows.sort(key=lambda r: r[sort_by], reverse=order == "desc")
+
+    return {
+        "trading_date": screen["trading_date"],
+        "days": days,
+        "total_screened": len(screen["results"]),
+        "filtered_count": len(rows),
+        "results": rows[offset:offset + limit],
+        "filters_applied": {
+            "min_checks": min_checks,
+            "conviction": conviction,
+            "require": require or [],
+            "min_dominance": min_dominance,
+            "max_gap_pct": max_gap_pct,
+            "sort_by": sort_by,
+            "order": order
+        }
+    }
+
 @router.get("/flow/{ticker}")
 async def get_smart_money_flow(
     ticker: str,
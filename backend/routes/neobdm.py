@@ -5,7 +5,6 @@ from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel
 import logging
-import asyncio
 import json
 
 router = APIRouter(prefix="/api", tags=["neobdm"])
@@ -338,118 +337,94 @@ def get_neobdm_dates():
 
 
 @router.post("/neobdm-batch-scrape")
-async def run_neobdm_batch_scrape(background_tasks: BackgroundTasks):
+async def run_neobdm_batch_scrape(
+    background_tasks: BackgroundTasks,
+    concurrency: int = Query(3, ge=1, le=6, description="Parallel browser contexts")
+):
     """
     Full synchronization of all NeoBDM data (Background Task).
     """
-    background_tasks.add_task(perform_full_sync)
+    background_tasks.add_task(perform_full_sync, concurrency)
     return {
         "status": "processing",
+        "concurrency": concurrency,
         "message": "Full synchronization started in the background. This will take a few minutes."
     }
 
 
-async def perform_full_sync():
-    """Core logic for background sync with ISOLATED sessions per task.
+def _build_market_summary_job(db_manager, m_code: str, p_code: str):
+    """Create a scheduler job that scrapes and stores one method/period combination."""
+    async def job(scraper):
+        df, reference_date = await scraper.get_market_summary(method=m_code, period=p_code)
+        if df is None or df.empty:
+            # Raise so the scheduler retries with a fresh context
+            raise RuntimeError("No data found")
+
+        # Incremental upsert: only new/changed rows are written, symbols that
+        # disappeared from the full table for this trade date are pruned
+        data_list = df.to_dict(orient="records")
+        scraped_at = reference_date if reference_date else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        stats = db_manager.save_neobdm_record_batch(m_code, p_code, data_list, scraped_at=scraped_at, prune=True)
+        return f"Success ({len(df)} rows, {stats['changed']} changed)"
+
+    return job
+
+
+async def perform_full_sync(concurrency: int = 3):
+    """Core logic for background sync with ISOLATED contexts per task.
     
-    Each method+period combination gets a fresh browser session to avoid
-    state pollution and ensure reliable scraping, especially for cumulative data.
+    Each method+period combination gets its own browser context (fresh cookies
+    and login) to avoid state pollution, but all contexts share one Chromium
+    process and up to `concurrency` of them run at the same time.
     """
     try:
-        from modules.scraper_neobdm import NeoBDMScraper
+        from modules.neobdm_sync_scheduler import NeoBDMSyncScheduler
         from modules.database import DatabaseManager
-        import traceback
         
         methods = [('m', 'Market Maker'), ('nr', 'Non-Retail'), ('f', 'Foreign Flow')]
         periods = [('d', 'Daily'), ('c', 'Cumulative')]
         
         db_manager = DatabaseManager()
         start_time = datetime.now()
-        today_str = start_time.strftime('%Y-%m-%d')
-        execution_log = []
         
         print(f"[*] Starting background Full Sync at {start_time}")
-        print(f"[*] Using ISOLATED SESSION approach (6 separate logins)")
+        print(f"[*] Using ISOLATED CONTEXT approach ({len(methods) * len(periods)} jobs, concurrency={concurrency})")
         
-        # Loop through all combinations with ISOLATED sessions
-        for m_code, m_label in methods:
-            for p_code, p_label in periods:
-                log_prefix = f"[{m_label}/{p_label}]"
-                print(f"\n{log_prefix} Starting isolated scraping session...")
-                
-                # ISOLATED SESSION: Create fresh scraper for THIS task only
-                scraper = NeoBDMScraper()
-                
-                try:
-                    # Initialize browser
-                    print(f"{log_prefix} Initializing browser...", flush=True)
-                    await scraper.init_browser(headless=True)
-                    
-                    # Login
-                    print(f"{log_prefix} Logging in...", flush=True)
-                    login_success = await scraper.login()
-                    
-                    if not login_success:
-                        msg = "Login failed"
-                        print(f"{log_prefix} Result: {msg}")
-                        execution_log.append(f"{log_prefix}: {msg}")
-                        continue  # Skip to next task
-
-                    # Cleanup old data for today
-                    try:
-                        conn = db_manager._get_conn()
-                        conn.execute(
-                            "DELETE FROM neobdm_records WHERE method=? AND period=? AND scraped_at LIKE ?", 
-                            (m_code, p_code, f"{today_str}%")
-                        )
-                        conn.commit()
-                        conn.close()
-                    except Exception as e:
-                        print(f"{log_prefix} Cleanup warning: {e}")
-
-                    # Scrape
-                    print(f"{log_prefix} Scraping data...", flush=True)
-                    try:
-                        df, reference_date = await scraper.get_market_summary(method=m_code, period=p_code)
-                        
-                        if df is not None and not df.empty:
-                            data_list = df.to_dict(orient="records")
-                            scraped_at = reference_date if reference_date else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            db_manager.save_neobdm_record_batch(m_code, p_code, data_list, scraped_at=scraped_at)
-                            msg = f"Success ({len(df)} rows)"
-                        else:
-                            msg = "No data found"
-                    except Exception as e:
-                        print(f"{log_prefix} Scraping error: {traceback.format_exc()}")
-                        msg = f"Error: {str(e)}"
-                    
-                    print(f"{log_prefix} Result: {msg}")
-                    execution_log.append(f"{log_prefix}: {msg}")
-                    
-                except Exception as e:
-                    msg = f"Session error: {str(e)}"
-                    print(f"{log_prefix} {msg}")
-                    execution_log.append(f"{log_prefix}: {msg}")
-                    
-                finally:
-                    # CRITICAL: Close browser immediately after each task
-                    print(f"{log_prefix} Closing browser session...", flush=True)
-                    await scraper.close()
-                
-                # Small cooldown between tasks
-                await asyncio.sleep(2)
+        jobs = [
+            {
+                "name": f"{m_label}/{p_label}",
+                "run": _build_market_summary_job(db_manager, m_code, p_code)
+            }
+            for m_code, m_label in methods
+            for p_code, p_label in periods
+        ]
+        
+        scheduler = NeoBDMSyncScheduler(concurrency=concurrency)
+        report = await scheduler.run(jobs)
+        
+        execution_log = [
+            f"[{job['name']}]: {job['result'] if job['status'] == 'success' else 'Error: ' + str(job['error'])}"
+            for job in report['jobs']
+        ]
             
         duration = datetime.now() - start_time
-        print(f"\n[*] Background Full Sync completed in {duration.total_seconds():.2f}s.")
+        print(f"\n[*] Background Full Sync completed in {duration.total_seconds():.2f}s "
+              f"(sum of jobs {report['sum_job_seconds']}s, speedup x{report['speedup']}).")
         print(f"[*] Logs: {execution_log}")
-
+        return report
 
     except Exception as e:
         print(f"[!] Critical error in background sync: {e}")
-        import logging
         logging.error(f"Critical error in background sync: {e}")
 
 
+@router.get("/neobdm-ingest-runs")
+async def get_neobdm_ingest_runs(limit: int = Query(50, ge=1, le=500)):
+    """Recent NeoBDM ingest runs with inserted/updated/unchanged/deleted row counts."""
+    from modules.database import DatabaseManager
+    return {"runs": DatabaseManager().get_neobdm_ingest_runs(limit)}
+
+
 @router.get("/neobdm-history")
 @router.get("/neobdm/history") # Al ias to fix potential 404s from slash/dash mismatch
 def get_neobdm_history(
@@ -622,51 +597,70 @@ async def get_broker_summary_api(
 @router.post("/neobdm-broker-summary-batch")
 async def run_neobdm_broker_summary_batch(
     background_tasks: BackgroundTasks,
-    tasks: List[BrokerSummaryBatchTask] = Body(...)
+    tasks: List[BrokerSummaryBatchTask] = Body(...),
+    workers: int = Query(3, ge=1, le=6),
+    force: bool = Query(False)
 ):
     """
     Trigger a batch scraping job for multiple tickers and dates.
     Format: [{"ticker": "ANTM", "dates": ["2026-01-12", "2026-01-11"]}, ...]
+
+    Args:
+        workers: Number of browser pages scraping in parallel (one shared login)
+        force: Re-scrape (ticker, date) pairs that already exist in the database
     """
     if not tasks:
         return JSONResponse(status_code=400, content={"error": "No batch tasks provided"})
 
     tasks_payload = [task.dict() for task in tasks]
-    background_tasks.add_task(perform_broker_summary_batch_sync, tasks_payload)
+    background_tasks.add_task(perform_broker_summary_batch_sync, tasks_payload, workers, force)
     return {
         "status": "processing",
         "message": f"Scrape job started for {len(tasks)} tickers. Data will be available in the database shortly."
     }
 
 
-async def perform_broker_summary_batch_sync(tasks: list):
-    """Background task for batch broker summary sync."""
+async def perform_broker_summary_batch_sync(tasks: list, workers: int = 3, force: bool = False):
+    """
+    Background task for batch broker summary sync.
+
+    Pairs already stored are skipped (unless force), and each result is saved
+    as soon as it is scraped so a crash mid-batch keeps the completed work.
+    """
     from modules.scraper_neobdm import NeoBDMScraper
     from modules.database import DatabaseManager
     import logging
     
     db_manager = DatabaseManager()
     scraper = NeoBDMScraper()
-    
+    counts = {"saved": 0, "errors": 0}
+
+    def save_result(res):
+        if "error" not in res:
+            db_manager.save_broker_summary_batch(
+                ticker=res['ticker'],
+                trade_date=res['trade_date'],
+                buy_data=res['buy'],
+                sell_data=res['sell']
+            )
+            counts["saved"] += 1
+        else:
+            counts["errors"] += 1
+            logging.warning(f"[!] Batch Broker Summary error for {res.get('ticker')} on {res.get('trade_date')}: {res.get('error')}")
+
     try:
+        skip_pairs = set()
+        if not force:
+            skip_pairs = db_manager.get_existing_broker_summary_pairs([t.get('ticker') for t in tasks])
+
         await scraper.init_browser(headless=True)
-        results = await scraper.get_broker_summary_batch(tasks)
-        success_count = 0
-        error_count = 0
-        for res in results:
-            if "error" not in res:
-                db_manager.save_broker_summary_batch(
-                    ticker=res['ticker'],
-                    trade_date=res['trade_date'],
-                    buy_data=res['buy'],
-                    sell_data=res['sell']
-                )
-                success_count += 1
-            else:
-                error_count += 1
-                logging.warning(f"[!] Batch Broker Summary error for {res.get('ticker')} on {res.get('trade_date')}: {res.get('error')}")
+        results = await scraper.get_broker_summary_batch(
+            tasks, workers=workers, skip_pairs=skip_pairs, on_result=save_result
+        )
+        if results and "ticker" not in results[0]:
+            logging.error(f"Batch broker summary sync aborted: {results[0].get('error')}")
         
-        print(f"[*] Batch Broker Summary Sync completed. {success_count} saved, {error_count} errors.")
+        print(f"[*] Batch Broker Summary Sync completed. {counts['saved']} saved, {counts['errors']} errors.")
         
     except Exception as e:
         logging.error(f"Error in background batch broker summary sync: {e}")
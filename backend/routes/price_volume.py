@@ -5,15 +5,19 @@ Provides endpoints to fetch stock price and volume data for visualization.
 Uses yfinance for data retrieval with smart incremental fetching.
 """
 
-from fastapi import APIRouter, HTTPException, Query
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
 from datetime import datetime, timedelta
 from typing import Optional
 import logging
-import yfinance as yf
+import numpy as np
 import pandas as pd
 
 from db.price_volume_repository import price_volume_repo
 from db.market_metadata_repository import MarketMetadataRepository
+from modules.ohlcv_refresh import OHLCVRefreshEngine, refresh_jobs, run_refresh_job
+from modules.ohlcv_service import ohlcv_service
+from modules.indicators import indicators_for_records, spec_name
 
 # Initialize market metadata repo
 market_meta_repo = MarketMetadataRepository()
@@ -22,13 +26,15 @@ router = APIRouter(prefix="/api", tags=["price-volume"])
 logger = logging.getLogger(__name__)
 
 
-def calculate_moving_averages(data: list, periods: list = [5, 10, 20]) -> dict:
+def calculate_moving_averages(data: list, periods: list = [5, 10, 20], ticker: Optional[str] = None) -> dict:
     """
     Calculate moving averages for price and volume data.
     
     Args:
         data: List of OHLCV records
         periods: List of MA periods to calculate
+        ticker: When data is a date range of this ticker's stored series, the
+            MAs come from the shared indicator cache (updated incrementally)
         
     Returns:
         Dictionary with MA data for each period
@@ -36,57 +42,44 @@ def calculate_moving_averages(data: list, periods: list = [5, 10, 20]) -> dict:
     if not data or len(data) < max(periods):
         return {f"ma{p}": [] for p in periods}
     
-    closes = [d['close'] for d in data]
-    volumes = [d['volume'] for d in data]
     times = [d['time'] for d in data]
-    
-    result = {}
-    
-    # Calculate price MAs
-    for period in periods:
-        ma_values = []
-        for i in range(len(closes)):
-            if i < period - 1:
-                ma_values.append(None)
-            else:
-                window = closes[i - period + 1:i + 1]
-                ma_values.append(sum(window) / period)
-        
-        result[f"ma{period}"] = [
-            {"time": times[i], "value": ma_values[i]}
-            for i in range(len(times))
-            if ma_values[i] is not None
+    specs = [("sma", "close", p) for p in periods] + [("sma", "volume", 20)]
+    values = indicators_for_records(data, specs, price_volume_repo, ticker)
+    
+    def to_points(name: str) -> list:
+        return [
+            {"time": times[i], "value": float(value)}
+            for i, value in enumerate(values[name])
+            if not np.isnan(value)
         ]
     
-    # Calculate volume MA20
-    volume_ma = []
-    for i in range(len(volumes)):
-        if i < 19:
-            volume_ma.append(None)
-        else:
-            window = volumes[i - 19:i + 1]
-            volume_ma.append(sum(window) / 20)
+    result = {f"ma{p}": to_points(spec_name(("sma", "close", p))) for p in periods}
     
-    result["volumeMa20"] = [
-        {"time": times[i], "value": volume_ma[i]}
-        for i in range(len(times))
-        if volume_ma[i] is not None
-    ]
+    # Calculate volume MA20
+    result["volumeMa20"] = to_points(spec_name(("sma", "volume", 20)))
     
     return result
 
 
 # IMPORTANT: Static routes MUST come before dynamic routes like {ticker}
 @router.post("/price-volume/refresh-all")
-async def refresh_all_tickers():
+async def refresh_all_tickers(
+    background_tasks: BackgroundTasks,
+    background: bool = Query(False, description="Return a job id immediately instead of waiting"),
+    batch_size: int = Query(40, ge=1, le=200, description="Tickers per provider request"),
+    concurrency: int = Query(4, ge=1, le=8, description="Provider requests in flight")
+):
     """
     Refresh OHLCV data for all existing tickers in the database.
     
-    This endpoint fetches incremental data from yfinance for each ticker
-    that already exists in the database, updating them to the latest date.
+    Tickers are grouped by their missing date range and fetched from yfinance
+    in multi-ticker batches (bounded concurrency, rate limited), then written
+    in one bulk transaction. Progress is available from
+    GET /price-volume/refresh-jobs/{job_id}.
     
     Returns:
         {
+            "job_id": "3f2a9c1b7d4e",
             "tickers_processed": 27,
             "tickers_updated": 25,
             "total_records_added": 120,
@@ -97,6 +90,7 @@ async def refresh_all_tickers():
             ],
             "errors": []
         }
+        With background=true only the job id and status are returned.
     """
     try:
         tickers = price_volume_repo.get_all_tickers()
@@ -111,106 +105,58 @@ async def refresh_all_tickers():
                 "message": "No tickers found in database. Add tickers first by searching them individually."
             }
         
-        results = []
-        errors = []
-        total_records_added = 0
-        tickers_updated = 0
+        running = refresh_jobs.running()
+        if running:
+            raise HTTPException(status_code=409, detail=f"Refresh job {running.job_id} is already running")
         
-        end_date = datetime.now()
+        engine = OHLCVRefreshEngine(price_volume_repo, batch_size=batch_size, concurrency=concurrency)
+        job = refresh_jobs.create()
         
-        for ticker in tickers:
-            try:
-                latest_date = price_volume_repo.get_latest_date(ticker)
-                
-                if not latest_date:
-                    results.append({
-                        "ticker": ticker,
-                        "status": "no_existing_data",
-                        "records_added": 0
-                    })
-                    continue
-                
-                latest_dt = datetime.strptime(latest_date, '%Y-%m-%d')
-                today = datetime.now().date()
-                
-                # Check if data is already up to date
-                if latest_dt.date() >= today - timedelta(days=1):
-                    results.append({
-                        "ticker": ticker,
-                        "status": "already_up_to_date",
-                        "records_added": 0,
-                        "latest_date": latest_date
-                    })
-                    continue
-                
-                # Fetch incremental data from yfinance
-                fetch_start = latest_dt + timedelta(days=1)
-                yf_ticker = f"{ticker}.JK"
-                
-                stock = yf.Ticker(yf_ticker)
-                df = stock.history(
-                    start=fetch_start.strftime('%Y-%m-%d'), 
-                    end=end_date.strftime('%Y-%m-%d')
-                )
-                
-                if df.empty:
-                    results.append({
-                        "ticker": ticker,
-                        "status": "no_new_data",
-                        "records_added": 0,
-                        "latest_date": latest_date
-                    })
-                    continue
-                
-                # Convert DataFrame to list of records
-                new_records = []
-                for date_idx, row in df.iterrows():
-                    new_records.append({
-                        'time': date_idx.strftime('%Y-%m-%d'),
-                        'open': float(row['Open']),
-                        'high': float(row['High']),
-                        'low': float(row['Low']),
-                        'close': float(row['Close']),
-                        'volume': int(row['Volume'])
-                    })
-                
-                # Store in database
-                records_added = price_volume_repo.upsert_ohlcv_data(ticker, new_records)
-                total_records_added += records_added
-                tickers_updated += 1
-                
-                new_latest = price_volume_repo.get_latest_date(ticker)
-                
-                results.append({
-                    "ticker": ticker,
-                    "status": "updated",
-                    "records_added": records_added,
-                    "previous_latest": latest_date,
-                    "new_latest": new_latest
-                })
-                
-                logger.info(f"Refreshed {ticker}: added {records_added} records")
-                
-            except Exception as e:
-                logger.error(f"Error refreshing {ticker}: {e}")
-                errors.append({
-                    "ticker": ticker,
-                    "error": str(e)
-                })
+        if background:
+            background_tasks.add_task(run_refresh_job, engine, job)
+            return {"job_id": job.job_id, "status": job.status}
         
-        return {
-            "tickers_processed": len(tickers),
-            "tickers_updated": tickers_updated,
-            "total_records_added": total_records_added,
-            "results": results,
-            "errors": errors
-        }
+        summary = await run_refresh_job(engine, job)
+        if summary is None:
+            raise HTTPException(status_code=500, detail=f"Failed to refresh tickers: {job.error}")
+        return {"job_id": job.job_id, **summary}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in refresh_all_tickers: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to refresh tickers: {str(e)}")
 
 
+@router.get("/price-volume/refresh-jobs/{job_id}")
+async def get_refresh_job(job_id: str):
+    """
+    Get progress (and the final summary once completed) of a refresh-all job.
+    """
+    job = refresh_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Refresh job {job_id} not found")
+    return job.to_dict()
+
+
+@router.post("/price-volume/market-cap/generate-history")
+async def generate_market_cap_history(
+    full: bool = Query(False, description="Recompute all dates instead of appending new ones")
+):
+    """
+    Compute market cap history (close x shares outstanding) for every ticker
+    with known shares outstanding, in one set-based pass and one transaction.
+    
+    Returns:
+        {"tickers": 812, "rows": 812}
+    """
+    try:
+        return await asyncio.to_thread(market_meta_repo.generate_market_cap_history, None, full)
+    except Exception as e:
+        logger.error(f"Error generating market cap history: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate market cap history: {str(e)}")
+
+
 @router.get("/price-volume/unusual/scan")
 
 async def scan_unusual_volumes(
@@ -758,75 +704,16 @@ async def get_price_volume(
         }
     """
     ticker = ticker.upper()
-    yf_ticker = f"{ticker}.JK"  # IDX ticker format for Yahoo Finance
     
     try:
         # Calculate date range
         end_date = datetime.now()
         start_date = end_date - timedelta(days=months * 30)
         
-        # Check existing data
-        latest_date = price_volume_repo.get_latest_date(ticker)
-        earliest_date = price_volume_repo.get_earliest_date(ticker)
-        
-        source = "database"
-        records_added = 0
-        
-        # Determine if we need to fetch data
-        need_fetch = False
-        fetch_start = start_date
-        
-        if not latest_date:
-            # No data exists, fetch everything
-            need_fetch = True
-            source = "fetched_full"
-            logger.info(f"No existing data for {ticker}, fetching full {months} months")
-        else:
-            latest_dt = datetime.strptime(latest_date, '%Y-%m-%d')
-            earliest_dt = datetime.strptime(earliest_date, '%Y-%m-%d')
-            today = datetime.now().date()
-            
-            # Check if we need to fetch older data (if requested range is older than what we have)
-            if start_date.date() < earliest_dt.date():
-                need_fetch = True
-                fetch_start = start_date
-                source = "fetched_full"
-                logger.info(f"Requested older data for {ticker}, fetching from {start_date.date()}")
-            # Check if we need to fetch newer data
-            elif latest_dt.date() < today - timedelta(days=1):
-                need_fetch = True
-                fetch_start = latest_dt + timedelta(days=1)
-                source = "fetched_incremental"
-                logger.info(f"Fetching incremental data for {ticker} from {fetch_start.date()}")
-        
-        # Fetch data from yfinance if needed
-        if need_fetch:
-            try:
-                stock = yf.Ticker(yf_ticker)
-                df = stock.history(start=fetch_start.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
-                
-                if df.empty:
-                    logger.warning(f"No data returned from yfinance for {yf_ticker}")
-                else:
-                    # Convert DataFrame to list of records
-                    new_records = []
-                    for date_idx, row in df.iterrows():
-                        new_records.append({
-                            'time': date_idx.strftime('%Y-%m-%d'),
-                            'open': float(row['Open']),
-                            'high': float(row['High']),
-                            'low': float(row['Low']),
-                            'close': float(row['Close']),
-                            'volume': int(row['Volume'])
-                        })
-                    
-                    # Store in database
-                    records_added = price_volume_repo.upsert_ohlcv_data(ticker, new_records)
-                    logger.info(f"Stored {records_added} records for {ticker}")
-                    
-            except Exception as e:
-                logger.error(f"Error fetching data from yfinance for {ticker}: {e}")
-                # Continue with database data if fetch fails
+        # Fetch missing (older or newer) data into the store if needed
+        fetch_result = ohlcv_service.ensure_history(ticker, start_date.strftime('%Y-%m-%d'))
+        source = fetch_result["source"]
+        records_added = fetch_result["records_added"]
         
         # Get all data from database
         data = price_volume_repo.get_ohlcv_data(
@@ -842,7 +729,7 @@ async def get_price_volume(
             )
         
         # Calculate moving averages
-        ma_data = calculate_moving_averages(data)
+        ma_data = calculate_moving_averages(data, ticker=ticker)
         
         return {
             "ticker": ticker,
@@ -937,56 +824,22 @@ async def get_market_cap_data(
         # Get history
         history = market_meta_repo.get_market_cap_history(ticker, days)
         
-        # If no history, try to generate from OHLCV data
+        # If no history, generate it from stored OHLCV (set-based, one transaction)
         if not history and shares:
             logger.info(f"No market cap history for {ticker}, generating from OHLCV...")
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            ohlcv_data = price_volume_repo.get_ohlcv_data(
-                ticker, 
-                start_date.strftime('%Y-%m-%d'),
-                end_date.strftime('%Y-%m-%d')
-            )
-            
-            if ohlcv_data:
-                saved = market_meta_repo.calculate_and_save_market_cap_from_ohlcv(
-                    ticker, ohlcv_data, shares
-                )
-                logger.info(f"Generated {saved} market cap history records for {ticker}")
-                history = market_meta_repo.get_market_cap_history(ticker, days)
-        
-        # Calculate changes
-        change_1d = None
-        change_7d = None
-        change_30d = None
-        
-        if history and len(history) >= 2:
-            latest = history[-1]['market_cap']
-            
-            if len(history) >= 2:
-                prev_1d = history[-2]['market_cap']
-                if prev_1d > 0:
-                    change_1d = ((latest - prev_1d) / prev_1d) * 100
-            
-            if len(history) >= 7:
-                prev_7d = history[-7]['market_cap']
-                if prev_7d > 0:
-                    change_7d = ((latest - prev_7d) / prev_7d) * 100
-            
-            if len(history) >= 30:
-                prev_30d = history[-30]['market_cap']
-                if prev_30d > 0:
-                    change_30d = ((latest - prev_30d) / prev_30d) * 100
+            saved = market_meta_repo.generate_market_cap_history([ticker])["rows"]
+            logger.info(f"Generated {saved} market cap history records for {ticker}")
+            history = market_meta_repo.get_market_cap_history(ticker, days)
+        
+        # Calculate changes (indexed lookup of the latest snapshots)
+        changes = market_meta_repo.get_market_cap_changes(ticker)
         
         return {
             "ticker": ticker,
             "current_market_cap": current_mcap,
             "shares_outstanding": shares,
             "currency": "IDR",
-            "change_1d_pct": round(change_1d, 2) if change_1d is not None else None,
-            "change_7d_pct": round(change_7d, 2) if change_7d is not None else None,
-            "change_30d_pct": round(change_30d, 2) if change_30d is not None else None,
+            **changes,
             "history": history,
             "history_count": len(history)
         }
@@ -33,27 +33,7 @@ async def run_batch_scrape():
             log_prefix = f"[{m_label}/{p_label}]"
             print(f"\n[>] Starting Sequence: {m_label} | {p_label} (FRESH LOGIN)")
             
-            # 1. Cleanup old data
-            try:
-                conn = db_manager._get_conn()
-                cursor = conn.execute(
-                    "SELECT COUNT(*) FROM neobdm_records WHERE method=? AND period=? AND scraped_at LIKE ?",
-                    (m_code, p_code, f"{today_str}%")
-                )
-                count_before = cursor.fetchone()[0]
-                
-                conn.execute(
-                    "DELETE FROM neobdm_records WHERE method=? AND period=? AND scraped_at LIKE ?", 
-                    (m_code, p_code, f"{today_str}%")
-                )
-                conn.commit()
-                conn.close()
-                if count_before > 0:
-                    print(f"    [CLEANUP] Cleared {count_before} existing records.")
-            except Exception as e:
-                print(f"    [CLEANUP] Warning: {e}")
-
-            # 2. Scrape with FRESH SESSION
+            # 1. Scrape with FRESH SESSION
             scraper = NeoBDMScraper()
             try:
                 print("    [INIT] Launching browser & Logging in...", flush=True)
@@ -72,8 +52,9 @@ async def run_batch_scrape():
                     data_list = df.to_dict(orient="records")
                     scraped_at = reference_date if reference_date else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     
-                    db_manager.save_neobdm_record_batch(m_code, p_code, data_list, scraped_at=scraped_at)
-                    print(f"    [+] Success: Saved {len(df)} rows.")
+                    # Incremental upsert replaces the old delete-today-and-reinsert cleanup
+                    stats = db_manager.save_neobdm_record_batch(m_code, p_code, data_list, scraped_at=scraped_at, prune=True)
+                    print(f"    [+] Success: {len(df)} rows, {stats['changed']} changed.")
                 else:
                     print(f"    [-] Warning: No data found.")
                     
@@ -82,7 +63,7 @@ async def run_batch_scrape():
             finally:
                 await scraper.close()
             
-            # 3. Cool-down
+            # 2. Cool-down
             print("    [WAIT] Cooling down for 5 seconds...")
             await asyncio.sleep(5)
 
@@ -32,10 +32,22 @@ def clean_database():
             
             updates.append((clean_symbol, row_id))
 
-        # Perform batch update
-        cursor.executemany("UPDATE neobdm_records SET symbol = ? WHERE id = ?", updates)
+        # Perform batch update. A cleaned symbol can collide with a row that
+        # already exists for the same (method, period, trade_date); those
+        # updates are skipped and the watchlist-suffixed duplicate is removed.
+        cursor.executemany("UPDATE OR IGNORE neobdm_records SET symbol = ? WHERE id = ?", updates)
+        cursor.executemany("""
+            DELETE FROM neobdm_records
+            WHERE id = ? AND symbol != ? AND EXISTS (
+                SELECT 1 FROM neobdm_records kept
+                WHERE kept.symbol = ? AND kept.method = neobdm_records.method
+                  AND kept.period = neobdm_records.period AND kept.trade_date = neobdm_records.trade_date
+            )
+        """, [(row_id, clean_symbol, clean_symbol) for clean_symbol, row_id in updates])
+        duplicates = cursor.rowcount
         conn.commit()
-        print(f"Successfully cleaned {len(updates)} database records.")
+        print(f"Successfully cleaned {len(updates) - duplicates} database records "
+              f"({duplicates} duplicates removed).")
 
     except Exception as e:
         print(f"Error during cleanup: {e}")
@@ -1,4 +1,6 @@
-
+# Legacy cleanup. New databases get one row per (symbol, method, period, trade_date)
+# from idx_neobdm_rec_unique and the upsert in NeoBDMRepository.save_neobdm_record_batch;
+# DatabaseConnection collapses old duplicates once when it creates that index.
 import sqlite3
 import os
 
@@ -39,35 +41,9 @@ def deduplicate():
     else:
         print("No exact duplicates found.")
 
-    # 2. Check for redundant batches (Multiple scrapes for the same method/period today)
-    print("\nChecking for redundant batches today (2025-12-22)...")
-    query_batches = """
-    SELECT method, period, scraped_at, COUNT(*) 
-    FROM neobdm_records 
-    WHERE substr(scraped_at, 1, 10) = '2025-12-22'
-    GROUP BY method, period, scraped_at
-    """
-    cursor.execute(query_batches)
-    batches = cursor.fetchall()
-
-    methods_periods = {}
-    for method, period, scraped_at, count in batches:
-        key = (method, period)
-        if key not in methods_periods:
-            methods_periods[key] = []
-        methods_periods[key].append(scraped_at)
-
-    for (m, p), times in methods_periods.items():
-        if len(times) > 1:
-            print(f"Found {len(times)} batches for {m}/{p} today. Keeping the LATEST one only ({max(times)}).")
-            # Remove all but the latest batch for this method/period today
-            latest = max(times)
-            others = [t for t in times if t != latest]
-            for other in others:
-                cursor.execute("DELETE FROM neobdm_records WHERE method=? AND period=? AND scraped_at=?", (m, p, other))
-                print(f"  Deleted batch from {other}")
-        else:
-            print(f"Only 1 batch found for {m}/{p} today. No cleanup needed.")
+    # Batches are no longer one scraped_at: since the incremental ingest, rows of
+    # a (method, period, trade_date) keep the stamp of the run that last changed
+    # them, and idx_neobdm_rec_unique already keeps one row per trade date.
 
     conn.commit()
     conn.close()
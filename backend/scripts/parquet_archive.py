@@ -0,0 +1,40 @@
+import os
+import sys
+import argparse
+from typing import List, Optional
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.connection import DatabaseConnection
+from db.parquet_archive import DATASETS, RESTORABLE, ParquetArchive
+
+def _parse_csv_list(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/restore OHLCV and flow history as partitioned Parquet")
+    parser.add_argument("action", choices=["export", "restore"])
+    parser.add_argument("--datasets", help=f"Comma-separated datasets (default: all). Available: {', '.join(DATASETS)}")
+    parser.add_argument("--tickers", help="Restore only: comma-separated tickers (default: all)")
+    parser.add_argument("--root", help="Archive directory (default: data/parquet)")
+    parser.add_argument("--db", help="SQLite database path (default: data/market_sentinel.db)")
+    parser.add_argument("--full", action="store_true", help="Export: rewrite the archive instead of appending")
+
+    args = parser.parse_args()
+    datasets = _parse_csv_list(args.datasets)
+    archive = ParquetArchive(root=args.root, db_path=args.db)
+
+    if args.action == "export":
+        archive.export(datasets or None, full=args.full)
+        return
+
+    DatabaseConnection(archive.db_path)
+    for name in datasets or RESTORABLE:
+        written = archive.restore(name, _parse_csv_list(args.tickers) or None)
+        print(f"[*] Restored {written} {name} rows into {archive.db_path}")
+
+if __name__ == "__main__":
+    main()
@@ -39,7 +39,7 @@ def _print_verification(ticker: str, date_str: str, data: dict):
         print(f"  {i+1}. {broker}: {nlot} lots | {nval}B | Avg: {savg}")
     print("=" * 50)
 
-async def scrape_action(ticker, date_str, verify=False, tickers=None, dates=None):
+async def scrape_action(ticker, date_str, verify=False, tickers=None, dates=None, workers=3, force=False):
     # Ensure tables exist
     DatabaseConnection()
 
@@ -52,12 +52,15 @@ async def scrape_action(ticker, date_str, verify=False, tickers=None, dates=None
 
         if tickers and dates:
             batch_tasks = [{"ticker": t.upper(), "dates": dates} for t in tickers]
-            print(f"[*] Running batch scrape for {len(tickers)} tickers and {len(dates)} dates...")
-            results = await scraper.get_broker_summary_batch(batch_tasks)
-            for result in results:
+            skip_pairs = set() if force else repo.get_existing_broker_summary_pairs(tickers)
+            print(f"[*] Running batch scrape for {len(tickers)} tickers and {len(dates)} dates "
+                  f"on {workers} page(s), {len(skip_pairs)} stored pairs known...")
+
+            def save_result(result):
+                # Save each result as soon as it is scraped
                 if "error" in result:
                     print(f"[!] Batch error: {result['error']}")
-                    continue
+                    return
                 repo.save_broker_summary_batch(
                     ticker=result['ticker'],
                     trade_date=result['trade_date'],
@@ -66,6 +69,10 @@ async def scrape_action(ticker, date_str, verify=False, tickers=None, dates=None
                 )
                 if verify:
                     _print_verification(result['ticker'], result['trade_date'], result)
+
+            await scraper.get_broker_summary_batch(
+                batch_tasks, workers=workers, skip_pairs=skip_pairs, on_result=save_result
+            )
             print("[OK] Batch scraping complete.")
             return
 
@@ -105,6 +112,8 @@ def main():
     parser.add_argument("--tickers", help="Comma-separated tickers for batch mode (e.g., ANTM,BBCA)")
     parser.add_argument("--dates", help="Comma-separated dates for batch mode (e.g., 2025-01-12,2025-01-13)")
     parser.add_argument("--verify", action="store_true", help="Print sample data for verification")
+    parser.add_argument("--workers", type=int, default=3, help="Parallel browser pages for batch mode (default: 3)")
+    parser.add_argument("--force", action="store_true", help="Batch mode: re-scrape pairs already in the database")
 
     # Handle Windows event loop policy
     if sys.platform == 'win32':
@@ -117,7 +126,10 @@ def main():
     if tickers or dates:
         if not tickers or not dates:
             parser.error("Batch mode requires both --tickers and --dates.")
-        asyncio.run(scrape_action(args.ticker, args.date, args.verify, tickers=tickers, dates=dates))
+        asyncio.run(scrape_action(
+            args.ticker, args.date, args.verify,
+            tickers=tickers, dates=dates, workers=args.workers, force=args.force
+        ))
     else:
         if not args.ticker:
             parser.error("--ticker is required unless batch mode is used.")
@@ -0,0 +1,28 @@
+import os
+import sys
+import argparse
+import json
+
+# Add parent directory to sys.path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.alpha_hunter_vpa import AlphaHunterStage2VPA
+
+def main():
+    """
+    Daily Stage 2 tracking job (schedule after the OHLCV refresh, e.g. cron 17:30 WIB on weekdays).
+    Advances the pullback tracking of every watchlist ticker by the bars added since its last run.
+    """
+    parser = argparse.ArgumentParser(description="Advance Alpha Hunter Stage 2 pullback tracking")
+    parser.add_argument("--tickers", help="Comma-separated watchlist tickers (default: whole watchlist)")
+    parser.add_argument("--post-spike-days", type=int, default=10, help="Pullback length for newly tracked tickers")
+
+    args = parser.parse_args()
+    tickers = [t.strip() for t in args.tickers.split(",") if t.strip()] if args.tickers else None
+
+    summary = AlphaHunterStage2VPA().update_tracking(tickers, post_spike_days=args.post_spike_days)
+    print(json.dumps(summary, indent=2, default=str))
+    return 1 if summary.get("error") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
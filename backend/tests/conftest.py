@@ -0,0 +1,81 @@
+"""Shared fixtures and data generators for the backend tests."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import pytest
+
+import config
+from db.connection import DatabaseConnection
+
+
+def make_bars(
+    count: int,
+    seed: int = 0,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    price: float = 1000.0,
+    step: float = 0.03,
+    volume: tuple = (10_000, 30_000),
+    spikes: Optional[Dict[int, int]] = None,
+    weekdays_only: bool = True
+):
+    """
+    Seeded random-walk daily bars in the repository record format
+    (time/open/high/low/close/volume).
+
+    Args:
+        count: Number of bars
+        seed: Random seed (same seed, same bars)
+        start: First day (inclusive); default: the bars end on `end`
+        end: Last day (inclusive) when no start is given; default today
+        price: Opening price of the first bar
+        step: Largest relative close-to-close move
+        volume: (low, high) range of the daily volume
+        spikes: {bar index: volume multiplier}
+        weekdays_only: Skip Saturdays and Sundays
+    """
+    def trading(day):
+        return not weekdays_only or day.weekday() < 5
+
+    if start is None:
+        day = end or datetime.now()
+        days = []
+        while len(days) < count:
+            if trading(day):
+                days.append(day)
+            day -= timedelta(days=1)
+        days.reverse()
+    else:
+        day = start
+        days = []
+        while len(days) < count:
+            if trading(day):
+                days.append(day)
+            day += timedelta(days=1)
+
+    rng = random.Random(seed)
+    bars = []
+    for index, day in enumerate(days):
+        open_price = price
+        price = max(50.0, price * (1 + rng.uniform(-step, step)))
+        bars.append({
+            "time": day.strftime('%Y-%m-%d'), "open": open_price, "high": max(open_price, price) * 1.01,
+            "low": min(open_price, price) * 0.99, "close": price,
+            "volume": rng.randint(*volume) * (spikes or {}).get(index, 1)
+        })
+    return bars
+
+
+@pytest.fixture
+def data_dir(monkeypatch):
+    """Temporary config.DATA_DIR with the application schema created in it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        monkeypatch.setattr(config, "DATA_DIR", tmp)
+        DatabaseConnection()
+        yield tmp
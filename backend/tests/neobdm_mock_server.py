@@ -0,0 +1,188 @@
+"""
+Local mock of the NeoBDM Dash site for scraper tests.
+
+Serves just enough of neobdm.tech for the Playwright scraper to log in and
+read a Dash-style table, without touching the real website:
+
+    /accounts/login/   login form (#id_login, #id_password, .primaryAction)
+    /home/             landing page after login (requires session cookie)
+    /market_summary/   Dash-like table (.dash-cell) rendered after a delay
+
+    /<page>/_dash-layout, /<page>/_dash-dependencies, /<page>/_dash-update-component
+                       Dash JSON API for market_summary and broker_summary,
+                       answered from recorded fixtures in fixtures/neobdm_dash/
+                       (variant="paged" serves a server-side paginated summary table)
+
+Usage:
+    server = MockNeoBDMServer(render_delay=0.5)
+    server.start()
+    scraper = NeoBDMScraper(base_url=server.base_url)
+    ...
+    server.stop()
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOGIN_PAGE = """<!doctype html>
+<html><body>
+<form method="post" action="/accounts/login/">
+  <input id="id_login" name="login">
+  <input id="id_password" name="password" type="password">
+  <button class="primaryAction btn btn-primary" type="submit">Sign In</button>
+</form>
+</body></html>"""
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "neobdm_dash")
+DASH_PAGES = ("market_summary", "broker_summary")
+
+
+def load_dash_fixture(page: str, kind: str, variant: str = ""):
+    path = os.path.join(FIXTURE_DIR, f"{page}_{variant}_{kind}.json")
+    if not variant or not os.path.exists(path):
+        path = os.path.join(FIXTURE_DIR, f"{page}_{kind}.json")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _fixture_key(payload: dict) -> str:
+    """
+    Key of the recorded response for a callback request (see *_update.json):
+    the first two input values, i.e. "method|period" or "TICKER|date", plus
+    "|p<page>" for table page requests.
+    """
+    inputs = payload.get("inputs", [])
+    values = [str(dep.get("value")) for dep in inputs[:2]]
+    values += [f"p{dep.get('value')}" for dep in inputs if dep.get("property") == "page_current"]
+    return "|".join(values)
+
+
+HOME_PAGE = "<!doctype html><html><body><h1>Home</h1></body></html>"
+
+MARKET_SUMMARY_PAGE = """<!doctype html>
+<html><body>
+<label class="mb-0 form-label">Market Maker Analysis Summary [2026-01-15]</label>
+<div class="dash-spreadsheet-container"><table id="summary"></table></div>
+<script>
+  setTimeout(() => {
+    const rows = [["BBCA", "12.5"], ["BBRI", "-3.1"], ["TLKM", "7.0"]];
+    const table = document.getElementById('summary');
+    table.innerHTML = '<tr><th class="dash-header"><span>symbol</span></th>' +
+                      '<th class="dash-header"><span>d-0</span></th></tr>' +
+      rows.map(r => '<tr>' + r.map(c => '<td class="dash-cell">' + c + '</td>').join('') + '</tr>').join('');
+  }, RENDER_DELAY_MS);
+</script>
+</body></html>"""
+
+
+class MockNeoBDMServer:
+    """Threaded HTTP server emulating the NeoBDM pages used by the scraper."""
+
+    def __init__(self, render_delay: float = 0.5, valid_password: str = "secret", dash_api: bool = True,
+                 variant: str = ""):
+        self.render_delay = render_delay
+        self.valid_password = valid_password
+        # dash_api=False emulates a changed app: the Dash JSON endpoints are gone
+        self.dash_api = dash_api
+        self.variant = variant
+        self.login_count = 0
+        self.dash_requests = []
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body="", headers=None, content_type="text/html; charset=utf-8"):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_json(self, obj):
+                return self._send(200, json.dumps(obj), content_type="application/json")
+
+            def _logged_in(self):
+                return "sessionid=ok" in (self.headers.get("Cookie") or "")
+
+            def _dash_route(self, path):
+                """(page, endpoint) for /<page>/_dash-* paths, else None."""
+                parts = path.strip("/").split("/")
+                if len(parts) == 2 and parts[0] in DASH_PAGES and parts[1].startswith("_dash-"):
+                    return parts[0], parts[1]
+                return None
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/accounts/login/":
+                    return self._send(200, LOGIN_PAGE)
+                if not self._logged_in():
+                    return self._send(302, headers={"Location": "/accounts/login/"})
+                if path == "/home/":
+                    return self._send(200, HOME_PAGE)
+                route = self._dash_route(path)
+                if route and server.dash_api:
+                    page, endpoint = route
+                    if endpoint == "_dash-layout":
+                        return self._send_json(load_dash_fixture(page, "layout", server.variant))
+                    if endpoint == "_dash-dependencies":
+                        return self._send_json(load_dash_fixture(page, "dependencies", server.variant))
+                if path == "/market_summary/":
+                    delay_ms = str(int(server.render_delay * 1000))
+                    return self._send(200, MARKET_SUMMARY_PAGE.replace("RENDER_DELAY_MS", delay_ms))
+                return self._send(404, "not found")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8")
+                route = self._dash_route(self.path.split("?")[0])
+                if route:
+                    if not self._logged_in():
+                        return self._send(302, headers={"Location": "/accounts/login/"})
+                    if not server.dash_api or route[1] != "_dash-update-component":
+                        return self._send(404, "not found")
+                    payload = json.loads(body)
+                    with server._lock:
+                        server.dash_requests.append(payload)
+                    recorded = load_dash_fixture(route[0], "update", server.variant).get(_fixture_key(payload))
+                    if recorded is None:
+                        # Dash PreventUpdate
+                        return self._send(204)
+                    return self._send_json(recorded)
+                if self.path.startswith("/accounts/login/") and f"password={server.valid_password}" in body:
+                    with server._lock:
+                        server.login_count += 1
+                    return self._send(302, headers={
+                        "Location": "/home/",
+                        "Set-Cookie": "sessionid=ok; Path=/"
+                    })
+                return self._send(200, LOGIN_PAGE + '<div class="alert-danger">Invalid login</div>')
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        # Give the socket a moment to start accepting connections
+        time.sleep(0.05)
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
@@ -0,0 +1,140 @@
+"""Tests for the set-based Stage 3 smart money vs retail aggregation."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import config
+from db.broker_five_repository import BrokerFiveRepository
+from db.neobdm_repository import NeoBDMRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules.alpha_hunter_flow import AlphaHunterFlow
+
+SMART = {"CC", "BB"}
+RETAIL = {"YP", "XL"}
+
+# date -> (buy rows, sell rows) of (broker, nlot, nval)
+SUMMARIES = {
+    "2026-02-02": ([("CC", 100, 1.0), ("YP", 50, 0.5)], [("XL", 80, 0.8), ("BB", 20, 0.2)]),
+    "2026-02-03": ([("cc", 40, 0.4)], [("YP", 90, 0.9), ("ZZ", 10, 0.1)]),
+    "2026-02-04": ([("BB", 60, 0.6), ("XL", 30, 0.3)], [("CC", 70, 0.7), ("YP", 5, 0.05)]),
+    # Outside a 3-day window
+    "2026-01-30": ([("CC", 999, 9.99)], [("YP", 999, 9.99)]),
+}
+
+
+@pytest.fixture
+def flow(data_dir):
+    repo = NeoBDMRepository()
+    for trade_date, (buys, sells) in SUMMARIES.items():
+        repo.save_broker_summary_batch(
+            "BBCA", trade_date,
+            [{"broker": b, "nlot": str(l), "nval": str(v), "bavg": "1000"} for b, l, v in buys],
+            [{"broker": b, "nlot": str(l), "nval": str(v), "savg": "1000"} for b, l, v in sells]
+        )
+    pv = PriceVolumeRepository()
+    pv.upsert_ohlcv_data("BBCA", [
+        {"time": "2026-02-03", "open": 1000, "high": 1010, "low": 990, "close": 1000, "volume": 500},
+        {"time": "2026-02-04", "open": 1000, "high": 1060, "low": 990, "close": 1050, "volume": 700},
+        {"time": "2026-02-05", "open": 1050, "high": 1050, "low": 1050, "close": 1050, "volume": 0},
+    ])
+    yield AlphaHunterFlow()
+
+
+def test_group_flow_from_grouped_net_flows(flow):
+    summary = flow._aggregate_group_flow("bbca", 3, SMART, RETAIL)
+    # Smart per day: +80, +40, -10 ; retail per day: -30, -90, +25
+    assert summary["smart_net_lot"] == 110 and summary["retail_net_lot"] == -95
+    assert summary["smart_net_value"] == pytest.approx(1.1)
+    assert summary["retail_net_value"] == pytest.approx(-0.95)
+    assert (summary["smart_days_buy"], summary["retail_days_sell"], summary["days_checked"]) == (2, 2, 3)
+    assert summary["consistency_threshold"] == 2
+    assert summary["dominance_pct"] == round(1.1 / 2.05 * 100, 1)
+    assert summary["smart_top_brokers"] == [{"code": "CC", "net_lot": 70, "net_value": 0.7},
+                                            {"code": "BB", "net_lot": 40, "net_value": 0.4}]
+
+    assert flow._aggregate_group_flow("BBCA", 0, SMART, RETAIL) is None
+    assert flow._aggregate_group_flow("NONE", 7, SMART, RETAIL) is None
+    assert flow._aggregate_group_flow("BBCA", 30, SMART, RETAIL)["days_checked"] == 4
+
+    # Preloaded broker summaries give the same aggregation without SQL
+    repo = flow.db.neobdm_repo
+    repo.use_broker_summaries(repo.load_broker_summaries(["BBCA"]))
+    repo._get_conn = lambda: pytest.fail("unexpected DB round trip")
+    assert flow._aggregate_group_flow("BBCA", 3, SMART, RETAIL) == summary
+
+
+def test_floor_check_uses_latest_traded_close(flow, monkeypatch):
+    monkeypatch.setattr(flow.db.neobdm_repo, "get_floor_price_analysis",
+                        lambda ticker, days=30: {"floor_price": 1000, "confidence": "LOW"})
+
+    assert flow.db.get_latest_close("bbca") == 1050
+    result = flow.analyze_smart_money_flow("BBCA", days=3)
+    assert result["floor_price_safe"] == {"passed": True, "floor_price": 1000, "current_price": 1050, "gap_pct": 5.0}
+
+
+def test_market_screen_matches_single_ticker_checks(flow):
+    with open(os.path.join(config.DATA_DIR, "brokers_idx.json"), "w", encoding="utf-8") as f:
+        json.dump({"brokers": [{"code": c, "category": ["institutional"]} for c in ("CC", "BB", "AK")]
+                   + [{"code": c, "category": ["retail"]} for c in ("YP", "XL", "KK")]}, f)
+    rng = random.Random(7)
+    codes = ["CC", "BB", "AK", "YP", "XL", "KK", "ZP"]
+    repo = NeoBDMRepository()
+    pv = PriceVolumeRepository()
+    today = datetime.now()
+    for ticker in ("ANTM", "TLKM", "GOTO"):
+        for back in range(1, 12):
+            trade_date = (today - timedelta(days=back)).strftime('%Y-%m-%d')
+            repo.save_broker_summary_batch(
+                ticker, trade_date,
+                [{"broker": b, "nlot": str(rng.randint(1, 500)), "nval": f"{rng.uniform(0.1, 3):.3f}", "bavg": "1"}
+                 for b in rng.sample(codes, 4)],
+                [{"broker": b, "nlot": str(rng.randint(1, 500)), "nval": f"{rng.uniform(0.1, 3):.3f}", "savg": "1"}
+                 for b in rng.sample(codes, 4)]
+            )
+        pv.upsert_ohlcv_data(ticker, [{"time": today.strftime('%Y-%m-%d'), "open": 1, "high": 1, "low": 1,
+                                       "close": rng.choice([400, 800, 1500]), "volume": 100}])
+    BrokerFiveRepository().create_broker("TLKM", "KK")
+
+    screen = flow.screen_market(days=5)
+    assert flow.screen_market(days=5) is screen
+    rows = {row["ticker"]: row for row in screen["results"]}
+    assert any(row["floor_price"] > 0 for row in rows.values())
+    assert set(rows) == {"ANTM", "TLKM", "GOTO", "BBCA"}
+    for ticker, row in rows.items():
+        single = flow.analyze_smart_money_flow(ticker, days=5)
+        assert row["checks_passed"] == single["checks_passed"]
+        assert row["overall_conviction"] == single["overall_conviction"]
+        assert row["smart_money_accumulation"] == single["smart_money_accumulation"]["passed"]
+        assert row["retail_capitulation"] == single["retail_capitulation"]["passed"]
+        assert row["smart_vs_retail"] == single["smart_vs_retail"]["passed"]
+        assert row["floor_price_safe"] == single["floor_price_safe"]["passed"]
+        assert row["smart_net_lot"] == single["smart_money_accumulation"]["net_lot"]
+        assert row["retail_net_lot"] == single["retail_capitulation"]["net_lot"]
+        assert row["top_brokers"] == single["smart_money_accumulation"]["top_brokers"]
+        assert row["floor_price"] == single["floor_price_safe"]["floor_price"]
+        assert row["gap_pct"] == single["floor_price_safe"]["gap_pct"]
+
+    # New summaries, closes, broker 5% codes or registry edits invalidate the cached screen
+    repo.save_broker_summary_batch("GOTO", today.strftime('%Y-%m-%d'), [{"broker": "CC", "nlot": "1", "nval": "1"}], [])
+    screen = flow.screen_market(days=5)
+    assert screen is not None and flow.screen_market(days=5) is screen
+
+    pv.upsert_ohlcv_data("GOTO", [{"time": today.strftime('%Y-%m-%d'), "open": 1, "high": 1, "low": 1,
+                                   "close": 5000, "volume": 100}])
+    assert flow.screen_market(days=5) is not screen
+    screen = flow.screen_market(days=5)
+
+    codes = BrokerFiveRepository()
+    codes.delete_broker(codes.list_brokers("TLKM")[0]["id"], "TLKM")
+    assert flow.screen_market(days=5) is not screen
+    screen = flow.screen_market(days=5)
+
+    registry = os.path.join(config.DATA_DIR, "brokers_idx.json")
+    os.utime(registry, (os.path.getmtime(registry) + 10,) * 2)
+    assert flow.screen_market(days=5) is not screen
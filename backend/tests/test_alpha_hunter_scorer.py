@@ -0,0 +1,120 @@
+"""Tests for the preloaded Alpha Hunter market scan."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from db import market_metadata_repository as metadata_module
+from db.market_metadata_repository import MarketMetadataRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules import alpha_hunter_scorer as scorer_module
+from modules.alpha_hunter_scorer import AlphaHunterScorer
+
+# ticker -> (sector, market cap, latest flow, volume of the last bar)
+UNIVERSE = {
+    "BBCA": ("Financial Services", 8e14, 9e11, 5000),
+    "BBRI": ("financial services", 6e14, -7e11, 3500),
+    "ANTM": ("Basic Materials", 4e13, 3e10, 1600),
+    "GOTO": ("Technology", 9e13, 1e9, 900),
+    "NOMC": (None, None, 5e9, 4000),
+}
+
+
+@pytest.fixture
+def scorer(data_dir, monkeypatch):
+    monkeypatch.setattr(metadata_module, "_refreshers", {})
+    monkeypatch.setattr(MarketMetadataRepository, "_fetch_info", lambda self, symbol: None)
+    pv = PriceVolumeRepository()
+    monkeypatch.setattr(scorer_module, "price_volume_repo", pv)
+
+    today = datetime.now()
+    for ticker, (_, _, _, last_volume) in UNIVERSE.items():
+        bars = []
+        for back in range(30, -1, -1):
+            day = today - timedelta(days=back)
+            bars.append({"time": day.strftime('%Y-%m-%d'), "open": 100, "high": 101, "low": 99,
+                         "close": 100 + back % 2, "volume": last_volume if back == 0 else 1000})
+        pv.upsert_ohlcv_data(ticker, bars)
+
+    conn = sqlite3.connect(os.path.join(data_dir, "market_sentinel.db"))
+    for ticker, (sector, mcap, flow, _) in UNIVERSE.items():
+        # An older scrape must not win over the latest one
+        conn.executemany(
+            "INSERT INTO neobdm_records (scraped_at, trade_date, method, period, symbol, d_0) "
+            "VALUES (?, substr(?, 1, 10), 'm', ?, ?, ?)",
+            [((today - timedelta(days=2)).isoformat(), (today - timedelta(days=2)).isoformat(), 'c', ticker.lower(), "1"),
+             (today.isoformat(), today.isoformat(), 'd', ticker, f"{flow:,.0f}")]
+        )
+        if mcap:
+            conn.execute(
+                "INSERT INTO market_metadata (symbol, market_cap, cached_at, sector) VALUES (?, ?, ?, ?)",
+                (ticker, mcap, today.isoformat(), sector)
+            )
+    conn.commit()
+    conn.close()
+    yield AlphaHunterScorer()
+
+
+def test_scan_matches_single_ticker_scores(scorer):
+    results = scorer.scan_market(min_score=0)
+    scores = [r["total_score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert {r["ticker"] for r in results} == set(UNIVERSE)
+    for row in results:
+        single = scorer.calculate_score(row["ticker"])
+        assert row["total_score"] == single["total_score"]
+        assert row["breakdown"] == single["breakdown"]
+
+    bbca = next(r for r in results if r["ticker"] == "BBCA")
+    assert bbca["breakdown"]["volume_ratio"] == 5.0 and bbca["breakdown"]["flow_score"] == 20
+    assert next(r for r in results if r["ticker"] == "NOMC")["breakdown"]["flow_score"] == 0
+    assert all(r["total_score"] >= 60 for r in scorer.scan_market())
+
+
+def test_scan_filters_by_sector_and_market_cap(scorer):
+    tickers = lambda **kw: sorted(r["ticker"] for r in scorer.scan_market(min_score=0, **kw))
+
+    assert tickers(sector="FINANCIAL SERVICES") == ["BBCA", "BBRI"]
+    assert tickers(mcap_min=5e13) == ["BBCA", "BBRI", "GOTO"]
+    assert tickers(sector="Financial Services", mcap_min=7e14) == ["BBCA"]
+    assert tickers(sector="Energy") == []
+    # Symbols without metadata are queued for a refresh instead of fetched inline
+    assert scorer.db.filter_symbols(["nomc", "BBCA"], mcap_min=0) == ["BBCA"]
+
+
+def test_sector_filter_queues_rows_cached_without_a_sector(scorer, monkeypatch):
+    scheduled = []
+    repo = MarketMetadataRepository()
+    monkeypatch.setattr(type(repo.refresher), "schedule", lambda self, symbols: scheduled.extend(symbols))
+    conn = sqlite3.connect(repo.db_path)
+    conn.execute("UPDATE market_metadata SET sector = NULL WHERE symbol = 'ANTM'")
+    conn.commit()
+    conn.close()
+
+    assert repo.filter_symbols(["ANTM", "BBCA", "NOMC"], sector="Basic Materials") == []
+    assert sorted(scheduled) == ["ANTM", "NOMC"]
+    scheduled.clear()
+    assert repo.filter_symbols(["ANTM", "BBCA", "NOMC"], mcap_min=0) == ["ANTM", "BBCA"]
+    assert scheduled == ["NOMC"]
+
+
+def test_scan_reads_the_window_without_priming_the_series_cache(scorer):
+    from db import price_volume_repository as pv_module
+
+    pv = scorer_module.price_volume_repo
+    pv.get_ohlcv_arrays("BBCA")  # warm
+    before = [k for k in pv_module._SERIES_CACHE if k[0] == pv.db_path]
+
+    results = {r["ticker"]: r for r in scorer.scan_market(min_score=0)}
+    assert [k for k in pv_module._SERIES_CACHE if k[0] == pv.db_path] == before
+    assert results["BBCA"]["breakdown"] == scorer.calculate_score("BBCA")["breakdown"]
+
+    start, end = scorer._volume_window()
+    window = pv.load_ohlcv_window(["antm", "BBCA", "NONE"], start, end)
+    assert len(window["NONE"]) == 0
+    assert window["ANTM"].dates.tolist() == pv.get_ohlcv_arrays("ANTM", start, end).dates.tolist()
+    assert window["BBCA"].date_at(0) >= start and len(window["BBCA"]) == len(pv.get_ohlcv_arrays("BBCA", start, end))
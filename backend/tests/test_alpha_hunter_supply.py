@@ -0,0 +1,195 @@
+"""Tests for the aggregate-backed Stage 4 supply analysis."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import math
+import random
+import sqlite3
+
+import pytest
+
+from db.broker_registry import get_broker_registry
+from db.connection import DatabaseConnection
+from db.done_detail_repository import DoneDetailRepository
+from modules.alpha_hunter_supply import AlphaHunterSupply
+
+BROKERS = [
+    {"code": "YP", "name": "Mirae Asset", "category": ["retail"]},
+    {"code": "PD", "name": "Indo Premier", "category": ["retail"]},
+    {"code": "XC", "name": "Ajaib", "category": ["retail"]},
+    {"code": "CC", "name": "Mandiri", "category": ["retail", "institutional"]},
+    {"code": "AK", "name": "UBS", "category": ["institutional", "foreign"]},
+    {"code": "RX", "name": "Macquarie", "category": ["institutional"]},
+]
+CODES = [b["code"] for b in BROKERS] + ["ZZ"]
+DATES = ["2026-03-02", "2026-03-03", "2026-03-04", "2026-03-05"]
+
+
+def _trades(seed, count=400):
+    rng = random.Random(seed)
+    return [
+        {
+            "time": f"09:{i // 60:02d}:{i % 60:02d}",
+            "price": rng.choice([995, 1000, 1005, 1010]),
+            "qty": rng.choice([1, 2, 5, 10, 20, 50, 150, 600]) if rng.random() < 0.9 else rng.randint(1, 900),
+            # Retail buys early and sells late so the 50% rule has something to measure
+            "buyer_code": rng.choice(CODES[:3] if seed < 2 else CODES[3:]),
+            "seller_code": rng.choice(CODES[3:] if seed < 2 else CODES[:3]) if rng.random() < 0.8 else rng.choice(CODES)
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def repo(data_dir):
+    with open(os.path.join(data_dir, "brokers_idx.json"), "w", encoding="utf-8") as f:
+        json.dump({"brokers": BROKERS}, f)
+    repo = DoneDetailRepository()
+    for seed, date in enumerate(DATES):
+        repo.save_records("BBCA", date, _trades(seed))
+        imposter = repo.detect_imposter_trades("BBCA", date, date)
+        repo.save_synthesis("BBCA", date, imposter, {}, {}, imposter["total_transactions"])
+    yield repo
+
+
+def _without_raw(path):
+    conn = sqlite3.connect(path)
+    conn.execute("DELETE FROM done_detail_records")
+    conn.commit()
+    conn.close()
+
+
+def test_aggregates_match_raw_capitulation_and_survive_cleanup(repo):
+    raw = repo.get_range_analysis("BBCA", DATES[0], DATES[-1])
+    aggregated = repo.get_range_analysis_from_aggregates("bbca", DATES[0], DATES[-1])
+
+    assert raw["retail_capitulation"]["brokers"], "fixture should produce retail positions"
+    assert len(aggregated["retail_capitulation"]["brokers"]) == len(raw["retail_capitulation"]["brokers"])
+    for key in ("overall_pct", "safe_count", "holding_count"):
+        assert aggregated["retail_capitulation"][key] == raw["retail_capitulation"][key]
+    for ours, theirs in zip(aggregated["retail_capitulation"]["brokers"], raw["retail_capitulation"]["brokers"]):
+        assert ours["broker"] == theirs["broker"] and ours["distribution_pct"] == theirs["distribution_pct"]
+        assert ours["peak_position"] == pytest.approx(theirs["peak_position"])
+        assert [h["date"] for h in ours["history"]] == [h["date"] for h in theirs["history"]]
+
+    # Imposters use each day's own P95, so the totals are the per-day synthesis counts
+    daily = [repo.get_synthesis("BBCA", d)["imposter_data"]["summary"] for d in DATES]
+    summary = aggregated["summary"]
+    assert summary["total_imposter_trades"] == sum(s["strong_count"] + s["possible_count"] for s in daily) > 0
+    assert summary["total_days"] == len(DATES) and len(aggregated["battle_timeline"]) == len(DATES)
+    assert summary["top_ghost_broker"] in {"YP", "PD", "XC", "CC"}
+
+    # An existing database gets the table backfilled from its raw records once
+    conn = sqlite3.connect(repo.db_path)
+    conn.execute("DROP TABLE done_detail_broker_daily")
+    conn.commit()
+    conn.close()
+    DatabaseConnection()
+    assert repo.get_range_analysis_from_aggregates("BBCA", DATES[0], DATES[-1]) == aggregated
+
+    # Raw cleanup keeps the range intact
+    _without_raw(repo.db_path)
+    assert repo.get_range_analysis_from_aggregates("BBCA", DATES[0], DATES[-1]) == aggregated
+    assert repo.get_synthesized_date_range("BBCA") == {"min_date": DATES[0], "max_date": DATES[-1]}
+    assert repo.get_latest_record_date("BBCA") is None
+
+    repo.delete_records("BBCA", DATES[0])
+    assert repo.get_broker_daily_flows("BBCA", DATES[0], DATES[0]).empty
+    assert "error" in repo.get_range_analysis_from_aggregates("NONE", DATES[0], DATES[-1])
+
+
+def _single_day_reference(trades, retail, mixed, categories):
+    """The per-trade loops analyze_supply used before the columnar pass."""
+    buy, sell, large = {}, {}, []
+    for t in trades:
+        if t["buyer"]:
+            buy[t["buyer"]] = buy.get(t["buyer"], 0) + t["lot"]
+        if t["seller"]:
+            sell[t["seller"]] = sell.get(t["seller"], 0) + t["lot"]
+        if t["lot"] >= 100:
+            large.append({"buyer": t["buyer"], "seller": t["seller"], "lot": t["lot"], "price": t["price"],
+                          "time": t["time"], "type": "ONE_CLICK" if t["lot"] >= 500 else "LARGE"})
+    large.sort(key=lambda x: x["lot"], reverse=True)
+
+    positions = {"institutional": [], "retail": [], "foreign": []}
+    for broker in sorted(set(buy) | set(sell)):
+        entry = {"broker": broker, "buy_lot": buy.get(broker, 0), "sell_lot": sell.get(broker, 0)}
+        entry["net_lot"] = entry["buy_lot"] - entry["sell_lot"]
+        kind = categories(broker)
+        positions[kind if kind in ("foreign", "institutional") else "retail"].append(entry)
+    for kind in positions:
+        positions[kind] = sorted(positions[kind], key=lambda x: x["net_lot"], reverse=True)[:10]
+
+    lots = sorted(t["lot"] for t in trades if t["lot"] > 0)
+    threshold = lots[max(0, int(math.ceil(len(lots) * 0.95)) - 1)]
+    stats = {}
+    for t in trades:
+        if t["lot"] < threshold:
+            continue
+        for broker in (t["buyer"], t["seller"]):
+            if broker in retail | mixed:
+                s = stats.setdefault(broker, [0, 0, 0])
+                s[0] += t["lot"] * t["price"] * 100
+                s[1] += 1
+                s[2] += t["lot"]
+    ghosts = sorted(stats.items(), key=lambda x: x[1][0], reverse=True)
+    return {
+        "one_click_orders": large[:20],
+        "broker_positions": positions,
+        "retail": (sum(buy.get(b, 0) for b in retail), sum(sell.get(b, 0) for b in retail)),
+        "imposters": [(b, round(s[0], 2), s[1], round(s[2] / s[1], 0)) for b, s in ghosts[:10]],
+        "imposter_total": sum(s[1] for _, s in ghosts)
+    }
+
+
+def test_single_day_pass_matches_per_trade_loops(repo):
+    rng = random.Random(5)
+    raw_trades = _trades(7, 600)
+    trades = [
+        {"time": t["time"], "price": float(t["price"]), "lot": t["qty"],
+         "buyer": t["buyer_code"] if rng.random() > 0.02 else "", "seller": t["seller_code"]}
+        for t in raw_trades
+    ]
+    result = AlphaHunterSupply().analyze_supply("bbca", trades)
+
+    registry = get_broker_registry()
+    expected = _single_day_reference(trades, registry.retail, registry.mixed, registry.classify)
+    assert result["total_trades"] == len(trades) and result["data_available"]
+    assert result["one_click_orders"] == expected["one_click_orders"]
+    assert result["broker_positions"] == expected["broker_positions"]
+    fifty = result["fifty_pct_rule"]
+    assert (fifty["retail_buy"], fifty["retail_sell"]) == expected["retail"] and fifty["source"] == "single_day"
+
+    imposter = result["imposter_detection"]
+    assert imposter["total_imposter_trades"] == expected["imposter_total"]
+    assert [(b["broker"], b["total_value"], b["total_count"], b["avg_lot"]) for b in imposter["brokers"]] == [
+        (b, pytest.approx(v), c, a) for b, v, c, a in expected["imposters"]
+    ]
+    prices = [t["price"] for t in trades]
+    assert result["entry_recommendation"]["zone_low"] == min(prices)
+    assert result["entry_recommendation"]["zone_high"] == round(sum(prices) / len(prices), 0)
+
+    json.dumps(result)  # plain Python values only
+
+
+def test_db_path_reads_raw_for_latest_day_only(repo, monkeypatch):
+    loaded = []
+    original = DoneDetailRepository.get_records
+    monkeypatch.setattr(DoneDetailRepository, "get_records",
+                        lambda self, ticker, date: loaded.append(date) or original(self, ticker, date))
+    for name in ("get_range_analysis", "get_records_range", "get_synthesis_range"):
+        monkeypatch.setattr(DoneDetailRepository, name, lambda *a, **k: pytest.fail("raw range read"))
+
+    result = AlphaHunterSupply().analyze_supply("BBCA", analysis_start_date=DATES[1])
+    assert loaded == [DATES[-1]] and result["total_trades"] == 400
+    assert result["analysis_range"] == {"start": DATES[1], "end": DATES[-1]}
+    assert result["fifty_pct_rule"]["source"] == "range" and result["imposter_detection"]["source"] == "range"
+
+    # Once the raw grace period has passed, the range analysis still answers
+    _without_raw(repo.db_path)
+    result = AlphaHunterSupply().analyze_supply("BBCA")
+    assert result["data_available"] and result["total_trades"] == 0
+    assert result["analysis_range"] == {"start": DATES[0], "end": DATES[-1]}
+    assert result["one_click_orders"] == [] and result["entry_recommendation"]["zone_low"] == 0
@@ -0,0 +1,107 @@
+"""Tests for the shared broker classification registry."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import random
+
+import numpy as np
+import pytest
+
+from db.broker_registry import get_broker_registry
+from db.connection import DatabaseConnection
+from db.done_detail_repository import DoneDetailRepository
+from modules import broker_utils
+
+BROKERS = [
+    {"code": "YP", "name": "Mirae Asset", "category": ["retail"]},
+    {"code": "PD", "name": "Indo Premier", "category": ["retail"]},
+    {"code": "CC", "name": "Mandiri", "category": ["retail", "institutional"]},
+    {"code": "AK", "name": "UBS", "category": ["institutional", "foreign"]},
+    {"code": "RX", "name": "Macquarie", "category": ["institutional"]},
+    {"code": "XX", "category": ["unknown"]},
+]
+
+
+def _write(path, brokers):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"brokers": brokers}, f)
+
+
+@pytest.fixture
+def registry_dir(data_dir):
+    _write(os.path.join(data_dir, "brokers_idx.json"), BROKERS)
+    return data_dir
+
+
+def test_lookups_sets_and_reload(registry_dir):
+    registry = get_broker_registry()
+    assert get_broker_registry() is registry
+    assert registry.name("AK") == "UBS" and registry.name("XX") == "XX" and registry.name("ZZ", "-") == "-"
+    assert registry.categories_of("ZZ") == ["unknown"]
+    assert registry.retail == {"YP", "PD"} and registry.mixed == {"CC"}
+    assert registry.institutional == {"CC", "RX"} and registry.foreign == {"AK"}
+    assert [registry.classify(c) for c in ("AK", "CC", "YP", "XX")] == ["foreign", "institutional", "retail", "unknown"]
+    assert "PD" in registry.stage3_retail and "PD" not in registry.stage3_smart_money
+
+    # The module helpers read the same registry
+    assert broker_utils.get_broker_name("yp") == "Mirae Asset"
+    assert broker_utils.get_imposter_suspects() == {"YP", "PD", "CC"}
+
+    # Integer ids and masks, with the trailing slot for unregistered codes
+    ids = registry.encode(["RX", "ZZ", "YP"])
+    assert ids[1] == -1 and registry.codes[ids[0]] == "RX"
+    assert registry.category_mask("retail", unregistered=True)[ids].tolist() == [False, True, True]
+
+    # Rewriting the file is picked up on the next lookup
+    path = os.path.join(registry_dir, "brokers_idx.json")
+    _write(path, BROKERS + [{"code": "ZZ", "name": "New", "category": ["retail"]}])
+    os.utime(path, (os.path.getmtime(path) + 5,) * 2)
+    reloaded = get_broker_registry()
+    assert reloaded is not registry and reloaded.name("ZZ") == "New" and "ZZ" in reloaded.retail
+
+    os.remove(path)
+    assert len(get_broker_registry()) == 0
+
+
+def _accum_dist_reference(trades, categories):
+    """The per-row loop get_accum_dist_analysis used before broker ids."""
+    broker_net = {}
+    for trade in trades:
+        broker_net[trade["buyer_code"]] = broker_net.get(trade["buyer_code"], 0) + trade["qty"]
+        broker_net[trade["seller_code"]] = broker_net.get(trade["seller_code"], 0) - trade["qty"]
+    totals = {"retail": 0, "institutional": 0, "foreign": 0}
+    lists = {"retail": [], "institutional": [], "foreign": []}
+    for code, net_lot in broker_net.items():
+        cats = categories.get(code, ["unknown"])
+        info = {"code": code, "net_lot": int(net_lot)}
+        for cat in ("retail", "institutional", "foreign"):
+            if cat in cats:
+                totals[cat] += net_lot
+                lists[cat].append(info)
+        if "unknown" in cats or not cats:
+            totals["retail"] += net_lot
+            lists["retail"].append(info)
+    for items in lists.values():
+        items.sort(key=lambda x: abs(x["net_lot"]), reverse=True)
+    return totals, lists
+
+
+def test_accum_dist_matches_per_row_classification(registry_dir):
+    db_path = os.path.join(registry_dir, "done.db")
+    DatabaseConnection(db_path)
+    repo = DoneDetailRepository(db_path)
+    rng = random.Random(11)
+    codes = [b["code"] for b in BROKERS] + ["ZZ", "QQ"]
+    trades = [{"time": f"09:{i // 60:02d}:{i % 60:02d}", "price": 1000, "qty": rng.choice([1, 5, 5, 20, 100]),
+               "buyer_code": rng.choice(codes), "seller_code": rng.choice(codes)} for i in range(300)]
+    repo.save_records("BBCA", "2026-02-02", trades)
+
+    result = repo.get_accum_dist_analysis("bbca", "2026-02-02")
+    totals, lists = _accum_dist_reference(trades, {b["code"]: b["category"] for b in BROKERS})
+    for cat in ("retail", "institutional", "foreign"):
+        assert result[f"{cat}_net_lot"] == totals[cat]
+        assert result[f"{cat}_brokers"] == lists[cat][:10]
+    assert result["total_volume"] == sum(t["qty"] for t in trades)
+    assert isinstance(result["retail_net_lot"], int) and not isinstance(result["retail_net_lot"], np.integer)
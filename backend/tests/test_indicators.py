@@ -0,0 +1,144 @@
+"""Tests for the shared indicator engine (vectorized math and incremental cache)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import statistics
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from db.price_volume_repository import PriceVolumeRepository
+from modules.alpha_hunter_vpa import AlphaHunterStage2VPA
+from modules.indicators import (
+    IndicatorEngine, atr, ema, indicators_for_records, rolling_max, rolling_min,
+    rolling_std, sma, spec_name, vwap
+)
+from modules.technical_analyst import TechnicalAnalyst
+from tests.conftest import make_bars
+
+
+SPECS = [("sma", "close", 5), ("sma", "volume", 20), ("ema", "close", 10),
+         ("std", "close", 20), ("atr", None, 14), ("vwap", None, 0)]
+
+# 80 stored bars plus the next one for the append tests
+BARS = make_bars(81, seed=5, start=datetime(2026, 1, 2), price=2000.0, step=0.04, volume=(1_000, 50_000))
+
+
+@pytest.fixture
+def repo(data_dir):
+    repo = PriceVolumeRepository()
+    repo.upsert_ohlcv_data("BBCA", BARS[:80])
+    return repo
+
+
+def test_vectorized_indicators_match_pandas():
+    df = pd.DataFrame(BARS[:80])
+    np.testing.assert_allclose(sma(df["close"], 5), df["close"].rolling(5).mean(), equal_nan=True)
+    np.testing.assert_allclose(rolling_std(df["close"], 20), df["close"].rolling(20).std(), equal_nan=True)
+    np.testing.assert_allclose(rolling_max(df["high"], 11, center=True),
+                               df["high"].rolling(11, center=True).max(), equal_nan=True)
+    np.testing.assert_allclose(rolling_min(df["low"], 6), df["low"].rolling(6).min(), equal_nan=True)
+
+    prev_close = df["close"].shift()
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - prev_close).abs(),
+                    (df["low"] - prev_close).abs()], axis=1).max(axis=1)
+    np.testing.assert_allclose(atr(df["high"], df["low"], df["close"], 14), tr.rolling(14).mean(), equal_nan=True)
+
+    seeded = pd.concat([pd.Series([df["close"][:10].mean()]), df["close"][10:]])
+    expected_ema = seeded.ewm(span=10, adjust=False).mean().to_numpy()
+    np.testing.assert_allclose(ema(df["close"], 10)[9:], expected_ema)
+    # Same recurrence as the per-bar loop
+    loop = [df["close"][:10].mean()]
+    for value in df["close"][10:]:
+        loop.append(2 / 11 * value + 9 / 11 * loop[-1])
+    np.testing.assert_allclose(ema(df["close"], 10)[9:], loop, rtol=1e-12)
+    assert np.isnan(ema(df["close"], 10)[:9]).all() and np.isnan(ema([1.0, 2.0], 5)).all()
+
+    typical = (df["high"] + df["low"] + df["close"]) / 3
+    np.testing.assert_allclose(vwap(df["high"], df["low"], df["close"], df["volume"]),
+                               (typical * df["volume"]).cumsum() / df["volume"].cumsum())
+    assert np.isnan(sma([1.0, 2.0], 5)).all()
+
+
+def test_incremental_append_matches_full_recompute(repo):
+    engine = IndicatorEngine()
+    key = (repo.db_path, "BBCA")
+    engine.compute(key, repo.get_ohlcv_arrays("BBCA"), SPECS, repo.series_version("BBCA"))
+
+    new_bar = BARS[80]
+    repo.upsert_ohlcv_data("BBCA", [new_bar])
+    version = repo.series_version("BBCA")
+    series = repo.get_ohlcv_arrays("BBCA")
+    incremental = engine.compute(key, series, SPECS, version)
+    full = IndicatorEngine().compute(key, series, SPECS, version)
+    for spec in SPECS:
+        name = spec_name(spec)
+        assert len(incremental[name]) == 81
+        np.testing.assert_allclose(incremental[name], full[name], rtol=1e-9, equal_nan=True)
+
+    # A rewritten bar (not an append) rebuilds from scratch
+    repo.upsert_ohlcv_data("BBCA", [dict(new_bar, close=new_bar["close"] * 2)])
+    version = repo.series_version("BBCA")
+    rebuilt = engine.compute(key, repo.get_ohlcv_arrays("BBCA"), SPECS, version)
+    assert rebuilt["sma_close_5"][-1] == pytest.approx(
+        statistics.mean([r["close"] for r in BARS[76:80]] + [new_bar["close"] * 2]))
+
+
+def test_rewritten_earlier_bars_are_not_served_from_cache(repo):
+    records = repo.get_ohlcv_data("BBCA")
+    before = indicators_for_records(records, [("sma", "close", 5)], repo, "BBCA")["sma_close_5"]
+
+    # Every bar but the last is rewritten; count, end dates and the last bar stay the same
+    halved = [dict(r, close=r["close"] / 2) for r in records[:-1]]
+    repo.upsert_ohlcv_data("BBCA", halved)
+    records = repo.get_ohlcv_data("BBCA")
+    after = indicators_for_records(records, [("sma", "close", 5)], repo, "BBCA")["sma_close_5"]
+    assert after[-2] == pytest.approx(before[-2] / 2)
+    assert after[-2] == pytest.approx(statistics.mean(r["close"] for r in records[-6:-1]))
+
+    # Rewrite plus a new bar must not take the one-bar append path either
+    new_bar = BARS[80]
+    repo.upsert_ohlcv_data("BBCA", [dict(r, close=r["close"] * 2) for r in halved] + [new_bar])
+    records = repo.get_ohlcv_data("BBCA")
+    after = indicators_for_records(records, [("sma", "close", 5)], repo, "BBCA")["sma_close_5"]
+    assert after[-3] == pytest.approx(before[-2])
+    assert after[-1] == pytest.approx(statistics.mean(r["close"] for r in records[-5:]))
+
+
+def test_record_windows_match_standalone_moving_averages(repo):
+    records = repo.get_ohlcv_data("BBCA", "2026-02-01", "2026-03-31")
+    specs = [("sma", "close", 10), ("sma", "volume", 20)]
+    cached = indicators_for_records(records, specs, repo, "bbca")
+    standalone = indicators_for_records(records, specs)
+    for spec in specs:
+        np.testing.assert_allclose(cached[spec_name(spec)], standalone[spec_name(spec)], equal_nan=True)
+
+    # Indicators that carry state from before the window are computed on the records
+    cached = indicators_for_records(records, SPECS, repo, "BBCA")
+    standalone = indicators_for_records(records, SPECS)
+    for spec in SPECS:
+        np.testing.assert_allclose(cached[spec_name(spec)], standalone[spec_name(spec)], equal_nan=True)
+    assert cached["vwap"][0] == pytest.approx((records[0]["high"] + records[0]["low"] + records[0]["close"]) / 3)
+
+    vpa = AlphaHunterStage2VPA.__new__(AlphaHunterStage2VPA)
+    ma_data = vpa._calculate_all_moving_averages(records)
+    closes = [r["close"] for r in records]
+    assert ma_data["price_ma5"][3] == {"date": records[3]["time"], "value": None}
+    assert ma_data["price_ma5"][10]["value"] == round(statistics.mean(closes[6:11]), 2)
+    assert len(ma_data["volume_ma20"]) == len(records)
+
+
+def test_technical_analyst_delegates_to_indicators():
+    df = pd.DataFrame(BARS[:60])
+    prev_close = df["close"].shift()
+    tr = pd.concat([df["high"] - df["low"], (df["high"] - prev_close).abs(),
+                    (df["low"] - prev_close).abs()], axis=1).max(axis=1)
+    assert TechnicalAnalyst.calculate_atr(df) == pytest.approx(tr.rolling(14).mean().iloc[-1])
+    assert TechnicalAnalyst.calculate_atr(df.head(10)) == 0.0
+
+    supports, resistances = TechnicalAnalyst.find_support_resistance(df)
+    assert supports and resistances
+    assert min(supports) <= df["low"].min() * 1.02
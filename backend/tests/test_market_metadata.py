@@ -0,0 +1,122 @@
+"""Tests for bulk market cap reads and the background (stale-while-revalidate) refresher."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.connection import DatabaseConnection
+from db import market_metadata_repository as metadata_module
+from db.market_metadata_repository import MarketMetadataRepository
+from db.price_volume_repository import PriceVolumeRepository
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "meta.db")
+        DatabaseConnection(db_path)
+        monkeypatch.setattr(metadata_module, "_refreshers", {})
+
+        fetch_threads = []
+
+        def fake_fetch(self, symbol):
+            fetch_threads.append(threading.current_thread())
+            if symbol == "FAIL":
+                return None
+            return {"market_cap": 1e12 + len(fetch_threads), "shares_outstanding": 1e9}
+
+        monkeypatch.setattr(MarketMetadataRepository, "_fetch_info", fake_fetch)
+        repo = MarketMetadataRepository(db_path)
+        repo.fetch_threads = fetch_threads
+
+        old = (datetime.now() - timedelta(hours=48)).isoformat()
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO market_metadata (symbol, market_cap, cached_at, shares_outstanding) VALUES (?, ?, ?, ?)",
+            [("BBCA", 5e14, datetime.now().isoformat(), 2e9), ("TLKM", 3e14, old, 7e9)]
+        )
+        conn.execute(
+            "INSERT INTO market_cap_history (ticker, trade_date, market_cap) VALUES ('ANTM', '2026-01-05', 4e13)"
+        )
+        conn.commit()
+        conn.close()
+        yield repo
+
+
+def test_bulk_read_serves_cache_and_queues_refresh(repo):
+    result = repo.get_market_caps(["bbca", "TLKM", "ANTM", "NEWT", "FAIL"])
+    assert result == {"ANTM": 4e13, "BBCA": 5e14, "FAIL": None, "NEWT": None, "TLKM": 3e14}
+
+    repo.refresher.wait(5)
+    assert repo.fetch_threads and threading.main_thread() not in repo.fetch_threads
+    assert len(repo.fetch_threads) == 4  # everything except the fresh BBCA
+
+    refreshed = repo.get_market_caps(["BBCA", "TLKM", "NEWT"])
+    assert refreshed["BBCA"] == 5e14
+    assert refreshed["TLKM"] > 1e12 and refreshed["NEWT"] > 1e12
+    # Refresh keeps the other metadata columns
+    assert repo.get_shares_outstanding("TLKM") == 1e9
+
+    # Failed symbols are not retried inside the cooldown
+    repo.get_market_caps(["FAIL"])
+    repo.refresher.wait(5)
+    assert len(repo.fetch_threads) == 4
+
+
+def test_single_reads_are_stale_while_revalidate(repo, monkeypatch):
+    assert repo.get_market_cap("TLKM") == 3e14
+    repo.refresher.wait(5)
+    assert repo.get_market_cap("TLKM") > 1e12
+
+    # Nothing cached: single lookups may still fetch inline
+    assert repo.get_market_cap("ZZZZ") > 1e12
+
+
+def test_flow_impact_does_not_fetch_inline(repo, monkeypatch):
+    pv = PriceVolumeRepository(repo.db_path)
+    pv.upsert_ohlcv_data("NEWT", [{"time": "2026-01-05", "open": 100, "high": 110, "low": 90, "close": 100, "volume": 1000}])
+    monkeypatch.setattr(MarketMetadataRepository, "get_market_cap", lambda *a, **k: pytest.fail("blocking lookup"))
+    monkeypatch.setattr(MarketMetadataRepository, "get_shares_outstanding", lambda *a, **k: pytest.fail("blocking lookup"))
+
+    assert pv.calculate_flow_impact("NEWT", "2026-01-05")["has_market_cap"] is False
+    repo.refresher.wait(5)
+    assert pv.calculate_flow_impact("NEWT", "2026-01-05")["has_market_cap"] is True
+
+
+def test_market_cap_history_generated_in_one_pass(repo):
+    pv = PriceVolumeRepository(repo.db_path)
+    closes = [100.0 + i for i in range(35)]
+    start = datetime(2026, 1, 1)
+    bars = [
+        {"time": (start + timedelta(days=i)).strftime('%Y-%m-%d'), "open": c, "high": c, "low": c, "close": c, "volume": 10}
+        for i, c in enumerate(closes)
+    ]
+    pv.upsert_ohlcv_data("BBCA", bars)
+    pv.upsert_ohlcv_data("TLKM", bars[:3])
+    pv.upsert_ohlcv_data("NOSH", bars[:3])  # no shares outstanding -> skipped
+
+    assert repo.generate_market_cap_history() == {"tickers": 2, "rows": 38}
+    history = repo.get_market_cap_history("BBCA", days=90)
+    assert [h["market_cap"] for h in history] == [c * 2e9 for c in closes]
+    assert repo.get_market_cap_history("NOSH") == []
+
+    # Incremental: only new dates are appended; full recomputes
+    pv.upsert_ohlcv_data("TLKM", bars[3:5])
+    assert repo.generate_market_cap_history(["TLKM"]) == {"tickers": 1, "rows": 2}
+    assert repo.generate_market_cap_history(["TLKM"]) == {"tickers": 1, "rows": 0}
+    assert repo.generate_market_cap_history(["TLKM"], full=True)["rows"] == 5
+
+    caps = [c * 2e9 for c in closes]
+    changes = repo.get_market_cap_changes("bbca")
+    assert changes == {
+        "change_1d_pct": round((caps[-1] - caps[-2]) / caps[-2] * 100, 2),
+        "change_7d_pct": round((caps[-1] - caps[-7]) / caps[-7] * 100, 2),
+        "change_30d_pct": round((caps[-1] - caps[-30]) / caps[-30] * 100, 2),
+    }
+    assert repo.get_market_cap_changes("TLKM")["change_30d_pct"] is None
@@ -0,0 +1,138 @@
+"""Tests for the concurrent broker summary batch mode (no browser needed)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import tempfile
+
+from modules.scraper_neobdm import NeoBDMScraper
+
+
+class FakePage:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+class FakeBatchScraper(NeoBDMScraper):
+    """Scraper where each broker summary takes a fixed time and never touches a browser."""
+    in_flight = {"now": 0, "max": 0}
+    scraped = []
+    logins = 0
+
+    async def login(self):
+        FakeBatchScraper.logins += 1
+        return True
+
+    async def _open_broker_summary(self):
+        pass
+
+    async def get_broker_summary(self, ticker, date_str):
+        state = FakeBatchScraper.in_flight
+        state["now"] += 1
+        state["max"] = max(state["max"], state["now"])
+        await asyncio.sleep(0.1)
+        state["now"] -= 1
+        FakeBatchScraper.scraped.append((ticker, date_str))
+        if date_str == "2026-01-03":
+            return None
+        return {"buy": [{"broker": "YP", "nlot": "10", "nval": "1.5", "bavg": "100"}], "sell": []}
+
+
+def _new_scraper():
+    FakeBatchScraper.in_flight = {"now": 0, "max": 0}
+    FakeBatchScraper.scraped = []
+    FakeBatchScraper.logins = 0
+    scraper = FakeBatchScraper()
+    scraper.context = FakeContext()
+    scraper.page = FakePage()
+    return scraper
+
+
+def test_expand_tasks_dedupes_and_skips_stored_pairs():
+    tasks = [
+        {"ticker": "antm", "dates": ["2026-01-01", "2026-01-02", "2026-01-01"]},
+        {"ticker": "ANTM", "dates": ["2026-01-02"]},
+        {"ticker": "BBCA", "dates": ["2026-01-01"]},
+    ]
+    pairs = NeoBDMScraper._expand_broker_summary_tasks(tasks, skip_pairs={("BBCA", "2026-01-01")})
+    assert pairs == [("ANTM", "2026-01-01"), ("ANTM", "2026-01-02")]
+
+
+def test_batch_shards_across_pages_with_one_login_and_streams_results():
+    scraper = _new_scraper()
+    tasks = [{"ticker": t, "dates": ["2026-01-01", "2026-01-02", "2026-01-03"]} for t in ("ANTM", "BBCA")]
+    streamed = []
+
+    def on_result(result):
+        # Results arrive while other items are still being scraped
+        streamed.append((result["ticker"], result["trade_date"], len(FakeBatchScraper.scraped)))
+
+    results = asyncio.run(scraper.get_broker_summary_batch(
+        tasks, workers=3, skip_pairs={("BBCA", "2026-01-01")}, on_result=on_result
+    ))
+
+    assert FakeBatchScraper.logins == 1
+    assert FakeBatchScraper.in_flight["max"] == 3
+    assert len(results) == 5
+    assert ("BBCA", "2026-01-01") not in FakeBatchScraper.scraped
+    assert sum(1 for r in results if "error" in r) == 2
+    assert len(streamed) == 5
+    assert streamed[0][2] < 5
+    # Extra worker pages are closed, the parent page is left to the caller
+    assert len(scraper.context.pages) == 2
+    assert all(page.closed for page in scraper.context.pages)
+    assert not scraper.page.closed
+
+
+def test_batch_with_everything_stored_does_not_login():
+    scraper = _new_scraper()
+    results = asyncio.run(scraper.get_broker_summary_batch(
+        [{"ticker": "ANTM", "dates": ["2026-01-01"]}], skip_pairs={("ANTM", "2026-01-01")}
+    ))
+    assert results == []
+    assert FakeBatchScraper.logins == 0
+
+
+def test_existing_pairs_query():
+    from db.connection import DatabaseConnection
+    from db.neobdm_repository import NeoBDMRepository
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        DatabaseConnection(db_path)
+        repo = NeoBDMRepository(db_path)
+        repo.save_broker_summary_batch("antm", "2026-01-01", [{"broker": "YP", "nlot": "1", "nval": "1", "bavg": "1"}], [])
+        repo.save_broker_summary_batch("BBCA", "2026-01-02", [{"broker": "YP", "nlot": "1", "nval": "1", "bavg": "1"}], [])
+
+        assert repo.get_existing_broker_summary_pairs(["ANTM"]) == {("ANTM", "2026-01-01")}
+        assert repo.get_existing_broker_summary_pairs(["antm", "BBCA", "TLKM"]) == {
+            ("ANTM", "2026-01-01"), ("BBCA", "2026-01-02")
+        }
+        assert repo.get_existing_broker_summary_pairs([]) == set()
+
+        traced = []
+        original = repo._get_conn
+        def traced_conn():
+            conn = original()
+            conn.set_trace_callback(traced.append)
+            return conn
+        repo._get_conn = traced_conn
+        repo.get_existing_broker_summary_pairs(["ANTM"])
+        conn = original()
+        plan = " ".join(str(row) for row in conn.execute("EXPLAIN QUERY PLAN " + traced[-1]))
+        conn.close()
+        assert "SEARCH" in plan and "idx_neobdm_broker_lookup (ticker=?)" in plan
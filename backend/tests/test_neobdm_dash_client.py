@@ -0,0 +1,121 @@
+"""Tests for NeoBDMDashClient against the recorded-fixture mock NeoBDM server."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+
+from modules.neobdm_dash_client import NeoBDMDashClient, DashLayoutChanged
+from modules.scraper_neobdm import NeoBDMScraper
+from tests.neobdm_mock_server import MockNeoBDMServer
+
+
+@pytest.fixture
+def server():
+    server = MockNeoBDMServer().start()
+    yield server
+    server.stop()
+
+
+def _client(server):
+    client = NeoBDMDashClient(base_url=server.base_url, email="tester@example.com", password=server.valid_password)
+    assert client.login()
+    return client
+
+
+def test_market_summary_replays_callback(server):
+    df, reference_date = _client(server).get_market_summary('m', 'd')
+
+    assert reference_date == "2026-01-15"
+    assert list(df.columns) == ["symbol", "pinky", "d-0", "d-2", "%1d", "price"]
+    assert df['symbol'].tolist() == ["BBCA", "BBRI", "TLKM"]
+    assert df.iloc[0]['d-0'] == "12.5"
+    assert df.iloc[0]['price'] == "9850"
+    # Tooltips are appended like the DOM scrape does
+    assert df.iloc[0]['pinky'] == "v|Pinky since 2026-01-10"
+
+    payload = server.dash_requests[-1]
+    inputs = {dep['id']: dep['value'] for dep in payload['inputs']}
+    assert inputs == {"method": "m", "summary-mode": "d", "summary-options": ["ma", "compatible"]}
+
+
+def test_broker_summary_maps_headers_to_scraper_keys(server):
+    data = _client(server).get_broker_summary('antm', '2026-01-12')
+
+    assert data['buy'][0] == {"broker": "YP", "nlot": "15230", "nval": "2.1B", "bavg": "1385.5"}
+    assert data['sell'] == [{"broker": "CC", "nlot": "-12000", "nval": "-1.7B", "savg": "1390"}]
+
+
+def test_prevent_update_means_no_data(server):
+    assert _client(server).get_broker_summary('ANTM', '2026-01-11') is None
+
+
+def test_expired_session_logs_in_again(server):
+    client = _client(server)
+    client.session.cookies.clear()
+
+    assert client.get_broker_summary('ANTM', '2026-01-12') is not None
+    assert server.login_count == 2
+
+
+def test_paginated_summary_is_read_page_by_page():
+    server = MockNeoBDMServer(variant="paged").start()
+    try:
+        client = _client(server)
+        df, reference_date = client.get_market_summary('m', 'd')
+
+        assert reference_date == "2026-01-15"
+        assert df['symbol'].tolist() == ["BBCA", "BBRI", "TLKM", "ASII", "GOTO"]
+        pages = [
+            {dep['id']: dep['value'] for dep in payload['inputs']}.get('summary-table')
+            for payload in server.dash_requests
+        ]
+        assert pages == [None, 1, 2]
+
+        # Without a page_current callback the remaining pages can't be replayed
+        client._apps['market_summary']['dependencies'] = client._apps['market_summary']['dependencies'][:1]
+        with pytest.raises(DashLayoutChanged):
+            client.get_market_summary('m', 'd')
+    finally:
+        server.stop()
+
+
+def test_scraper_fast_path_is_opt_in(server, monkeypatch):
+    monkeypatch.delenv("NEOBDM_DASH_API", raising=False)
+    assert NeoBDMScraper(base_url=server.base_url).use_dash_api is False
+
+
+def test_layout_change_is_reported():
+    server = MockNeoBDMServer(dash_api=False).start()
+    try:
+        with pytest.raises(DashLayoutChanged):
+            _client(server).get_market_summary('m', 'd')
+    finally:
+        server.stop()
+
+
+def test_scraper_uses_fast_path_without_browser(server, monkeypatch):
+    monkeypatch.setenv("NEOBDM_DASH_API", "1")
+    monkeypatch.setenv("NEOBDM_EMAIL", "tester@example.com")
+    monkeypatch.setenv("NEOBDM_PASSWORD", server.valid_password)
+    scraper = NeoBDMScraper(base_url=server.base_url)
+
+    data = asyncio.run(scraper.get_broker_summary('ANTM', '2026-01-12'))
+
+    assert data['buy'][0]['broker'] == "YP"
+    assert scraper.page is None
+
+
+def test_scraper_disables_fast_path_on_layout_change(monkeypatch):
+    server = MockNeoBDMServer(dash_api=False).start()
+    monkeypatch.setenv("NEOBDM_DASH_API", "1")
+    monkeypatch.setenv("NEOBDM_EMAIL", "tester@example.com")
+    monkeypatch.setenv("NEOBDM_PASSWORD", server.valid_password)
+    try:
+        scraper = NeoBDMScraper(base_url=server.base_url)
+        # No page: after the fast path gives up there is nothing to fall back to
+        assert asyncio.run(scraper.get_market_summary('m', 'd')) == (None, None)
+        assert scraper.use_dash_api is False
+    finally:
+        server.stop()
@@ -0,0 +1,145 @@
+"""Tests for the incremental (hash-based upsert) NeoBDM record ingest."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import sqlite3
+import tempfile
+import pytest
+
+from db.connection import DatabaseConnection
+from db.neobdm_repository import NeoBDMRepository
+
+
+def _rows(**overrides):
+    rows = [
+        {"symbol": "BBCA|Add BBCA to Watchlist", "d-0": "12.5", "price": "9850"},
+        {"symbol": "BBRI", "d-0": "-3.1", "price": "4120"},
+        {"symbol": "TLKM", "d-0": "7.0", "price": "3350"},
+    ]
+    for row in rows:
+        if row["symbol"].startswith(tuple(overrides)):
+            row.update(overrides[row["symbol"][:4]])
+    return rows
+
+
+@pytest.fixture
+def repo():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        DatabaseConnection(db_path)
+        yield NeoBDMRepository(db_path)
+
+
+def _count(repo, where="1=1"):
+    conn = sqlite3.connect(repo.db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM neobdm_records WHERE {where}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_rerun_writes_only_changed_rows(repo):
+    first = repo.save_neobdm_record_batch('m', 'd', _rows(), scraped_at="2026-01-15")
+    assert first["inserted"] == 3 and first["changed"] == 3
+
+    again = repo.save_neobdm_record_batch('m', 'd', _rows(), scraped_at="2026-01-15")
+    assert again["unchanged"] == 3 and again["changed"] == 0
+
+    changed = repo.save_neobdm_record_batch('m', 'd', _rows(BBRI={"d-0": "-2.0"}), scraped_at="2026-01-15")
+    assert changed["updated"] == 1 and changed["changed"] == 1
+
+    assert _count(repo) == 3
+    assert _count(repo, "symbol = 'BBRI' AND d_0 = '-2.0'") == 1
+    assert _count(repo, "symbol = 'BBCA'") == 1
+
+
+def test_prune_removes_symbols_missing_from_full_scrape(repo):
+    repo.save_neobdm_record_batch('m', 'd', _rows(), scraped_at="2026-01-15")
+    stats = repo.save_neobdm_record_batch('m', 'd', _rows()[:2], scraped_at="2026-01-15", prune=True)
+
+    assert stats["deleted"] == 1
+    assert _count(repo) == 2
+    # Other trade dates and method/periods are untouched
+    repo.save_neobdm_record_batch('m', 'c', _rows(), scraped_at="2026-01-15")
+    repo.save_neobdm_record_batch('m', 'd', _rows(), scraped_at="2026-01-16")
+    repo.save_neobdm_record_batch('m', 'd', _rows()[:1], scraped_at="2026-01-16", prune=True)
+    assert _count(repo, "trade_date = '2026-01-15' AND method = 'm' AND period = 'd'") == 2
+    assert _count(repo, "period = 'c'") == 3
+
+
+def test_timestamped_rerun_restamps_only_changed_rows(repo):
+    repo.save_neobdm_record_batch('m', 'd', _rows(), scraped_at="2026-01-15 09:00:00")
+    statements = []
+    original = repo._get_conn
+
+    def traced_conn():
+        conn = original()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    repo._get_conn = traced_conn
+    stats = repo.save_neobdm_record_batch('m', 'd', _rows(TLKM={"d-0": "8.0"}), scraped_at="2026-01-15 16:00:00")
+    repo._get_conn = original
+
+    assert (stats["updated"], stats["unchanged"]) == (1, 2)
+    # One upsert for the changed row, no blanket re-stamp of the unchanged ones
+    writes = [sql for sql in statements if sql.lstrip().startswith(("INSERT INTO neobdm_records", "UPDATE neobdm_records"))]
+    assert len(writes) == 1
+    assert _count(repo, "scraped_at = '2026-01-15 16:00:00'") == 1
+    assert _count(repo, "scraped_at = '2026-01-15 09:00:00'") == 2
+    assert [r["scraped_at"] for r in repo.get_neobdm_ingest_runs()] == ["2026-01-15 16:00:00", "2026-01-15 09:00:00"]
+
+    # Readers take the whole trade date, reported with its newest stamp
+    df = repo.get_neobdm_summaries(method='m', period='d')
+    assert len(df) == 1 and df.iloc[0]["scraped_at"] == "2026-01-15 16:00:00"
+    assert sorted(r["symbol"] for r in json.loads(df.iloc[0]["data_json"])) == ["BBCA", "BBRI", "TLKM"]
+    assert repo.get_neobdm_history("TLKM", "m", "c")[0]["flow_d0"] == 8.0
+    assert repo.get_available_neobdm_dates() == ["2026-01-15"]
+
+
+def test_unique_constraint_and_ingest_log(repo):
+    repo.save_neobdm_record_batch('nr', 'c', _rows(), scraped_at="2026-01-15")
+    repo.save_neobdm_record_batch('nr', 'c', _rows(), scraped_at="2026-01-15")
+
+    conn = sqlite3.connect(repo.db_path)
+    try:
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO neobdm_records (symbol, method, period, trade_date) VALUES ('BBRI', 'nr', 'c', '2026-01-15')"
+            )
+    finally:
+        conn.close()
+
+    runs = repo.get_neobdm_ingest_runs()
+    assert [(r["inserted"], r["unchanged"]) for r in runs] == [(0, 3), (3, 0)]
+
+
+def test_migration_collapses_legacy_duplicates():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE neobdm_records (id INTEGER PRIMARY KEY AUTOINCREMENT, scraped_at DATETIME, "
+                     "method TEXT, period TEXT, symbol TEXT, d_0 TEXT)")
+        conn.executemany(
+            "INSERT INTO neobdm_records (scraped_at, method, period, symbol, d_0) VALUES (?, ?, ?, ?, ?)",
+            [("2026-01-15 09:00:00", "m", "d", "BBCA", "1"),
+             ("2026-01-15 16:00:00", "m", "d", "BBCA", "2"),
+             ("2026-01-16", "m", "d", "BBCA", "3")]
+        )
+        conn.commit()
+        conn.close()
+
+        DatabaseConnection(db_path)
+
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT trade_date, d_0 FROM neobdm_records ORDER BY trade_date").fetchall()
+        assert rows == [("2026-01-15", "2"), ("2026-01-16", "3")]
+
+        # The backfill is part of the one-time migration, not of every startup
+        conn.execute("INSERT INTO neobdm_records (scraped_at, method, period, symbol) VALUES ('2026-01-17', 'm', 'd', 'TLKM')")
+        conn.commit()
+        DatabaseConnection(db_path)
+        assert conn.execute("SELECT trade_date FROM neobdm_records WHERE symbol = 'TLKM'").fetchone() == (None,)
+        conn.close()
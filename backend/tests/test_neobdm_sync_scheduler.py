@@ -0,0 +1,146 @@
+"""Tests for NeoBDMSyncScheduler (parallel isolated contexts)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import pytest
+
+from modules.neobdm_sync_scheduler import NeoBDMSyncScheduler
+from modules.scraper_neobdm import NeoBDMScraper
+
+
+class FakeContext:
+    def __init__(self):
+        self.closed = False
+
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self):
+        context = FakeContext()
+        self.contexts.append(context)
+        return context
+
+
+class FakeScraper(NeoBDMScraper):
+    """Scraper whose login is instant and configurable."""
+    login_ok = True
+
+    async def login(self):
+        return self.login_ok
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _chromium_available() -> bool:
+    async def probe():
+        from playwright.async_api import async_playwright
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            await browser.close()
+    try:
+        _run(probe())
+        return True
+    except Exception:
+        return False
+
+
+def test_jobs_run_in_parallel_with_bounded_concurrency():
+    in_flight = {"now": 0, "max": 0}
+
+    async def job(scraper):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.2)
+        in_flight["now"] -= 1
+        return "ok"
+
+    browser = FakeBrowser()
+    scheduler = NeoBDMSyncScheduler(concurrency=3, login_stagger=0, scraper_factory=FakeScraper)
+    report = _run(scheduler.run([{"name": f"j{i}", "run": job} for i in range(6)], browser=browser))
+
+    assert report["success_count"] == 6
+    assert in_flight["max"] == 3
+    # 6 jobs x 0.2s on 3 workers should take ~0.4s, not ~1.2s
+    assert report["wall_seconds"] < 1.0
+    assert report["speedup"] >= 2.0
+    # Every job got its own context and every context was closed
+    assert len(browser.contexts) == 6
+    assert all(ctx.closed for ctx in browser.contexts)
+
+
+def test_failed_job_is_retried_in_a_fresh_context():
+    attempts = {"count": 0}
+
+    async def flaky(scraper):
+        attempts["count"] += 1
+        if attempts["count"] == 1:
+            raise RuntimeError("Dash table never rendered")
+        return "recovered"
+
+    browser = FakeBrowser()
+    scheduler = NeoBDMSyncScheduler(concurrency=1, retry_delay=0, login_stagger=0, scraper_factory=FakeScraper)
+    report = _run(scheduler.run([{"name": "flaky", "run": flaky}], browser=browser))
+
+    job = report["jobs"][0]
+    assert job["status"] == "success"
+    assert job["attempts"] == 2
+    assert job["result"] == "recovered"
+    assert len(browser.contexts) == 2
+
+
+def test_login_failure_is_reported_after_retries():
+    class NoLoginScraper(FakeScraper):
+        login_ok = False
+
+    async def never_called(scraper):
+        raise AssertionError("job must not run without login")
+
+    scheduler = NeoBDMSyncScheduler(
+        concurrency=2, max_retries=1, retry_delay=0, login_stagger=0, scraper_factory=NoLoginScraper
+    )
+    report = _run(scheduler.run([{"name": "x", "run": never_called}], browser=FakeBrowser()))
+
+    job = report["jobs"][0]
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"] == "Login failed"
+    assert report["failed_count"] == 1
+
+
+def test_parallel_scrape_against_mock_dash_page(monkeypatch):
+    """End-to-end run on real Chromium against the local mock NeoBDM site."""
+    if not _chromium_available():
+        pytest.skip("Chromium not available for Playwright")
+    from tests.neobdm_mock_server import MockNeoBDMServer
+
+    server = MockNeoBDMServer(render_delay=1.0).start()
+    monkeypatch.setenv("NEOBDM_EMAIL", "tester@example.com")
+    monkeypatch.setenv("NEOBDM_PASSWORD", server.valid_password)
+
+    async def read_table(scraper):
+        await scraper.page.goto(f"{scraper.base_url}/market_summary/")
+        await scraper.page.wait_for_selector('.dash-cell', timeout=10000)
+        return await scraper.page.locator('tr:has(.dash-cell)').count()
+
+    scheduler = NeoBDMSyncScheduler(concurrency=6, login_stagger=0, base_url=server.base_url)
+    try:
+        report = _run(scheduler.run([{"name": f"m{i}", "run": read_table} for i in range(6)]))
+    finally:
+        server.stop()
+
+    assert report["success_count"] == 6
+    assert all(job["result"] == 3 for job in report["jobs"])
+    assert server.login_count == 6
+    assert report["speedup"] >= 3.0
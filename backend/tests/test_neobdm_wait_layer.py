@@ -0,0 +1,161 @@
+"""Tests for the NeoBDMScraper event-driven wait layer (no browser needed)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+
+from modules.scraper_neobdm import NeoBDMScraper
+
+
+class FakeDashScraper(NeoBDMScraper):
+    """Scraper whose table fingerprint and Dash traffic are driven by the test."""
+    WAIT_POLL_INTERVAL = 0.01
+    WAIT_QUIET_PERIOD = 0.1
+
+    def __init__(self, fingerprints, traffic=None):
+        super().__init__()
+        self._fingerprints = list(fingerprints)
+        # poll number -> "request" / "done" Dash event fired before that poll
+        self._traffic = dict(traffic or {})
+        self._polls = 0
+
+    async def _get_data_fingerprint(self):
+        self._polls += 1
+        event = self._traffic.get(self._polls)
+        if event == "request":
+            self._on_dash_request()
+        elif event == "done":
+            self._on_dash_done()
+        if len(self._fingerprints) > 1:
+            return self._fingerprints.pop(0)
+        return self._fingerprints[0]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_returns_as_soon_as_fingerprint_changes():
+    scraper = FakeDashScraper(["old", "old", "new"])
+    outcome = _run(scraper._wait_for_dash_render('date', previous_fingerprint="old", timeout=5.0))
+
+    assert outcome == 'fingerprint_changed'
+    assert scraper.wait_log[0]['seconds'] < 1.0
+
+
+def test_dash_response_with_unchanged_data_does_not_wait_for_timeout():
+    scraper = FakeDashScraper(["same"])
+
+    async def action():
+        # Simulate a completed _dash-update-component round trip
+        scraper._on_dash_request()
+        scraper._on_dash_done()
+
+    outcome = _run(scraper._wait_for_dash_render(
+        'ticker', previous_fingerprint="same", action=action, timeout=5.0
+    ))
+
+    assert outcome == 'dash_response'
+    assert 0.1 <= scraper.wait_log[0]['seconds'] < 1.0
+    # A "nothing changed" exit is not a render-time sample
+    assert 'ticker' not in scraper._wait_samples
+
+
+def test_chained_callbacks_wait_for_the_table_render():
+    # First (unrelated) callback done by the action; the table callback starts
+    # a few polls later and only then does the fingerprint change
+    scraper = FakeDashScraper(["old"] * 8 + ["new"], traffic={4: "request", 7: "done"})
+
+    async def action():
+        scraper._on_dash_request()
+        scraper._on_dash_done()
+
+    outcome = _run(scraper._wait_for_dash_render(
+        'market_summary_params', previous_fingerprint="old", action=action, timeout=5.0
+    ))
+
+    assert outcome == 'fingerprint_changed'
+    assert len(scraper._wait_samples['market_summary_params']) == 1
+
+
+def test_inflight_callback_blocks_completion_until_timeout():
+    scraper = FakeDashScraper(["old", "new"])
+    scraper._dash_inflight = 1
+
+    outcome = _run(scraper._wait_for_dash_render('busy', previous_fingerprint="old", timeout=0.2))
+
+    assert outcome == 'timeout'
+    assert scraper.get_wait_metrics()['busy']['timeouts'] == 1
+
+
+def test_adaptive_timeout_follows_recent_samples_and_resets_on_timeout():
+    scraper = NeoBDMScraper()
+    assert scraper._adaptive_timeout('date', 20.0) == 20.0
+
+    for seconds in (0.5, 0.8, 1.0):
+        scraper._record_wait('date', seconds, 'fingerprint_changed', 20.0)
+    assert scraper._adaptive_timeout('date', 20.0) == 4.0
+    # Never below the floor, never above the default
+    assert scraper._adaptive_timeout('date', 2.0) == 2.0
+
+    scraper._record_wait('date', 4.0, 'timeout', 4.0)
+    assert scraper._adaptive_timeout('date', 20.0) == 20.0
+
+
+def test_wait_metrics_summary():
+    scraper = NeoBDMScraper()
+    for seconds in (0.2, 0.4, 0.6, 0.8):
+        scraper._record_wait('market_summary_params', seconds, 'dash_response', 30.0)
+
+    metrics = scraper.get_wait_metrics()['market_summary_params']
+    assert metrics['count'] == 4
+    assert metrics['avg_seconds'] == 0.5
+    assert metrics['max_seconds'] == 0.8
+    assert metrics['timeouts'] == 0
+    assert metrics['samples'] == [0.2, 0.4, 0.6, 0.8]
+
+
+class FakeLocator:
+    def __init__(self, page, selector):
+        self.page = page
+        self.selector = selector
+        self.first = self
+
+    async def count(self):
+        return 1 if self.selector in self.page.present() else 0
+
+    async def is_visible(self):
+        return await self.count() > 0
+
+    async def is_enabled(self):
+        return self.page.polls >= 4
+
+    async def inner_text(self):
+        return " 1 / 3 "
+
+
+class FakeFooterPage:
+    """Pagination footer that renders on the 3rd poll and enables Next on the 4th."""
+
+    def __init__(self):
+        self.polls = 0
+
+    def present(self):
+        return {'.previous-next-container', '.page-number .last-page', 'button.next-page'} if self.polls >= 3 else set()
+
+    def locator(self, selector):
+        if selector == '.previous-next-container':
+            self.polls += 1
+        return FakeLocator(self, selector)
+
+
+def test_pagination_detection_is_a_recorded_wait():
+    scraper = NeoBDMScraper()
+    scraper.page = FakeFooterPage()
+    state = _run(scraper._wait_for_pagination(timeout=5.0))
+
+    assert state == (3, True, False)
+    metrics = scraper.get_wait_metrics()['market_summary_pagination']
+    assert metrics['count'] == 1 and metrics['timeouts'] == 0
+    assert metrics['max_seconds'] < 1.0
@@ -0,0 +1,170 @@
+"""Tests for the columnar OHLCV cache and the analytics that consume it."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import sqlite3
+import statistics
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from db import price_volume_repository as pv_module
+from db.ohlcv_arrays import OHLCVArrays, from_day_number, to_day_number
+from db.price_volume_repository import PriceVolumeRepository
+from modules.alpha_hunter_vpa import AlphaHunterStage2VPA
+from tests.conftest import make_bars
+
+BARS = make_bars(60, seed=3, start=datetime(2026, 1, 2), step=0.05, volume=(1_000, 90_000))
+
+
+@pytest.fixture
+def repo(data_dir):
+    repo = PriceVolumeRepository()
+    repo.upsert_ohlcv_data("BBCA", BARS)
+    return repo
+
+
+def test_arrays_layout_and_views(repo):
+    series = repo.get_ohlcv_arrays("bbca")
+    assert series.days.dtype == np.int32
+    assert series.open.dtype == np.float64 and series.close.dtype == np.float64
+    assert series.volume.dtype == np.int64
+    assert from_day_number(to_day_number("2026-01-02")) == "2026-01-02"
+
+    window = repo.get_ohlcv_arrays("BBCA", "2026-01-10", "2026-02-10")
+    assert np.shares_memory(window.close, series.close)
+    assert window.date_at(0) >= "2026-01-10" and window.date_at(-1) <= "2026-02-10"
+    with pytest.raises(ValueError):
+        window.close[0] = 1.0
+
+    assert series.index_of("2026-01-03") is None  # Saturday
+    assert series.date_at(series.index_at_or_before("2026-01-04")) == "2026-01-02"
+    assert series.index_at_or_before("2025-12-31") is None
+    assert len(OHLCVArrays.from_rows([])) == 0
+
+
+def test_record_format_unchanged(repo):
+    conn = sqlite3.connect(repo.db_path)
+    rows = conn.execute(
+        "SELECT trade_date, open, high, low, close, volume FROM price_volume "
+        "WHERE ticker = 'BBCA' AND trade_date BETWEEN '2026-01-15' AND '2026-02-15' ORDER BY trade_date"
+    ).fetchall()
+    conn.close()
+    expected = [dict(zip(("time", "open", "high", "low", "close", "volume"), row)) for row in rows]
+    assert repo.get_ohlcv_data("BBCA", "2026-01-15", "2026-02-15") == expected
+
+
+def test_warm_reads_skip_the_database(repo, monkeypatch):
+    repo.get_ohlcv_arrays("BBCA")
+
+    def no_db():
+        raise AssertionError("unexpected DB round trip")
+
+    monkeypatch.setattr(repo, "_get_conn", no_db)
+    assert len(repo.get_ohlcv_data("BBCA", "2026-01-01", "2026-12-31")) == 60
+    assert repo.detect_sideways_compression("BBCA", days=15)["avg_close"] > 0
+    repo.get_volume_spike_markers("BBCA", 20, 1.5, 0.0)
+
+    monkeypatch.undo()
+    repo.upsert_ohlcv_data("BBCA", [{"time": "2026-12-01", "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}])
+    assert repo.get_latest_date("BBCA") == "2026-12-01"
+    # Other instances on the same DB see the write too
+    assert PriceVolumeRepository(repo.db_path).get_ohlcv_arrays("BBCA").date_at(-1) == "2026-12-01"
+
+
+def test_date_bounds_see_writes_from_other_processes(repo):
+    repo.get_ohlcv_arrays("BBCA")
+    assert repo.get_latest_date("bbca") == BARS[-1]["time"]
+    assert repo.get_earliest_date("BBCA") == BARS[0]["time"]
+
+    # A write that bypasses this process's repository (and its cache invalidation)
+    conn = sqlite3.connect(repo.db_path)
+    conn.executemany(
+        "INSERT INTO price_volume (ticker, trade_date, open, high, low, close, volume) VALUES ('BBCA', ?, 1, 1, 1, 1, 1)",
+        [("2025-06-02",), ("2026-12-01",)]
+    )
+    conn.commit()
+    conn.close()
+    assert repo.get_latest_date("BBCA") == "2026-12-01"
+    assert repo.get_earliest_date("BBCA") == "2025-06-02"
+    assert repo.get_latest_date("NONE") is None
+
+
+def test_cached_series_see_writes_from_other_processes(repo, monkeypatch):
+    monkeypatch.setattr(PriceVolumeRepository, "SERIES_RECHECK_SECONDS", 0)
+    series = repo.get_ohlcv_arrays("BBCA")
+    rewrites, writes = repo.series_version("BBCA")
+    day = series.date_at(10)
+
+    # An earlier bar rewritten through another connection (no cache invalidation here)
+    conn = sqlite3.connect(repo.db_path)
+    conn.execute(
+        "INSERT OR REPLACE INTO price_volume (ticker, trade_date, open, high, low, close, volume) "
+        "VALUES ('BBCA', ?, 1, 1, 1, 1, 1)", (day,)
+    )
+    conn.commit()
+    rewritten = repo.get_ohlcv_arrays("BBCA")
+    assert len(rewritten) == 60 and rewritten.close[10] == 1.0
+    assert repo.series_version("BBCA") == (rewrites + 1, writes + 1)
+
+    # A later bar from the other connection counts as a pure append
+    conn.execute(
+        "INSERT INTO price_volume (ticker, trade_date, open, high, low, close, volume) "
+        "VALUES ('BBCA', '2026-12-01', 2, 2, 2, 2, 2)"
+    )
+    conn.commit()
+    conn.close()
+    window = PriceVolumeRepository(repo.db_path).load_ohlcv_window(["BBCA"], "2026-11-01", "2026-12-31")
+    assert window["BBCA"].close.tolist() == [2.0]
+    assert repo.load_ohlcv_arrays(["bbca"])["BBCA"].date_at(-1) == "2026-12-01"
+    assert repo.series_version("BBCA") == (rewrites + 1, writes + 2)
+    assert repo.series_marker("BBCA")[0] == 61
+
+
+def test_series_cache_holds_the_whole_universe(repo, monkeypatch):
+    monkeypatch.setattr(PriceVolumeRepository, "SERIES_CACHE_SIZE", 4)
+    tickers = [f"T{i:02d}" for i in range(12)]
+    repo.bulk_upsert_ohlcv({t: BARS[:5] for t in tickers})
+    # Sized from the tickers stored when the database is first opened
+    universe = os.path.join(os.path.dirname(repo.db_path), "universe.db")
+    shutil.copyfile(repo.db_path, universe)
+
+    wide = PriceVolumeRepository(universe)
+    wide.load_ohlcv_arrays(tickers + ["BBCA"])
+    assert all((universe, t) in pv_module._SERIES_CACHE for t in tickers + ["BBCA"])
+
+
+def test_sideways_compression_matches_statistics(repo):
+    records = BARS[-15:]
+    closes = [r["close"] for r in records]
+    mean_close = statistics.mean(closes)
+    cv = statistics.stdev(closes) / mean_close * 100
+    result = repo.detect_sideways_compression("BBCA", days=15)
+    assert result["volatility_pct"] == round(cv, 2)
+    assert result["avg_close"] == round(mean_close, 2)
+
+
+def test_vpa_helpers_accept_arrays(repo):
+    vpa = AlphaHunterStage2VPA.__new__(AlphaHunterStage2VPA)
+    series = repo.get_ohlcv_arrays("BBCA")
+    records = BARS
+    spike_index = 40
+
+    ratio, category, score = vpa._calculate_volume_metrics(series.volume[:spike_index], records[spike_index]["volume"], 20)
+    median_volume = statistics.median(r["volume"] for r in records[spike_index - 20:spike_index])
+    assert ratio == round(records[spike_index]["volume"] / median_volume, 2)
+    assert vpa._calculate_volume_metrics(series.volume[:spike_index], 1, 5)[1] == "insufficient_data"
+
+    compression = vpa._calculate_compression(series[:spike_index], 15)
+    closes = [r["close"] for r in records[spike_index - 15:spike_index]]
+    assert compression["volatility_pct"] == round(statistics.stdev(closes) / statistics.mean(closes) * 100, 2)
+
+    pullback = vpa._calculate_pullback(series, spike_index, 10)
+    assert pullback["days_tracked"] == 10
+    first = pullback["log"][0]
+    assert first["date"] == records[spike_index + 1]["time"]
+    assert first["price_chg"] == vpa._pct_change(records[spike_index + 1]["close"], records[spike_index]["close"])
+    assert type(first["volume"]) is int and type(first["price"]) is float
@@ -0,0 +1,135 @@
+"""Tests for the grouped, concurrent OHLCV refresh engine (fake provider, temp DB)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.price_volume_repository import PriceVolumeRepository
+from modules.ohlcv_refresh import OHLCVRefreshEngine, RefreshJobRegistry, run_refresh_job
+
+
+def _day(offset: int) -> str:
+    return (datetime.now() - timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+def _bar(day: str, close: float = 100.0):
+    return {"time": day, "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000}
+
+
+class FakeProvider:
+    """Serves bars for every calendar day in [start, end) except for broken/empty tickers."""
+
+    def __init__(self, fail_tickers=(), empty_tickers=(), delay=0.02):
+        self.fail_tickers = set(fail_tickers)
+        self.empty_tickers = set(empty_tickers)
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, tickers, start_date, end_date):
+        with self._lock:
+            self.calls.append((tuple(tickers), start_date, end_date, time.monotonic()))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.fail_tickers & set(tickers):
+                raise RuntimeError("provider unavailable")
+            days = []
+            day = datetime.strptime(start_date, '%Y-%m-%d')
+            while day < datetime.strptime(end_date, '%Y-%m-%d'):
+                days.append(day.strftime('%Y-%m-%d'))
+                day += timedelta(days=1)
+            return {
+                t: [] if t in self.empty_tickers else [_bar(d, 200.0) for d in days]
+                for t in tickers
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def repo():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = PriceVolumeRepository(os.path.join(tmp, "pv.db"))
+        for index in range(12):
+            # Three groups of stale tickers (by latest stored date) plus fresh ones
+            offset = [5, 5, 5, 5, 9, 9, 9, 9, 12, 0, 1, 5][index]
+            repo.upsert_ohlcv_data(f"T{index:02d}", [_bar(_day(offset + 3)), _bar(_day(offset))])
+        yield repo
+
+
+def test_refresh_groups_batches_and_writes(repo):
+    provider = FakeProvider(empty_tickers={"T11"})
+    engine = OHLCVRefreshEngine(repo, provider=provider, batch_size=3, concurrency=2, min_interval=0)
+    summary = asyncio.run(engine.run())
+
+    # Groups: 5 stale tickers at offset 5 -> 2 batches, 4 at 9 -> 2, 1 at 12 -> 1
+    assert len(provider.calls) == 5
+    assert all(len(tickers) <= 3 for tickers, _, _, _ in provider.calls)
+    assert sorted(start for _, start, _, _ in provider.calls) == [_day(11), _day(8), _day(8), _day(4), _day(4)]
+    assert provider.max_in_flight <= 2
+
+    by_ticker = {r["ticker"]: r for r in summary["results"]}
+    assert summary["tickers_processed"] == 12
+    assert by_ticker["T09"]["status"] == "already_up_to_date"
+    assert by_ticker["T10"]["status"] == "already_up_to_date"
+    assert by_ticker["T11"]["status"] == "no_new_data"
+    assert by_ticker["T00"] == {
+        "ticker": "T00", "status": "updated", "records_added": 4,
+        "previous_latest": _day(5), "new_latest": _day(1)
+    }
+    assert by_ticker["T08"]["records_added"] == 11
+    assert summary["tickers_updated"] == 9
+    assert summary["total_records_added"] == 4 * 4 + 4 * 8 + 11
+    assert summary["errors"] == []
+    assert repo.get_latest_date("T04") == _day(1)
+    assert repo.get_latest_date("T11") == _day(5)
+
+
+def test_failed_batch_reported_without_losing_others(repo):
+    provider = FakeProvider(fail_tickers={"T08"})
+    engine = OHLCVRefreshEngine(repo, provider=provider, batch_size=10, concurrency=4, min_interval=0)
+    summary = asyncio.run(engine.run())
+
+    assert summary["errors"] == [{"ticker": "T08", "error": "provider unavailable"}]
+    assert "T08" not in {r["ticker"] for r in summary["results"]}
+    assert repo.get_latest_date("T08") == _day(12)
+    assert repo.get_latest_date("T00") == _day(1)
+
+
+def test_rate_limit_spaces_requests(repo):
+    provider = FakeProvider(delay=0)
+    engine = OHLCVRefreshEngine(repo, provider=provider, batch_size=1, concurrency=4, min_interval=0.05)
+    asyncio.run(engine.run())
+
+    starts = sorted(call[3] for call in provider.calls)
+    assert len(starts) == 10
+    assert all(b - a >= 0.045 for a, b in zip(starts, starts[1:]))
+
+
+def test_job_progress_and_registry(repo):
+    registry = RefreshJobRegistry()
+    job = registry.create()
+    assert registry.running() is job
+
+    engine = OHLCVRefreshEngine(repo, provider=FakeProvider(), batch_size=4, min_interval=0)
+    summary = asyncio.run(run_refresh_job(engine, job))
+
+    status = registry.get(job.job_id).to_dict()
+    assert status["status"] == "completed"
+    assert status["progress"]["tickers_done"] == status["progress"]["tickers_total"] == 12
+    assert status["progress"]["batches_done"] == 4
+    assert status["progress"]["percent"] == 100.0
+    assert status["result"] == summary
+    assert registry.running() is None
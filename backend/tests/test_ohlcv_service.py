@@ -0,0 +1,167 @@
+"""Tests for the unified OHLCV store: legacy migration, fetch policy and read paths."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.connection import DatabaseConnection
+from db.neobdm_repository import NeoBDMRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules import ohlcv_service as service_module
+from modules.market_data import MarketData
+from modules.ohlcv_service import OHLCVService
+
+
+def _day(offset: int) -> str:
+    return (datetime.now() - timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+class FakeProvider:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, tickers, start_date, end_date):
+        self.calls.append((tuple(tickers), start_date, end_date))
+        day = datetime.strptime(start_date, '%Y-%m-%d')
+        bars = []
+        while day < datetime.strptime(end_date, '%Y-%m-%d'):
+            bars.append({
+                "time": day.strftime('%Y-%m-%d'), "open": 100.0, "high": 110.0,
+                "low": 95.0, "close": 105.0, "volume": 0 if day.weekday() >= 5 else 5000
+            })
+            day += timedelta(days=1)
+        return {t: bars for t in tickers}
+
+
+@pytest.fixture
+def db_path():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield os.path.join(tmp, "store.db")
+
+
+@pytest.fixture
+def service(db_path, monkeypatch):
+    DatabaseConnection(db_path)
+    service = OHLCVService(PriceVolumeRepository(db_path), provider=FakeProvider())
+    monkeypatch.setitem(service_module._services, db_path, service)
+    return service
+
+
+def test_legacy_tables_are_retired_without_mixing_unadjusted_bars(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE market_analytics_cache (ticker TEXT, date DATE, open REAL, high REAL, low REAL,
+            close REAL, volume REAL, PRIMARY KEY (ticker, date));
+        CREATE TABLE volume_daily_records (id INTEGER PRIMARY KEY AUTOINCREMENT, ticker TEXT NOT NULL,
+            trade_date TEXT NOT NULL, volume INTEGER NOT NULL, open_price REAL, high_price REAL,
+            low_price REAL, close_price REAL, fetched_at TEXT, UNIQUE(ticker, trade_date));
+        INSERT INTO market_analytics_cache VALUES ('bbca', '2026-01-05', 1, 2, 0.5, 1.5, 1000.0);
+        INSERT INTO market_analytics_cache VALUES ('BBCA', '2026-01-06', 1, 2, 0.5, 1.6, 1100.0);
+        INSERT INTO volume_daily_records (ticker, trade_date, volume, open_price, high_price, low_price, close_price)
+            VALUES ('BBCA', '2026-01-06', 9999, 9, 9, 9, 9);
+        INSERT INTO volume_daily_records (ticker, trade_date, volume, open_price, high_price, low_price, close_price)
+            VALUES ('ANTM', '2026-01-06', 500, 1, 1, 1, 1);
+        INSERT INTO volume_daily_records (ticker, trade_date, volume) VALUES ('ANTM', '2026-01-07', 700);
+    """)
+    conn.commit()
+    conn.close()
+
+    DatabaseConnection(db_path)
+
+    DatabaseConnection(db_path)  # second startup is a no-op
+
+    conn = sqlite3.connect(db_path)
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    rows = conn.execute("SELECT ticker, trade_date, close, volume FROM price_volume ORDER BY ticker, trade_date").fetchall()
+    kept = [conn.execute(f"SELECT COUNT(*) FROM {t}_legacy").fetchone()[0]
+            for t in ("market_analytics_cache", "volume_daily_records")]
+    conn.close()
+    assert not tables & {"market_analytics_cache", "volume_daily_records"}
+    # Adjusted volume_daily_records bars are copied; unadjusted market_analytics_cache bars are not
+    assert rows == [
+        ("ANTM", "2026-01-06", 1.0, 500),
+        ("BBCA", "2026-01-06", 9.0, 9999),
+    ]
+    # Nothing is dropped, incomplete rows included
+    assert kept == [2, 3]
+
+
+def test_fetch_policy_full_incremental_and_fresh(service):
+    result = service.ensure_history("bbca", _day(20))
+    assert result == {"source": "fetched_full", "records_added": 20}
+    assert service.provider.calls[-1] == (("BBCA",), _day(20), _day(0))
+
+    assert service.ensure_history("BBCA", _day(10)) == {"source": "database", "records_added": 0}
+
+    service.repo.upsert_ohlcv_data("ANTM", [{"time": _day(6), "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1}])
+    result = service.ensure_history("ANTM", _day(6))
+    assert result == {"source": "fetched_incremental", "records_added": 5}
+    assert service.provider.calls[-1] == (("ANTM",), _day(5), _day(0))
+    assert len(service.provider.calls) == 2
+
+
+def test_empty_fetch_not_retried_within_window(service):
+    service.provider.fetch = lambda tickers, start, end: service.provider.calls.append(start) or {}
+    for _ in range(3):
+        assert service.ensure_history("NEWT", _day(30)) == {"source": "database", "records_added": 0}
+    assert service.provider.calls == [_day(30)]
+
+
+def test_weekend_or_pre_listing_start_is_not_refetched(service):
+    calls = service.provider.calls
+
+    def weekdays_since(listed):
+        def fetch(tickers, start_date, end_date):
+            calls.append((tuple(tickers), start_date, end_date))
+            bars = FakeProvider().fetch(tickers, max(start_date, listed), end_date)
+            return {t: [b for b in rows if datetime.strptime(b["time"], '%Y-%m-%d').weekday() < 5]
+                    for t, rows in bars.items()}
+        return fetch
+
+    service.provider.fetch = weekdays_since(_day(400))
+    saturday = next(_day(n) for n in range(200, 207) if datetime.strptime(_day(n), '%Y-%m-%d').weekday() == 5)
+    assert service.ensure_history("BBCA", saturday)["source"] == "fetched_full"
+    for _ in range(3):
+        assert service.ensure_history("BBCA", saturday) == {"source": "database", "records_added": 0}
+
+    # Listed 60 days ago: asking for a year fetches once, then the store is known to be complete
+    service.provider.fetch = weekdays_since(_day(60))
+    assert service.ensure_history("NEWL", _day(365))["source"] == "fetched_full"
+    assert service.repo.get_earliest_date("NEWL") > _day(61)
+    for _ in range(3):
+        assert service.ensure_history("NEWL", _day(365)) == {"source": "database", "records_added": 0}
+    # ...but a genuinely older range still backfills
+    assert service.ensure_history("NEWL", _day(500))["source"] == "fetched_full"
+    # (Only the incremental top-up after the last weekday bar may add calls, at most once per ticker)
+    assert [c[1] for c in calls if c[1] < _day(30)] == [saturday, _day(365), _day(500)]
+    assert len(calls) <= 5
+
+
+def test_consumers_share_one_store(service, db_path):
+    frame = MarketData(db_path).fetch_ohlcv("★BBCA", days=15)
+    assert len(frame) == 15
+    assert list(frame.columns) == ["open", "high", "low", "close", "volume"]
+    assert frame.index.is_monotonic_increasing
+
+    neobdm = NeoBDMRepository(db_path)
+    result = neobdm.get_or_fetch_volume("bbca")
+    assert result["source"] == "fetched_full"
+    history = result["data"]
+    assert [r["trade_date"] for r in history] == sorted((r["trade_date"] for r in history), reverse=True)
+    assert all(r["volume"] > 0 for r in history)
+    assert set(history[0]) == {"trade_date", "volume", "open_price", "high_price", "low_price", "close_price"}
+
+    # A write through another repository instance is visible to cached readers
+    neobdm.save_volume_batch("BBCA", [{
+        "trade_date": _day(2), "volume": 123, "open_price": 1.0, "high_price": 2.0,
+        "low_price": 0.5, "close_price": 1.5
+    }, {"trade_date": _day(3), "volume": 1}])
+    bar = next(r for r in service.repo.get_ohlcv_data("BBCA", _day(2), _day(2)))
+    assert bar["volume"] == 123
+    assert neobdm.get_volume_history("BBCA", _day(3), _day(2))[0]["volume"] == 123
+    assert neobdm.get_latest_volume_date("bbca") == max([r["trade_date"] for r in history] + [_day(2)])
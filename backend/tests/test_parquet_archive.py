@@ -0,0 +1,148 @@
+"""Tests for the partitioned Parquet export/import of history tables."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+import tempfile
+
+import pytest
+
+from db.connection import DatabaseConnection
+from db.neobdm_repository import NeoBDMRepository
+from db.parquet_archive import ParquetArchive
+from db.price_volume_repository import PriceVolumeRepository
+
+
+def _bar(day, close):
+    return {"time": day, "open": close, "high": close + 5, "low": close - 5, "close": close, "volume": 1000}
+
+
+@pytest.fixture
+def archive():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "src.db")
+        DatabaseConnection(db_path)
+        PriceVolumeRepository(db_path).upsert_ohlcv_data("BBCA", [_bar("2025-12-30", 100.0), _bar("2026-01-02", 101.0)])
+        PriceVolumeRepository(db_path).upsert_ohlcv_data("ANTM", [_bar("2026-01-02", 50.0)])
+
+        neobdm = NeoBDMRepository(db_path)
+        neobdm.save_neobdm_record_batch("m", "c", [
+            {"symbol": "BBCA", "d-0": "1,234.5B", "c-3": "12.5|x", "price": "9,500", "pinky": "v"},
+            {"symbol": "ANTM", "d-0": "-3.2", "c-3": None, "price": "bad"},
+        ], scraped_at="2026-01-02 16:00:00")
+        neobdm.save_broker_summary_batch("BBCA", "2026-01-02", [{"broker": "YP", "nlot": "10", "nval": "1.5", "bavg": "9500"}],
+                                         [{"broker": "CC", "nlot": "-10", "nval": "-1.5", "savg": "9490"}])
+
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO done_detail_records (ticker, trade_date, price, qty, buyer_code, seller_code) VALUES (?, ?, ?, ?, ?, ?)",
+            [("BBCA", "2026-01-02", 100.0, 10, "YP", "CC"), ("BBCA", "2026-01-02", 101.0, 5, "YP", "PD")]
+        )
+        conn.commit()
+        conn.close()
+        yield ParquetArchive(root=os.path.join(tmp, "parquet"), db_path=db_path)
+
+
+def test_export_partitions_and_decodes(archive):
+    summary = archive.export()
+    assert summary["price_volume"] == {"rows": 3, "tickers": 2}
+    assert os.path.isdir(os.path.join(archive.root, "price_volume", "year=2025", "ticker=BBCA"))
+    assert os.path.isdir(os.path.join(archive.root, "price_volume", "year=2026", "ticker=ANTM"))
+
+    flows = archive.read("neobdm_flows").set_index("ticker")
+    assert flows.loc["BBCA", "d_0"] == 1234.5 and flows.loc["BBCA", "c_3"] == 12.5
+    assert flows.loc["BBCA", "price"] == 9500.0 and flows.loc["BBCA", "pinky"] == "v"
+    assert flows.loc["ANTM", "price"] == 0.0 and flows.loc["ANTM", "d_0"] == -3.2
+
+    daily = archive.read("done_detail_daily").set_index("broker")
+    assert daily.loc["YP", "buy_qty"] == 15 and daily.loc["YP", "buy_value"] == 1505.0
+    assert daily.loc["CC", "sell_trades"] == 1 and daily.loc["PD", "sell_qty"] == 5
+
+    bars = archive.read("price_volume", tickers=["bbca"], start_date="2026-01-01")
+    assert bars["trade_date"].tolist() == ["2026-01-02"]
+
+
+def test_incremental_append(archive):
+    archive.export(["price_volume"])
+    assert archive.export(["price_volume"]) == {"price_volume": {"rows": 0, "tickers": 0}}
+
+    PriceVolumeRepository(archive.db_path).upsert_ohlcv_data("BBCA", [_bar("2026-01-05", 102.0)])
+    assert archive.export(["price_volume"]) == {"price_volume": {"rows": 1, "tickers": 1}}
+    assert archive.read("price_volume", ["BBCA"])["close"].tolist() == [100.0, 101.0, 102.0]
+
+    assert archive.export(["price_volume"], full=True)["price_volume"]["rows"] == 4
+    assert len(archive.read("price_volume")) == 4
+
+
+def test_rows_inserted_for_exported_dates_are_picked_up(archive):
+    conn = sqlite3.connect(archive.db_path)
+    conn.execute("UPDATE neobdm_broker_summaries SET scraped_at = '2026-01-02 16:00:00'")
+    conn.commit()
+    conn.close()
+    archive.export()
+
+    # Backfilled history, another method for a day already archived, and a re-scraped broker day
+    PriceVolumeRepository(archive.db_path).upsert_ohlcv_data("BBCA", [_bar("2025-12-29", 99.0)])
+    neobdm = NeoBDMRepository(archive.db_path)
+    neobdm.save_neobdm_record_batch("nr", "c", [{"symbol": "BBCA", "d-0": "7"}], scraped_at="2026-01-02 17:00:00")
+    neobdm.save_broker_summary_batch("BBCA", "2026-01-02", [{"broker": "AK", "nlot": "20", "nval": "3", "bavg": "9600"}], [])
+    conn = sqlite3.connect(archive.db_path)
+    conn.execute(
+        "INSERT INTO done_detail_records (ticker, trade_date, price, qty, buyer_code, seller_code) VALUES (?, ?, ?, ?, ?, ?)",
+        ("BBCA", "2026-01-02", 102.0, 1, "YP", "CC")
+    )
+    conn.commit()
+    conn.close()
+
+    summary = archive.export()
+    assert summary["price_volume"]["rows"] == 1 and summary["neobdm_flows"]["rows"] == 1
+    assert archive.export() == {name: {"rows": 0, "tickers": 0} for name in summary}
+
+    assert archive.read("price_volume", ["BBCA"])["trade_date"].tolist() == ["2025-12-29", "2025-12-30", "2026-01-02"]
+    flows = archive.read("neobdm_flows", ["BBCA"])
+    assert flows["method"].tolist() == ["m", "nr"] and flows["d_0"].tolist() == [1234.5, 7.0]
+    assert archive.read("broker_summaries")["broker"].tolist() == ["AK"]
+    daily = archive.read("done_detail_daily").set_index("broker")
+    assert daily.loc["YP", "buy_qty"] == 16 and daily.loc["CC", "sell_trades"] == 2
+
+
+def test_updated_and_pruned_flows_are_re_exported(archive):
+    archive.export(["neobdm_flows"])
+
+    # Same trade date re-scraped: BBCA changes in place (keeps its row id), ANTM drops out
+    NeoBDMRepository(archive.db_path).save_neobdm_record_batch(
+        "m", "c", [{"symbol": "BBCA", "d-0": "9.0", "price": "9,500", "pinky": "v"}],
+        scraped_at="2026-01-02 18:00:00", prune=True
+    )
+
+    summary = archive.export(["neobdm_flows"])
+    assert summary["neobdm_flows"] == {"rows": 2, "tickers": 2}
+    flows = archive.read("neobdm_flows")
+    assert flows["ticker"].tolist() == ["BBCA"]
+    assert flows.loc[0, "d_0"] == 9.0 and flows.loc[0, "scraped_at"] == "2026-01-02 18:00:00"
+    assert archive.export(["neobdm_flows"]) == {"neobdm_flows": {"rows": 0, "tickers": 0}}
+
+
+def test_restore_into_empty_database(archive, tmp_path):
+    archive.export()
+    target = str(tmp_path / "restored.db")
+    DatabaseConnection(target)
+    restored = ParquetArchive(root=archive.root, db_path=target)
+
+    assert restored.restore("price_volume") == 3
+    assert PriceVolumeRepository(target).get_ohlcv_data("BBCA", "2025-12-01", "2026-01-31") == \
+        PriceVolumeRepository(archive.db_path).get_ohlcv_data("BBCA", "2025-12-01", "2026-01-31")
+
+    assert restored.restore("neobdm_flows") == 2
+    assert restored.restore("neobdm_flows") == 0  # existing rows are kept
+    history = NeoBDMRepository(target).get_neobdm_history("BBCA", "m", "c")
+    assert history[0]["flow_d0"] == 1234.5 and history[0]["price"] == 9500.0
+
+    assert restored.restore("broker_summaries") == 2
+    assert restored.restore("broker_summaries") == 2
+    summary = NeoBDMRepository(target).get_broker_summary("BBCA", "2026-01-02")
+    assert [b["broker"] for b in summary["buy"]] == ["YP"]
+
+    with pytest.raises(ValueError):
+        restored.restore("done_detail_daily")
@@ -0,0 +1,193 @@
+"""Regression tests for the vectorized volume scanners in PriceVolumeRepository."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import sqlite3
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.connection import DatabaseConnection
+from db.market_metadata_repository import MarketMetadataRepository
+from db.ohlcv_arrays import to_day_number
+from db.price_volume_repository import PriceVolumeRepository
+
+
+def _trading_days(count: int):
+    day = datetime.now()
+    days = []
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.strftime('%Y-%m-%d'))
+        day -= timedelta(days=1)
+    return sorted(days)
+
+
+@pytest.fixture(scope="module")
+def repo():
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "pv.db")
+        DatabaseConnection(db_path)
+        repo = PriceVolumeRepository(db_path)
+        metadata = MarketMetadataRepository(db_path)
+        days = _trading_days(120)
+        for index in range(25):
+            ticker = f"T{index:03d}"
+            # Some tickers have a short history, one has a gap in the middle
+            ticker_days = days[-(15 + index * 5):] if index < 4 else days
+            if index == 5:
+                ticker_days = days[:60] + days[75:]
+            records = []
+            price = 1000.0
+            for day in ticker_days:
+                volume = rng.randint(1_000, 50_000)
+                if rng.random() < 0.08:
+                    volume *= rng.choice([3, 6, 12])
+                if rng.random() < 0.02:
+                    volume = 0
+                open_price = price
+                price = max(50.0, price * (1 + rng.uniform(-0.09, 0.09)))
+                records.append({
+                    "time": day, "open": open_price, "high": max(open_price, price) * 1.01,
+                    "low": min(open_price, price) * 0.99, "close": price, "volume": volume
+                })
+            repo.upsert_ohlcv_data(ticker, records)
+            # Market caps: history for some tickers, only shares for others, none for the rest
+            if index % 3 == 0:
+                metadata.save_market_cap_snapshot(ticker, days[-1], rng.choice([5e8, 5e9, 5e10]))
+            elif index % 3 == 1:
+                metadata._save_cache(ticker, 1e12)
+                metadata._update_shares_outstanding(ticker, rng.choice([1e5, 1e6, 1e7]))
+        yield repo
+
+
+def _reference_unusual(repo, scan_days=30, lookback_days=20, min_ratio=2.0):
+    """The original per-ticker/per-day query implementation."""
+    end_date = datetime.now().strftime('%Y-%m-%d')
+    start_date = (datetime.now() - timedelta(days=scan_days)).strftime('%Y-%m-%d')
+    events = []
+    conn = sqlite3.connect(repo.db_path)
+    cursor = conn.cursor()
+    for ticker in repo.get_all_tickers():
+        cursor.execute(
+            "SELECT trade_date, volume, close, open FROM price_volume "
+            "WHERE ticker = ? AND trade_date BETWEEN ? AND ? ORDER BY trade_date DESC",
+            (ticker, start_date, end_date)
+        )
+        for trade_date, volume, close, open_price in cursor.fetchall():
+            cursor.execute(
+                "SELECT volume FROM price_volume WHERE ticker = ? AND trade_date < ? "
+                "ORDER BY trade_date DESC LIMIT ?",
+                (ticker, trade_date, lookback_days)
+            )
+            prev = [row[0] for row in cursor.fetchall()]
+            if len(prev) < 10:
+                continue
+            median = statistics.median(prev)
+            if median > 0 and volume / median >= min_ratio:
+                events.append((ticker, trade_date, round(volume / median, 2), round(median)))
+    conn.close()
+    return sorted(events)
+
+
+@pytest.mark.parametrize("scan_days,lookback_days,min_ratio", [(30, 20, 2.0), (60, 10, 1.5), (7, 20, 3.0)])
+def test_detect_unusual_volumes_matches_reference(repo, scan_days, lookback_days, min_ratio):
+    result = repo.detect_unusual_volumes(scan_days=scan_days, lookback_days=lookback_days, min_ratio=min_ratio)
+
+    assert sorted((e['ticker'], e['date'], e['ratio'], e['median_20d']) for e in result) == \
+        _reference_unusual(repo, scan_days, lookback_days, min_ratio)
+    assert [e['ratio'] for e in result] == sorted((e['ratio'] for e in result), reverse=True)
+    for event in result:
+        expected = 'extreme' if event['ratio'] >= 5 else 'high' if event['ratio'] >= 3 else 'elevated'
+        assert event['category'] == expected
+        assert isinstance(event['volume'], int) and isinstance(event['close'], float)
+
+
+def test_scan_with_scoring_matches_per_event_scoring(repo, monkeypatch):
+    def cached_shares_only(self, symbol, ttl_hours=168):
+        return self.get_cached_market_data([symbol])[symbol]["shares_outstanding"]
+
+    monkeypatch.setattr(MarketMetadataRepository, "get_shares_outstanding", cached_shares_only)
+
+    result = repo.scan_with_scoring(scan_days=30, lookback_days=20, min_ratio=1.5, min_score=0)
+    unusual = repo.detect_unusual_volumes(scan_days=30, lookback_days=20, min_ratio=1.5)
+    assert len(result) == len(unusual)
+    assert any(e['flow_data']['has_market_cap'] for e in result)
+    assert any(e['compression_data']['compression_score'] > 0 for e in result)
+
+    for event in result:
+        expected = repo.calculate_anomaly_score(event['ticker'], event['date'], event['ratio'])
+        assert event['total_score'] == expected['total_score']
+        assert event['signal_level'] == expected['signal_level']
+        assert event['breakdown'] == expected['breakdown']
+        assert event['flow_data'] == expected['flow_data']
+        for key, value in expected['compression_data'].items():
+            assert event['compression_data'][key] == pytest.approx(value, abs=0.011)
+    assert [e['total_score'] for e in result] == sorted((e['total_score'] for e in result), reverse=True)
+
+
+def _reference_spike_markers(repo, ticker, lookback_days=20, min_ratio=3.0, min_price_change=5.0):
+    """The original per-day statistics.median implementation."""
+    conn = sqlite3.connect(repo.db_path)
+    rows = conn.execute(
+        "SELECT trade_date, volume, close, open FROM price_volume WHERE ticker = ? ORDER BY trade_date ASC",
+        (ticker,)
+    ).fetchall()
+    conn.close()
+    if len(rows) < lookback_days + 1:
+        return []
+    markers = []
+    for i in range(lookback_days, len(rows)):
+        trade_date, volume, close, open_price = rows[i]
+        prev_volumes = [rows[j][1] for j in range(i - lookback_days, i)]
+        if len(prev_volumes) < 10:
+            continue
+        median_volume = statistics.median(prev_volumes)
+        if median_volume <= 0:
+            continue
+        ratio = volume / median_volume
+        price_change = ((close - open_price) / open_price * 100) if open_price > 0 else 0
+        if ratio >= min_ratio and abs(price_change) >= min_price_change:
+            markers.append((trade_date, volume, round(median_volume), round(ratio, 2), round(price_change, 2)))
+    return markers
+
+
+@pytest.mark.parametrize("lookback_days,min_ratio,min_price_change", [(20, 3.0, 5.0), (10, 1.5, 1.0), (5, 2.0, 0.0)])
+def test_spike_markers_match_reference(repo, lookback_days, min_ratio, min_price_change):
+    for index in range(25):
+        ticker = f"T{index:03d}"
+        markers = repo.get_volume_spike_markers(ticker, lookback_days, min_ratio, min_price_change)
+        expected = _reference_spike_markers(repo, ticker, lookback_days, min_ratio, min_price_change)
+        assert [
+            (m['time'], m['volume'], m['median_20d'], m['ratio'], m['price_change']) for m in markers
+        ] == expected
+        for marker in markers:
+            assert marker['position'] == ('aboveBar' if marker['price_change'] >= 0 else 'belowBar')
+
+
+def test_spike_markers_cached_until_upsert(repo, monkeypatch):
+    markers = repo.get_volume_spike_markers("t010", 20, 1.5, 1.0)
+    assert markers
+    markers[0]['ratio'] = -1  # callers get copies, never the cached series
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cache miss")
+
+    monkeypatch.setattr(PriceVolumeRepository, "_compute_spike_markers", staticmethod(fail))
+    cached = repo.get_volume_spike_markers("T010", 20, 1.5, 1.0)
+    assert cached[0]['ratio'] != -1
+    monkeypatch.undo()
+
+    latest = cached[-1]['time']
+    next_day = (datetime.strptime(_trading_days(1)[0], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    repo.upsert_ohlcv_data("T010", [{
+        "time": next_day, "open": 100.0, "high": 130.0, "low": 99.0, "close": 125.0, "volume": 10_000_000
+    }])
+    refreshed = repo.get_volume_spike_markers("T010", 20, 1.5, 1.0)
+    assert refreshed[-1]['time'] == next_day != latest
+    assert not any(key[0] == "T010" and key[1] != to_day_number(next_day) for key in repo._spike_cache)
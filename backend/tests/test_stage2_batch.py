@@ -0,0 +1,112 @@
+"""Tests for the whole-watchlist Stage 2 VPA batch (preload + parallel analysis)."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.alpha_hunter_repository import AlphaHunterRepository
+from db.neobdm_repository import NeoBDMRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules import alpha_hunter_vpa as vpa_module
+from modules.ohlcv_service import OHLCVService
+from tests.conftest import make_bars
+
+TICKERS = ["BBCA", "ANTM", "TLKM"]
+
+
+class NoNetworkProvider:
+    def fetch(self, tickers, start_date, end_date):
+        raise AssertionError("unexpected provider call")
+
+
+@pytest.fixture
+def env(data_dir, monkeypatch):
+    with open(os.path.join(data_dir, "brokers_idx.json"), "w", encoding="utf-8") as f:
+        json.dump({"brokers": [{"code": "CC", "category": ["institutional"]},
+                               {"code": "YP", "category": ["retail"]}]}, f)
+    repo = PriceVolumeRepository()
+    monkeypatch.setattr(vpa_module, "price_volume_repo", repo)
+    monkeypatch.setattr(vpa_module, "ohlcv_service", OHLCVService(repo, provider=NoNetworkProvider()))
+
+    watchlist = AlphaHunterRepository()
+    neobdm = NeoBDMRepository()
+    for seed, ticker in enumerate(TICKERS):
+        bars = make_bars(90, seed=seed, end=datetime.now() - timedelta(days=1), spikes={60: 6})
+        repo.upsert_ohlcv_data(ticker, bars)
+        watchlist.add_to_watchlist(ticker, bars[60]["time"], 70, {})
+        for i, bar in enumerate(bars[-12:]):
+            neobdm.save_broker_summary_batch(
+                ticker, bar["time"],
+                [{"broker": "CC", "nlot": str(100 + i * seed), "nval": "1.5", "bavg": "1000"}],
+                [{"broker": "YP", "nlot": str(80 + i), "nval": "1.2", "savg": "990"}]
+            )
+    return repo
+
+
+def test_preloaded_broker_readers_match_sql(env):
+    sql = NeoBDMRepository()
+    preloaded = NeoBDMRepository()
+    frames = preloaded.load_broker_summaries(TICKERS + ["NONE"])
+    assert frames["NONE"].empty
+    preloaded.use_broker_summaries(frames)
+
+    for ticker in TICKERS:
+        floor = sql.get_floor_price_analysis(ticker, days=30)
+        assert floor["confidence"] != "ERROR"
+        assert preloaded.get_floor_price_analysis(ticker, days=30) == floor
+
+    preloaded._get_conn = lambda: pytest.fail("unexpected DB round trip")
+    for ticker in TICKERS:
+        dates = sql.get_available_dates_for_ticker(ticker)
+        assert preloaded.get_available_dates_for_ticker(ticker) == dates
+        assert preloaded.get_broker_summary(ticker, dates[0]) == sql.get_broker_summary(ticker, dates[0])
+        assert preloaded.get_top_holders_by_net_lot(ticker, 5) == sql.get_top_holders_by_net_lot(ticker, 5)
+
+
+def _collect(tasks, workers):
+    async def run():
+        return [result async for result in vpa_module.iter_watchlist_batch(tasks, max_workers=workers)]
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_matches_single_ticker_analysis(env, workers):
+    analyzer = vpa_module.AlphaHunterStage2VPA()
+    expected = {t: analyzer.analyze_watchlist(t) for t in TICKERS}
+    assert all("error" not in result for result in expected.values())
+
+    tasks, errors = analyzer.prepare_watchlist_batch(TICKERS + ["ZZZZ"])
+    assert errors == [{"ticker": "ZZZZ", "error": "ZZZZ not found in watchlist"}]
+    results = {r["ticker"]: r for r in _collect(tasks, workers)}
+    assert set(results) == set(TICKERS)
+    for ticker in TICKERS:
+        assert json.dumps(results[ticker], sort_keys=True, default=str) == \
+            json.dumps(expected[ticker], sort_keys=True, default=str)
+
+
+def test_batch_defaults_to_whole_watchlist(env):
+    tasks, errors = vpa_module.AlphaHunterStage2VPA().prepare_watchlist_batch(lookback_days=20)
+    assert not errors
+    assert sorted(t["ticker"] for t in tasks) == sorted(TICKERS)
+    assert all(t["params"] == {"lookback_days": 20} for t in tasks)
+
+
+def test_batches_share_one_spawned_pool(env, monkeypatch):
+    monkeypatch.setattr(vpa_module.os, "cpu_count", lambda: 2)
+    analyzer = vpa_module.AlphaHunterStage2VPA()
+    expected = {t: analyzer.analyze_watchlist(t) for t in TICKERS}
+    tasks, _ = analyzer.prepare_watchlist_batch()
+    # Spawned workers read the same (temporary) database as this process
+    for result in _collect(tasks, 2):
+        assert json.dumps(result, sort_keys=True, default=str) == \
+            json.dumps(expected[result["ticker"]], sort_keys=True, default=str)
+    pool = vpa_module._batch_pool
+    assert pool._mp_context.get_start_method() == "spawn"
+
+    assert len(_collect(tasks[:2], 2)) == 2
+    assert vpa_module._batch_pool is pool
@@ -0,0 +1,109 @@
+"""Tests for the persisted, incrementally advanced Stage 2 pullback tracking."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime
+
+import pytest
+
+from db import market_metadata_repository as metadata_module
+from db.market_metadata_repository import MarketMetadataRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules import alpha_hunter_vpa as vpa_module
+from modules.ohlcv_service import OHLCVService
+from tests.conftest import make_bars
+
+
+class NoNetworkProvider:
+    def fetch(self, tickers, start_date, end_date):
+        raise AssertionError("unexpected provider call")
+
+
+@pytest.fixture
+def vpa(data_dir, monkeypatch):
+    monkeypatch.setattr(metadata_module, "_refreshers", {})
+    monkeypatch.setattr(MarketMetadataRepository, "_fetch_info", lambda self, symbol: None)
+    repo = PriceVolumeRepository()
+    monkeypatch.setattr(vpa_module, "price_volume_repo", repo)
+    monkeypatch.setattr(vpa_module, "ohlcv_service", OHLCVService(repo, provider=NoNetworkProvider()))
+    analyzer = vpa_module.AlphaHunterStage2VPA()
+    analyzer.bars = {
+        ticker: make_bars(70, seed=seed, start=datetime(2026, 1, 5), spikes={60: 6})
+        for seed, ticker in ((1, "BBCA"), (2, "TLKM"))
+    }
+    for ticker, bars in analyzer.bars.items():
+        # Three days after the spike are known so far
+        repo.upsert_ohlcv_data(ticker, bars[:64])
+        analyzer.watchlist_repo.add_to_watchlist(ticker, bars[60]["time"], 70, {"spike_date": bars[60]["time"]})
+    analyzer.pv = repo
+    return analyzer
+
+
+def _history(analyzer, ticker):
+    return sorted(analyzer.watchlist_repo.get_tracking_history(ticker), key=lambda r: r["trade_date"])
+
+
+def test_persist_writes_only_new_days(vpa):
+    result = vpa.analyze_watchlist("BBCA", persist_tracking=True)
+    log = result["pullback"]["log"]
+    history = _history(vpa, "BBCA")
+    assert [r["trade_date"] for r in history] == [e["date"] for e in log] and len(log) == 3
+    assert [r["health_status"] for r in history] == [e["status"] for e in log]
+    assert history[-1]["health_score"] == result["scores"]["pullback_health_score"]
+    assert history[0]["meta_data"] == {"stage2_score": result["scores"]["stage2_score"], "spike_date": result["spike"]["date"]}
+
+    # Nothing new: no snapshot rewrite
+    written = []
+    original = vpa.watchlist_repo.save_tracking_progress
+    vpa.watchlist_repo.save_tracking_progress = lambda updates: written.append(updates) or original(updates)
+    vpa.analyze_watchlist("BBCA", persist_tracking=True)
+    assert written == []
+
+    # Two new bars: exactly two snapshots appended
+    vpa.pv.upsert_ohlcv_data("BBCA", vpa.bars["BBCA"][64:66])
+    result = vpa.analyze_watchlist("BBCA", persist_tracking=True)
+    assert [len(u["snapshots"]) for u in written[0]] == [2] and not written[0][0]["reset"]
+    history = _history(vpa, "BBCA")
+    assert [r["trade_date"] for r in history] == [e["date"] for e in result["pullback"]["log"]]
+    assert history[-1]["health_score"] == result["scores"]["pullback_health_score"]
+
+
+def test_daily_job_advances_watchlist_in_one_transaction(vpa, monkeypatch):
+    vpa.analyze_watchlist("BBCA", persist_tracking=True)
+
+    classified = []
+    original = vpa._classify_pullback_day
+    monkeypatch.setattr(vpa, "_classify_pullback_day", lambda p, v: classified.append(p) or original(p, v))
+    calls = []
+    save = vpa.watchlist_repo.save_tracking_progress
+    monkeypatch.setattr(vpa.watchlist_repo, "save_tracking_progress", lambda updates: calls.append(updates) or save(updates))
+
+    for ticker in ("BBCA", "TLKM"):
+        vpa.pv.upsert_ohlcv_data(ticker, vpa.bars[ticker][64:])
+    summary = vpa.update_tracking()
+
+    assert len(calls) == 1 and summary["updated"] == 2
+    results = {r["ticker"]: r for r in summary["results"]}
+    monkeypatch.setattr(vpa, "_classify_pullback_day", original)
+    full = {ticker: vpa.analyze_watchlist(ticker) for ticker in ("BBCA", "TLKM")}
+    # BBCA resumes after its 3 stored days; TLKM starts from its spike
+    assert results["BBCA"]["new_days"] == len(full["BBCA"]["pullback"]["log"]) - 3
+    assert results["TLKM"]["new_days"] == len(full["TLKM"]["pullback"]["log"]) > 3
+    assert len(classified) == results["BBCA"]["new_days"] + results["TLKM"]["new_days"]
+
+    for ticker, analysis in full.items():
+        history = _history(vpa, ticker)
+        assert [r["trade_date"] for r in history] == [e["date"] for e in analysis["pullback"]["log"]]
+        assert [r["price_change_pct"] for r in history] == [e["price_chg"] for e in analysis["pullback"]["log"]]
+        assert history[-1]["health_score"] == analysis["scores"]["pullback_health_score"] == results[ticker]["health_score"]
+
+    # Fully tracked: the next run is a no-op
+    again = vpa.update_tracking()
+    assert again["updated"] == 0 and {r["status"] for r in again["results"]} == {"up_to_date"}
+
+    # A new spike restarts tracking
+    bars = vpa.bars["BBCA"]
+    vpa.watchlist_repo.add_to_watchlist("BBCA", bars[64]["time"], 70, {"spike_date": bars[64]["time"]})
+    vpa.analyze_watchlist("BBCA", persist_tracking=True)
+    assert _history(vpa, "BBCA")[0]["trade_date"] == bars[65]["time"]
@@ -0,0 +1,114 @@
+"""Tests for the cached Stage 2 visualization payload and its ETag handling."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.neobdm_repository import NeoBDMRepository
+from db.price_volume_repository import PriceVolumeRepository
+from modules import alpha_hunter_vpa as vpa_module
+from modules.ohlcv_service import OHLCVService
+from tests.conftest import make_bars
+
+
+class EmptyProvider:
+    """Counts fetches; has nothing newer than what is stored."""
+
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, tickers, start_date, end_date):
+        self.calls.append((tuple(tickers), start_date))
+        return {}
+
+
+@pytest.fixture
+def env(data_dir, monkeypatch):
+    repo = PriceVolumeRepository()
+    monkeypatch.setattr(vpa_module, "price_volume_repo", repo)
+    service = OHLCVService(repo, provider=EmptyProvider())
+    monkeypatch.setattr(vpa_module, "ohlcv_service", service)
+    monkeypatch.setattr(vpa_module, "_visualization_cache", OrderedDict())
+    # Weekday bars up to yesterday, fewer than the 180-day window (a recent listing)
+    repo.upsert_ohlcv_data("BBCA", make_bars(70, seed=3, end=datetime.now() - timedelta(days=1), spikes={33: 5}))
+
+    builds = []
+    original = vpa_module.AlphaHunterStage2VPA._build_stage2_visualization
+    monkeypatch.setattr(
+        vpa_module.AlphaHunterStage2VPA, "_build_stage2_visualization",
+        lambda self, *args, **kwargs: builds.append(args) or original(self, *args, **kwargs)
+    )
+    return vpa_module.AlphaHunterStage2VPA(), repo, builds, service
+
+
+def test_etag_checks_never_reach_the_provider(env):
+    analyzer, repo, builds, service = env
+
+    etag = analyzer.stage2_visualization_etag("BBCA")
+    for _ in range(3):
+        assert analyzer.stage2_visualization_etag("bbca") == etag
+    assert service.provider.calls == [] and builds == []
+
+    # Serving the payload tops the history up in the background, once per retry window
+    for _ in range(3):
+        assert analyzer.get_stage2_visualization("BBCA")[0] == etag
+        service.wait()
+    assert len(service.provider.calls) <= 1 and len(builds) == 1
+
+
+def test_payload_is_rebuilt_only_when_inputs_change(env):
+    analyzer, repo, builds, service = env
+
+    etag, payload = analyzer.get_stage2_visualization("bbca")
+    service.wait()
+    assert payload["ticker"] == "BBCA" and len(builds) == 1
+    assert analyzer.stage2_visualization_etag("BBCA") == etag and len(builds) == 1
+    again_etag, again = analyzer.get_stage2_visualization("BBCA")
+    assert (again_etag, again) == (etag, payload) and again is payload and len(builds) == 1
+    assert analyzer.get_stage2_visualization_data("BBCA") is payload
+
+    # Parameters are part of the key
+    override_etag, _ = analyzer.get_stage2_visualization("BBCA", repo.get_latest_date("BBCA"))
+    assert override_etag != etag and len(builds) == 2
+
+    # New flow records and a new bar each change the payload's inputs
+    NeoBDMRepository().save_neobdm_record_batch("m", "c", [{"symbol": "BBCA", "d-0": "12"}])
+    flow_etag = analyzer.stage2_visualization_etag("BBCA")
+    assert flow_etag != etag and len(builds) == 2
+    assert analyzer.get_stage2_visualization("BBCA")[0] == flow_etag and len(builds) == 3
+
+    repo.upsert_ohlcv_data("BBCA", make_bars(1, end=datetime.now(), weekdays_only=False))
+    bar_etag, bar_payload = analyzer.get_stage2_visualization("BBCA")
+    assert bar_etag not in (etag, flow_etag) and len(builds) == 4
+    assert bar_payload["price_chart"]["ohlcv"][-1]["date"] == datetime.now().strftime('%Y-%m-%d')
+
+    # Errors are returned without an ETag and not cached; an unknown ticker is fetched inline
+    assert analyzer.get_stage2_visualization("NONE") == (None, {"error": "No OHLCV data available for NONE"})
+    assert service.provider.calls[-1][0] == ("NONE",)
+
+
+def test_bars_rewritten_by_another_process_rebuild_the_payload(env, monkeypatch):
+    analyzer, repo, builds, service = env
+    monkeypatch.setattr(PriceVolumeRepository, "SERIES_RECHECK_SECONDS", 3600)
+    etag, payload = analyzer.get_stage2_visualization("BBCA")
+    service.wait()
+    last = payload["price_chart"]["ohlcv"][-1]
+
+    # Same dates and bar count, last close rewritten outside this process
+    conn = sqlite3.connect(repo.db_path)
+    conn.execute(
+        "INSERT OR REPLACE INTO price_volume (ticker, trade_date, open, high, low, close, volume) "
+        "SELECT ticker, trade_date, open, high * 2, low, close * 2, volume FROM price_volume "
+        "WHERE ticker = 'BBCA' AND trade_date = ?", (last["date"],)
+    )
+    conn.commit()
+    conn.close()
+
+    new_etag, new_payload = analyzer.get_stage2_visualization("BBCA")
+    assert new_etag != etag and len(builds) == 2
+    assert new_payload["price_chart"]["ohlcv"][-1]["close"] == pytest.approx(last["close"] * 2)
@@ -0,0 +1,110 @@
+"""Tests for the OHLCV-derived trading calendar."""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+from db.connection import DatabaseConnection
+from db.neobdm_repository import NeoBDMRepository
+from db.price_volume_repository import PriceVolumeRepository
+from db import trading_calendar
+from db.trading_calendar import TradingCalendar, get_trading_calendar
+from modules import alpha_hunter_vpa as vpa_module
+
+HOLIDAYS = {"2026-01-01", "2026-01-16"}
+
+
+def _weekdays(start=date(2025, 12, 29), count=40):
+    days = [(start + timedelta(days=i)).isoformat() for i in range(count)]
+    return [d for d in days if date.fromisoformat(d).weekday() < 5]
+
+
+def _bar(day, volume=1000):
+    return {"time": day, "open": 100, "high": 101, "low": 99, "close": 100, "volume": volume}
+
+
+@pytest.fixture
+def repo():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "calendar.db")
+        DatabaseConnection(db_path)
+        repo = PriceVolumeRepository(db_path)
+        for ticker in ("BBCA", "TLKM", "ANTM"):
+            repo.upsert_ohlcv_data(ticker, [_bar(d) for d in _weekdays() if d not in HOLIDAYS])
+        # A stray zero-volume bar on a holiday is not a session
+        repo.upsert_ohlcv_data("BBCA", [_bar("2026-01-16", volume=0)])
+        yield repo
+
+
+def test_offsets_counts_and_ranges():
+    calendar = TradingCalendar.from_dates([d for d in _weekdays(date(2026, 1, 1), 31) if d not in HOLIDAYS])
+
+    assert calendar.offset("2026-01-19", -1) == "2026-01-15"
+    assert calendar.offset("2026-01-17", 0) == "2026-01-15"
+    assert calendar.offset("2026-01-15", 1) == "2026-01-19"
+    assert calendar.is_session("2026-01-15") and not calendar.is_session("2026-01-16")
+    assert calendar.count("2026-01-12", "2026-01-23") == 9
+    assert calendar.sessions("2026-01-14", "2026-01-20") == ["2026-01-14", "2026-01-15", "2026-01-19", "2026-01-20"]
+    assert calendar.missing(["2026-01-14", "2026-01-19"], "2026-01-14", "2026-01-20") == ["2026-01-15", "2026-01-20"]
+    assert calendar.count("2026-01-20", "2026-01-14") == 0
+
+    # Weekday fallback outside the known history
+    assert calendar.offset("2026-01-30", 2) == "2026-02-03"
+    assert calendar.sessions("2025-12-31", "2026-01-05") == ["2025-12-31", "2026-01-01", "2026-01-02", "2026-01-05"]
+    assert calendar.count("2026-01-29", "2026-02-09") == 8
+    empty = TradingCalendar.from_dates([])
+    assert empty.offset("2026-01-03", 0) == "2026-01-02"
+    assert empty.count("2026-01-01", "2026-01-31") == 22
+
+
+def test_calendar_is_derived_from_ohlcv_and_rebuilt_on_write(repo, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(trading_calendar.time, "monotonic", lambda: clock[0])
+    builds = []
+    original = PriceVolumeRepository.get_session_dates
+    monkeypatch.setattr(PriceVolumeRepository, "get_session_dates",
+                        lambda self, *a: builds.append(1) or original(self, *a))
+
+    calendar = get_trading_calendar(repo.db_path)
+    assert not calendar.is_session("2026-01-01") and not calendar.is_session("2026-01-16")
+    assert calendar.is_session("2026-01-15")
+    assert get_trading_calendar(repo.db_path) is calendar
+
+    # A session traded by most tickers after a write shows up
+    last = _weekdays()[-1]
+    nxt = (date.fromisoformat(last) + timedelta(days=3)).isoformat()
+    for ticker in ("BBCA", "TLKM"):
+        repo.upsert_ohlcv_data(ticker, [_bar(nxt)])
+        # Writes in a burst don't rebuild on every read
+        assert get_trading_calendar(repo.db_path) is calendar
+    clock[0] += trading_calendar.MIN_REBUILD_SECONDS
+    rebuilt = get_trading_calendar(repo.db_path)
+    assert rebuilt is not calendar
+    assert rebuilt.days[-1] == calendar.days[-1] + 3
+    assert get_trading_calendar(repo.db_path) is rebuilt and len(builds) == 2
+
+
+def test_callers_skip_holidays(repo, monkeypatch):
+    monkeypatch.setattr(vpa_module, "price_volume_repo", repo)
+    assert NeoBDMRepository(repo.db_path)._get_trading_date("2026-01-18", 1) == "2026-01-15"
+
+    vpa = vpa_module.AlphaHunterStage2VPA.__new__(vpa_module.AlphaHunterStage2VPA)
+    assert vpa._days_between("2026-01-19", "2026-01-12") == 4
+    assert vpa._days_between("2026-01-12", "bad") == 999
+
+    class FakeNeoBDM:
+        def get_available_dates_for_ticker(self, ticker):
+            return ["2026-01-14", "2026-01-15", "2026-01-19"]
+
+        def get_top_holders_by_net_lot(self, ticker, limit=5):
+            return []
+
+    vpa.neobdm_repo = FakeNeoBDM()
+    activity = vpa._analyze_big_player_activity("BBCA", "2026-01-14", "2026-01-20")
+    assert activity["missing_dates"] == ["2026-01-20"]
+    assert activity["coverage_pct"] == 75.0
+    assert activity["data_status"] == "partial"
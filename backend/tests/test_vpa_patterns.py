@@ -0,0 +1,79 @@
+"""Regression tests for the vectorized VPA pattern detectors.
+
+fixtures/vpa_patterns.json holds fixed OHLCV series and the outputs the
+per-bar loop implementations in AlphaHunterStage2VPA produced for them.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+
+import pytest
+
+from db.ohlcv_arrays import OHLCVArrays
+from modules import vpa_patterns
+
+with open(os.path.join(os.path.dirname(__file__), "fixtures", "vpa_patterns.json"), encoding="utf-8") as f:
+    FIXTURE = json.load(f)
+
+SERIES = {ticker: OHLCVArrays.from_rows([tuple(r) for r in rows]) for ticker, rows in FIXTURE["series"].items()}
+
+
+def _plain(value):
+    """JSON round trip: fails on NumPy scalars and turns tuples into lists."""
+    return json.loads(json.dumps(value))
+
+
+@pytest.mark.parametrize("ticker", sorted(SERIES))
+def test_detectors_match_pinned_outputs(ticker):
+    series = SERIES[ticker]
+    expected = FIXTURE["expected"][ticker]
+
+    for key, pinned in expected["spikes"].items():
+        spike = int(key)
+        start, method = vpa_patterns.detect_accumulation_start(series, spike)
+        actual = {
+            "accumulation_start": [start, method],
+            "accumulation_start_30": list(vpa_patterns.detect_accumulation_start(series, spike, max_lookback=30)),
+            "accumulation": vpa_patterns.analyze_pre_spike_accumulation(series, start, spike),
+            "accumulation_from_0": vpa_patterns.analyze_pre_spike_accumulation(series, 0, spike),
+            "accumulation_tail": vpa_patterns.analyze_pre_spike_accumulation(series, max(0, spike - 2), spike),
+            "breakout": vpa_patterns.detect_breakout_setup(series, spike),
+            "breakout_5": vpa_patterns.detect_breakout_setup(series, spike, post_spike_days=5),
+            "breakout_window": vpa_patterns.detect_breakout_setup(series[:min(len(series), spike + 8)], spike),
+        }
+        assert _plain(actual) == pinned, f"{ticker} spike {spike}"
+
+    for count, pinned in expected["selling_climax"].items():
+        assert _plain(vpa_patterns.detect_selling_climax(series[:int(count)])) == pinned
+
+    lines = vpa_patterns.detect_resistance_levels(series, expected["volume_spikes"], "2026-10-19")
+    assert _plain(lines) == expected["resistance_lines"]
+
+
+def test_scans_match_single_ticker_detectors():
+    spike_dates = {ticker: series.date_at(len(series) // 2) for ticker, series in SERIES.items()}
+    # Weekend date resolves to the Friday before; unknown tickers are skipped
+    spike_dates["SIDE"] = "2025-09-06"
+    spike_dates["NONE"] = "2025-09-01"
+    results = vpa_patterns.scan_spikes(SERIES, spike_dates, post_spike_days=7)
+
+    assert set(results) == set(SERIES)
+    assert results["SIDE"]["spike_date"] == "2025-09-05"
+    for ticker, result in results.items():
+        spike = result["spike_index"]
+        assert result["spike_date"] == SERIES[ticker].date_at(spike)
+        start, method = vpa_patterns.detect_accumulation_start(SERIES[ticker], spike)
+        assert result["accumulation"] == dict(
+            vpa_patterns.analyze_pre_spike_accumulation(SERIES[ticker], start, spike), detection_method=method
+        )
+        assert result["breakout_setup"] == vpa_patterns.detect_breakout_setup(SERIES[ticker], spike, 7)
+
+    climaxes = vpa_patterns.scan_selling_climaxes(SERIES)
+    assert climaxes == {ticker: vpa_patterns.detect_selling_climax(s) for ticker, s in SERIES.items()}
+    assert climaxes["CLMX"][1]["detected"] and climaxes["SHORT"] == (None, {})
+
+    # Record-based callers (visualization) convert once and get the same answers
+    records = SERIES["CLMX"].to_records()
+    assert vpa_patterns.detect_selling_climax(OHLCVArrays.from_records(records)) == climaxes["CLMX"]
@@ -290,6 +290,7 @@ export interface RefreshError {
 }
 
 export interface RefreshAllResponse {
+    job_id?: string;
     tickers_processed: number;
     tickers_updated: number;
     total_records_added: number;